@@ -0,0 +1,121 @@
+"""书签转换工具核心库
+
+导入本包不会加载 tkinter 或 BeautifulSoup，可在无界面环境中使用：
+
+    from bookmark_converter import convert_file
+    convert_file("bookmarks.html", "result.json")
+
+除 engine 中的基本接口外，其余名称在第一次访问时才导入对应模块(见 __getattr__)，
+因此导入本包不会加载 asyncio、sqlite3、http.client 等只有部分功能才用到的模块。
+
+命令行用法见 ``python -m bookmark_converter --help``。
+"""
+import importlib
+import types
+
+from .engine import (
+    PARSER_BACKENDS,
+    UNCATEGORIZED_NAME,
+    ConversionCancelled,
+    build_result,
+    convert_file,
+    convert_to_json_format,
+    count_result,
+    default_configs,
+    iter_bookmark_folders,
+    iter_source_folders,
+    load_json_file,
+    parse_bookmarks,
+    read_bookmark_file,
+    write_result,
+)
+
+# 延迟导入的名称 -> 所在模块
+_LAZY_NAMES = {
+    # batch
+    "batch_convert": "batch",
+    "merge_folders": "batch",
+    # cache
+    "ParseCache": "cache",
+    # corpus
+    "write_corpus": "corpus",
+    # dedup
+    "DEDUP_POLICIES": "dedup",
+    "SiteIndex": "dedup",
+    "canonical_url": "dedup",
+    # favicons
+    "FaviconResolver": "favicons",
+    "IconCache": "favicons",
+    "icon_cache_path_for": "favicons",
+    "site_origin": "favicons",
+    # htmlexport
+    "ExportReader": "htmlexport",
+    "export_html": "htmlexport",
+    "iter_bookmark_html": "htmlexport",
+    # icons
+    "ICON_MODES": "icons",
+    "IconStore": "icons",
+    "describe_icon": "icons",
+    # incremental
+    "SyncManifest": "incremental",
+    "sync_file": "incremental",
+    "sync_folders": "incremental",
+    # linkcheck
+    "LINK_ACTIONS": "linkcheck",
+    "LinkCache": "linkcheck",
+    "LinkChecker": "linkcheck",
+    "link_cache_path_for": "linkcheck",
+    # metrics
+    "Metrics": "metrics",
+    # model
+    "GroupSites": "model",
+    "SiteRecord": "model",
+    "SiteTable": "model",
+    "to_plain": "model",
+    # neardup
+    "NEAR_DUP_ACTIONS": "neardup",
+    "NearDuplicateFinder": "neardup",
+    # netscape
+    "Link": "netscape",
+    # readers
+    "READERS": "readers",
+    "detect_format": "readers",
+    "iter_input_folders": "readers",
+    "register_reader": "readers",
+    # searchindex
+    "SearchIndex": "searchindex",
+    "build_search_index": "searchindex",
+    "search_index_path_for": "searchindex",
+    "write_search_index": "searchindex",
+    # source
+    "InputFile": "source",
+    "iter_text": "source",
+    "sniff_encoding": "source",
+    # sql
+    "write_sql": "sql",
+    # uploader
+    "Uploader": "uploader",
+    "UploadError": "uploader",
+    "load_bundles": "uploader",
+    # writer
+    "ExportWriter": "writer",
+    "validate_export_data": "writer",
+    "write_export": "writer",
+}
+
+# engine 中的名称加上延迟导入的名称
+__all__ = [name for name, value in globals().items()
+           if not name.startswith('_') and not isinstance(value, types.ModuleType)] + list(_LAZY_NAMES)
+
+
+def __getattr__(name):
+    module = _LAZY_NAMES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module("." + module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
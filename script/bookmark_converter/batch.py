@@ -0,0 +1,136 @@
+"""批量转换：并行解析多个书签文件并合并为一个结果
+
+每个文件在进程池中独立解析(解析是 CPU 密集型的，多进程才能利用多核)，
+主进程按输入顺序合并：同名文件夹合并为一个分组，分组和站点的ID在合并时统一分配，
+因此无论各进程以什么顺序完成，相同的输入总会得到相同的ID。
+"""
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .engine import _noop, _plain_sites, convert_to_json_format, count_result, load_json_file
+from .icons import IconStore
+from .metrics import Metrics
+from .readers import iter_input_folders
+
+
+def _parse_one(index, path, full_path, parser, input_format):
+    """在工作进程中解析单个文件，返回 (序号, 文件夹列表, 耗时, 错误信息)"""
+    started = time.perf_counter()
+    try:
+        folders = list(iter_input_folders(path, full_path=full_path, parser=parser, input_format=input_format))
+        return index, folders, time.perf_counter() - started, None
+    except Exception as e:
+        return index, None, time.perf_counter() - started, f"{type(e).__name__}: {e}"
+
+
+def merge_folders(folder_lists):
+    """按顺序合并多个文件的文件夹，同名文件夹的链接依次追加到第一次出现的位置
+
+    每个文件的文件夹先按 "order"(在文档中的先后序号)排列，流式解析时子文件夹先于父文件夹产出。
+    """
+    merged = OrderedDict()
+    for folders in folder_lists:
+        for folder in sorted(folders, key=lambda f: f.get("order", 0)):
+            target = merged.get(folder["name"])
+            if target is None:
+                target = merged[folder["name"]] = {
+                    "name": folder["name"],
+                    "path": folder["path"],
+                    "order": len(merged),
+                    "links": []
+                }
+            target["links"].extend(folder["links"])
+    return list(merged.values())
+
+
+def batch_convert(paths, existing_path=None, configs=None, workers=None, log=None, progress=None,
+                  full_path=False, parser='auto', input_format='auto', icon_store=None, site_index=None,
+                  metrics=None, favicons=None, link_checker=None, near_duplicates=None, keep_metadata=False,
+                  columnar=False):
+    """并行解析多个书签文件并合并，返回 (结果, 每个文件的报告)
+
+    报告中每项为 {"path", "seconds", "folders", "links", "error"}，按输入顺序排列。
+    解析失败的文件记录错误并跳过，不影响其他文件。所有文件都没有书签时结果为 None。
+    workers 为进程数，默认为 CPU 核数；为 1 时在当前进程中依次解析。
+    metrics 为 Metrics 时记录 parse(所有文件的墙钟时间)、merge、load_existing、convert 和 log 各阶段。
+    near_duplicates 为 neardup.NearDuplicateFinder 时查找并按其设置处理近似重复的站点，
+    link_checker 为 linkcheck.LinkChecker 时检查所有站点的链接并按其设置处理失效站点，
+    favicons 为 favicons.FaviconResolver 时为没有图标的站点获取网站图标。
+    keep_metadata 和 columnar 见 engine.convert_to_json_format。
+    """
+    if metrics is None:
+        metrics = Metrics()
+    log = metrics.wrap('log', log or _noop)
+    progress = progress or _noop
+    if icon_store is None:
+        icon_store = IconStore()
+    paths = list(paths)
+    workers = workers or os.cpu_count() or 1
+    results = [None] * len(paths)
+    reports = [None] * len(paths)
+    started = time.perf_counter()
+
+    def record(index, folders, seconds, error):
+        results[index] = folders
+        links = sum(len(f["links"]) for f in folders) if folders else 0
+        reports[index] = {"path": paths[index], "seconds": round(seconds, 3),
+                          "folders": len(folders or ()), "links": links, "error": error}
+        done = sum(1 for r in reports if r is not None)
+        if error:
+            log(f"[{done}/{len(paths)}] {paths[index]}: 失败 - {error}")
+        else:
+            log(f"[{done}/{len(paths)}] {paths[index]}: {links} 个链接，耗时 {seconds:.2f} 秒")
+        progress(80 * done / len(paths))
+
+    with metrics.span('parse'):
+        if workers == 1 or len(paths) == 1:
+            for index, path in enumerate(paths):
+                record(*_parse_one(index, path, full_path, parser, input_format))
+        else:
+            log(f"使用 {workers} 个进程解析 {len(paths)} 个文件")
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(_parse_one, index, path, full_path, parser, input_format)
+                           for index, path in enumerate(paths)]
+                for future in as_completed(futures):
+                    record(*future.result())
+    parse_seconds = time.perf_counter() - started
+    metrics.count('parse', items=sum(r["links"] for r in reports))
+
+    # 归并：按输入顺序而不是完成顺序合并，保证ID稳定
+    with metrics.span('merge'):
+        folders = merge_folders(f for f in results if f)
+    if not folders:
+        return None, reports
+
+    existing_data = None
+    if existing_path and os.path.exists(existing_path):
+        log(f"读取现有JSON文件: {existing_path}")
+        try:
+            with metrics.span('load_existing'):
+                existing_data = load_json_file(existing_path)
+        except Exception as e:
+            log(f"加载JSON文件失败: {str(e)}")
+            log("将创建新的JSON数据")
+    with metrics.span('convert') as span:
+        result = convert_to_json_format(folders, existing_data, configs, log, icon_store, site_index,
+                                        keep_metadata, columnar=True)
+        span.items += count_result(result)[1]
+    if near_duplicates is not None:
+        with metrics.span('neardup') as span:
+            span.items += near_duplicates.apply(result, log)
+    if link_checker is not None:
+        with metrics.span('links') as span:
+            span.items += link_checker.apply(result, log)
+    if favicons is not None:
+        with metrics.span('favicons') as span:
+            span.items += favicons.fill_missing(result, log)
+    progress(90)
+
+    total_groups, total_sites = count_result(result)
+    failed = sum(1 for r in reports if r["error"])
+    cpu_seconds = sum(r["seconds"] for r in reports)
+    log(f"批量解析完成: {len(paths) - failed}/{len(paths)} 个文件，耗时 {parse_seconds:.2f} 秒"
+        f"(各文件解析时间合计 {cpu_seconds:.2f} 秒)，合并后 {total_groups} 个分组，{total_sites} 个链接")
+    return (result if columnar else _plain_sites(result)), reports
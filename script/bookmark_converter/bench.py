@@ -0,0 +1,377 @@
+"""转换流程的基准测试
+
+对不同规模的生成书签(见 corpus 模块)依次执行各个阶段，记录耗时、吞吐量(链接/秒)和内存峰值：
+
+- read：read_bookmark_file 读取并解码整个文件
+- parse：parse_bookmarks 解析已读入的文本
+- stream：iter_bookmark_folders 直接从文件流式解析(convert_file 实际使用的方式)
+- convert：convert_to_json_format，按默认设置做图标去重和 skip 策略的链接去重
+- neardup：NearDuplicateFinder 在转换结果中查找近似重复的站点(report 方式，不修改结果)
+- search：build_search_index 为转换结果生成前端搜索索引
+- write：write_result 写出带缩进的JSON
+
+每个规模先只计时运行 repeat 遍(取最快的一遍)，再在 tracemalloc 下运行一遍测量内存，
+避免 tracemalloc 的开销影响计时。内存峰值为阶段执行期间相对开始时新增的内存最大值。
+
+结果保存为 JSON，可以与阈值文件或上一次的结果比较，出现退化时退出码为 1：
+
+    python -m bookmark_converter.bench --sizes 1k,10k,100k,1M -o bench.json
+    python -m bookmark_converter.bench --sizes 10k,100k --baseline bench.json --tolerance 0.25
+    python -m bookmark_converter.bench --sizes 100k --thresholds bench_thresholds.json
+
+--batch-workers 另外测量批量转换(batch 模块)的多核扩展性：把最大规模的链接分成 --batch-files 个文件，
+依次用各个进程数解析并报告解析阶段的加速比(需要机器有足够的 CPU 核数才有意义)：
+
+    python -m bookmark_converter.bench --sizes 1M --batch-workers 1,2,4,8 --no-memory
+
+阈值文件中 "default" 对所有规模生效，也可以用 "100k" 这样的键为某个规模单独设置：
+
+    {"default": {"parse": {"min_links_per_second": 20000, "max_peak_bytes_per_link": 4000}},
+     "1M": {"write": {"max_seconds": 60}}}
+"""
+import argparse
+import gc
+import hashlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from .batch import batch_convert
+from .corpus import parse_count, write_corpus
+from .dedup import SiteIndex
+from .engine import (
+    _noop,
+    convert_to_json_format,
+    default_configs,
+    iter_bookmark_folders,
+    parse_bookmarks,
+    read_bookmark_file,
+    write_result,
+)
+from .icons import IconStore
+from .metrics import Metrics, _mb
+from .neardup import NearDuplicateFinder
+from .searchindex import build_search_index
+
+BENCH_VERSION = 1
+
+STAGES = ('read', 'parse', 'stream', 'convert', 'neardup', 'search', 'write')
+
+DEFAULT_SIZES = "1k,10k,100k,1M"
+
+# 阈值文件中支持的限制
+THRESHOLD_KEYS = ('min_links_per_second', 'max_seconds', 'max_peak_bytes', 'max_peak_bytes_per_link')
+
+# 与基准结果比较时，内存增长小于该值不算退化(避免小规模时的噪声)
+_PEAK_NOISE_BYTES = 1024 * 1024
+
+
+def _consume(folders):
+    count = 0
+    for folder in folders:
+        count += len(folder["links"])
+    return count
+
+
+def run_pipeline(path, output_path, measure):
+    """依次执行各个阶段；measure(stage, func) 执行 func 并返回其结果"""
+    text = measure('read', lambda: read_bookmark_file(path))
+    folders = measure('parse', lambda: parse_bookmarks(text))
+    del text
+    measure('stream', lambda: _consume(iter_bookmark_folders(path)))
+    result = measure('convert', lambda: convert_to_json_format(
+        folders, None, default_configs(), icon_store=IconStore(), site_index=SiteIndex('skip'), columnar=True))
+    del folders
+    measure('neardup', lambda: NearDuplicateFinder().apply(result))
+    measure('search', lambda: build_search_index(result))
+    measure('write', lambda: write_result(result, output_path))
+
+
+def _timed_pass(path, output_path):
+    seconds = {}
+
+    def measure(stage, func):
+        gc.collect()
+        started = time.perf_counter()
+        value = func()
+        seconds[stage] = time.perf_counter() - started
+        return value
+
+    run_pipeline(path, output_path, measure)
+    return seconds
+
+
+def _memory_pass(path, output_path):
+    peaks = {}
+
+    def measure(stage, func):
+        gc.collect()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        value = func()
+        peaks[stage] = tracemalloc.get_traced_memory()[1] - baseline
+        return value
+
+    tracemalloc.start()
+    try:
+        run_pipeline(path, output_path, measure)
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def corpus_path(workdir, links, options):
+    """同样参数生成的书签文件可以重复使用，文件名中带有参数的哈希"""
+    digest = hashlib.blake2b(json.dumps(options, sort_keys=True).encode('utf-8'), digest_size=6).hexdigest()
+    return os.path.join(workdir, f"corpus-{links}-{digest}.html")
+
+
+def _corpus(workdir, links, options, log):
+    """生成(或重复使用)书签文件，返回 (路径, 生成统计)"""
+    path = corpus_path(workdir, links, options)
+    stats_path = path + ".stats.json"
+    if os.path.exists(path) and os.path.exists(stats_path):
+        with open(stats_path, 'r', encoding='utf-8') as f:
+            return path, json.load(f)
+    log(f"生成 {links} 个链接的书签文件...")
+    corpus_stats = write_corpus(path + ".tmp", links, **options)
+    os.replace(path + ".tmp", path)
+    with open(stats_path, 'w', encoding='utf-8') as f:
+        json.dump(corpus_stats, f)
+    return path, corpus_stats
+
+
+def bench_size(links, workdir, options, repeat=1, memory=True, log=None):
+    """对一个规模运行基准测试，返回 {"links", "file_bytes", "corpus", "stages"}"""
+    log = log or _noop
+    path, corpus_stats = _corpus(workdir, links, options, log)
+    output_path = os.path.join(workdir, f"result-{links}.json")
+
+    best = {}
+    for run in range(repeat):
+        log(f"{links} 个链接: 计时第 {run + 1}/{repeat} 遍")
+        for stage, seconds in _timed_pass(path, output_path).items():
+            best[stage] = min(seconds, best.get(stage, seconds))
+    peaks = {}
+    if memory:
+        log(f"{links} 个链接: 测量内存")
+        peaks = _memory_pass(path, output_path)
+    os.remove(output_path)
+
+    stages = {}
+    for stage in STAGES:
+        seconds = best[stage]
+        stages[stage] = {
+            "seconds": round(seconds, 4),
+            "links_per_second": round(links / seconds) if seconds else None,
+            "peak_bytes": peaks.get(stage),
+        }
+    return {"links": links, "file_bytes": os.path.getsize(path), "corpus": corpus_stats, "stages": stages}
+
+
+def bench_batch(links, files, workers_list, workdir, options, repeat=1, log=None):
+    """批量转换的多核扩展性：把 links 个链接分成 files 个文件，用不同的进程数运行 batch_convert
+
+    返回 {"links", "files", "cpus", "workers": [{"workers", "seconds", "parse_seconds", "speedup"}]}，
+    speedup 为解析阶段相对第一个进程数的加速比(只有解析在进程池中并行，合并和转换在主进程中执行)。
+    每个进程数计时运行 repeat 遍，取最快的一遍；进程池的启动时间计入解析阶段。
+    """
+    log = log or _noop
+    per_file = max(1, links // files)
+    paths = [_corpus(workdir, per_file, dict(options, seed=options.get("seed", 0) + i), log)[0]
+             for i in range(files)]
+    entries = []
+    for workers in workers_list:
+        best = None
+        for run in range(repeat):
+            log(f"批量转换 {files} 个文件: {workers} 个进程，第 {run + 1}/{repeat} 遍")
+            metrics = Metrics()
+            gc.collect()
+            started = time.perf_counter()
+            batch_convert(paths, configs=default_configs(), workers=workers, metrics=metrics, columnar=True)
+            timing = (time.perf_counter() - started, metrics.spans['parse'].seconds)
+            best = timing if best is None else min(best, timing, key=lambda t: t[1])
+        entries.append({"workers": workers, "seconds": round(best[0], 4), "parse_seconds": round(best[1], 4)})
+    for entry in entries:
+        entry["speedup"] = round(entries[0]["parse_seconds"] / entry["parse_seconds"], 2) \
+            if entry["parse_seconds"] else None
+    return {"links": per_file * files, "files": files, "cpus": os.cpu_count(), "workers": entries}
+
+
+def format_batch_table(batch):
+    """批量转换扩展性表格：每个进程数一行"""
+    lines = [f"批量转换 {batch['files']} 个文件，共 {batch['links']} 个链接(CPU 核数 {batch['cpus']})",
+             f"{'进程数':>8} {'总耗时(秒)':>12} {'解析(秒)':>10} {'加速比':>8}"]
+    for entry in batch["workers"]:
+        speedup = entry["speedup"]
+        lines.append(f"{entry['workers']:>8} {entry['seconds']:>12.3f} {entry['parse_seconds']:>10.3f} "
+                     f"{speedup if speedup is not None else '-':>8}")
+    return "\n".join(lines)
+
+
+def _size_key(key):
+    return key if key == "default" else parse_count(key)
+
+
+def check_thresholds(results, thresholds):
+    """按阈值检查结果，返回违反阈值的说明列表"""
+    thresholds = {_size_key(key): value for key, value in thresholds.items()}
+    violations = []
+    for entry in results:
+        links = entry["links"]
+        for stage, data in entry["stages"].items():
+            limits = dict(thresholds.get("default", {}).get(stage, {}))
+            limits.update(thresholds.get(links, {}).get(stage, {}))
+            for key, limit in limits.items():
+                if key not in THRESHOLD_KEYS:
+                    raise ValueError(f"未知的阈值: {key}")
+                if key == 'max_peak_bytes_per_link':
+                    value = data["peak_bytes"] / links if data["peak_bytes"] is not None else None
+                else:
+                    value = data[key[4:]]
+                if value is None:
+                    continue
+                if (value < limit) if key.startswith('min_') else (value > limit):
+                    violations.append(f"{links} 个链接 {stage}: {key[4:]} = {value:.6g}，阈值 {key} = {limit}")
+    return violations
+
+
+def compare_baseline(results, baseline, tolerance):
+    """与上一次的结果比较：吞吐量下降或内存峰值增长超过 tolerance 比例时视为退化"""
+    previous = {entry["links"]: entry["stages"] for entry in baseline.get("results", [])}
+    regressions = []
+    for entry in results:
+        old_stages = previous.get(entry["links"])
+        if not old_stages:
+            continue
+        for stage, data in entry["stages"].items():
+            old = old_stages.get(stage)
+            if not old:
+                continue
+            if old.get("links_per_second") and data["links_per_second"] is not None \
+                    and data["links_per_second"] < old["links_per_second"] * (1 - tolerance):
+                regressions.append(f"{entry['links']} 个链接 {stage}: 吞吐量 {old['links_per_second']} -> "
+                                   f"{data['links_per_second']} 链接/秒")
+            if old.get("peak_bytes") and data["peak_bytes"] is not None \
+                    and data["peak_bytes"] > old["peak_bytes"] * (1 + tolerance) \
+                    and data["peak_bytes"] - old["peak_bytes"] > _PEAK_NOISE_BYTES:
+                regressions.append(f"{entry['links']} 个链接 {stage}: 内存峰值 {_mb(old['peak_bytes'])} -> "
+                                   f"{_mb(data['peak_bytes'])}")
+    return regressions
+
+
+def format_table(results):
+    """结果表格：每个规模、每个阶段一行"""
+    lines = [f"{'链接数':>10} {'阶段':<8} {'耗时(秒)':>10} {'链接/秒':>12} {'内存峰值':>12}"]
+    for entry in results:
+        for stage, data in entry["stages"].items():
+            rate = data["links_per_second"]
+            lines.append(f"{entry['links']:>10} {stage:<8} {data['seconds']:>10.3f} "
+                         f"{rate if rate is not None else '-':>12} {_mb(data['peak_bytes']):>12}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bookmark_converter.bench", description="书签转换流程的基准测试")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"链接数，逗号分隔(默认 {DEFAULT_SIZES})")
+    parser.add_argument("-o", "--output", help="结果JSON文件")
+    parser.add_argument("--repeat", type=int, default=1, help="计时运行的遍数，取最快的一遍(默认 1)")
+    parser.add_argument("--no-memory", action="store_true", help="不测量内存峰值")
+    parser.add_argument("--workdir", help="保存生成的书签文件的目录，可在多次运行间重复使用(默认使用临时目录)")
+    parser.add_argument("--thresholds", help="阈值文件，结果超出阈值时退出码为 1")
+    parser.add_argument("--baseline", help="上一次的结果文件，出现退化时退出码为 1")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="与 --baseline 比较时允许的变化比例(默认 0.2)")
+    parser.add_argument("--depth", type=int, default=3, help="文件夹层数(默认 3)")
+    parser.add_argument("--fanout", type=int, default=6, help="每个文件夹的子文件夹数(默认 6)")
+    parser.add_argument("--icon-share", type=float, default=0.3, help="带图标的链接比例(默认 0.3)")
+    parser.add_argument("--icon-size", type=int, default=1024, help="每个图标的字节数(默认 1024)")
+    parser.add_argument("--duplicate-rate", type=float, default=0.05, help="重复链接比例(默认 0.05)")
+    parser.add_argument("--near-duplicate-rate", type=float, default=0.02, help="近似重复链接比例(默认 0.02)")
+    parser.add_argument("--non-ascii-share", type=float, default=0.3, help="非 ASCII 标题比例(默认 0.3)")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子(默认 0)")
+    parser.add_argument("--batch-workers",
+                        help="同时测量批量转换的多核扩展性，逗号分隔的进程数(如 1,2,4)；链接总数为 --sizes 中的最大值")
+    parser.add_argument("--batch-files", type=int, default=8, help="批量转换测量使用的文件数(默认 8)")
+    args = parser.parse_args(argv)
+
+    def log(message):
+        print(message, file=sys.stderr)
+
+    try:
+        sizes = [parse_count(size) for size in args.sizes.split(",") if size.strip()]
+        batch_workers = [int(n) for n in args.batch_workers.split(",") if n.strip()] if args.batch_workers else []
+        if any(n < 1 for n in batch_workers) or args.batch_files < 1:
+            raise ValueError("进程数和文件数必须大于 0")
+        thresholds = baseline = None
+        if args.thresholds:
+            with open(args.thresholds, 'r', encoding='utf-8') as f:
+                thresholds = json.load(f)
+        if args.baseline:
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+    except (OSError, ValueError) as e:
+        log(f"错误: {e}")
+        return 2
+
+    options = {
+        "depth": args.depth,
+        "fanout": args.fanout,
+        "icon_share": args.icon_share,
+        "icon_size": args.icon_size,
+        "duplicate_rate": args.duplicate_rate,
+        "near_duplicate_rate": args.near_duplicate_rate,
+        "non_ascii_share": args.non_ascii_share,
+        "seed": args.seed,
+    }
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bookmark-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        results = [bench_size(links, workdir, options, args.repeat, not args.no_memory, log) for links in sizes]
+        batch = bench_batch(max(sizes), args.batch_files, batch_workers, workdir, options, args.repeat, log) \
+            if batch_workers else None
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(format_table(results))
+    if batch is not None:
+        print()
+        print(format_batch_table(batch))
+    regressions = []
+    if thresholds is not None:
+        regressions += check_thresholds(results, thresholds)
+    if baseline is not None:
+        regressions += compare_baseline(results, baseline, args.tolerance)
+
+    if args.output:
+        report = {
+            "version": BENCH_VERSION,
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "corpus": options,
+            "repeat": args.repeat,
+            "results": results,
+            "batch": batch,
+            "regressions": regressions,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        log(f"结果已保存到: {args.output}")
+
+    if regressions:
+        log("\n性能退化:")
+        for message in regressions:
+            log(f"- {message}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,401 @@
+"""解析结果缓存
+
+同一个书签文件先预览再转换，或者只修改了标题、CSS 后重新转换时，没有必要重新解析 HTML。
+ParseCache 以 (路径, 大小, 修改时间, 内容哈希) 以及解析选项为键缓存解析出的文件夹列表：
+
+- 进程内 LRU：最近使用的若干个结果以压缩后的二进制形式保存在内存中
+- 磁盘缓存(可选)：每个结果一个文件；目录总大小超过上限时按最近使用时间淘汰
+
+两者的内容相同：CACHE_MAGIC 之后是 zlib 压缩的记录流，每条记录为 4 字节长度加 marshal 数据，
+第一条是格式版本，之后每个文件夹一条，按列存储链接，图标在第一次出现时登记到图标表中去重。
+未命中时边解析边把文件夹写入记录流，不在内存中保留整个文件夹列表；读取时也是逐个文件夹解码。
+
+浏览器的图标数据库(Favicons、favicons.sqlite)和 SQLite 的 -wal 文件也会影响解析结果，
+同目录下存在这些文件时一并计入文件指纹。内容哈希按 (路径, 大小, 修改时间) 记录下来
+(有缓存目录时保存在其中的 FINGERPRINT_INDEX 文件里)，文件没有变化时不必为了计算缓存键重新读取整个文件。
+
+命中缓存时只需重新执行 convert_to_json_format 和写出。
+"""
+import hashlib
+import io
+import json
+import marshal
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from .engine import _noop
+from .incremental import _write_json_atomic
+from .netscape import Link
+from .readers import iter_input_folders
+from .source import InputFile
+
+CACHE_FORMAT_VERSION = 3
+CACHE_MAGIC = b"BMC1"
+CACHE_SUFFIX = ".bmc"
+
+DEFAULT_MAX_ENTRIES = 8
+DEFAULT_MAX_DISK_BYTES = 256 * 1024 * 1024
+
+# 缓存目录中记录文件内容哈希的文件，以及其中最多保留的记录数
+FINGERPRINT_INDEX = "fingerprints.json"
+MAX_FINGERPRINTS = 1024
+
+# 与输入文件同目录、会被读取器一并读取的文件
+SIDECAR_FILES = ("Favicons", "Favicons-wal", "favicons.sqlite", "favicons.sqlite-wal")
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+_READ_CHUNK_SIZE = 256 * 1024
+_LENGTH_SIZE = 4
+# 修改时间距今不到这么多纳秒的文件不记录内容哈希：同一时间刻度内再次修改时大小和修改时间可能都不变
+_RACY_NS = 2 * 10 ** 9
+
+
+def file_fingerprint(path, digests=None, source=None):
+    """文件指纹：(绝对路径, 大小, 修改时间(纳秒), 内容哈希)
+
+    digests 为 {"路径\\x1f大小\\x1f修改时间": 内容哈希} 的字典时，大小和修改时间与记录相同的文件
+    直接使用记录的哈希而不读取文件，新算出的哈希也记录到其中(刚修改过的文件除外)。
+    source 为已经打开的 path 的 source.InputFile 时从它的映射计算哈希，不再另外读取文件。
+    """
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    stamp = f"{path}\x1f{st.st_size}\x1f{st.st_mtime_ns}"
+    digest = digests.get(stamp) if digests is not None else None
+    if digest is None:
+        hasher = hashlib.blake2b(digest_size=16)
+        if source is not None:
+            for data in source.raw_chunks():
+                hasher.update(data)
+        else:
+            with open(path, 'rb') as f:
+                for data in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+                    hasher.update(data)
+        digest = hasher.hexdigest()
+        if digests is not None and time.time_ns() - st.st_mtime_ns > _RACY_NS:
+            digests[stamp] = digest
+    return path, st.st_size, st.st_mtime_ns, digest
+
+
+def input_fingerprint(path, digests=None, source=None):
+    """输入文件及其 -wal 文件、同目录图标数据库的指纹；digests 和 source 见 file_fingerprint"""
+    fingerprint = file_fingerprint(path, digests, source)
+    directory = os.path.dirname(fingerprint[0])
+    sidecars = [fingerprint[0] + "-wal"] + [os.path.join(directory, name) for name in SIDECAR_FILES]
+    for sidecar in sidecars:
+        if sidecar != fingerprint[0] and os.path.isfile(sidecar):
+            fingerprint += file_fingerprint(sidecar, digests)
+    return fingerprint
+
+
+class _PackWriter:
+    """把文件夹逐个写成缓存记录流"""
+
+    def __init__(self, file):
+        self.file = file
+        self._compressor = zlib.compressobj(1)
+        self._icons = {"": 0}
+        file.write(CACHE_MAGIC)
+        self._write(CACHE_FORMAT_VERSION)
+
+    def _write(self, value):
+        data = marshal.dumps(value)
+        self.file.write(self._compressor.compress(len(data).to_bytes(_LENGTH_SIZE, 'little') + data))
+
+    def add(self, folder):
+        links = folder["links"]
+        icons = self._icons
+        new_icons = []
+        icon_ids = []
+        for link in links:
+            icon_id = icons.get(link.icon)
+            if icon_id is None:
+                icon_id = icons[link.icon] = len(icons)
+                new_icons.append(link.icon)
+            icon_ids.append(icon_id)
+        self._write((
+            folder["name"], folder["path"], folder["order"], new_icons,
+            [link.name for link in links],
+            [link.url for link in links],
+            icon_ids,
+            [link.add_date for link in links],
+            [link.private for link in links],
+        ))
+
+    def close(self):
+        self.file.write(self._compressor.flush())
+
+
+def pack_folders(folders):
+    """把文件夹列表编码为紧凑的二进制格式"""
+    buffer = io.BytesIO()
+    writer = _PackWriter(buffer)
+    for folder in folders:
+        writer.add(folder)
+    writer.close()
+    return buffer.getvalue()
+
+
+def iter_unpack(blob, progress=None):
+    """逐个解码 pack_folders 的结果中的文件夹，progress(已解码的比例) 在每个文件夹之后调用
+
+    开头的格式标记或版本不符时在第一次取值前抛出 ValueError，数据损坏时在读到损坏处抛出 ValueError。
+    """
+    records = _iter_records(blob, progress or _noop)
+    version = next(records, None)
+    if version != CACHE_FORMAT_VERSION:
+        raise ValueError(f"不支持的缓存版本: {version}")
+    return _iter_folders(records)
+
+
+def unpack_folders(blob):
+    """pack_folders 的逆过程；格式不符时抛出 ValueError"""
+    return list(iter_unpack(blob))
+
+
+def _iter_records(blob, progress):
+    if not blob.startswith(CACHE_MAGIC):
+        raise ValueError("不是解析缓存文件")
+    decompressor = zlib.decompressobj()
+    view = memoryview(blob)
+    total = len(blob)
+    position = len(CACHE_MAGIC)
+    buffer = bytearray()
+    while True:
+        while len(buffer) >= _LENGTH_SIZE:
+            size = int.from_bytes(buffer[:_LENGTH_SIZE], 'little')
+            end = _LENGTH_SIZE + size
+            if len(buffer) < end:
+                break
+            try:
+                record = marshal.loads(bytes(buffer[_LENGTH_SIZE:end]))
+            except (EOFError, TypeError, ValueError) as e:
+                raise ValueError(f"缓存文件已损坏: {e}")
+            del buffer[:end]
+            yield record
+            progress(position / total)
+        if position >= total:
+            break
+        try:
+            buffer += decompressor.decompress(view[position:position + _READ_CHUNK_SIZE])
+        except zlib.error as e:
+            raise ValueError(f"缓存文件已损坏: {e}")
+        position = min(position + _READ_CHUNK_SIZE, total)
+
+    if buffer or not decompressor.eof:
+        raise ValueError("缓存文件已损坏: 数据不完整")
+
+
+def _iter_folders(records):
+    icons = [""]
+    for record in records:
+        try:
+            name, path, order, new_icons, names, urls, icon_ids, add_dates, privates = record
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"缓存文件已损坏: {e}")
+        icons.extend(new_icons)
+        yield {
+            "name": name,
+            "path": path,
+            "order": order,
+            "links": [Link(n, u, icons[i], d, p)
+                      for n, u, i, d, p in zip(names, urls, icon_ids, add_dates, privates)]
+        }
+
+
+class ParseCache:
+    """解析结果的 LRU 缓存，可选持久化到磁盘
+
+    内存和磁盘中保存的都是 pack_folders 格式的数据，get 返回这份数据，用 iter_unpack 解码。
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, directory=None, max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._digests = self._load_digests()
+        self._digests_lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    @staticmethod
+    def make_key(path, full_path=False, parser='auto', input_format='auto', digests=None, source=None):
+        """缓存键：输入文件(包括同目录的图标数据库和 -wal 文件)的指纹加上会影响解析结果的选项
+
+        digests 和 source 见 file_fingerprint。
+        """
+        fingerprint = input_fingerprint(path, digests, source)
+        text = "\x1f".join(str(part) for part in fingerprint + (full_path, parser, input_format))
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+    def _key(self, path, full_path, parser, input_format, source):
+        """make_key，使用并更新记录的内容哈希"""
+        with self._digests_lock:
+            known = len(self._digests)
+            key = self.make_key(path, full_path, parser, input_format, self._digests, source)
+            if len(self._digests) != known and self.directory:
+                self._save_digests()
+        return key
+
+    def _load_digests(self):
+        if not self.directory:
+            return {}
+        try:
+            with open(os.path.join(self.directory, FINGERPRINT_INDEX), 'r', encoding='utf-8') as f:
+                digests = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return digests if isinstance(digests, dict) else {}
+
+    def _save_digests(self):
+        # 只保留最近记录的 MAX_FINGERPRINTS 条
+        for stamp in list(self._digests)[:-MAX_FINGERPRINTS]:
+            del self._digests[stamp]
+        os.makedirs(self.directory, exist_ok=True)
+        _write_json_atomic(self._digests, os.path.join(self.directory, FINGERPRINT_INDEX))
+
+    def _disk_path(self, key):
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def get(self, key):
+        """读取缓存的数据(pack_folders 的格式)，未命中时返回 None"""
+        with self._lock:
+            blob = self._entries.get(key)
+            if blob is not None:
+                self._entries.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return blob
+
+        if self.directory:
+            path = self._disk_path(key)
+            try:
+                with open(path, 'rb') as f:
+                    blob = f.read()
+                if not blob.startswith(CACHE_MAGIC):
+                    raise ValueError("不是解析缓存文件")
+                os.utime(path)  # 修改时间作为最近使用时间，用于淘汰
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError):
+                _remove_quietly(path)
+            else:
+                self.stats["disk_hits"] += 1
+                self._remember(key, blob)
+                return blob
+
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, key, folders):
+        """保存文件夹列表"""
+        blob = pack_folders(folders)
+        self._remember(key, blob)
+        if self.directory:
+            tmp_path = self._tmp_path(key)
+            with open(tmp_path, 'wb') as f:
+                f.write(blob)
+            self._commit(key, tmp_path)
+
+    def _tmp_path(self, key):
+        """写入中的缓存文件；写完后由 _commit 替换为正式文件"""
+        os.makedirs(self.directory, exist_ok=True)
+        return f"{self._disk_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def _commit(self, key, tmp_path):
+        os.replace(tmp_path, self._disk_path(key))
+        self._evict_disk()
+
+    def _remember(self, key, blob):
+        with self._lock:
+            self._entries[key] = blob
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _evict_disk(self):
+        """磁盘缓存超过上限时删除最久未使用的文件"""
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(CACHE_SUFFIX):
+                st = entry.stat()
+                files.append((st.st_mtime_ns, st.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            _remove_quietly(path)
+            total -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        with self._digests_lock:
+            self._digests.clear()
+        if self.directory and os.path.isdir(self.directory):
+            _remove_quietly(os.path.join(self.directory, FINGERPRINT_INDEX))
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(CACHE_SUFFIX):
+                    _remove_quietly(entry.path)
+
+    def folders(self, path, log=None, progress=None, full_path=False, parser='auto', input_format='auto'):
+        """与 readers.iter_input_folders 相同，但优先使用缓存；未命中时边解析边产出，解析完成后写入缓存
+
+        输入文件只打开一次：需要计算内容哈希时从同一个映射计算，未命中时接着用它解析。
+        """
+        log = log or _noop
+        progress = progress or _noop
+        source = InputFile(path)
+        try:
+            key = self._key(path, full_path, parser, input_format, source)
+            blob = self.get(key)
+        except BaseException:
+            source.close()
+            raise
+        if blob is not None:
+            try:
+                folders = iter_unpack(blob, lambda fraction: progress(70 * fraction))
+            except ValueError as e:
+                log(f"缓存的解析结果无法读取，重新解析: {e}")
+            else:
+                source.close()
+                log(f"使用缓存的解析结果: {len(blob) / 1024:.0f} KB")
+                return folders
+        return self._parse_and_store(key, source, log, progress, full_path, parser, input_format)
+
+    def _parse_and_store(self, key, source, log, progress, full_path, parser, input_format):
+        """边解析边产出，同时把每个文件夹写入缓存记录流(有缓存目录时直接写入磁盘上的临时文件)"""
+        tmp_path = self._tmp_path(key) if self.directory else None
+        target = open(tmp_path, 'wb') if tmp_path else io.BytesIO()
+        complete = False
+        try:
+            writer = _PackWriter(target)
+            for folder in iter_input_folders(source.path, log, progress, full_path, parser, input_format, source):
+                writer.add(folder)
+                yield folder
+            writer.close()
+            complete = True
+        finally:
+            # 只缓存完整解析的结果；中途取消或出错时丢弃已写出的部分
+            source.close()
+            if tmp_path:
+                target.close()
+                if not complete:
+                    _remove_quietly(tmp_path)
+        if tmp_path:
+            # 先读回再提交：提交时可能因为超过磁盘上限被立即淘汰
+            with open(tmp_path, 'rb') as f:
+                blob = f.read()
+            self._commit(key, tmp_path)
+        else:
+            blob = target.getvalue()
+        self._remember(key, blob)
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
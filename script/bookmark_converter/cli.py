@@ -0,0 +1,411 @@
+"""书签转换工具命令行入口
+
+用法示例：
+
+    python -m bookmark_converter convert bookmarks.html -o result.json
+    python -m bookmark_converter convert bookmarks.html -o result.json --merge old.json --title "我的导航"
+    python -m bookmark_converter convert ~/.mozilla/firefox/xxxx.default/places.sqlite -o result.json
+    python -m bookmark_converter batch exports/ -o team.json -j 8 --report timing.json
+    python -m bookmark_converter convert bookmarks.html -o result.json --metrics metrics.json --profile parse
+    python -m bookmark_converter convert bookmarks.html -o result.json --fetch-icons
+    python -m bookmark_converter convert bookmarks.html -o result.json --check-links --dead-links move
+    python -m bookmark_converter convert bookmarks.html -o result.json --near-dups report --near-report near.json
+    python -m bookmark_converter convert bookmarks.html -o result.json --search-index result.search.json
+    python -m bookmark_converter to-html export.json -o bookmarks.html
+    python -m bookmark_converter upload result.json --url https://nav.example.com --username admin
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from .batch import batch_convert
+from .cache import DEFAULT_MAX_DISK_BYTES, ParseCache
+from .dedup import DEDUP_POLICIES, SiteIndex
+from .engine import PARSER_BACKENDS, convert_file, count_result, default_configs, write_result
+from .favicons import DEFAULT_CONCURRENCY as ICON_CONCURRENCY, DEFAULT_PER_HOST, DEFAULT_TIMEOUT
+from .favicons import FaviconResolver, IconCache, icon_cache_path_for
+from .htmlexport import DEFAULT_TITLE as HTML_TITLE, export_html
+from .linkcheck import DEFAULT_CONCURRENCY as LINK_CONCURRENCY, DEFAULT_DELAY as LINK_DELAY
+from .linkcheck import DEAD_GROUP_NAME, LINK_ACTIONS, REDIRECT_POLICIES, LinkCache, LinkChecker, link_cache_path_for
+from .icons import ICON_MODES, IconStore
+from .incremental import sync_file
+from .metrics import Metrics
+from .neardup import DEFAULT_THRESHOLD, NEAR_DUP_ACTIONS, NearDuplicateFinder
+from .searchindex import write_search_index
+from .readers import input_formats
+from .sql import write_sql
+from .uploader import DEFAULT_CONCURRENCY, DEFAULT_RETRIES, Uploader, UploadError, checkpoint_path_for, load_bundles
+from .writer import DEFAULT_MAX_BYTES, write_export
+
+
+def _stderr_log(message):
+    """日志输出到标准错误，避免与标准输出中的数据混在一起"""
+    print(message, file=sys.stderr)
+
+
+def _read_text(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def _make_writer(args, log):
+    """根据输出格式选项生成写出函数"""
+    def writer(result, path):
+        if args.format == 'export':
+            write_export(result, path, args.max_bytes, args.compact, log)
+        else:
+            write_result(result, path, args.compact)
+        # 只为完整结果生成 SQL，增量文件不生成
+        if args.sql and path == args.output:
+            write_sql(result, args.sql, args.sql_replace, log=log)
+    return writer
+
+
+def _make_configs(args):
+    custom_css = _read_text(args.css_file) if args.css_file else ""
+    return default_configs(args.title, args.name or args.title, custom_css)
+
+
+def _make_icon_store(args):
+    icon_dir = args.icon_dir or os.path.splitext(args.output)[0] + "_icons"
+    return IconStore(args.icons, icon_dir if args.icons == 'sidecar' else None, args.icon_base_url)
+
+
+def _connect_to(args):
+    if not args.connect_to:
+        return None
+    host, _, port = args.connect_to.rpartition(':')
+    return host or "127.0.0.1", int(port)
+
+
+def _make_favicons(args, log):
+    """指定 --fetch-icons 时生成 FaviconResolver，否则为 None"""
+    if not args.fetch_icons:
+        return None
+    cache = IconCache(args.icon_cache or icon_cache_path_for(args.output))
+    return FaviconResolver(cache, args.icon_concurrency, args.icon_per_host, args.icon_timeout,
+                           _connect_to(args), log)
+
+
+def _make_link_checker(args, log):
+    """指定 --check-links 时生成 LinkChecker，否则为 None"""
+    if not args.check_links:
+        return None
+    cache = LinkCache(args.link_cache or link_cache_path_for(args.output))
+    return LinkChecker(cache, args.dead_links, args.rewrite_redirects, args.dead_group, args.link_concurrency,
+                       args.link_per_host, args.link_delay, args.link_timeout, _connect_to(args), log)
+
+
+def _make_near_duplicates(args, log):
+    """指定 --near-dups 时生成 NearDuplicateFinder，否则为 None"""
+    if not args.near_dups:
+        return None
+    return NearDuplicateFinder(args.near_threshold, args.near_dups, log=log)
+
+
+def _write_near_report(finder, args, log):
+    if finder is not None and args.near_report:
+        finder.write_report(args.near_report)
+        if log:
+            log(f"近似重复报告已保存到: {args.near_report}")
+
+
+def _write_search_index(result, args, log, metrics):
+    """指定 --search-index 时为结果生成前端搜索索引"""
+    if args.search_index and result is not None:
+        with metrics.span('search', count_result(result)[1]):
+            write_search_index(result, args.search_index, log)
+
+
+def _make_metrics(args):
+    return Metrics(args.trace_memory, args.profile)
+
+
+def _report_metrics(metrics, args, log):
+    """输出各阶段统计；指定了任一统计选项时才在日志中显示表格"""
+    metrics.close()
+    if log and (args.metrics or args.trace_memory or args.profile):
+        log("\n各阶段统计:\n" + metrics.summary())
+        if args.profile:
+            log(metrics.profile_summary())
+    if args.metrics:
+        metrics.write(args.metrics)
+
+
+def _expand_inputs(inputs):
+    """展开输入中的目录：目录下的文件(不含子目录)按名称排序"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(entry.path for entry in sorted(os.scandir(item), key=lambda e: e.name) if entry.is_file())
+        else:
+            paths.append(item)
+    return paths
+
+
+def cmd_convert(args):
+    """convert 子命令：转换单个书签文件"""
+    log = None if args.quiet else _stderr_log
+    if args.max_bytes and args.format != 'export':
+        _stderr_log("--max-bytes 只能用于 --format export")
+        return 2
+    writer = _make_writer(args, log)
+    configs = _make_configs(args)
+    icon_store = _make_icon_store(args)
+    cache = None
+    if args.cache_dir:
+        cache = ParseCache(directory=args.cache_dir, max_disk_bytes=args.cache_size * 1024 * 1024)
+
+    if args.incremental and args.merge:
+        _stderr_log("--incremental 不能与 --merge 同时使用")
+        return 2
+    if args.incremental and (args.check_links or args.near_dups or args.search_index or args.keep_metadata):
+        _stderr_log("--incremental 不能与 --check-links、--near-dups、--search-index、--keep-metadata 同时使用")
+        return 2
+
+    favicons = _make_favicons(args, log)
+    near_duplicates = _make_near_duplicates(args, log)
+    metrics = _make_metrics(args)
+    site_index = SiteIndex(args.dedup) if args.dedup != 'off' else None
+    try:
+        if args.incremental:
+            result = sync_file(args.input, args.output, configs, args.manifest, args.delta, log,
+                               full_path=args.full_path, parser=args.parser, icon_store=icon_store,
+                               writer=writer, cache=cache, input_format=args.input_format, metrics=metrics,
+                               favicons=favicons, site_index=site_index)
+        else:
+            result = convert_file(args.input, args.output, args.merge, configs, log,
+                                  full_path=args.full_path, parser=args.parser, icon_store=icon_store,
+                                  site_index=site_index, writer=writer, cache=cache, input_format=args.input_format,
+                                  metrics=metrics, favicons=favicons,
+                                  link_checker=_make_link_checker(args, log), near_duplicates=near_duplicates,
+                                  keep_metadata=args.keep_metadata, columnar=True)
+            _write_search_index(result, args, log, metrics)
+    finally:
+        _report_metrics(metrics, args, log)
+    _write_near_report(near_duplicates, args, log)
+    if result is None:
+        _stderr_log("未找到有效的书签文件夹")
+        return 1
+    return 0
+
+
+def cmd_batch(args):
+    """batch 子命令：并行解析多个书签文件并合并"""
+    log = None if args.quiet else _stderr_log
+    if args.max_bytes and args.format != 'export':
+        _stderr_log("--max-bytes 只能用于 --format export")
+        return 2
+    paths = _expand_inputs(args.inputs)
+    if not paths:
+        _stderr_log("没有找到输入文件")
+        return 2
+    writer = _make_writer(args, log)
+    site_index = SiteIndex(args.dedup) if args.dedup != 'off' else None
+    near_duplicates = _make_near_duplicates(args, log)
+
+    metrics = _make_metrics(args)
+    try:
+        result, reports = batch_convert(paths, args.merge, _make_configs(args), args.workers, log,
+                                        full_path=args.full_path, parser=args.parser,
+                                        input_format=args.input_format, icon_store=_make_icon_store(args),
+                                        site_index=site_index, metrics=metrics,
+                                        favicons=_make_favicons(args, log),
+                                        link_checker=_make_link_checker(args, log),
+                                        near_duplicates=near_duplicates,
+                                        keep_metadata=args.keep_metadata, columnar=True)
+        if args.report:
+            with open(args.report, 'w', encoding='utf-8') as f:
+                json.dump({"files": reports}, f, ensure_ascii=False, indent=2)
+        if result is None:
+            _stderr_log("未找到有效的书签文件夹")
+            return 1
+
+        if log:
+            log(f"正在保存结果到: {args.output}")
+        with metrics.span('write', count_result(result)[1]):
+            writer(result, args.output)
+        _write_search_index(result, args, log, metrics)
+    finally:
+        _report_metrics(metrics, args, log)
+    _write_near_report(near_duplicates, args, log)
+    if site_index is not None and log:
+        log(site_index.summary())
+    failed = [r for r in reports if r["error"]]
+    if failed:
+        _stderr_log(f"{len(failed)} 个文件解析失败，结果中不包含这些文件")
+        return 1
+    return 0
+
+
+def cmd_upload(args):
+    """upload 子命令：把导入包上传到 worker 的 /api/import"""
+    log = None if args.quiet else _stderr_log
+    password = args.password or os.environ.get("NAVIHIVE_PASSWORD")
+    if args.username and not password:
+        _stderr_log("请通过 --password 或环境变量 NAVIHIVE_PASSWORD 提供密码")
+        return 2
+    checkpoint = args.checkpoint or checkpoint_path_for(args.inputs[0])
+
+    with tempfile.TemporaryDirectory() as workdir:
+        bundles = load_bundles(args.inputs, workdir, args.max_bytes, log)
+        uploader = Uploader(args.url, args.username, password, args.token, args.concurrency, args.retries,
+                            timeout=args.timeout, checkpoint_path=checkpoint, log=log)
+        report = uploader.upload(bundles)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if report["failed"]:
+        _stderr_log(f"{len(report['failed'])} 个导入包上传失败，重新运行同一命令可从检查点继续")
+        return 1
+    return 0
+
+
+def cmd_to_html(args):
+    """to-html 子命令：把导出数据转换回书签HTML"""
+    log = None if args.quiet else _stderr_log
+    export_html(args.inputs, args.output, args.title, log, temp_dir=args.temp_dir)
+    return 0
+
+
+def _add_conversion_options(parser):
+    """convert 和 batch 共用的转换及输出选项"""
+    parser.add_argument("-o", "--output", default="result.json", help="输出JSON文件(默认 result.json)")
+    parser.add_argument("--merge", metavar="JSON", help="与现有JSON文件合并")
+    parser.add_argument("--title", default="导航站", help="网站标题")
+    parser.add_argument("--name", help="网站名称(默认与标题相同)")
+    parser.add_argument("--css-file", metavar="FILE", help="自定义CSS文件")
+    parser.add_argument("--full-path", action="store_true", help="分组名称使用完整文件夹路径(如 A/B/C)")
+    parser.add_argument("--keep-metadata", action="store_true",
+                        help="书签的 ADD_DATE 作为站点创建时间，PRIVATE=\"1\" 的书签导入为私密站点")
+    parser.add_argument("--input-format", choices=input_formats(), default="auto",
+                        help="输入格式(默认 auto，根据文件内容自动判断)")
+    parser.add_argument("--parser", choices=PARSER_BACKENDS, default="auto",
+                        help="HTML解析后端：auto(默认，流式解析，失败时改用BeautifulSoup)、stream、bs4")
+    parser.add_argument("--icons", choices=ICON_MODES, default="inline",
+                        help="图标输出方式：inline(默认，直接写入)、table(去重后存入JSON的icons表)、sidecar(写入单独目录)")
+    parser.add_argument("--icon-dir", metavar="DIR", help="sidecar 模式的图标目录(默认为 输出文件名_icons)")
+    parser.add_argument("--icon-base-url", metavar="URL", help="sidecar 模式下图标地址的前缀")
+    parser.add_argument("--dedup", choices=DEDUP_POLICIES + ('off',), default="skip",
+                        help="重复链接(含现有JSON中的站点)的处理方式：skip(默认，跳过)、update(更新已有站点)、keep-both(都保留)、off(不检查)")
+    parser.add_argument("--format", choices=("nested", "export"), default="nested",
+                        help="输出格式：nested(默认，分组内嵌站点)、export(导航站原生导出格式，可直接通过导入功能导入)")
+    parser.add_argument("--compact", action="store_true", help="输出不缩进的紧凑JSON")
+    parser.add_argument("--max-bytes", type=int, nargs="?", const=DEFAULT_MAX_BYTES, metavar="BYTES",
+                        help=f"按字节数拆分为多个导入包(默认 {DEFAULT_MAX_BYTES}，不超过worker的1MB限制)")
+    parser.add_argument("--sql", metavar="FILE", help="另外生成可用 wrangler d1 execute --file 批量导入的SQL文件")
+    parser.add_argument("--sql-replace", action="store_true", help="SQL 使用 INSERT ... ON CONFLICT DO UPDATE，覆盖ID相同的已有记录(不会删除分组中的其他站点)")
+    parser.add_argument("--fetch-icons", action="store_true", help="为没有图标的站点从网站获取图标(需要联网)")
+    parser.add_argument("--icon-cache", metavar="FILE", help="网站图标缓存文件(默认为 输出文件名.favicons.json)")
+    parser.add_argument("--icon-concurrency", type=int, default=ICON_CONCURRENCY,
+                        help=f"获取网站图标的并发请求数(默认 {ICON_CONCURRENCY})")
+    parser.add_argument("--icon-per-host", type=int, default=DEFAULT_PER_HOST,
+                        help=f"每个主机的并发请求数(默认 {DEFAULT_PER_HOST})")
+    parser.add_argument("--icon-timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help=f"获取网站图标时单个请求的超时秒数(默认 {DEFAULT_TIMEOUT})")
+    parser.add_argument("--near-dups", choices=NEAR_DUP_ACTIONS,
+                        help="查找标题和地址相近的重复站点：report 只列出，merge 每组只保留最先出现的站点")
+    parser.add_argument("--near-threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"近似重复的相似度阈值(0-1，默认 {DEFAULT_THRESHOLD})")
+    parser.add_argument("--near-report", metavar="JSON", help="把找到的近似重复组写入文件")
+    parser.add_argument("--search-index", metavar="JSON",
+                        help="为前端站内搜索生成索引文件(中文名称的拼音需要安装 pypinyin)")
+    parser.add_argument("--check-links", action="store_true", help="检查所有站点的链接是否有效(需要联网)")
+    parser.add_argument("--dead-links", choices=LINK_ACTIONS, default="report",
+                        help="失效链接的处理方式：report 只统计，notes 写入站点备注，move 移到单独的分组，drop 删除(默认 report)")
+    parser.add_argument("--dead-group", default=DEAD_GROUP_NAME, help=f"move 方式的分组名称(默认 {DEAD_GROUP_NAME})")
+    parser.add_argument("--rewrite-redirects", choices=REDIRECT_POLICIES, default="keep",
+                        help="重定向的链接：keep 保持原地址，permanent 改写永久重定向，all 改写所有重定向(默认 keep)")
+    parser.add_argument("--link-cache", metavar="FILE", help="链接检查缓存文件(默认为 输出文件名.links.json)")
+    parser.add_argument("--link-concurrency", type=int, default=LINK_CONCURRENCY,
+                        help=f"检查链接的并发请求数(默认 {LINK_CONCURRENCY})")
+    parser.add_argument("--link-per-host", type=int, default=DEFAULT_PER_HOST,
+                        help=f"检查链接时每个主机的并发请求数(默认 {DEFAULT_PER_HOST})")
+    parser.add_argument("--link-delay", type=float, default=LINK_DELAY,
+                        help=f"同一主机相邻两个请求的最小间隔秒数(默认 {LINK_DELAY})")
+    parser.add_argument("--link-timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help=f"检查链接时单个请求的超时秒数(默认 {DEFAULT_TIMEOUT})")
+    parser.add_argument("--connect-to", metavar="HOST:PORT",
+                        help="把获取图标和检查链接的请求以明文 HTTP 发往该地址(用于测试，见 tests/mock_sites.py)")
+    parser.add_argument("--metrics", metavar="JSON", help="把各阶段的耗时、条目数和内存统计写入文件")
+    parser.add_argument("--trace-memory", action="store_true", help="用 tracemalloc 统计各阶段的内存峰值(较慢)")
+    parser.add_argument("--profile", action="append", default=[], metavar="STAGE",
+                        help="用 cProfile 采样指定阶段(如 parse、convert、write，或 all)，可重复指定")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="bookmark_converter",
+        description="将浏览器导出的书签HTML文件转换为导航站JSON数据"
+    )
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+    subparsers.required = True
+
+    convert = subparsers.add_parser("convert", help="转换书签文件")
+    convert.add_argument("input", help="书签文件：导出的HTML，或 Chrome 的 Bookmarks、Firefox 的 places.sqlite、Safari 的 Bookmarks.plist")
+    _add_conversion_options(convert)
+    convert.add_argument("--incremental", action="store_true",
+                         help="增量模式：根据清单文件保持站点ID和时间戳稳定，只处理变化的站点")
+    convert.add_argument("--manifest", metavar="FILE", help="增量模式的清单文件(默认为 输出文件名.manifest.json)")
+    convert.add_argument("--delta", metavar="JSON", help="增量模式下另外写出只包含新增和修改站点的文件")
+    convert.add_argument("--cache-dir", metavar="DIR",
+                         help="解析结果缓存目录；书签文件未变化时跳过解析，只重新转换和写出")
+    convert.add_argument("--cache-size", type=int, default=DEFAULT_MAX_DISK_BYTES // (1024 * 1024), metavar="MB",
+                         help=f"缓存目录的大小上限(默认 {DEFAULT_MAX_DISK_BYTES // (1024 * 1024)} MB)，超出时删除最久未使用的缓存")
+    convert.add_argument("-q", "--quiet", action="store_true", help="不输出处理日志")
+    convert.set_defaults(func=cmd_convert)
+
+    batch = subparsers.add_parser("batch", help="并行转换多个书签文件并合并为一个结果")
+    batch.add_argument("inputs", nargs="+", metavar="INPUT", help="书签文件或目录(目录中的文件按名称排序)")
+    _add_conversion_options(batch)
+    batch.add_argument("-j", "--workers", type=int, help="解析进程数(默认为CPU核数)")
+    batch.add_argument("--report", metavar="JSON", help="把每个文件的解析耗时和错误写入文件")
+    batch.add_argument("-q", "--quiet", action="store_true", help="不输出处理日志")
+    batch.set_defaults(func=cmd_batch)
+
+    upload = subparsers.add_parser("upload", help="上传到导航站的导入接口")
+    upload.add_argument("inputs", nargs="+", metavar="JSON",
+                        help="导入包(convert --format export 的输出)；嵌套格式的结果文件会自动拆分")
+    upload.add_argument("--url", required=True, help="导航站地址，如 https://nav.example.com")
+    upload.add_argument("--username", help="登录用户名(worker 未启用认证时可省略)")
+    upload.add_argument("--password", help="登录密码(也可通过环境变量 NAVIHIVE_PASSWORD 提供)")
+    upload.add_argument("--token", help="直接使用已有的 auth_token，不再登录")
+    upload.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"同时进行的请求数(默认 {DEFAULT_CONCURRENCY})")
+    upload.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help=f"遇到 429/5xx 时的最大重试次数(默认 {DEFAULT_RETRIES})")
+    upload.add_argument("--timeout", type=float, default=60, help="单个请求的超时秒数(默认 60)")
+    upload.add_argument("--checkpoint", metavar="FILE",
+                        help="检查点文件(默认为 第一个输入文件名.upload.json)")
+    upload.add_argument("--max-bytes", type=int, default=DEFAULT_MAX_BYTES, metavar="BYTES",
+                        help=f"拆分嵌套格式文件时每个导入包的字节上限(默认 {DEFAULT_MAX_BYTES})")
+    upload.add_argument("--report", metavar="JSON", help="把上传统计(吞吐量、请求耗时)写入文件")
+    upload.add_argument("-q", "--quiet", action="store_true", help="不输出处理日志")
+    upload.set_defaults(func=cmd_upload)
+
+    to_html = subparsers.add_parser("to-html", help="把导航站的导出数据转换回书签HTML")
+    to_html.add_argument("inputs", nargs="+", metavar="JSON",
+                         help="导出数据(/api/export 的结果或导入包，可以是多个分片)，也可以是嵌套格式的结果文件")
+    to_html.add_argument("-o", "--output", default="bookmarks.html", help="输出的HTML文件(默认 bookmarks.html)")
+    to_html.add_argument("--title", default=HTML_TITLE, help=f"书签文件标题(默认 {HTML_TITLE})")
+    to_html.add_argument("--temp-dir", metavar="DIR", help="暂存站点的临时数据库所在目录(默认为系统临时目录)")
+    to_html.add_argument("-q", "--quiet", action="store_true", help="不输出处理日志")
+    to_html.set_defaults(func=cmd_to_html)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (OSError, ValueError, UploadError) as e:
+        _stderr_log(f"处理过程中发生错误: {str(e)}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""生成用于测试和基准测试的 Netscape 书签文件
+
+生成的文件与浏览器导出的格式一致(DT/H3/DL/A 结构，带 ADD_DATE、ICON 属性)，可以控制：
+
+- 链接总数、文件夹深度和每层的子文件夹数
+- 带图标的链接比例、图标大小和不同图标的数量(真实导出中同一网站的图标会反复出现)
+- 重复链接比例：一部分链接重复使用前面出现过的地址，其中一半做 http/https、末尾斜杠、utm_ 参数等变形
+- 近似重复比例：一部分链接是前面某个链接的镜像域名或移动版主机，标题改变词序或加上 Docs 等词
+- 非 ASCII 标题(中文、日文)的比例
+
+相同的参数和种子总是生成完全相同的文件。写出是流式的，生成 100 万个链接也不会占用多少内存。
+
+    python -m bookmark_converter.corpus 100000 -o bookmarks.html --depth 4 --fanout 5
+"""
+import argparse
+import base64
+import html
+import random
+import sys
+
+# 文件夹和链接标题使用的词
+_ASCII_WORDS = (
+    "Home", "News", "Docs", "Tools", "Blog", "Reference", "Music", "Video", "Design", "Cloud",
+    "Python", "Linux", "Travel", "Finance", "Recipes", "Games", "Research", "Archive", "Shop", "Photos",
+)
+_NON_ASCII_WORDS = (
+    "常用", "工作", "学习", "资料", "工具", "新闻", "视频", "音乐", "设计", "开发",
+    "読書", "旅行", "技術", "料理", "写真", "ニュース", "ゲーム", "资源", "收藏", "文档",
+)
+_TLDS = ("com", "org", "net", "io", "cn", "dev", "jp")
+
+# 最近出现过的地址，重复链接从中选取
+_RECENT_URLS = 10000
+# 近似重复链接的主机变形
+_HOST_VARIANTS = ("m.", "www.", "mirror")
+
+_FILE_HEADER = """<!DOCTYPE NETSCAPE-Bookmark-file-1>
+<!-- This is an automatically generated file.
+     It will be read and overwritten.
+     DO NOT EDIT! -->
+<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">
+<TITLE>Bookmarks</TITLE>
+<H1>Bookmarks</H1>
+<DL><p>
+"""
+
+
+class _Generator:
+    def __init__(self, links, depth, fanout, icon_share, icon_size, icon_variety, duplicate_rate,
+                 non_ascii_share, uncategorized_share, seed, near_duplicate_rate=0.0, private_share=0.0):
+        self.random = random.Random(seed)
+        self.icon_share = icon_share
+        self.duplicate_rate = duplicate_rate
+        self.near_duplicate_rate = near_duplicate_rate
+        self.non_ascii_share = non_ascii_share
+        self.private_share = private_share
+        self.hosts = [self._host(i) for i in range(max(1, int(links ** 0.7)))]
+        self.icons = [self._icon(icon_size) for _ in range(icon_variety)] if icon_share else []
+        self.recent = []
+        self.recent_links = []  # 近似重复链接的来源：(地址, 标题)
+        self.timestamp = 1500000000
+        self.stats = {"links": 0, "folders": 0, "icons": 0, "duplicates": 0, "near_duplicates": 0, "non_ascii": 0,
+                      "private": 0}
+
+        self.uncategorized = int(links * uncategorized_share)
+        self.folders = sum(fanout ** level for level in range(1, depth + 1))
+        if not self.folders:
+            self.uncategorized = links
+        self._per_folder, self._extra = divmod(links - self.uncategorized, self.folders or 1)
+
+    def _host(self, index):
+        word = self.random.choice(_ASCII_WORDS).lower()
+        return f"{word}{index}.example.{self.random.choice(_TLDS)}"
+
+    def _icon(self, size):
+        data = b"\x89PNG\r\n\x1a\n" + self.random.randbytes(max(0, size - 8))
+        return "data:image/png;base64," + base64.b64encode(data).decode('ascii')
+
+    def _title(self, words=2):
+        pool = _NON_ASCII_WORDS if self.random.random() < self.non_ascii_share else _ASCII_WORDS
+        if pool is _NON_ASCII_WORDS:
+            self.stats["non_ascii"] += 1
+        return " ".join(self.random.choice(pool) for _ in range(words))
+
+    def _url(self):
+        if self.recent and self.random.random() < self.duplicate_rate:
+            self.stats["duplicates"] += 1
+            url = self.random.choice(self.recent)
+            if self.random.random() < 0.5:
+                return url
+            variant = self.random.randrange(3)
+            if variant == 0:
+                return url.replace("https://", "http://", 1)
+            if variant == 1:
+                return url if url.endswith("/") else url + "/"
+            return url + ("&" if "?" in url else "?") + "utm_source=bookmarks"
+        host = self.random.choice(self.hosts)
+        path = "/".join(self.random.choice(_ASCII_WORDS).lower() for _ in range(self.random.randint(1, 3)))
+        url = f"https://{host}/{path}/{self.stats['links']}"
+        if self.random.random() < 0.2:
+            url += f"?id={self.random.randrange(100000)}"
+        if len(self.recent) < _RECENT_URLS:
+            self.recent.append(url)
+        else:
+            self.recent[self.random.randrange(_RECENT_URLS)] = url
+        return url
+
+    def _near_duplicate(self):
+        """前面某个链接的变形：换成移动版主机、www. 主机或其他顶级域名，标题改变词序或加上一个词"""
+        self.stats["near_duplicates"] += 1
+        url, title = self.random.choice(self.recent_links)
+        scheme, _, rest = url.partition("://")
+        host, _, path = rest.partition("/")
+        variant = self.random.choice(_HOST_VARIANTS)
+        if variant == "mirror":
+            host = host.rpartition(".")[0] + "." + self.random.choice(_TLDS)
+        else:
+            host = variant + host
+        words = title.split(" ")
+        if len(words) > 1 and self.random.random() < 0.5:
+            words.reverse()
+        else:
+            words.append(self.random.choice(("Docs", "Home", "文档")))
+        return f"{scheme}://{host}/{path}", " ".join(words)
+
+    def link(self, indent):
+        self.timestamp += self.random.randrange(1, 600)
+        near = (self.near_duplicate_rate and self.recent_links
+                and self.random.random() < self.near_duplicate_rate)
+        if near:
+            url, title = self._near_duplicate()
+        else:
+            url = self._url()
+        attrs = f'HREF="{html.escape(url)}" ADD_DATE="{self.timestamp}"'
+        if self.icons and self.random.random() < self.icon_share:
+            self.stats["icons"] += 1
+            attrs += f' ICON="{self.random.choice(self.icons)}"'
+        if self.private_share and self.random.random() < self.private_share:
+            self.stats["private"] += 1
+            attrs += ' PRIVATE="1"'
+        self.stats["links"] += 1
+        if not near:
+            title = self._title(self.random.randint(1, 3))
+            if self.near_duplicate_rate:
+                if len(self.recent_links) < _RECENT_URLS:
+                    self.recent_links.append((url, title))
+                else:
+                    self.recent_links[self.random.randrange(_RECENT_URLS)] = (url, title)
+        return f'{indent}<DT><A {attrs}>{html.escape(title)}</A>\n'
+
+    def _folder_links(self):
+        count = self._per_folder + (1 if self._extra else 0)
+        self._extra = max(0, self._extra - 1)
+        return count
+
+    def write_folder(self, f, level, depth, fanout, indent):
+        self.stats["folders"] += 1
+        name = html.escape(self._title())
+        toolbar = ' PERSONAL_TOOLBAR_FOLDER="true"' if self.stats["folders"] == 1 else ''
+        f.write(f'{indent}<DT><H3 ADD_DATE="{self.timestamp}" LAST_MODIFIED="{self.timestamp}"{toolbar}>'
+                f'{name}</H3>\n{indent}<DL><p>\n')
+        inner = indent + "    "
+        if level < depth:
+            for _ in range(fanout):
+                self.write_folder(f, level + 1, depth, fanout, inner)
+        for _ in range(self._folder_links()):
+            f.write(self.link(inner))
+        f.write(f'{indent}</DL><p>\n')
+
+
+def write_corpus(path, links, depth=3, fanout=6, icon_share=0.3, icon_size=1024, icon_variety=200,
+                 duplicate_rate=0.05, non_ascii_share=0.3, uncategorized_share=0.01, seed=0,
+                 near_duplicate_rate=0.0, private_share=0.0):
+    """生成书签HTML文件，返回统计 {"links", "folders", "icons", "duplicates", "near_duplicates", "non_ascii", "private"}
+
+    depth 层文件夹，每层 fanout 个子文件夹，链接平均分配到所有文件夹中；
+    uncategorized_share 比例的链接放在所有文件夹之外，private_share 比例的链接带 PRIVATE="1"。
+    """
+    generator = _Generator(links, depth, fanout, icon_share, icon_size, icon_variety, duplicate_rate,
+                           non_ascii_share, uncategorized_share, seed, near_duplicate_rate, private_share)
+    with open(path, 'w', encoding='utf-8', buffering=1024 * 1024) as f:
+        f.write(_FILE_HEADER)
+        if depth:
+            for _ in range(fanout):
+                generator.write_folder(f, 1, depth, fanout, "    ")
+        for _ in range(generator.uncategorized):
+            f.write(generator.link("    "))
+        f.write("</DL><p>\n")
+    return generator.stats
+
+
+def parse_count(text):
+    """解析 "10k"、"1M" 这样的数量"""
+    text = text.strip().lower()
+    for suffix, factor in (("k", 1000), ("m", 1000000)):
+        if text.endswith(suffix):
+            return int(float(text[:-1]) * factor)
+    return int(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bookmark_converter.corpus", description="生成测试用的书签HTML文件")
+    parser.add_argument("links", type=parse_count, help="链接数，可以写作 10k、1M")
+    parser.add_argument("-o", "--output", required=True, help="输出的HTML文件")
+    parser.add_argument("--depth", type=int, default=3, help="文件夹层数(默认 3)")
+    parser.add_argument("--fanout", type=int, default=6, help="每个文件夹的子文件夹数(默认 6)")
+    parser.add_argument("--icon-share", type=float, default=0.3, help="带图标的链接比例(默认 0.3)")
+    parser.add_argument("--icon-size", type=int, default=1024, help="每个图标的字节数(默认 1024)")
+    parser.add_argument("--icon-variety", type=int, default=200, help="不同图标的数量(默认 200)")
+    parser.add_argument("--duplicate-rate", type=float, default=0.05, help="重复链接比例(默认 0.05)")
+    parser.add_argument("--near-duplicate-rate", type=float, default=0.0, help="近似重复链接比例(默认 0)")
+    parser.add_argument("--non-ascii-share", type=float, default=0.3, help="非 ASCII 标题比例(默认 0.3)")
+    parser.add_argument("--uncategorized-share", type=float, default=0.01, help="未分类链接比例(默认 0.01)")
+    parser.add_argument("--private-share", type=float, default=0.0, help="私密链接比例(默认 0)")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子(默认 0)")
+    args = parser.parse_args(argv)
+
+    stats = write_corpus(args.output, args.links, args.depth, args.fanout, args.icon_share, args.icon_size,
+                         args.icon_variety, args.duplicate_rate, args.non_ascii_share, args.uncategorized_share,
+                         args.seed, args.near_duplicate_rate, args.private_share)
+    print(f"已生成 {args.output}: {stats['links']} 个链接，{stats['folders']} 个文件夹，"
+          f"{stats['icons']} 个带图标，{stats['duplicates']} 个重复，{stats['near_duplicates']} 个近似重复",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,169 @@
+"""URL 规范化与重复链接检测
+
+canonical_url 把写法不同但指向同一页面的地址归一为同一个键：
+忽略协议(http/https)、主机名大小写、默认端口、末尾斜杠、跟踪参数及参数顺序。
+
+SiteIndex 以规范化地址为键建立哈希索引(现有JSON中的站点 + 本次新增的站点)，
+每次查重都是 O(1)。遇到重复时按策略处理：
+- skip：跳过新链接
+- update：用新链接的名称和图标更新已有站点
+- keep-both：两者都保留
+
+新链接之间保留文档中最先出现的一个。流式解析先产出子文件夹、后产出父文件夹，
+所以登记新站点时同时记录文件夹在文档中的序号；已登记的站点来自文档中更靠后的文件夹时，
+新链接取代它，被取代的站点由 pop_displaced 取出，调用方负责从结果中删除。
+"""
+DEDUP_POLICIES = ('skip', 'update', 'keep-both')
+
+# 常见的跟踪参数
+TRACKING_PARAMS = frozenset((
+    'fbclid', 'gclid', 'dclid', 'gclsrc', 'msclkid', 'yclid', 'igshid',
+    'mc_cid', 'mc_eid', '_hsenc', '_hsmi', 'mkt_tok', 'spm', 'vero_id',
+))
+TRACKING_PREFIXES = ('utm_',)
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+_DEFAULT_PORT_STRINGS = ('', '80', '443')
+
+
+def _is_tracking(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def canonical_url(url):
+    """计算URL的规范化键，用于判断两个链接是否重复
+
+    为了在大量链接上保持速度，这里直接按字符串切分，不经过 urllib.parse。
+    """
+    url = url.strip()
+    if not url:
+        return ''
+
+    scheme, sep, rest = url.partition('://')
+    if not sep:
+        prefix = url.partition(':')[0].lower()
+        if prefix in ('javascript', 'mailto', 'data', 'about', 'tel'):
+            return url
+        scheme, rest = 'http', url  # 省略了协议的地址，如 x.com/path
+    scheme = scheme.lower()
+
+    rest, _, fragment = rest.partition('#')
+    rest, _, query = rest.partition('?')
+    netloc, slash, path = rest.partition('/')
+
+    if scheme not in _DEFAULT_PORTS:
+        # 非网页地址(chrome://、file:// 等)只做最基本的规范化
+        return scheme + '://' + netloc.lower() + slash + path + ('?' + query if query else '')
+
+    userinfo, _, host = netloc.rpartition('@')
+    host = host.lower()
+    # 去掉默认端口(注意 IPv6 地址中的冒号)；http 与 https 视为相同，两者的默认端口都去掉
+    head, colon, port = host.rpartition(':')
+    if colon and port in _DEFAULT_PORT_STRINGS:
+        host = head
+    host = host.rstrip('.')
+    if userinfo:
+        host = userinfo + '@' + host
+
+    path = (slash + path).rstrip('/')
+
+    if query:
+        # 参数按原始文本比较，不做解码再编码，避免额外开销
+        params = [p for p in query.split('&') if p and not _is_tracking(p.partition('=')[0])]
+        if params:
+            params.sort()
+            query = '?' + '&'.join(params)
+        else:
+            query = ''
+
+    return host + path + query + ('#' + fragment if fragment else '')
+
+
+class SiteIndex:
+    """以规范化URL为键的站点索引"""
+
+    def __init__(self, policy='skip'):
+        if policy not in DEDUP_POLICIES:
+            raise ValueError(f"未知的去重策略: {policy}")
+        self.policy = policy
+        self._sites = {}
+        self._orders = {}  # 规范化键 -> 新站点所在文件夹在文档中的序号
+        self._named = {}  # 规范化键 -> 新站点的名称和图标来自的文件夹序号(update 策略)
+        self._displaced = []
+        self.stats = {"added": 0, "skipped": 0, "updated": 0, "kept_both": 0}
+
+    def add_existing(self, groups):
+        """登记现有JSON中的站点"""
+        for group in groups:
+            for site in group.get('sites', []):
+                self._sites.setdefault(canonical_url(site.get('url', '')), site)
+
+    def admit(self, url, name, icon, now, order=None):
+        """检查新链接，应作为新站点加入时返回其规范化键，否则返回 None
+
+        order 为链接所在文件夹在文档中的序号；已登记的新站点所在的文件夹更靠后时返回键，
+        随后 add 用新链接取代它。update 策略下会直接更新已有站点。
+        """
+        key = canonical_url(url)
+        existing = self._sites.get(key)
+        if existing is None:
+            self.stats["added"] += 1
+            return key
+        if self.policy == 'keep-both':
+            self.stats["kept_both"] += 1
+            return key
+        if order is not None and order < self._orders.get(key, order):
+            self.stats["updated" if self.policy == 'update' else "skipped"] += 1
+            return key
+        if self.policy == 'update':
+            # 文档中更靠后的链接已经更新过这个站点时不再用本链接覆盖
+            if order is None or order >= self._named.get(key, order):
+                existing["name"] = name
+                if icon:
+                    existing["icon"] = icon
+                existing["updated_at"] = now
+                if order is not None:
+                    self._named[key] = order
+            self.stats["updated"] += 1
+            return None
+        self.stats["skipped"] += 1
+        return None
+
+    def add(self, key, site, order=None):
+        """登记新加入的站点，order 见 admit
+
+        取代文档中更靠后的站点时，update 策略下新站点沿用被取代站点的名称和图标
+        (按文档顺序，后出现的链接更新先出现的站点)。
+        """
+        existing = self._sites.get(key)
+        if existing is None or self.policy == 'keep-both':
+            self._sites.setdefault(key, site)
+        elif order is not None and order < self._orders.get(key, order):
+            if self.policy == 'update':
+                site["name"] = existing["name"]
+                if existing["icon"]:
+                    site["icon"] = existing["icon"]
+            self._displaced.append(existing)
+            self._sites[key] = site
+        else:
+            return
+        if order is not None:
+            self._orders[key] = min(self._orders.get(key, order), order)
+            self._named[key] = max(self._named.get(key, order), order)
+
+    def pop_displaced(self):
+        """取出被文档中更靠前的链接取代的新站点"""
+        displaced, self._displaced = self._displaced, []
+        return displaced
+
+    def records(self):
+        """登记的所有站点"""
+        return self._sites.values()
+
+    def summary(self):
+        s = self.stats
+        return (
+            f"去重({self.policy}): 新增 {s['added']} 个，跳过 {s['skipped']} 个，"
+            f"更新 {s['updated']} 个，重复保留 {s['kept_both']} 个"
+        )
@@ -0,0 +1,499 @@
+"""书签转换核心引擎
+
+不依赖 tkinter，可在无界面环境(命令行、定时任务、其他 Python 服务)中直接调用。
+日志和进度通过回调函数输出：log(message)、progress(percent)。
+默认使用基于标准库的流式解析，BeautifulSoup 只在需要备选解析时才导入。
+"""
+import functools
+import json
+import os
+from datetime import datetime, timezone
+
+from .icons import IconStore
+from .metrics import Metrics
+from .model import GroupSites, SiteRecord, SiteTable, iter_sites_json, to_plain
+from .netscape import CHUNK_SIZE, iter_folders, iter_soup_events, iter_stream_events
+from .source import InputFile, read_text
+
+# 未归入任何文件夹的链接所使用的分组名称
+UNCATEGORIZED_NAME = "未分类"
+
+# 可选的HTML解析后端
+PARSER_BACKENDS = ('auto', 'stream', 'bs4')
+
+
+class ConversionCancelled(Exception):
+    """转换被用户取消；由 log/progress 回调抛出，用于中止正在进行的解析"""
+
+
+def _noop(*args, **kwargs):
+    """默认回调：什么也不做"""
+
+
+def default_configs(title="导航站", name="导航站", custom_css=""):
+    """生成新数据结构使用的默认配置"""
+    return {
+        "site.title": title,
+        "site.name": name,
+        "site.customCss": custom_css,
+        "DB_INITIALIZED": "true"
+    }
+
+
+def read_bookmark_file(path, log=None):
+    """读取书签文件的全部文本，编码根据 BOM 和 META 声明判断，未声明时 UTF-8 失败则按 GB18030 解码"""
+    return read_text(path, log or _noop)
+
+
+def load_json_file(path):
+    """读取现有JSON文件"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _iter_file_events(source, log, progress):
+    """流式后端：逐个文档增量解码并解析，按已读字节数更新进度(0-70)"""
+    for _, chunks in source.iter_text(log, lambda percent: progress(0.7 * percent)):
+        yield from iter_stream_events(chunks)
+
+
+def _iter_string_chunks(text, progress=_noop, chunk_size=CHUNK_SIZE):
+    """按块切分文本，同时按已送出的字符数更新进度(0-70)"""
+    total = len(text) or 1
+    for start in range(0, len(text), chunk_size):
+        progress(70 * start / total)
+        yield text[start:start + chunk_size]
+
+
+def _soup_events(html_content):
+    from bs4 import BeautifulSoup  # 延迟导入，只有使用 BeautifulSoup 后端时才需要
+
+    return iter_soup_events(BeautifulSoup(html_content, 'html.parser'))
+
+
+def _logged(folders, log):
+    """逐个转发文件夹并记录日志"""
+    for folder in folders:
+        if folder["path"]:
+            log(f"处理文件夹 '{folder['path']}' 中的 {len(folder['links'])} 个链接")
+        else:
+            log(f"将 {len(folder['links'])} 个未分类的链接归入'{folder['name']}'文件夹")
+        yield folder
+
+
+def _iter_folders_with_fallback(make_stream_events, make_soup_events, parser, full_path, log):
+    """使用流式后端解析；auto 模式下流式解析失败或未找到书签时改用 BeautifulSoup"""
+    if parser not in PARSER_BACKENDS:
+        raise ValueError(f"未知的解析后端: {parser}")
+
+    if parser != 'bs4':
+        yielded = False
+        try:
+            for folder in iter_folders(make_stream_events(), full_path, UNCATEGORIZED_NAME):
+                yielded = True
+                yield folder
+        except (UnicodeDecodeError, ConversionCancelled):
+            raise
+        except Exception as e:
+            if yielded or parser == 'stream':
+                raise
+            log(f"流式解析失败({str(e)})，改用 BeautifulSoup 解析")
+        else:
+            if yielded or parser == 'stream':
+                return
+            log("流式解析未找到书签，改用 BeautifulSoup 解析")
+
+    yield from iter_folders(make_soup_events(), full_path, UNCATEGORIZED_NAME)
+
+
+def iter_bookmark_folders(path, log=None, progress=None, full_path=False, parser='auto'):
+    """增量解析书签HTML文件，逐个产出文件夹
+
+    parser 可选 'auto'(默认，流式解析，失败时改用 BeautifulSoup)、'stream'、'bs4'。
+    流式解析时内存占用与当前打开的各级文件夹有关，而与文件大小无关。
+    文件以 mmap 方式只读取一次，也可以是 .gz/.zip 压缩包(见 source 模块)。
+    """
+    with InputFile(path) as source:
+        yield from _iter_html_folders(source, log, progress, full_path, parser)
+
+
+def _iter_html_folders(source, log=None, progress=None, full_path=False, parser='auto'):
+    """与 iter_bookmark_folders 相同，从已经打开的 source.InputFile 读取"""
+    log = log or _noop
+    progress = progress or _noop
+
+    folders = _iter_folders_with_fallback(
+        lambda: _iter_file_events(source, log, progress),
+        lambda: _soup_events(source.read_text(log)), parser, full_path, log
+    )
+    yield from _logged(folders, log)
+
+
+def iter_source_folders(path, log=None, progress=None, full_path=False, parser='auto', cache=None,
+                        input_format='auto'):
+    """按输入格式读取书签文件并逐个产出文件夹，有缓存时优先使用缓存"""
+    if cache is not None:
+        return cache.folders(path, log, progress, full_path, parser, input_format)
+    # readers 依赖本模块，只能在这里导入
+    from .readers import iter_input_folders
+
+    return iter_input_folders(path, log, progress, full_path, parser, input_format)
+
+
+def parse_bookmarks(html_content, log=None, progress=None, full_path=False, parser='auto'):
+    """解析书签HTML内容，提取所有文件夹和链接，并处理未分类链接
+
+    full_path 为 True 时分组名称使用完整文件夹路径(如 "A/B/C")。
+    """
+    log = log or _noop
+    progress = progress or _noop
+
+    folders = _iter_folders_with_fallback(
+        lambda: iter_stream_events(_iter_string_chunks(html_content, progress)),
+        lambda: _soup_events(html_content), parser, full_path, log
+    )
+    folders = list(_logged(folders, log))
+    progress(70)
+
+    return folders
+
+
+def _add_date_timestamp(add_date):
+    """书签的 ADD_DATE(Unix 秒数，部分来源为毫秒或微秒)转换为 "YYYY-MM-DD HH:MM:SS"(UTC)；无效时返回 None"""
+    try:
+        seconds = int(add_date)
+    except (TypeError, ValueError):
+        return None
+    while seconds > 10 ** 11:
+        seconds //= 1000
+    if seconds <= 0:
+        return None
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def convert_to_json_format(folders, existing_data=None, configs=None, log=None, icon_store=None,
+                           site_index=None, keep_metadata=False, columnar=False):
+    """将文件夹和链接转换为特定的JSON格式
+
+    folders 可以是列表，也可以是 iter_bookmark_folders 返回的生成器(逐个消费)。
+    新分组的 "sites" 是站点字典的列表，可以直接 json.dump；现有数据中的分组保持原样。
+    columnar 为 True 时新分组的 "sites" 保持为 model.GroupSites(按列存储，用法与站点字典的列表相同，
+    内存占用小得多)，由 write_result、writer 等直接编码，json.dump 时需要 model.to_plain 作为 default。
+    文件夹带有 "order"(在文档中的先后序号)时按它排列新分组，否则按出现顺序；
+    流式解析在文件夹结束时才产出它，子文件夹先于父文件夹到达，因此分组ID、站点ID和 order_num
+    在所有文件夹转换完后才按排列后的顺序连续分配，与文件夹在文档中的顺序一致。
+    configs 为新建数据结构时使用的配置；合并现有数据时沿用现有数据中的配置。
+    icon_store 为 IconStore 时图标按内容去重，table 模式下结果中会带有 "icons" 表。
+    site_index 为 SiteIndex 时按规范化URL对现有站点和新链接去重，新链接之间保留文档中最先出现的一个
+    (按文件夹的 "order")，没有新站点的分组被跳过。
+
+    keep_metadata 为 True 时书签的 ADD_DATE 作为站点的 created_at，PRIVATE="1" 的书签 is_public 为 0
+    (用于 htmlexport 导出的书签文件往返转换)；默认所有站点的创建时间都是转换时间。
+    """
+    log = log or _noop
+    if configs is None:
+        configs = default_configs()
+
+    next_group_id = 1
+    next_site_id = 1
+    next_order = 0
+    existing_groups = []
+
+    # 如果有现有数据，获取下一个可用的ID
+    if existing_data and 'groups' in existing_data:
+        try:
+            groups = existing_data['groups']
+            next_group_id = max([g["id"] for g in groups]) + 1 if groups else 1
+
+            # 获取所有站点ID
+            all_site_ids = [s["id"] for g in groups for s in g.get('sites', []) if 'id' in s]
+
+            next_site_id = max(all_site_ids) + 1 if all_site_ids else 1
+            next_order = max([g["order_num"] for g in groups]) + 1 if groups else 0
+            existing_groups = groups
+            configs = existing_data.get('configs', {})
+        except Exception as e:
+            log(f"解析现有JSON数据时出错: {str(e)}")
+            log("将创建新的JSON数据结构")
+            next_group_id = 1
+            next_site_id = 1
+            next_order = 0
+            existing_groups = []
+
+    if site_index is not None:
+        site_index.add_existing(existing_groups)
+
+    # 转换文件夹为groups格式；新站点按列保存在 SiteTable 中，分组的 "sites" 指向其中的一段行
+    new_groups = []
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    table = SiteTable(next_site_id, current_time)
+    first_group_id = next_group_id
+
+    for position, folder in enumerate(folders):
+        sites = table.group(next_group_id)
+        group = {
+            "id": next_group_id,
+            "name": folder["name"],
+            "order_num": folder.get("order", position),
+            "sites": sites
+        }
+
+        # 添加链接作为sites
+        for link in folder["links"]:
+            icon = icon_store.add(link.icon) if icon_store else link.icon
+            if site_index is not None:
+                key = site_index.admit(link.url, link.name, icon, current_time, group["order_num"])
+                if key is None:
+                    continue
+                record = sites.append(link.name, link.url, icon)
+                site_index.add(key, record, group["order_num"])
+            else:
+                record = sites.append(link.name, link.url, icon)
+            if keep_metadata:
+                created_at = _add_date_timestamp(link.add_date)
+                if created_at:
+                    record["created_at"] = created_at
+                if link.private:
+                    record["is_public"] = 0
+
+        if not sites:
+            continue  # 所有链接都是重复的
+
+        new_groups.append(group)
+        next_group_id += 1
+
+    if site_index is not None:
+        new_groups = _remove_displaced(table, new_groups, site_index)
+
+    # 按文档顺序排列新分组，重新分配连续的ID和 order_num
+    new_groups.sort(key=lambda g: g["order_num"])
+    site_id = next_site_id
+    for position, group in enumerate(new_groups):
+        group["id"] = first_group_id + position
+        group["order_num"] = next_order + position
+        site_id = group["sites"].renumber(group["id"], site_id)
+
+    # 合并现有组和新组
+    result = {
+        "groups": existing_groups + new_groups,
+        "configs": configs
+    }
+
+    if icon_store and icon_store.mode == 'table':
+        icons = dict(existing_data.get('icons', {})) if isinstance(existing_data, dict) else {}
+        icons.update(icon_store.table())
+        result["icons"] = icons
+
+    return result if columnar else _plain_sites(result)
+
+
+def _plain_sites(result):
+    """把结果中按列存储的站点原地转换为站点字典的列表，返回 result"""
+    for group in result["groups"]:
+        if isinstance(group.get("sites"), GroupSites):
+            group["sites"] = to_plain(group["sites"])
+    return result
+
+
+def _remove_displaced(table, groups, site_index):
+    """删除去重时被文档中更靠前的链接取代的站点，返回仍有站点的分组"""
+    rows = {record.row for record in site_index.pop_displaced()
+            if isinstance(record, SiteRecord) and record.sites.table is table}
+
+    if not rows:
+        return groups
+    mapping = table.remove_rows(rows, [group["sites"] for group in groups])
+    for record in site_index.records():
+        if isinstance(record, SiteRecord) and record.sites.table is table:
+            record.row = mapping[record.row]
+    return [group for group in groups if group["sites"]]
+
+
+def count_result(result):
+
+    """统计结果中的分组数和链接数"""
+    total_groups = len(result['groups'])
+    total_sites = sum(len(g['sites']) for g in result['groups'])
+    return total_groups, total_sites
+
+
+def _link_count(folder):
+    return len(folder["links"])
+
+
+def build_result(bookmark_path, existing_path=None, configs=None, log=None, progress=None,
+                 full_path=False, parser='auto', icon_store=None, site_index=None, cache=None,
+                 input_format='auto', metrics=None, favicons=None, link_checker=None,
+                 near_duplicates=None, keep_metadata=False, columnar=False):
+    """读取、解析并转换书签文件
+
+    书签文件以流式方式边解析边转换。未找到任何书签文件夹时返回 None。
+    未指定 icon_store 时使用 inline 模式，相同图标在内存中只保留一份。
+    cache 为 ParseCache 时文件未变化则直接使用上次的解析结果。
+    input_format 为输入格式(见 readers 模块)，默认根据文件内容自动判断。
+    keep_metadata 和 columnar 见 convert_to_json_format。
+    metrics 为 Metrics 时记录 load_existing、parse、convert 和 log 各阶段的耗时和条目数。
+    near_duplicates 为 neardup.NearDuplicateFinder 时查找并按其设置处理近似重复的站点(neardup 阶段)，
+    link_checker 为 linkcheck.LinkChecker 时检查所有站点的链接并按其设置处理失效站点(links 阶段)，
+    favicons 为 favicons.FaviconResolver 时为没有图标的站点获取网站图标(favicons 阶段)。
+    """
+    if metrics is None:
+        metrics = Metrics()
+    log = metrics.wrap('log', log or _noop)
+    progress = progress or _noop
+    if icon_store is None:
+        icon_store = IconStore()
+
+    # 查看是否有现有JSON文件
+    existing_data = None
+    if existing_path and os.path.exists(existing_path):
+        log(f"读取现有JSON文件: {existing_path}")
+        try:
+            with metrics.span('load_existing'):
+                existing_data = load_json_file(existing_path)
+        except Exception as e:
+            log(f"加载JSON文件失败: {str(e)}")
+            log("将创建新的JSON数据")
+
+    log(f"读取书签文件: {bookmark_path}")
+    log("正在解析书签并转换为JSON格式...")
+    found = []
+
+    def counted(folders):
+        for folder in folders:
+            found.append(folder["name"])
+            yield folder
+
+    metrics.count('parse', bytes=os.path.getsize(bookmark_path))
+    folders = metrics.iter('parse', iter_source_folders(bookmark_path, log, progress, full_path, parser, cache,
+                                                        input_format), _link_count)
+    with metrics.span('convert') as span:
+        result = convert_to_json_format(counted(folders), existing_data, configs, log, icon_store, site_index,
+                                        keep_metadata, columnar=True)
+        span.items += count_result(result)[1]
+    progress(70)
+
+    if not found:
+        return None
+    if near_duplicates is not None:
+        with metrics.span('neardup') as span:
+            span.items += near_duplicates.apply(result, log)
+    if link_checker is not None:
+        with metrics.span('links') as span:
+            span.items += link_checker.apply(result, log)
+    if favicons is not None:
+        with metrics.span('favicons') as span:
+            span.items += favicons.fill_missing(result, log)
+    return result if columnar else _plain_sites(result)
+
+
+def _iter_result_json(result, compact):
+    """逐个分组编码结果，产出 (文本, 已编码的站点数)；拼接后与 json.dump 的输出完全相同"""
+    if compact:
+        dumps = functools.partial(json.dumps, ensure_ascii=False, separators=(',', ':'))
+        key_separator = ':'
+    else:
+        dumps = functools.partial(json.dumps, ensure_ascii=False, indent=2)
+        key_separator = ': '
+
+    def newline(level):
+        return '' if compact else '\n' + '  ' * level
+
+    def nested(value, level):
+        # JSON 字符串中的换行总是被转义，所以可以直接替换换行来增加缩进
+        return dumps(value).replace('\n', newline(level)) if not compact else dumps(value)
+
+    def group_json(group, prefix):
+        # 按列存储的站点由 iter_sites_json 直接拼出，分组的其他字段照常编码
+        nonlocal done
+        for index, (key, value) in enumerate(group.items()):
+            text = (prefix + '{' if not index else ',') + newline(3) + dumps(key) + key_separator
+            if isinstance(value, GroupSites):
+                yield text, done
+                for chunk, count in iter_sites_json(value, 3, compact, dumps):
+                    done += count
+                    yield chunk, done
+            else:
+                yield text + nested(value, 3), done
+        yield newline(2) + '}', done
+
+    if not result:
+        yield dumps(result), 0
+        return
+    done = 0
+    yield '{', done
+    for index, (key, value) in enumerate(result.items()):
+        yield (',' if index else '') + newline(1) + dumps(key) + key_separator, done
+        if key == 'groups' and isinstance(value, list) and value:
+            yield '[', done
+            for position, group in enumerate(value):
+                prefix = (',' if position else '') + newline(2)
+                if isinstance(group.get('sites'), GroupSites):
+                    yield from group_json(group, prefix)
+                else:
+                    done += len(group.get('sites', ()))
+                    yield prefix + nested(group, 2), done
+            yield newline(1) + ']', done
+        else:
+            yield nested(value, 1), done
+    yield newline(0) + '}', done
+
+
+def write_result(result, output_path, compact=False, progress=None):
+    """保存结果到JSON文件
+
+    compact 为 True 时不缩进，可以使用 json 的 C 加速编码器，大文件写出快得多。
+    分组逐个编码写出，progress(percent) 按已写出的站点数报告 0-100 的进度。
+    """
+    progress = progress or _noop
+    total = sum(len(g.get('sites', ())) for g in result.get('groups', ())) or 1
+    with open(output_path, 'w', encoding='utf-8') as f:
+        for text, done in _iter_result_json(result, compact):
+            f.write(text)
+            progress(100 * done / total)
+
+
+def convert_file(bookmark_path, output_path, existing_path=None, configs=None, log=None, progress=None,
+                 full_path=False, parser='auto', icon_store=None, site_index=None, writer=None, cache=None,
+                 input_format='auto', metrics=None, favicons=None, link_checker=None,
+                 near_duplicates=None, keep_metadata=False, columnar=False):
+    """完整转换流程：读取 -> 解析 -> 转换 -> 保存
+
+    writer(result, output_path) 用于替换默认的 write_result，例如按 ExportData 格式分片写出。
+    cache 为 ParseCache 时优先使用缓存的解析结果。
+    metrics 为 Metrics 时另外记录 write 阶段；near_duplicates、link_checker、favicons、keep_metadata
+    和 columnar 见 build_result。
+    返回结果数据；未找到书签文件夹时返回 None 且不写出文件。
+    """
+    if metrics is None:
+        metrics = Metrics()
+    log = log or _noop
+    progress = progress or _noop
+
+    if icon_store is None:
+        icon_store = IconStore()
+    result = build_result(bookmark_path, existing_path, configs, log, progress, full_path, parser,
+                          icon_store, site_index, cache, input_format, metrics, favicons, link_checker,
+                          near_duplicates, keep_metadata, columnar=True)
+    if result is None:
+        log("警告: 没有找到有效的书签文件夹!")
+        return None
+
+    total_groups, total_sites = count_result(result)
+    log(f"正在保存结果到: {output_path}")
+    with metrics.span('write', total_sites):
+        if writer is None:
+            write_result(result, output_path, progress=lambda percent: progress(70 + 0.3 * percent))
+        else:
+            progress(90)
+            writer(result, output_path)
+    progress(100)
+
+    log("\n处理完成!")
+    log(f"共处理了 {total_groups} 个分组，{total_sites} 个链接")
+    if icon_store.total:
+        log(icon_store.summary())
+    if site_index is not None:
+        log(site_index.summary())
+    log(f"结果已保存到: {os.path.abspath(output_path)}")
+    return result if columnar else _plain_sites(result)
@@ -0,0 +1,495 @@
+"""为缺少图标的站点获取网站图标
+
+导出文件中没有 ICON 属性的链接转换后图标为空。FaviconResolver 按来源(协议 + 主机 + 端口)去重后并发获取图标：
+
+1. 请求首页，在 <head> 中查找 <link rel="icon">(也接受 "shortcut icon"，其次是 apple-touch-icon)，
+   找到时使用其地址(相对地址按跟随重定向后的页面地址解析)
+2. 没有声明图标时请求 /favicon.ico，返回图片时使用该地址
+
+站点中写入的是图标地址而不是图片数据，worker 的站点验证接受图标地址。
+
+网络请求基于 asyncio 的流实现了一个最小的 HTTP/1.1 客户端(不依赖第三方库)：
+- 全局并发数和每个主机的并发数分别限制，同一主机的请求复用保持连接(首页和 /favicon.ico 通常共用一个连接)
+- 每个请求有超时，首页只读取开头的 MAX_PAGE_BYTES 字节，最多跟随 MAX_REDIRECTS 次重定向
+
+结果保存在 IconCache(JSON 文件)中：找到的图标在 ttl 内有效，没有找到或请求失败的来源在 negative_ttl 内
+不再请求，因此重复运行时已知的来源不会产生任何请求。
+
+测试时可以用 connect_to 把所有请求以明文 HTTP 发往本地的模拟服务器(见 tests/mock_sites.py)，
+请求中的主机名保持不变，服务器按 Host 头模拟不同的网站：
+
+    python -m tests.mock_sites --port 8790
+    python -m bookmark_converter convert bookmarks.html --fetch-icons --connect-to 127.0.0.1:8790
+"""
+import asyncio
+import json
+import os
+import ssl
+import time
+from collections import OrderedDict
+from html.parser import HTMLParser
+from urllib.parse import quote, urljoin, urlsplit
+
+from .engine import _noop
+from .incremental import _write_json_atomic
+
+ICON_CACHE_VERSION = 1
+
+DEFAULT_CONCURRENCY = 64
+DEFAULT_PER_HOST = 2
+DEFAULT_TIMEOUT = 10
+DEFAULT_TTL = 30 * 24 * 3600
+DEFAULT_NEGATIVE_TTL = 24 * 3600
+
+# 首页最多读取的字节数，<link rel="icon"> 总是在 <head> 中
+MAX_PAGE_BYTES = 256 * 1024
+# 检查 /favicon.ico 时最多读取的字节数
+MAX_ICON_BYTES = 64 * 1024
+MAX_REDIRECTS = 5
+# 空闲连接总数上限，超出时关闭最久未使用的连接
+MAX_IDLE_CONNECTIONS = 64
+# 每获取多少个来源输出一次进度日志
+LOG_INTERVAL = 500
+
+USER_AGENT = "Mozilla/5.0 (compatible; NaviHiveBookmarkConverter/1.0)"
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+_REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+# 请求目标中不需要转义的字符(已经转义的 %XX 保持不变)
+_TARGET_SAFE = "/?&=%:@!$'()*+,;~-._"
+
+
+class HttpError(Exception):
+    """响应格式错误或连接意外关闭"""
+
+
+def icon_cache_path_for(output_path):
+    """输出文件对应的默认图标缓存文件路径"""
+    return os.path.splitext(output_path)[0] + ".favicons.json"
+
+
+def site_origin(url):
+    """站点地址的来源，如 https://example.com:8443；不是 http/https 地址时返回 None"""
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except (ValueError, AttributeError):
+        return None
+    if parts.scheme.lower() not in _DEFAULT_PORTS or not parts.hostname:
+        return None
+    scheme = parts.scheme.lower()
+    host = parts.hostname
+    if ':' in host:
+        host = f"[{host}]"  # IPv6
+    if port and port != _DEFAULT_PORTS[scheme]:
+        return f"{scheme}://{host}:{port}"
+    return f"{scheme}://{host}"
+
+
+class IconCache:
+    """来源 -> 图标地址的持久缓存
+
+    文件内容为 {"version", "origins": {来源: [图标地址或 null, 检查时间]}}。
+    """
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.entries = {}
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != ICON_CACHE_VERSION:
+                raise ValueError(f"不支持的图标缓存版本: {data.get('version')}")
+            self.entries = data.get("origins", {})
+
+    def get(self, origin, now=None):
+        """返回 (是否命中, 图标地址)；图标地址为 None 表示已知没有图标"""
+        entry = self.entries.get(origin)
+        if entry is None:
+            return False, None
+        icon, checked = entry
+        ttl = self.ttl if icon else self.negative_ttl
+        if (now if now is not None else time.time()) - checked > ttl:
+            return False, None
+        return True, icon
+
+    def put(self, origin, icon, now=None):
+        self.entries[origin] = [icon, int(now if now is not None else time.time())]
+
+    def save(self):
+        """写回缓存文件，同时删除已经过期的记录"""
+        if not self.path:
+            return
+        now = time.time()
+        origins = {origin: entry for origin, entry in self.entries.items()
+                   if now - entry[1] <= (self.ttl if entry[0] else self.negative_ttl)}
+        _write_json_atomic({"version": ICON_CACHE_VERSION, "origins": origins}, self.path)
+
+
+class _IconLinkParser(HTMLParser):
+    """在 <head> 中查找图标声明，遇到 <body> 时停止"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.icon = None
+        self.touch_icon = None
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'body':
+            self.done = True
+        elif tag == 'link' and not self.done:
+            attrs = dict(attrs)
+            rels = (attrs.get('rel') or '').lower().split()
+            href = (attrs.get('href') or '').strip()
+            if not href:
+                return
+            if 'icon' in rels and self.icon is None:
+                self.icon = href
+            elif ('apple-touch-icon' in rels or 'apple-touch-icon-precomposed' in rels) and self.touch_icon is None:
+                self.touch_icon = href
+
+    def handle_endtag(self, tag):
+        if tag == 'head':
+            self.done = True
+
+
+def find_icon_link(html, base_url):
+    """页面中声明的图标的绝对地址，没有声明时返回 None"""
+    parser = _IconLinkParser()
+    try:
+        parser.feed(html)
+    except AssertionError:
+        pass  # html.parser 在某些格式错误的标记上会断言失败，已经解析出的部分仍然有效
+    href = parser.icon or parser.touch_icon
+    if not href:
+        return None
+    if href.lower().startswith('data:'):
+        return href
+    url = urljoin(base_url, href)
+    return url if urlsplit(url).scheme in _DEFAULT_PORTS else None
+
+
+class Response:
+    """HTTP 响应；body 在超过读取上限时被截断"""
+
+    def __init__(self, url, status, headers, body):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def content_type(self):
+        return self.headers.get('content-type', '').split(';', 1)[0].strip().lower()
+
+    def text(self):
+        charset = 'utf-8'
+        for param in self.headers.get('content-type', '').split(';')[1:]:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'charset':
+                charset = value.strip().strip('"\'') or charset
+        try:
+            return self.body.decode(charset, 'replace')
+        except LookupError:
+            return self.body.decode('utf-8', 'replace')
+
+
+class _Connection:
+    def __init__(self, key, reader, writer):
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+
+    def close(self):
+        self.writer.close()
+
+
+class HttpClient:
+    """基于 asyncio 流的最小 HTTP/1.1 客户端，按 (协议, 主机, 端口) 复用保持连接
+
+    connect_to 为 (主机, 端口) 时所有连接都以明文发往该地址(用于测试)，请求的 Host 头不变。
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, connect_to=None, max_idle=MAX_IDLE_CONNECTIONS):
+        self.timeout = timeout
+        self.connect_to = connect_to
+        self.max_idle = max_idle
+        self._idle = OrderedDict()  # 连接 -> None，按最近使用排序
+        self._ssl = None
+        self.stats = {"requests": 0, "connections": 0, "reused": 0}
+
+    async def _connect(self, key):
+        scheme, host, port = key
+        address = self.connect_to or (host, port)
+        ssl_context = None
+        if scheme == 'https' and not self.connect_to:
+            if self._ssl is None:
+                self._ssl = ssl.create_default_context()
+            ssl_context = self._ssl
+        reader, writer = await asyncio.open_connection(
+            address[0], address[1], ssl=ssl_context, server_hostname=host if ssl_context else None,
+            limit=MAX_PAGE_BYTES)
+        self.stats["connections"] += 1
+        return _Connection(key, reader, writer)
+
+    def _take_idle(self, key):
+        for connection in self._idle:
+            if connection.key == key:
+                del self._idle[connection]
+                if connection.reader.at_eof():
+                    connection.close()
+                    return self._take_idle(key)
+                return connection
+        return None
+
+    def _release(self, connection):
+        self._idle[connection] = None
+        while len(self._idle) > self.max_idle:
+            oldest, _ = self._idle.popitem(last=False)
+            oldest.close()
+
+    async def request(self, method, url, max_body):
+        """发送一个请求(不跟随重定向)，返回 Response"""
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        port = parts.port or _DEFAULT_PORTS[scheme]
+        hostname = parts.hostname.encode('idna').decode('ascii')  # 国际化域名
+        key = (scheme, hostname, port)
+        target = quote((parts.path or '/') + (f"?{parts.query}" if parts.query else ''), safe=_TARGET_SAFE)
+        host = hostname if ':' not in hostname else f"[{hostname}]"
+        if port != _DEFAULT_PORTS[scheme]:
+            host += f":{port}"
+        head = (f"{method} {target} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: {USER_AGENT}\r\n"
+                f"Accept: */*\r\nAccept-Encoding: identity\r\nConnection: keep-alive\r\n\r\n").encode('ascii')
+
+        connection = self._take_idle(key)
+        if connection is not None:
+            self.stats["reused"] += 1
+            try:
+                return await asyncio.wait_for(self._exchange(connection, url, method, head, max_body), self.timeout)
+            except (HttpError, ConnectionError, asyncio.IncompleteReadError):
+                pass  # 服务器已经关闭了空闲连接，换一个新连接重试
+        connection = await asyncio.wait_for(self._connect(key), self.timeout)
+        return await asyncio.wait_for(self._exchange(connection, url, method, head, max_body), self.timeout)
+
+    async def _exchange(self, connection, url, method, head, max_body):
+        self.stats["requests"] += 1
+        try:
+            connection.writer.write(head)
+            await connection.writer.drain()
+            status, version, headers = await self._read_head(connection.reader)
+            body, complete = await self._read_body(connection.reader, method, status, headers, max_body)
+        except BaseException:
+            connection.close()
+            raise
+        connection_header = headers.get('connection', '').lower()
+        keep_alive = complete and ('close' not in connection_header if version == 'HTTP/1.1'
+                                   else 'keep-alive' in connection_header)
+        if keep_alive:
+            self._release(connection)
+        else:
+            connection.close()
+        return Response(url, status, headers, body)
+
+    @staticmethod
+    async def _read_head(reader):
+        try:
+            data = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.LimitOverrunError:
+            raise HttpError("响应头过长")
+        except asyncio.IncompleteReadError as e:
+            raise HttpError("连接在响应头之前关闭") if not e.partial else HttpError("响应头不完整")
+        lines = data.decode('latin-1').split("\r\n")
+        status_line = lines[0].split(' ', 2)
+        if len(status_line) < 2 or not status_line[0].startswith('HTTP/') or not status_line[1].isdigit():
+            raise HttpError(f"无效的状态行: {lines[0][:80]}")
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(':')
+            if sep:
+                name = name.strip().lower()
+                value = value.strip()
+                headers[name] = headers[name] + ", " + value if name in headers else value
+        return int(status_line[1]), status_line[0], headers
+
+    @staticmethod
+    async def _read_body(reader, method, status, headers, max_body):
+        """读取响应体，返回 (数据, 是否完整读完)；没有读完的连接不能复用"""
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            return b'', True
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            chunks = []
+            size = 0
+            while True:
+                line = await reader.readline()
+                try:
+                    length = int(line.split(b';', 1)[0].strip(), 16)
+                except ValueError:
+                    raise HttpError("无效的分块长度")
+                if length == 0:
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass  # 跳过 trailer
+                    return b''.join(chunks), True
+                if size + length > max_body:
+                    chunks.append(await reader.readexactly(max_body - size))
+                    return b''.join(chunks), False
+                chunks.append(await reader.readexactly(length))
+                size += length
+                await reader.readexactly(2)
+        length = headers.get('content-length')
+        if length is not None:
+            try:
+                length = int(length)
+            except ValueError:
+                raise HttpError("无效的 Content-Length")
+            if length > max_body:
+                return await reader.readexactly(max_body), False
+            return await reader.readexactly(length), True
+        # 既没有长度也没有分块：读到连接关闭为止
+        chunks = []
+        size = 0
+        while size < max_body:
+            data = await reader.read(max_body - size)
+            if not data:
+                break
+            chunks.append(data)
+            size += len(data)
+        return b''.join(chunks), False
+
+    async def get(self, url, max_body):
+        """GET 请求，跟随重定向"""
+        for _ in range(MAX_REDIRECTS + 1):
+            response = await self.request('GET', url, max_body)
+            location = response.headers.get('location')
+            if response.status not in _REDIRECT_STATUSES or not location:
+                return response
+            url = urljoin(url, location)
+            if urlsplit(url).scheme.lower() not in _DEFAULT_PORTS:
+                return response
+        raise HttpError("重定向次数过多")
+
+    def close(self):
+        for connection in self._idle:
+            connection.close()
+        self._idle.clear()
+
+
+class FaviconResolver:
+    """并发获取网站图标，结果保存在 IconCache 中"""
+
+    def __init__(self, cache=None, concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST,
+                 timeout=DEFAULT_TIMEOUT, connect_to=None, log=None, progress=None):
+        self.cache = cache if cache is not None else IconCache()
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.connect_to = connect_to
+        self.log = log or _noop
+        self.progress = progress or _noop
+        self.stats = {"origins": 0, "cached": 0, "fetched": 0, "found": 0, "missing": 0, "errors": 0,
+                      "requests": 0, "connections": 0}
+
+    def resolve(self, origins):
+        """获取各个来源的图标，返回 {来源: 图标地址或 None}；已缓存的来源不发送请求"""
+        icons = {}
+        pending = []
+        now = time.time()
+        for origin in dict.fromkeys(origins):
+            hit, icon = self.cache.get(origin, now)
+            if hit:
+                icons[origin] = icon
+            else:
+                pending.append(origin)
+        self.stats["origins"] += len(icons) + len(pending)
+        self.stats["cached"] += len(icons)
+        if pending:
+            self.log(f"获取 {len(pending)} 个网站的图标(已缓存 {len(icons)} 个)...")
+            try:
+                asyncio.run(self._resolve_all(pending, icons))
+            finally:
+                self.cache.save()
+        return icons
+
+    async def _resolve_all(self, origins, icons):
+        client = HttpClient(self.timeout, self.connect_to, max(self.concurrency, MAX_IDLE_CONNECTIONS))
+        limit = asyncio.Semaphore(self.concurrency)
+        host_limits = {}
+        done = 0
+
+        async def resolve_one(origin):
+            nonlocal done
+            host = urlsplit(origin).hostname
+            host_limit = host_limits.setdefault(host, asyncio.Semaphore(self.per_host))
+            # 先等待主机的名额再占用全局名额，同一主机排队的请求不会占满全局并发
+            async with host_limit, limit:
+                try:
+                    icon = await self._fetch_icon(client, origin)
+                except (OSError, asyncio.TimeoutError, HttpError, ssl.SSLError, UnicodeError, ValueError):
+                    icon = None
+                    self.stats["errors"] += 1
+                else:
+                    self.stats["found" if icon else "missing"] += 1
+            icons[origin] = icon
+            self.cache.put(origin, icon)
+            self.stats["fetched"] += 1
+            done += 1
+            self.progress(100 * done / len(origins))
+            if done % LOG_INTERVAL == 0:
+                self.log(f"已获取 {done}/{len(origins)} 个网站的图标")
+
+        try:
+            await asyncio.gather(*(resolve_one(origin) for origin in origins))
+        finally:
+            client.close()
+            self.stats["requests"] += client.stats["requests"]
+            self.stats["connections"] += client.stats["connections"]
+
+    async def _fetch_icon(self, client, origin):
+        page = await client.get(origin + "/", MAX_PAGE_BYTES)
+        if page.status == 200 and page.content_type in ('text/html', 'application/xhtml+xml', ''):
+            icon = find_icon_link(page.text(), page.url)
+            if icon:
+                return icon
+        # 首页可能重定向到其他主机(如 www.)，图标按最终页面所在的来源查找
+        favicon_url = urljoin(page.url, "/favicon.ico")
+        response = await client.get(favicon_url, MAX_ICON_BYTES)
+        if response.status == 200 and response.body and not response.content_type.startswith('text/'):
+            return response.url
+        return None
+
+    def fill_missing(self, result, log=None):
+        """为结果中没有图标的站点填入网站图标，返回填入的站点数"""
+        log = log or self.log
+        origins = {}
+        for group in result.get("groups", ()):
+            for site in group.get("sites", ()):
+                if not site.get("icon"):
+                    origin = site_origin(site.get("url") or "")
+                    if origin:
+                        origins[origin] = None
+        if not origins:
+            return 0
+
+        icons = self.resolve(origins)
+        filled = 0
+        for group in result.get("groups", ()):
+            for site in group.get("sites", ()):
+                if not site.get("icon"):
+                    icon = icons.get(site_origin(site.get("url") or ""))
+                    if icon:
+                        site["icon"] = icon
+                        filled += 1
+        log(self.summary())
+        log(f"为 {filled} 个站点填入了网站图标")
+        return filled
+
+    def summary(self):
+        s = self.stats
+        return (
+            f"网站图标: {s['origins']} 个网站，缓存命中 {s['cached']} 个，请求 {s['fetched']} 个"
+            f"(找到 {s['found']} 个，没有图标 {s['missing']} 个，失败 {s['errors']} 个)，"
+            f"共 {s['requests']} 个请求，{s['connections']} 个连接"
+        )
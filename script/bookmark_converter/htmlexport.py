@@ -0,0 +1,510 @@
+"""把导航站的导出数据(ExportData)转换回 Netscape 书签HTML
+
+worker 的 /api/export 返回扁平结构 {"groups": [...], "sites": [...], "configs": {...}}，
+站点通过 group_id 关联分组。转换回浏览器可以导入的书签文件时：
+
+1. 增量读取导出文件(_JsonStream)：groups、sites 数组中的记录逐条解码，不把整个文档读入内存
+2. 分组(数量很少)保存在内存中；站点暂存在临时 SQLite 数据库里，
+   输出时按 (group_id, order_num, 读入顺序) 取出，站点在文件中的顺序和分组出现在站点之前还是之后都无关紧要
+3. 分组按 order_num 排列，每个分组输出为 <DT><H3> 文件夹，站点输出为 <DT><A>；
+   iter_bookmark_html 逐块产出文本，每块最多 HTML_BLOCK_SITES 个站点，写出时不构造整个文档
+
+站点的 created_at / updated_at 写为 ADD_DATE / LAST_MODIFIED(Unix 秒数，没有时区的时间按 UTC 处理)，
+data URI 图标写为 ICON，图标地址写为 ICON_URI，is_public 为 0 的站点和分组带 PRIVATE="1"，描述写在 <DD> 中。
+引用了不存在的分组的站点放在所有文件夹之外，再次转换时归入"未分类"。
+可以同时读入多个分片(ExportWriter 按大小拆分的导入包)，重复出现的分组按 ID 合并；
+也可以读入嵌套格式的转换结果(分组中带有 "sites"，此时一次解码一个分组)。
+
+用 convert --keep-metadata 转换导出的HTML时，创建时间、图标和是否公开都能还原：
+
+    python -m bookmark_converter to-html export.json -o bookmarks.html
+    python -m bookmark_converter.htmlexport --links 100k --memory-budget 64
+
+后者生成书签文件后执行 HTML -> JSON -> HTML -> JSON 的往返转换，比较两次的导出数据和两次的HTML(不比较 LAST_MODIFIED)，
+并检查 to-html 进程的内存峰值，不一致或超出预算时退出码为 1。
+"""
+import argparse
+import codecs
+import hashlib
+import html
+import json
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from .engine import _noop
+from .icons import resolve_icon
+
+DEFAULT_TITLE = "Bookmarks"
+
+# 每次从导出文件读取的字节数
+READ_CHUNK_SIZE = 1024 * 1024
+# 每积累多少个站点写入一次临时数据库
+SPOOL_BATCH_SITES = 1000
+# iter_bookmark_html 每次产出的站点数
+HTML_BLOCK_SITES = 1000
+
+# 暂存和输出的站点字段
+SPOOL_FIELDS = ("name", "url", "icon", "description", "created_at", "updated_at", "is_public")
+
+_HEADER = """<!DOCTYPE NETSCAPE-Bookmark-file-1>
+<!-- This is an automatically generated file.
+     It will be read and overwritten.
+     DO NOT EDIT! -->
+<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">
+<TITLE>{title}</TITLE>
+<H1>{title}</H1>
+<DL><p>
+"""
+
+_WHITESPACE_RE = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+
+class _JsonStream:
+    """增量读取 JSON 文本：缓冲区中只保留尚未解析的部分"""
+
+    def __init__(self, f, progress=None):
+        self._file = f
+        self._decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self._progress = progress or _noop
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.bytes_read = 0
+
+    def _fill(self):
+        data = self._file.read(READ_CHUNK_SIZE)
+        self.bytes_read += len(data)
+        self.eof = not data
+        self.buffer = self.buffer[self.pos:] + self._decoder.decode(data, final=self.eof)
+        self.pos = 0
+        self._progress(self.bytes_read)
+
+    def peek(self):
+        """跳过空白，返回下一个字符；文件结束时返回空串"""
+        while True:
+            self.pos = _WHITESPACE_RE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.eof:
+                return ''
+            self._fill()
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"导出文件格式错误: 第 {self.bytes_read} 字节附近应为 {' 或 '.join(chars)}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """解码下一个完整的 JSON 值；值跨越缓冲区末尾时读入更多内容后重新解码"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise ValueError(f"导出文件格式错误: {e}") from None
+                self._fill()
+                continue
+            if end == len(self.buffer) and not self.eof:
+                self._fill()  # 位于末尾的数字可能还没有读完
+                continue
+            self.pos = end
+            return value
+
+
+def iter_export_records(f, progress=None):
+    """逐条产出导出文件(以二进制方式打开)中的记录
+
+    groups 中的每个分组产出 ("group", 分组)，sites 中的每个站点产出 ("site", 站点)，
+    其他顶层键产出 (键, 值)。嵌套格式的分组中的 "sites" 被取出，逐个以 ("site", 站点) 产出并带上 group_id。
+    progress(已读取的字节数) 在每次读入后调用。
+    """
+    stream = _JsonStream(f, progress)
+    stream.expect('{')
+    if stream.peek() == '}':
+        return
+    while True:
+        key = stream.value()
+        stream.expect(':')
+        if key in ("groups", "sites") and stream.peek() == '[':
+            kind = key[:-1]
+            stream.expect('[')
+            if stream.peek() != ']':
+                while True:
+                    record = stream.value()
+                    if kind == "group" and isinstance(record, dict) and "sites" in record:
+                        for site in record.pop("sites") or ():
+                            yield "site", dict(site, group_id=record.get("id"))
+                    yield kind, record
+                    if stream.expect(',]') == ']':
+                        break
+            else:
+                stream.expect(']')
+        else:
+            yield key, stream.value()
+        if stream.expect(',}') == '}':
+            return
+
+
+def _number(value, default=0):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else default
+
+
+class ExportReader:
+    """读入一个或多个导出文件：分组保存在内存中，站点暂存在临时 SQLite 数据库里
+
+    作为上下文管理器使用，退出时删除临时数据库。temp_dir 为临时数据库所在目录(默认为系统临时目录)。
+    """
+
+    def __init__(self, paths, temp_dir=None, log=None, progress=None):
+        self.paths = [paths] if isinstance(paths, str) else list(paths)
+        self.log = log or _noop
+        self.progress = progress or _noop
+        self.groups = {}  # 分组ID -> 分组，按首次出现的顺序
+        self.icons = {}  # 嵌套格式 table 模式的图标表
+        self.configs = {}
+        self.stats = {"groups": 0, "sites": 0}
+        fd, self._db_path = tempfile.mkstemp(prefix="bookmark-export-", suffix=".sqlite", dir=temp_dir)
+        os.close(fd)
+        self._db = sqlite3.connect(self._db_path)
+        self._db.execute("PRAGMA journal_mode=OFF")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute("CREATE TABLE sites (group_id, order_num, seq INTEGER, "
+                         + ", ".join(SPOOL_FIELDS) + ")")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+            os.remove(self._db_path)
+
+    def read(self):
+        """读入所有文件，返回 self"""
+        total = sum(os.path.getsize(path) for path in self.paths) or 1
+        done = 0
+        pending = []
+        insert = (f"INSERT INTO sites VALUES (?, ?, ?, {', '.join('?' * len(SPOOL_FIELDS))})")
+        for path in self.paths:
+            self.log(f"读取导出文件: {path}")
+            with open(path, 'rb') as f:
+                for kind, record in iter_export_records(f, lambda read: self.progress(100 * (done + read) / total)):
+                    if kind == "site":
+                        if not isinstance(record, dict):
+                            continue
+                        pending.append((record.get("group_id"), _number(record.get("order_num")),
+                                        self.stats["sites"]) + tuple(record.get(k) for k in SPOOL_FIELDS))
+                        self.stats["sites"] += 1
+                        if len(pending) >= SPOOL_BATCH_SITES:
+                            self._db.executemany(insert, pending)
+                            pending = []
+                    elif kind == "group":
+                        if isinstance(record, dict) and record.get("id") not in self.groups:
+                            record["_seq"] = len(self.groups)
+                            self.groups[record.get("id")] = record
+                    elif kind == "icons" and isinstance(record, dict):
+                        self.icons.update(record)
+                    elif kind == "configs" and isinstance(record, dict) and not self.configs:
+                        self.configs = record
+            done += os.path.getsize(path)
+        if pending:
+            self._db.executemany(insert, pending)
+        self._db.execute("CREATE INDEX sites_order ON sites (group_id, order_num, seq)")
+        self._db.commit()
+        self.stats["groups"] = len(self.groups)
+        return self
+
+    def ordered_groups(self):
+        """按 order_num(相同时按出现顺序)排列的分组"""
+        return sorted(self.groups.values(), key=lambda g: (_number(g.get("order_num")), g["_seq"]))
+
+    def iter_sites(self, group_id):
+        """分组中的站点，每个为按 SPOOL_FIELDS 排列的元组"""
+        return self._db.execute("SELECT " + ", ".join(SPOOL_FIELDS)
+                                + " FROM sites WHERE group_id IS ? ORDER BY order_num, seq", (group_id,))
+
+    def iter_orphan_sites(self):
+        """引用了不存在的分组的站点"""
+        known = set(self.groups)
+        for (group_id,) in self._db.execute("SELECT DISTINCT group_id FROM sites ORDER BY group_id"):
+            if group_id not in known:
+                yield from self.iter_sites(group_id)
+
+    def iter_content(self):
+        """按输出顺序产出 (分组或 None, 站点)；分组为 None 的是引用了不存在的分组的站点"""
+        for group in self.ordered_groups():
+            for site in self.iter_sites(group.get("id")):
+                yield group, site
+        for site in self.iter_orphan_sites():
+            yield None, site
+
+
+def _seconds(value):
+    """created_at 等时间转换为 Unix 秒数；没有时区的时间按 UTC 处理，无法解析时返回 None"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        moment = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def _time_attrs(created_at, updated_at):
+    attrs = ''
+    added = _seconds(created_at)
+    if added is not None:
+        attrs += f' ADD_DATE="{added}"'
+    modified = _seconds(updated_at)
+    if modified is not None:
+        attrs += f' LAST_MODIFIED="{modified}"'
+    return attrs
+
+
+def _group_html(group, indent):
+    attrs = _time_attrs(group.get("created_at"), group.get("updated_at"))
+    if group.get("is_public") == 0:
+        attrs += ' PRIVATE="1"'
+    return f'{indent}<DT><H3{attrs}>{html.escape(group.get("name") or "", quote=False)}</H3>\n{indent}<DL><p>\n'
+
+
+def _site_html(site, indent, icons):
+    name, url, icon, description, created_at, updated_at, is_public = site
+    attrs = f'HREF="{html.escape(url or "")}"' + _time_attrs(created_at, updated_at)
+    if icons:
+        icon = resolve_icon(icon, icons)
+    if icon:
+        attrs += f' {"ICON" if icon.startswith("data:") else "ICON_URI"}="{html.escape(icon)}"'
+    if is_public == 0:
+        attrs += ' PRIVATE="1"'
+    text = f'{indent}<DT><A {attrs}>{html.escape(name or "", quote=False)}</A>\n'
+    if description:
+        text += f'{indent}<DD>{html.escape(description, quote=False)}\n'
+    return text
+
+
+def iter_bookmark_html(export, title=DEFAULT_TITLE, stats=None):
+    """按 ExportReader 中的内容逐块产出书签HTML
+
+    stats 为字典时累计写出的站点数(sites)、不属于任何分组的站点数(orphans)、私密站点数(private)和带图标的站点数(icons)。
+    """
+    if stats is None:
+        stats = {}
+    for key in ("sites", "orphans", "private", "icons"):
+        stats.setdefault(key, 0)
+    yield _HEADER.format(title=html.escape(title, quote=False))
+    indent = "    "
+    block = []
+    count = 0
+    current = False  # 当前打开的分组；None 表示在所有文件夹之外
+    for group, site in export.iter_content():
+        if group is not current:
+            if current:
+                block.append(f'{indent}</DL><p>\n')
+            if group is not None:
+                block.append(_group_html(group, indent))
+            current = group
+        block.append(_site_html(site, indent * 2 if group is not None else indent, export.icons))
+        stats["sites"] += 1
+        stats["orphans"] += group is None
+        stats["private"] += site[6] == 0
+        stats["icons"] += bool(site[2])
+        count += 1
+        if count == HTML_BLOCK_SITES:
+            yield ''.join(block)
+            block, count = [], 0
+    if current:
+        block.append(f'{indent}</DL><p>\n')
+    block.append("</DL><p>\n")
+    yield ''.join(block)
+
+
+def export_html(paths, output_path, title=DEFAULT_TITLE, log=None, progress=None, temp_dir=None):
+    """把一个或多个导出文件转换为书签HTML，返回统计 {"groups", "sites", "orphans", "private", "icons"}
+
+    progress(percent) 读取时报告 0-70，写出时报告 70-100。没有站点的分组不会写出(浏览器和再次转换都会忽略它们)。
+    """
+    log = log or _noop
+    progress = progress or _noop
+    with ExportReader(paths, temp_dir, log, lambda percent: progress(0.7 * percent)) as export:
+        export.read()
+        total = export.stats["sites"] or 1
+        stats = dict(export.stats)
+        written = {}
+        log(f"正在写出书签HTML: {output_path}")
+        tmp_path = output_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8', newline='\n') as f:
+            for text in iter_bookmark_html(export, title, written):
+                f.write(text)
+                progress(70 + 30 * written["sites"] / total)
+        os.replace(tmp_path, output_path)
+    stats.update(orphans=written["orphans"], private=written["private"], icons=written["icons"])
+    progress(100)
+    log(f"已写出 {stats['groups']} 个分组、{written['sites']} 个站点到: {os.path.abspath(output_path)}")
+    if stats["orphans"]:
+        log(f"{stats['orphans']} 个站点引用了不存在的分组，已放在所有文件夹之外")
+    return stats
+
+
+def export_digest(paths, temp_dir=None):
+    """导出数据中书签HTML能够表示的内容的摘要，返回 (SHA-256 十六进制串, 分组数, 站点数)
+
+    按输出顺序计入分组名称，以及站点的名称、地址、图标、描述、创建时间和是否公开；
+    ID、order_num 的具体数值和 updated_at(每次转换的时间)不计入。
+    """
+    digest = hashlib.sha256()
+    groups = sites = 0
+    current = False
+    with ExportReader(paths, temp_dir) as export:
+        export.read()
+        for group, site in export.iter_content():
+            if group is not current:
+                digest.update(json.dumps(group and group.get("name"), ensure_ascii=False).encode('utf-8'))
+                groups += group is not None
+                current = group
+            name, url, icon, description, created_at, _, is_public = site
+            if export.icons:
+                icon = resolve_icon(icon, export.icons)
+            digest.update(json.dumps([name, url, icon or "", description or "", created_at, is_public != 0],
+                                     ensure_ascii=False).encode('utf-8'))
+            sites += 1
+    return digest.hexdigest(), groups, sites
+
+
+_LAST_MODIFIED_RE = re.compile(r' LAST_MODIFIED="\d*"')
+
+
+def _same_html(first, second):
+    """逐行比较两个书签HTML；LAST_MODIFIED 来自 updated_at，即每次转换的时间，不参与比较"""
+    with open(first, encoding='utf-8') as a, open(second, encoding='utf-8') as b:
+        for line_a, line_b in zip(a, b):
+            if line_a != line_b and _LAST_MODIFIED_RE.sub('', line_a) != _LAST_MODIFIED_RE.sub('', line_b):
+                return False
+        return a.readline() == b.readline() == ''
+
+
+def _to_json(html_path, json_path):
+    from .engine import build_result
+    from .writer import write_export
+
+    result = build_result(html_path, keep_metadata=True, columnar=True)
+    write_export(result, json_path)
+
+
+def _peak_rss():
+    """当前进程的内存峰值字节数，无法获取时返回 None
+
+    Linux 上读取 VmHWM：ru_maxrss 在 exec 后仍保留 fork 时父进程的峰值，子进程的数值会包含父进程占用的内存。
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+# 在子进程中执行命令行的 to-html，结束后输出内存峰值
+_CHILD_SCRIPT = ("import sys\n"
+                 "from bookmark_converter.cli import main\n"
+                 "from bookmark_converter.htmlexport import _peak_rss\n"
+                 "code = main(sys.argv[1:])\n"
+                 "print(_peak_rss())\n"
+                 "sys.exit(code)\n")
+
+
+def _to_html_process(json_path, html_path, temp_dir):
+    """在子进程中执行 to-html，返回 (耗时, 子进程内存峰值字节数或 None)"""
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", _CHILD_SCRIPT, "to-html", json_path, "-o", html_path,
+                                "--temp-dir", temp_dir, "-q"],
+                               check=True, stdout=subprocess.PIPE, text=True,
+                               cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    seconds = time.perf_counter() - started
+    peak = completed.stdout.strip().splitlines()[-1]
+    return seconds, None if peak == "None" else int(peak)
+
+
+def main(argv=None):
+    from .corpus import parse_count, write_corpus
+
+    parser = argparse.ArgumentParser(prog="bookmark_converter.htmlexport",
+                                     description="书签HTML与导出数据的往返转换检查：HTML -> JSON -> HTML -> JSON")
+    parser.add_argument("--input", help="书签HTML文件(默认生成测试文件)")
+    parser.add_argument("--links", type=parse_count, default=100000, help="生成的链接数(默认 100k)")
+    parser.add_argument("--private-share", type=float, default=0.05, help="生成的私密链接比例(默认 0.05)")
+    parser.add_argument("--memory-budget", type=float, default=64, help="to-html 进程的内存上限，单位 MB(默认 64)")
+    parser.add_argument("--workdir", help="保存中间文件的目录(默认使用临时目录并在结束后删除)")
+    args = parser.parse_args(argv)
+
+    def log(message):
+        print(message, file=sys.stderr)
+
+    with tempfile.TemporaryDirectory(prefix="bookmark-roundtrip-") as tmp:
+        workdir = args.workdir or tmp
+        os.makedirs(workdir, exist_ok=True)
+        source = args.input
+        if not source:
+            source = os.path.join(workdir, "roundtrip-0.html")
+            log(f"生成 {args.links} 个链接的书签文件...")
+            write_corpus(source, args.links, private_share=args.private_share)
+        json1, html1, json2, html2 = (os.path.join(workdir, name) for name in
+                                      ("roundtrip-1.json", "roundtrip-1.html", "roundtrip-2.json", "roundtrip-2.html"))
+
+        log("HTML -> JSON")
+        _to_json(source, json1)
+        log("JSON -> HTML")
+        seconds, peak = _to_html_process(json1, html1, workdir)
+        log("HTML -> JSON")
+        _to_json(html1, json2)
+        log("JSON -> HTML")
+        _, second_peak = _to_html_process(json2, html2, workdir)
+        if peak is not None and second_peak is not None:
+            peak = max(peak, second_peak)
+
+        first, groups, sites = export_digest(json1, workdir)
+        second, *_ = export_digest(json2, workdir)
+        failures = []
+        if first != second:
+            failures.append("两次转换得到的导出数据不一致")
+        if not _same_html(html1, html2):
+            failures.append("两次写出的书签HTML不一致")
+        print(f"{groups} 个分组，{sites} 个站点；to-html 耗时 {seconds:.2f} 秒"
+              f"({sites / seconds:.0f} 个站点/秒，含进程启动)")
+        if peak is not None:
+            print(f"to-html 内存峰值 {peak / 1024 / 1024:.1f} MB，上限 {args.memory_budget:g} MB")
+            if peak > args.memory_budget * 1024 * 1024:
+                failures.append("to-html 内存峰值超出上限")
+    for failure in failures:
+        print(f"- {failure}")
+    if not failures:
+        print("往返转换一致")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,148 @@
+"""内容寻址的图标存储
+
+浏览器导出的书签把图标以 data URI 的形式直接写在 ICON 属性中，同一个网站的图标会重复出现成百上千次。
+IconStore 按内容哈希为每个图标只保存一份，支持三种输出方式：
+
+- inline：站点仍直接写 data URI，但所有相同图标共用同一个字符串对象，只节省内存
+- table：站点写 "icon:<哈希>" 引用，图标数据统一保存在输出 JSON 的 "icons" 表中
+- sidecar：图标解码后写入单独目录，站点写文件的相对路径或 base_url 拼接的地址
+"""
+import base64
+import hashlib
+import os
+from urllib.parse import unquote_to_bytes
+
+ICON_MODES = ('inline', 'table', 'sidecar')
+
+# table 模式下站点图标引用的前缀
+ICON_REF_PREFIX = "icon:"
+
+# 常见图片类型对应的文件扩展名
+_MIME_EXTENSIONS = {
+    "image/png": "png",
+    "image/x-icon": "ico",
+    "image/vnd.microsoft.icon": "ico",
+    "image/jpeg": "jpg",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/svg+xml": "svg",
+    "image/bmp": "bmp",
+}
+
+
+def icon_hash(data_uri):
+    """计算图标的内容哈希"""
+    return hashlib.sha256(data_uri.encode('utf-8')).hexdigest()[:24]
+
+
+def decode_data_uri(data_uri):
+    """解析 data URI，返回 (MIME 类型, 二进制数据)；格式无效时返回 (None, None)"""
+    header, sep, payload = data_uri.partition(',')
+    if not sep or not header.lower().startswith('data:'):
+        return None, None
+    params = header[5:].split(';')
+    mime = params[0].strip().lower() or "text/plain"
+    try:
+        if 'base64' in (p.strip().lower() for p in params[1:]):
+            return mime, base64.b64decode(payload)
+        return mime, unquote_to_bytes(payload)
+    except ValueError:
+        return None, None
+
+
+class IconStore:
+    """按内容去重的图标存储"""
+
+    def __init__(self, mode='inline', directory=None, base_url=None):
+        if mode not in ICON_MODES:
+            raise ValueError(f"未知的图标模式: {mode}")
+        if mode == 'sidecar' and not directory:
+            raise ValueError("sidecar 模式需要指定图标目录")
+        self.mode = mode
+        self.directory = directory
+        self.base_url = base_url
+        self._refs = {}  # data URI -> 站点中使用的值
+        self._table = {}  # 哈希 -> data URI (table 模式)
+        self.total = 0  # 遇到的 data URI 图标数
+        self.original_bytes = 0  # 去重前所有 data URI 的总长度
+        self.stored_bytes = 0  # 去重后实际保存的图标大小
+        self.reference_bytes = 0  # 站点中引用字符串的总长度
+
+    def add(self, icon):
+        """登记一个图标，返回站点中应写入的值
+
+        只处理 data URI；普通图标地址和空值原样返回。
+        """
+        if not icon or not icon.startswith('data:'):
+            return icon
+
+        self.total += 1
+        self.original_bytes += len(icon)
+        ref = self._refs.get(icon)
+        if ref is None:
+            ref = self._store(icon)
+            self._refs[icon] = ref
+        if self.mode != 'inline':
+            self.reference_bytes += len(ref)
+        return ref
+
+    def _store(self, icon):
+        if self.mode == 'inline':
+            self.stored_bytes += len(icon)
+            return icon
+
+        digest = icon_hash(icon)
+        if self.mode == 'table':
+            self._table[digest] = icon
+            self.stored_bytes += len(icon)
+            return ICON_REF_PREFIX + digest
+
+        mime, data = decode_data_uri(icon)
+        if data is None:
+            # 无法解码的图标保持原样
+            self.stored_bytes += len(icon)
+            return icon
+        filename = f"{digest}.{_MIME_EXTENSIONS.get(mime, 'bin')}"
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, filename), 'wb') as f:
+            f.write(data)
+        self.stored_bytes += len(data)
+        if self.base_url:
+            return self.base_url.rstrip('/') + '/' + filename
+        return os.path.basename(os.path.normpath(self.directory)) + '/' + filename
+
+    @property
+    def unique(self):
+        return len(self._refs)
+
+    @property
+    def saved_bytes(self):
+        """去重节省的字节数(inline 模式为内存中节省的字节数)"""
+        return self.original_bytes - self.stored_bytes - self.reference_bytes
+
+    def table(self):
+        """table 模式下的图标表：哈希 -> data URI"""
+        return dict(self._table)
+
+    def summary(self):
+        return (
+            f"图标: 共 {self.total} 个，去重后 {self.unique} 个，"
+            f"原始 {self.original_bytes} 字节，节省 {self.saved_bytes} 字节"
+        )
+
+
+def describe_icon(icon):
+    """图标的简短描述，用于预览：data URI 显示类型、大小和哈希，其他图标显示原值"""
+    if not icon:
+        return ""
+    if icon.startswith('data:'):
+        mime = icon[5:].partition(',')[0].partition(';')[0] or "text/plain"
+        return f"{mime} {len(icon)} 字节 #{icon_hash(icon)[:8]}"
+    return icon
+
+
+def resolve_icon(icon, icons):
+    """将 table 模式的引用还原为 data URI"""
+    if icon and icon.startswith(ICON_REF_PREFIX):
+        return icons.get(icon[len(ICON_REF_PREFIX):], '')
+    return icon
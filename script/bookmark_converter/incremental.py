@@ -0,0 +1,250 @@
+"""增量同步：用清单文件记录上次转换的结果，重新运行时只处理变化的部分
+
+清单文件(默认与输出文件同名，扩展名为 .manifest.json)中保存：
+- 每个文件夹(按完整路径)对应的分组ID
+- 每个站点(文件夹路径 + 规范化URL)对应的站点ID、内容哈希和时间戳
+- 下一个可用的分组ID和站点ID
+
+再次转换新的导出文件时，已有站点沿用原来的ID和创建时间，内容没有变化的站点连更新时间也保持不变；
+只有新增、修改和删除的站点会被记录下来，并可以单独写出一个只包含变化的增量文件用于导入。
+"""
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from .dedup import canonical_url
+from .engine import _link_count, _noop, count_result, iter_source_folders, write_result
+from .metrics import Metrics
+
+MANIFEST_VERSION = 1
+
+
+def manifest_path_for(output_path):
+    """输出文件对应的默认清单文件路径"""
+    return os.path.splitext(output_path)[0] + ".manifest.json"
+
+
+def content_hash(name, url, icon):
+    """站点内容哈希，用于判断站点是否被修改"""
+    data = "\x1f".join((name, url, icon or "")).encode('utf-8')
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def _write_json_atomic(data, path):
+    """先写临时文件再替换，避免中途失败留下损坏的文件"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+class SyncManifest:
+    """上次转换结果的清单"""
+
+    def __init__(self, data=None):
+        data = data or {}
+        self.next_group_id = data.get("next_group_id", 1)
+        self.next_site_id = data.get("next_site_id", 1)
+        self.groups = data.get("groups", {})  # 文件夹路径 -> 分组ID
+        self.sites = data.get("sites", {})  # 站点键 -> [站点ID, 内容哈希, created_at, updated_at]
+
+    @classmethod
+    def load(cls, path):
+        """读取清单文件，文件不存在时返回空清单"""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"不支持的清单版本: {data.get('version')}")
+        return cls(data)
+
+    def save(self, path):
+        _write_json_atomic({
+            "version": MANIFEST_VERSION,
+            "next_group_id": self.next_group_id,
+            "next_site_id": self.next_site_id,
+            "groups": self.groups,
+            "sites": self.sites
+        }, path)
+
+
+def sync_folders(folders, manifest, configs, icon_store=None, log=None, site_index=None):
+    """将文件夹与清单比对，生成完整结果和增量结果
+
+    返回 (result, delta, stats)：result 为完整数据；delta 结构相同，但只包含新增和修改的站点，
+    并在 "removed" 中列出已删除的站点(站点ID、分组ID和规范化URL)。manifest 会被更新为本次的状态。
+    site_index 为 SiteIndex 时与普通转换一样按规范化URL在所有文件夹之间去重，
+    否则只去掉同一文件夹中的重复链接。分组按文件夹在文档中的顺序排列，order_num 连续编号。
+    """
+    log = log or _noop
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    stats = {"added": 0, "changed": 0, "unchanged": 0, "removed": 0}
+
+    old_sites = manifest.sites
+    new_sites = {}
+    new_groups = {}
+    groups = {}  # 文件夹路径 -> 分组；同一路径出现多次时合并为一个分组
+    delta_groups = {}
+    site_keys = {}  # 站点 -> (清单中的键, 新增/修改/未变化)，用于删除被取代的站点
+
+    for position, folder in enumerate(folders):
+        folder_key = folder.get("path", folder["name"])
+        group = groups.get(folder_key)
+        if group is None:
+            group_id = manifest.groups.get(folder_key)
+            if group_id is None:
+                group_id = manifest.next_group_id
+                manifest.next_group_id += 1
+            new_groups[folder_key] = group_id
+            group = groups[folder_key] = {
+                "id": group_id,
+                "name": folder["name"],
+                "order_num": folder.get("order", position),
+                "sites": []
+            }
+        group_id = group["id"]
+
+        for link in folder["links"]:
+            url_key = canonical_url(link.url)
+            key = folder_key + "\t" + url_key
+            if key in new_sites:
+                continue  # 同一文件夹中的重复链接
+
+            icon = icon_store.add(link.icon) if icon_store else link.icon
+            if site_index is not None and site_index.admit(link.url, link.name, icon, current_time,
+                                                           group["order_num"]) is None:
+                continue  # 其他文件夹中已有相同地址的站点
+            digest = content_hash(link.name, link.url, icon)
+            record = old_sites.get(key)
+            if record is None:
+                record = [manifest.next_site_id, digest, current_time, current_time]
+                manifest.next_site_id += 1
+                kind = "added"
+            elif record[1] != digest:
+                record = [record[0], digest, record[2], current_time]
+                kind = "changed"
+            else:
+                kind = "unchanged"
+            stats[kind] += 1
+            changed = kind != "unchanged"
+            new_sites[key] = record
+
+            site = {
+                "id": record[0],
+                "group_id": group_id,
+                "name": link.name,
+                "url": link.url,
+                "icon": icon,
+                "description": "",
+                "notes": "",
+                "order_num": len(group["sites"]),
+                "created_at": record[2],
+                "updated_at": record[3]
+            }
+            group["sites"].append(site)
+            if site_index is not None:
+                site_index.add(url_key, site, group["order_num"])
+                site_keys[id(site)] = (key, kind)
+            if changed:
+                if folder_key not in delta_groups:
+                    delta_groups[folder_key] = dict(group, sites=[])
+                delta_groups[folder_key]["sites"].append(site)
+
+    if site_index is not None:
+        # 删除被文档中更靠前的链接取代的站点
+        displaced = {id(site) for site in site_index.pop_displaced() if id(site) in site_keys}
+        if displaced:
+            for key, kind in (site_keys[site_id] for site_id in displaced):
+                del new_sites[key]
+                stats[kind] -= 1
+            for group in list(groups.values()) + list(delta_groups.values()):
+                group["sites"] = [site for site in group["sites"] if id(site) not in displaced]
+            for group in groups.values():
+                for position, site in enumerate(group["sites"]):
+                    site["order_num"] = position
+
+    removed = []
+    for key, record in old_sites.items():
+        if key not in new_sites:
+            folder_key, _, url_key = key.partition("\t")
+            removed.append({"id": record[0], "group_id": manifest.groups.get(folder_key), "url_key": url_key})
+    stats["removed"] = len(removed)
+
+    manifest.sites = new_sites
+    manifest.groups = new_groups
+
+    # 流式解析时子文件夹先于父文件夹产出，按文件夹在文档中的顺序排列分组
+    ordered = sorted((g for g in groups.values() if g["sites"]), key=lambda g: g["order_num"])
+    for position, group in enumerate(ordered):
+        group["order_num"] = position
+    for folder_key, group in delta_groups.items():
+        group["order_num"] = groups[folder_key]["order_num"]
+    result = {"groups": ordered, "configs": configs}
+    delta = {"groups": sorted((g for g in delta_groups.values() if g["sites"]), key=lambda g: g["order_num"]),
+             "configs": configs, "removed": removed}
+    if icon_store and icon_store.mode == 'table':
+        result["icons"] = icon_store.table()
+        delta["icons"] = icon_store.table()
+
+    log(
+        f"增量同步: 新增 {stats['added']} 个，修改 {stats['changed']} 个，"
+        f"未变化 {stats['unchanged']} 个，删除 {stats['removed']} 个"
+    )
+    return result, delta, stats
+
+
+def sync_file(bookmark_path, output_path, configs, manifest_path=None, delta_path=None, log=None,
+              progress=None, full_path=False, parser='auto', icon_store=None, writer=None, cache=None,
+              input_format='auto', metrics=None, favicons=None, site_index=None):
+    """增量转换书签文件
+
+    读取清单 -> 流式解析并比对 -> 写出完整结果(及增量文件) -> 更新清单。
+    writer(result, path) 用于替换默认的 write_result；cache 为 ParseCache 时优先使用缓存的解析结果。
+    metrics 为 Metrics 时记录 load_manifest、parse、sync、write、save_manifest 和 log 各阶段。
+    favicons 为 favicons.FaviconResolver 时为没有图标的站点获取网站图标；
+    获取到的图标不计入内容哈希，之后的运行从图标缓存中重新填入。
+    site_index 为 SiteIndex 时在所有文件夹之间去重(见 sync_folders)。
+    返回统计信息；未找到书签时返回 None。
+    """
+    if metrics is None:
+        metrics = Metrics()
+    log = metrics.wrap('log', log or _noop)
+    progress = progress or _noop
+    manifest_path = manifest_path or manifest_path_for(output_path)
+
+    with metrics.span('load_manifest'):
+        manifest = SyncManifest.load(manifest_path)
+    log(f"读取清单文件: {manifest_path} (已记录 {len(manifest.sites)} 个站点)")
+
+    metrics.count('parse', bytes=os.path.getsize(bookmark_path))
+    folders = metrics.iter('parse', iter_source_folders(bookmark_path, log, progress, full_path, parser, cache,
+                                                        input_format), _link_count)
+    with metrics.span('sync') as span:
+        result, delta, stats = sync_folders(folders, manifest, configs, icon_store, log, site_index)
+        span.items += stats["added"] + stats["changed"] + stats["unchanged"]
+    if site_index is not None:
+        log(site_index.summary())
+
+    if not result["groups"]:
+        log("警告: 没有找到有效的书签文件夹!")
+        return None
+    if favicons is not None:
+        with metrics.span('favicons') as span:
+            span.items += favicons.fill_missing(result, log)
+
+    log(f"正在保存结果到: {output_path}")
+    with metrics.span('write', count_result(result)[1]):
+        if writer is None:
+            write_result(result, output_path, progress=lambda percent: progress(70 + 0.3 * percent))
+        else:
+            progress(90)
+            writer(result, output_path)
+        if delta_path:
+            log(f"正在保存增量文件到: {delta_path}")
+            (writer or write_result)(delta, delta_path)
+    with metrics.span('save_manifest'):
+        manifest.save(manifest_path)
+    progress(100)
+    return stats
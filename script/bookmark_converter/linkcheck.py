@@ -0,0 +1,391 @@
+"""导入前检查站点链接是否有效
+
+旧的书签导出中有大量已经失效的链接。LinkChecker 并发检查结果中所有站点的地址：
+
+1. 先发送 HEAD 请求并手动跟随重定向，记录最终地址以及是否全部为永久重定向(301/308)
+2. HEAD 返回错误状态或不支持 HEAD 时改用 GET 重新检查(部分服务器对 HEAD 返回 405 或 404)
+
+每个地址的检查结果分为三种：
+- ok：最终状态码小于 400，或为 401/403/407/429(页面存在但需要登录或被限流)
+- dead：其他 4xx 状态码，或 DNS 明确答复域名不存在(EAI_NONAME)
+- error：超时、连接失败、5xx、DNS 暂时不可用(EAI_AGAIN 等)等无法确定的情况，不会被当作失效链接处理
+
+本次检查的地址分布在多个主机上却都无法解析域名时，通常是没有联网或 DNS 不可用，而不是这些网站都已失效，
+这些结果改记为 error(不会作为失效链接缓存)，apply 也不会移动或删除任何站点。
+因此域名不存在的结果要等所有地址检查完、排除了这种情况之后才写入缓存。
+
+网络请求使用 favicons 模块的 HttpClient(复用保持连接)。全局并发数和每个主机的并发数分别限制，
+同一主机相邻两个请求的开始时间至少间隔 delay 秒，避免对同一个网站造成压力。
+
+结果保存在 LinkCache(JSON 文件)中，检查过程中每完成 SAVE_INTERVAL 个地址保存一次，
+中断后重新运行会跳过已经检查过的地址。ok 和 dead 的结果在 ttl 内有效，error 只在 error_ttl 内有效。
+
+apply 按检查结果处理站点：
+- report：只输出统计
+- notes：在站点的备注中记录检查结果
+- move：把失效站点移到单独的分组(默认为"失效链接")
+- drop：删除失效站点
+redirects 为 permanent 时把永久重定向的站点地址改为最终地址，为 all 时临时重定向也改写。
+"""
+import asyncio
+import json
+import os
+import socket
+import ssl
+import time
+from urllib.parse import urljoin, urlsplit
+
+from .engine import _noop
+from .favicons import _DEFAULT_PORTS, _REDIRECT_STATUSES, MAX_REDIRECTS, HttpClient, HttpError
+from .incremental import _write_json_atomic
+
+LINK_CACHE_VERSION = 1
+
+LINK_ACTIONS = ('report', 'notes', 'move', 'drop')
+REDIRECT_POLICIES = ('keep', 'permanent', 'all')
+DEAD_GROUP_NAME = "失效链接"
+
+DEFAULT_CONCURRENCY = 32
+DEFAULT_PER_HOST = 2
+DEFAULT_DELAY = 0.2
+DEFAULT_TIMEOUT = 10
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_ERROR_TTL = 24 * 3600
+
+# GET 检查时最多读取的字节数；较小的错误页面可以完整读取，连接仍能复用
+MAX_GET_BYTES = 16 * 1024
+# 空闲连接数上限；链接分散在很多主机上，保留较多的空闲连接才能在同一主机的下一个请求时复用
+MAX_IDLE_CONNECTIONS = 256
+# 每检查多少个地址保存一次缓存并输出进度
+SAVE_INTERVAL = 1000
+
+# 这些状态码说明页面存在，只是不允许匿名访问
+_ALIVE_STATUSES = (401, 403, 407, 429)
+_PERMANENT_REDIRECTS = (301, 308)
+
+# DNS 明确答复域名不存在的错误码，其他解析错误(EAI_AGAIN、EAI_FAIL 等)不能说明域名无效
+_NXDOMAIN_ERRORS = tuple(getattr(socket, name) for name in ('EAI_NONAME', 'EAI_NODATA') if hasattr(socket, name))
+_NXDOMAIN_REASON = "域名无法解析"
+_RESOLVE_ERROR_REASON = "DNS 解析失败"
+
+
+def link_cache_path_for(output_path):
+    """输出文件对应的默认链接检查缓存文件路径"""
+    return os.path.splitext(output_path)[0] + ".links.json"
+
+
+def classify(status):
+    """状态码对应的检查结果：ok、dead 或 error"""
+    if status < 400 or status in _ALIVE_STATUSES:
+        return 'ok'
+    if status < 500:
+        return 'dead'
+    return 'error'
+
+
+def describe(entry):
+    """检查结果的简短说明，用于日志和站点备注"""
+    state, status, final_url, permanent, reason = entry[:5]
+    text = {"ok": "有效", "dead": "失效", "error": "检查失败"}[state]
+    if status:
+        text += f" (HTTP {status})"
+    if reason:
+        text += f" ({reason})"
+    if final_url:
+        text += f"，{'永久' if permanent else '临时'}重定向到 {final_url}"
+    return text
+
+
+class LinkCache:
+    """地址 -> 检查结果的持久缓存
+
+    文件内容为 {"version", "urls": {地址: [结果, 状态码, 重定向后的地址, 是否永久重定向, 原因, 检查时间]}}，
+    状态码在请求失败时为 null，没有重定向时地址为 null。
+    """
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL, error_ttl=DEFAULT_ERROR_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.entries = {}
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != LINK_CACHE_VERSION:
+                raise ValueError(f"不支持的链接缓存版本: {data.get('version')}")
+            self.entries = data.get("urls", {})
+
+    def _expired(self, entry, now):
+        return now - entry[5] > (self.error_ttl if entry[0] == 'error' else self.ttl)
+
+    def get(self, url, now=None):
+        """返回检查结果(不含检查时间)，没有记录或已过期时返回 None"""
+        entry = self.entries.get(url)
+        if entry is None or self._expired(entry, now if now is not None else time.time()):
+            return None
+        return entry[:5]
+
+    def put(self, url, entry, now=None):
+        self.entries[url] = list(entry) + [int(now if now is not None else time.time())]
+
+    def save(self):
+        """写回缓存文件，同时删除已经过期的记录"""
+        if not self.path:
+            return
+        now = time.time()
+        urls = {url: entry for url, entry in self.entries.items() if not self._expired(entry, now)}
+        _write_json_atomic({"version": LINK_CACHE_VERSION, "urls": urls}, self.path)
+
+
+def _checkable(url):
+    try:
+        parts = urlsplit(url)
+        return parts.scheme.lower() in _DEFAULT_PORTS and bool(parts.hostname)
+    except ValueError:
+        return False
+
+
+class LinkChecker:
+    """并发检查地址是否有效，结果保存在 LinkCache 中"""
+
+    def __init__(self, cache=None, action='report', redirects='keep', group_name=DEAD_GROUP_NAME,
+                 concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST, delay=DEFAULT_DELAY,
+                 timeout=DEFAULT_TIMEOUT, connect_to=None, log=None, progress=None):
+        if action not in LINK_ACTIONS:
+            raise ValueError(f"未知的处理方式: {action}")
+        if redirects not in REDIRECT_POLICIES:
+            raise ValueError(f"未知的重定向处理方式: {redirects}")
+        self.cache = cache if cache is not None else LinkCache()
+        self.action = action
+        self.redirects = redirects
+        self.group_name = group_name
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.delay = delay
+        self.timeout = timeout
+        self.connect_to = connect_to
+        self.log = log or _noop
+        self.progress = progress or _noop
+        self.stats = {"urls": 0, "cached": 0, "checked": 0, "skipped": 0, "ok": 0, "dead": 0, "error": 0,
+                      "redirected": 0, "requests": 0, "connections": 0}
+        self.resolver_failed = False  # 本次检查的地址全部无法解析域名
+
+    def check(self, urls):
+        """检查各个地址，返回 {地址: 检查结果}；已缓存的地址不发送请求，不是 http/https 的地址不检查"""
+        self.resolver_failed = False
+        results = {}
+        pending = []
+        now = time.time()
+        for url in dict.fromkeys(urls):
+            if not _checkable(url):
+                self.stats["skipped"] += 1
+                continue
+            entry = self.cache.get(url, now)
+            if entry is not None:
+                results[url] = entry
+            else:
+                pending.append(url)
+        self.stats["urls"] += len(results) + len(pending)
+        self.stats["cached"] += len(results)
+        for entry in results.values():
+            self._count(entry)
+        if pending:
+            self.log(f"检查 {len(pending)} 个链接(已缓存 {len(results)} 个)...")
+            try:
+                asyncio.run(self._check_all(pending, results))
+                self._check_resolver(pending, results)
+            finally:
+                self.cache.save()
+        return results
+
+    def _check_resolver(self, urls, results):
+        """本次检查的地址分布在多个主机上并且全部无法解析域名时不认为它们失效，改记为检查失败
+
+        域名不存在的结果在这里确认之后才写入缓存。
+        """
+        # 只有一个主机时无法区分 DNS 故障和域名确实不存在
+        if len({urlsplit(url).hostname for url in urls}) < 2 or \
+                not all(results[url][4] in (_NXDOMAIN_REASON, _RESOLVE_ERROR_REASON) for url in urls):
+            for url in urls:
+                if results[url][4] == _NXDOMAIN_REASON:
+                    self.cache.put(url, results[url])
+            return
+        self.resolver_failed = True
+        self.log(f"所有 {len(urls)} 个链接都无法解析域名，可能没有联网或 DNS 不可用，不把它们当作失效链接")
+        for url in urls:
+            if results[url][0] == 'dead':
+                self.stats["dead"] -= 1
+                self.stats["error"] += 1
+            results[url] = ['error', None, None, False, _RESOLVE_ERROR_REASON]
+            self.cache.put(url, results[url])
+
+    def _count(self, entry):
+        self.stats[entry[0]] += 1
+        if entry[2]:
+            self.stats["redirected"] += 1
+
+    async def _check_all(self, urls, results):
+        client = HttpClient(self.timeout, self.connect_to, max(self.concurrency, MAX_IDLE_CONNECTIONS))
+        limit = asyncio.Semaphore(self.concurrency)
+        host_limits = {}
+        host_next = {}  # 主机 -> 下一个请求最早的开始时间
+        done = 0
+
+        async def polite(host):
+            # 同一主机的请求按 delay 间隔依次排队
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            start = max(now, host_next.get(host, now))
+            host_next[host] = start + self.delay
+            if start > now:
+                await asyncio.sleep(start - now)
+
+        async def check_one(url):
+            nonlocal done
+            host = urlsplit(url).hostname
+            host_limit = host_limits.setdefault(host, asyncio.Semaphore(self.per_host))
+            # 先等待主机的名额再占用全局名额，同一主机排队的请求不会占满全局并发
+            async with host_limit, limit:
+                entry = await self._check_url(client, url, polite)
+            results[url] = entry
+            if entry[4] != _NXDOMAIN_REASON:
+                self.cache.put(url, entry)  # 域名不存在的结果由 _check_resolver 写入
+            self._count(entry)
+            self.stats["checked"] += 1
+            done += 1
+            self.progress(100 * done / len(urls))
+            if done % SAVE_INTERVAL == 0:
+                self.cache.save()  # 中断后重新运行时从这里继续
+                self.log(f"已检查 {done}/{len(urls)} 个链接")
+
+        try:
+            await asyncio.gather(*(check_one(url) for url in urls))
+        finally:
+            client.close()
+            self.stats["requests"] += client.stats["requests"]
+            self.stats["connections"] += client.stats["connections"]
+
+    async def _check_url(self, client, url, polite):
+        """返回 [结果, 状态码, 重定向后的地址, 是否永久重定向, 原因]"""
+        try:
+            status, final_url, permanent = await self._follow(client, 'HEAD', url, polite)
+            if status >= 400:
+                status, final_url, permanent = await self._follow(client, 'GET', url, polite)
+        except HttpError as e:
+            # 部分服务器对 HEAD 的响应不规范，用 GET 再试一次
+            try:
+                status, final_url, permanent = await self._follow(client, 'GET', url, polite)
+            except (OSError, asyncio.TimeoutError, HttpError, ssl.SSLError, UnicodeError, ValueError) as e:
+                return self._failure(e)
+        except (OSError, asyncio.TimeoutError, ssl.SSLError, UnicodeError, ValueError) as e:
+            return self._failure(e)
+        if final_url == url:
+            final_url, permanent = None, False
+        return [classify(status), status, final_url, permanent if final_url else False, None]
+
+    @staticmethod
+    def _failure(error):
+        if isinstance(error, socket.gaierror):
+            if error.errno in _NXDOMAIN_ERRORS:
+                return ['dead', None, None, False, _NXDOMAIN_REASON]
+            return ['error', None, None, False, _RESOLVE_ERROR_REASON]
+        if isinstance(error, asyncio.TimeoutError):
+            return ['error', None, None, False, "超时"]
+        return ['error', None, None, False, str(error) or type(error).__name__]
+
+    @staticmethod
+    async def _follow(client, method, url, polite):
+        """发送请求并跟随重定向，返回 (最终状态码, 最终地址, 是否全部为永久重定向)"""
+        permanent = True
+        for _ in range(MAX_REDIRECTS + 1):
+            await polite(urlsplit(url).hostname)
+            response = await client.request(method, url, MAX_GET_BYTES)
+            location = response.headers.get('location')
+            if response.status not in _REDIRECT_STATUSES or not location:
+                return response.status, url, permanent
+            target = urljoin(url, location)
+            if not _checkable(target):
+                return response.status, url, permanent
+            permanent = permanent and response.status in _PERMANENT_REDIRECTS
+            url = target
+        raise HttpError("重定向次数过多")
+
+    def apply(self, result, log=None):
+        """检查结果中所有站点的地址并按 action 处理，返回受影响(改写、移动、删除或添加备注)的站点数"""
+        log = log or self.log
+        action, redirects, group_name = self.action, self.redirects, self.group_name
+        groups = result.get("groups", [])
+        entries = self.check(site.get("url") or "" for group in groups for site in group.get("sites", ()))
+        if self.resolver_failed and action in ('move', 'drop'):
+            log("无法解析任何域名，本次不移动或删除站点")
+            action = 'report'
+
+        affected = rewritten = dropped = 0
+        dead_sites = []
+        emptied = set()
+        for group in groups:
+            kept = []
+            removed = False
+            for site in group.get("sites", ()):
+                entry = entries.get(site.get("url") or "")
+                if entry is None:
+                    kept.append(site)
+                    continue
+                state, _, final_url, permanent = entry[:4]
+                changed = False
+                if final_url and (redirects == 'all' or (redirects == 'permanent' and permanent)):
+                    site["url"] = final_url
+                    rewritten += 1
+                    changed = True
+                if action == 'notes' and state != 'ok':
+                    site["notes"] = "链接检查: " + describe(entry)
+                    changed = True
+                if state == 'dead' and action in ('move', 'drop'):
+                    if action == 'move':
+                        dead_sites.append(dict(site))
+                    else:
+                        dropped += 1
+                    removed = changed = True
+                else:
+                    kept.append(site)
+                affected += changed
+            if removed:
+                # 按列存储的分组不能删除行，转换为普通的站点列表
+                group["sites"] = [dict(site) for site in kept]
+                if not kept:
+                    emptied.add(id(group))
+        if emptied:
+            groups[:] = [g for g in groups if id(g) not in emptied]
+
+        if dead_sites:
+            group = next((g for g in groups if g.get("name") == group_name and isinstance(g.get("sites"), list)),
+                         None)
+            if group is None:
+                group = {
+                    "id": max((g["id"] for g in groups), default=0) + 1,
+                    "name": group_name,
+                    "order_num": max((g["order_num"] for g in groups), default=-1) + 1,
+                    "sites": []
+                }
+                groups.append(group)
+            for site in dead_sites:
+                site["group_id"] = group["id"]
+                site["order_num"] = len(group["sites"])
+                group["sites"].append(site)
+
+        log(self.summary())
+        if rewritten:
+            log(f"{rewritten} 个站点的地址改为重定向后的地址")
+        if dead_sites:
+            log(f"{len(dead_sites)} 个失效站点移到了分组 '{group_name}'")
+        if dropped:
+            log(f"删除了 {dropped} 个失效站点")
+        return affected
+
+    def summary(self):
+        s = self.stats
+        return (
+            f"链接检查: {s['urls']} 个链接，缓存命中 {s['cached']} 个，检查 {s['checked']} 个"
+            f"(有效 {s['ok']} 个，失效 {s['dead']} 个，检查失败 {s['error']} 个，重定向 {s['redirected']} 个)，"
+            f"跳过非 http 链接 {s['skipped']} 个，共 {s['requests']} 个请求，{s['connections']} 个连接"
+        )
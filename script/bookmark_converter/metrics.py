@@ -0,0 +1,238 @@
+"""转换流程的计时和统计
+
+Metrics 按名称记录各个阶段(span)的耗时、调用次数和处理的条目数，同名阶段多次进入时累加：
+
+- 解析是流式的，与转换交替进行。iter() 只统计在迭代器内部花费的时间，
+  外层阶段的"自身耗时"扣除了其中嵌套的阶段，因此解析和转换的时间可以分开看
+- trace_memory 为 True 时用 tracemalloc 记录每个阶段新增内存的峰值和结束时的净增量(会明显变慢)
+- profile 中列出的阶段(或 'all')用 cProfile 采样，结果中保留累计耗时最多的函数
+
+Metrics 只在一个线程中使用；GUI 的工作线程和命令行各自创建自己的实例。
+"""
+import json
+import time
+from contextlib import contextmanager
+
+METRICS_VERSION = 1
+
+# 每个阶段的 cProfile 结果保留的函数数
+PROFILE_TOP = 20
+
+
+class Span:
+    """一个阶段的统计"""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0
+        self.child_seconds = 0.0
+        self.items = 0
+        self.bytes = 0
+        self.peak_bytes = None
+        self.delta_bytes = None
+        self.profiler = None
+
+    @property
+    def self_seconds(self):
+        return max(0.0, self.seconds - self.child_seconds)
+
+    def to_dict(self):
+        data = {
+            "name": self.name,
+            "calls": self.calls,
+            "seconds": round(self.seconds, 6),
+            "self_seconds": round(self.self_seconds, 6),
+            "items": self.items,
+            "items_per_second": round(self.items / self.seconds) if self.items and self.seconds else None,
+        }
+        if self.bytes:
+            data["bytes"] = self.bytes
+        if self.peak_bytes is not None:
+            data["peak_bytes"] = self.peak_bytes
+            data["delta_bytes"] = self.delta_bytes
+        if self.profiler is not None:
+            data["profile"] = profile_entries(self.profiler)
+        return data
+
+
+class _Frame:
+    """正在进行的一次阶段调用"""
+
+    def __init__(self, span, started, memory_start):
+        self.span = span
+        self.started = started
+        self.memory_start = memory_start
+        self.peak_seen = 0  # 嵌套阶段中观察到的内存峰值
+        self.profiling = False
+
+
+class Metrics:
+    """按阶段统计耗时、条目数和内存"""
+
+    def __init__(self, trace_memory=False, profile=()):
+        self.trace_memory = trace_memory
+        self.profile = set(profile or ())
+        self.spans = {}
+        self.started = time.perf_counter()
+        self._stack = []
+        self._profiling = False
+        self._owns_tracemalloc = False
+        self._tracemalloc = None
+        if trace_memory:
+            import tracemalloc  # 只有记录内存时才导入
+
+            self._tracemalloc = tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._owns_tracemalloc = True
+
+    def close(self):
+        """停止由本实例启动的 tracemalloc"""
+        if self._owns_tracemalloc:
+            self._tracemalloc.stop()
+            self._owns_tracemalloc = False
+
+    def get(self, name):
+        span = self.spans.get(name)
+        if span is None:
+            span = self.spans[name] = Span(name)
+        return span
+
+    def count(self, name, items=0, bytes=0):
+        """为阶段累加处理的条目数和字节数"""
+        span = self.get(name)
+        span.items += items
+        span.bytes += bytes
+
+    @contextmanager
+    def span(self, name, items=0):
+        """统计 with 块的耗时；嵌套时外层阶段的自身耗时会扣除内层"""
+        span = self.get(name)
+        frame = self._enter(span)
+        try:
+            yield span
+        finally:
+            self._exit(frame)
+            span.items += items
+
+    def iter(self, name, iterable, count=None):
+        """包装迭代器：只统计取下一个元素花费的时间，count(元素) 为每个元素计入的条目数"""
+        iterator = iter(iterable)
+        span = self.get(name)
+        while True:
+            frame = self._enter(span)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self._exit(frame)
+            span.items += count(item) if count else 1
+            yield item
+
+    def wrap(self, name, callback):
+        """包装回调函数(如 log)，统计调用次数和耗时"""
+        def wrapped(*args, **kwargs):
+            with self.span(name, 1):
+                return callback(*args, **kwargs)
+        return wrapped
+
+    def _enter(self, span):
+        memory_start = None
+        if self.trace_memory:
+            current, peak = self._tracemalloc.get_traced_memory()
+            if self._stack:
+                parent = self._stack[-1]
+                parent.peak_seen = max(parent.peak_seen, peak)
+            self._tracemalloc.reset_peak()
+            memory_start = current
+        frame = _Frame(span, time.perf_counter(), memory_start)
+        if not self._profiling and ('all' in self.profile or span.name in self.profile):
+            if span.profiler is None:
+                import cProfile  # 只有需要采样时才导入
+
+                span.profiler = cProfile.Profile()
+            span.profiler.enable()
+            frame.profiling = self._profiling = True
+        self._stack.append(frame)
+        span.calls += 1
+        return frame
+
+    def _exit(self, frame):
+        span = frame.span
+        if frame.profiling:
+            span.profiler.disable()
+            self._profiling = False
+        elapsed = time.perf_counter() - frame.started
+        self._stack.pop()
+        span.seconds += elapsed
+        parent = self._stack[-1] if self._stack else None
+        if parent is not None and parent.span is not span:
+            parent.span.child_seconds += elapsed
+        if frame.memory_start is not None:
+            current, peak = self._tracemalloc.get_traced_memory()
+            peak = max(peak, frame.peak_seen)
+            span.peak_bytes = max(span.peak_bytes or 0, peak - frame.memory_start)
+            span.delta_bytes = (span.delta_bytes or 0) + current - frame.memory_start
+            if parent is not None:
+                parent.peak_seen = max(parent.peak_seen, peak)
+
+    def to_dict(self):
+        return {
+            "version": METRICS_VERSION,
+            "total_seconds": round(time.perf_counter() - self.started, 6),
+            "trace_memory": self.trace_memory,
+            "spans": [span.to_dict() for span in self.spans.values()],
+        }
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    def summary(self):
+        """各阶段的统计表格"""
+        lines = [f"{'阶段':<10}{'耗时(秒)':>10}{'自身(秒)':>10}{'次数':>8}{'条目':>10}{'条目/秒':>10}"
+                 + (f"{'内存峰值':>12}{'内存增量':>12}" if self.trace_memory else "")]
+        for span in self.spans.values():
+            data = span.to_dict()
+            rate = data["items_per_second"]
+            line = (f"{span.name:<10}{span.seconds:>10.3f}{span.self_seconds:>10.3f}{span.calls:>8}"
+                    f"{span.items:>10}{rate if rate is not None else '-':>10}")
+            if self.trace_memory:
+                line += f"{_mb(span.peak_bytes):>12}{_mb(span.delta_bytes):>12}"
+            lines.append(line)
+        lines.append(f"总耗时 {time.perf_counter() - self.started:.3f} 秒")
+        return "\n".join(lines)
+
+    def profile_summary(self, limit=10):
+        """各个采样阶段中累计耗时最多的函数"""
+        lines = []
+        for span in self.spans.values():
+            if span.profiler is None:
+                continue
+            lines.append(f"[{span.name}] 累计耗时最多的函数:")
+            for entry in profile_entries(span.profiler, limit):
+                lines.append(f"  {entry['cumulative_seconds']:>8.3f}s {entry['calls']:>9} 次  {entry['function']}")
+        return "\n".join(lines)
+
+
+def profile_entries(profiler, limit=PROFILE_TOP):
+    """cProfile 结果中按累计耗时排序的前 limit 个函数"""
+    import pstats
+
+    stats = pstats.Stats(profiler).stats
+    entries = []
+    for (filename, line, function), (_, calls, total, cumulative, _) in stats.items():
+        entries.append({
+            "function": f"{function} ({filename}:{line})",
+            "calls": calls,
+            "total_seconds": round(total, 6),
+            "cumulative_seconds": round(cumulative, 6),
+        })
+    entries.sort(key=lambda e: e["cumulative_seconds"], reverse=True)
+    return entries[:limit]
+
+
+def _mb(value):
+    return "-" if value is None else f"{value / 1024 / 1024:.1f} MB"
@@ -0,0 +1,250 @@
+"""转换结果中新建站点的紧凑内存表示
+
+convert_to_json_format(columnar=True) 为每个链接新建的站点不再是十个键的字典，而是按列保存在 SiteTable 中
+(convert_file、命令行和图形界面内部都使用这种表示，默认返回给调用者的结果仍是普通的列表和字典)：
+
+- 每个站点只占名称、地址、图标三列中的三个指针，字符串直接沿用解析出的链接中的对象，
+  图标由 IconStore 去重后共用同一个字符串
+- 站点ID、所属分组ID、组内序号都可以由分组的起始ID和行号推算，
+  创建/更新时间、描述、备注整个表共用一个值，都不单独保存；
+  被修改过的站点(如 update 去重策略、保留书签自带的添加时间)只把改动的字段单独保存在 changes 中
+- 分组的 "sites" 是 GroupSites：指向表中一段连续行的只读序列，
+  按下标或迭代取出的是 SiteRecord，行为与站点字典相同(可以读取、修改字段，可以用 dict() 转换)
+
+写出时 iter_sites_json 直接从列中拼出 JSON 文本，不构造中间的字典；
+不认识这些类型的 JSON 编码器可以用 to_plain 作为 default 参数。
+"""
+import json
+from collections.abc import Mapping, Sequence
+
+# 站点记录的字段，顺序与输出的JSON一致
+SITE_KEYS = ("id", "group_id", "name", "url", "icon", "description", "notes", "order_num",
+             "created_at", "updated_at")
+
+# 只在站点被设置过时才出现的字段(如 keep_metadata 时的私密书签)
+OPTIONAL_SITE_KEYS = ("is_public",)
+
+# iter_sites_json 每次产出的站点数
+JSON_BLOCK_SITES = 1000
+
+_encode_string = json.encoder.encode_basestring
+
+
+class SiteTable:
+    """按列保存的新建站点
+
+    first_id 为第一行的站点ID，之后每行依次加一；timestamp 为所有站点的创建和更新时间。
+    分组按文档顺序重新排列后，可以用 GroupSites.renumber 给每个分组重新分配连续的站点ID。
+    """
+
+    def __init__(self, first_id, timestamp):
+        self.first_id = first_id
+        self.timestamp = timestamp
+        self.names = []
+        self.urls = []
+        self.icons = []
+        self.changes = {}  # 行号 -> {字段: 值}，站点被修改(如 update 去重策略)后的字段
+
+    def __len__(self):
+        return len(self.names)
+
+    def group(self, group_id):
+        """为新分组开始一段行，之后用返回的 GroupSites.append 添加站点"""
+        return GroupSites(self, group_id, len(self.names))
+
+    def remove_rows(self, rows, groups):
+        """删除 rows 中的行，groups 为表中所有分组的 GroupSites，各分组的行随之前移
+
+        返回 {旧行号: 新行号}，用于更新仍然指向表中的 SiteRecord。
+        """
+        mapping = {}
+        names, urls, icons, changes = [], [], [], {}
+        for sites in sorted(groups, key=lambda s: s.start):
+            start = len(names)
+            for row in range(sites.start, sites.stop):
+                if row in rows:
+                    continue
+                mapping[row] = len(names)
+                if row in self.changes:
+                    changes[len(names)] = self.changes[row]
+                names.append(self.names[row])
+                urls.append(self.urls[row])
+                icons.append(self.icons[row])
+            sites.start, sites.stop = start, len(names)
+        self.names, self.urls, self.icons, self.changes = names, urls, icons, changes
+        return mapping
+
+
+class GroupSites(Sequence):
+    """一个分组的站点：SiteTable 中从 start 开始的连续行，站点ID从 first_id 开始"""
+
+    __slots__ = ('table', 'group_id', 'start', 'stop', 'first_id')
+
+    def __init__(self, table, group_id, start):
+        self.table = table
+        self.group_id = group_id
+        self.start = start
+        self.stop = start
+        self.first_id = table.first_id + start
+
+    def renumber(self, group_id, first_id):
+        """改变所属分组ID和第一个站点的ID，返回下一个可用的站点ID"""
+        self.group_id = group_id
+        self.first_id = first_id
+        return first_id + len(self)
+
+    def append(self, name, url, icon):
+        """在表末尾添加一个站点，返回其记录；只能向最后开始的分组添加"""
+        table = self.table
+        if self.stop != len(table.names):
+            raise ValueError("只能向表中最后一个分组添加站点")
+        table.names.append(name)
+        table.urls.append(url)
+        table.icons.append(icon)
+        self.stop += 1
+        return SiteRecord(self, self.stop - 1)
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("站点下标超出范围")
+        return SiteRecord(self, self.start + index)
+
+    def __iter__(self):
+        for row in range(self.start, self.stop):
+            yield SiteRecord(self, row)
+
+    def value(self, row, key):
+        """第 row 行的字段值"""
+        table = self.table
+        changes = table.changes.get(row)
+        if changes and key in changes:
+            return changes[key]
+        if key == "name":
+            return table.names[row]
+        if key == "url":
+            return table.urls[row]
+        if key == "icon":
+            return table.icons[row]
+        if key == "id":
+            return self.first_id + row - self.start
+        if key == "group_id":
+            return self.group_id
+        if key == "order_num":
+            return row - self.start
+        if key in ("created_at", "updated_at"):
+            return table.timestamp
+        if key in ("description", "notes"):
+            return ""
+        raise KeyError(key)
+
+
+class SiteRecord(Mapping):
+    """SiteTable 中一行的字典视图；修改字段会写回表中"""
+
+    __slots__ = ('sites', 'row')
+
+    def __init__(self, sites, row):
+        self.sites = sites
+        self.row = row
+
+    def __getitem__(self, key):
+        return self.sites.value(self.row, key)
+
+    def __setitem__(self, key, value):
+        if key not in SITE_KEYS and key not in OPTIONAL_SITE_KEYS:
+            raise KeyError(key)
+        table = self.sites.table
+        if key == "name":
+            table.names[self.row] = value
+        elif key == "url":
+            table.urls[self.row] = value
+        elif key == "icon":
+            table.icons[self.row] = value
+        else:
+            table.changes.setdefault(self.row, {})[key] = value
+
+    def _optional_keys(self):
+        changes = self.sites.table.changes.get(self.row)
+        return [key for key in OPTIONAL_SITE_KEYS if key in changes] if changes else []
+
+    def __iter__(self):
+        yield from SITE_KEYS
+        yield from self._optional_keys()
+
+    def __len__(self):
+        return len(SITE_KEYS) + len(self._optional_keys())
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+def to_plain(value):
+    """json 编码器的 default 参数：把 GroupSites、SiteRecord 转换为列表和字典"""
+    if isinstance(value, GroupSites):
+        return [dict(site) for site in value]
+    if isinstance(value, SiteRecord):
+        return dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def iter_sites_json(sites, level, compact, dumps):
+    """把分组的站点编码为 JSON 数组，产出 (文本块, 其中的站点数)
+
+    拼接后与 dumps([dict(site) for site in sites]) 缩进到 level 层的结果相同。
+    dumps 为与 compact 配合的 json.dumps，只用于被修改过的站点。
+    """
+    if not len(sites):
+        yield '[]', 0
+        return
+    table = sites.table
+    if compact:
+        item_start, key_start, item_end, key_sep, array_end = '', '', '', ':', ''
+    else:
+        item_start = '\n' + '  ' * (level + 1)
+        key_start = item_start + '  '
+        item_end = item_start
+        key_sep = ': '
+        array_end = '\n' + '  ' * level
+
+    def prefix(key, first=False):
+        return ('' if first else ',') + key_start + '"' + key + '"' + key_sep
+
+    # 所有站点相同的部分只编码一次
+    id_prefix = '{' + prefix("id", True)
+    name_prefix = prefix("group_id") + str(sites.group_id) + prefix("name")
+    url_prefix = prefix("url")
+    icon_prefix = prefix("icon")
+    order_prefix = prefix("description") + '""' + prefix("notes") + '""' + prefix("order_num")
+    timestamp = _encode_string(table.timestamp)
+    tail = prefix("created_at") + timestamp + prefix("updated_at") + timestamp + item_end + '}'
+    names, urls, icons, changes = table.names, table.urls, table.icons, table.changes
+    icon_cache = {}
+
+    block = ['[']
+    count = 0
+    for index, row in enumerate(range(sites.start, sites.stop)):
+        separator = (',' if index else '') + item_start
+        if row in changes:
+            text = dumps(dict(SiteRecord(sites, row)))
+            block.append(separator + (text if compact else text.replace('\n', item_start)))
+        else:
+            icon = icons[row]
+            encoded_icon = icon_cache.get(icon)
+            if encoded_icon is None:
+                encoded_icon = icon_cache[icon] = _encode_string(icon)
+            block.append(separator + id_prefix + str(sites.first_id + index) + name_prefix
+                         + _encode_string(names[row]) + url_prefix + _encode_string(urls[row])
+                         + icon_prefix + encoded_icon + order_prefix + str(index) + tail)
+        count += 1
+        if count == JSON_BLOCK_SITES:
+            yield ''.join(block), count
+            block, count = [], 0
+    block.append(array_end + ']')
+    yield ''.join(block), count
@@ -0,0 +1,317 @@
+"""近似重复书签的检测与合并
+
+dedup 模块只能识别规范化后完全相同的地址。同一页面常常以略有不同的地址和标题被收藏在不同文件夹中：
+镜像域名(foo.com / foo.org)、移动版主机(m.foo.com)、"Docs – Foo" 与 "Foo Documentation" 等。
+
+NearDuplicateFinder 为每个站点提取特征集合，用 MinHash 估计特征集合的 Jaccard 相似度：
+- 标题：小写的单词(常见的同义词归一，如 docs/documentation)，中日文按相邻两个字切分
+- 主机：去掉 www.、m. 等前缀和顶级域名后的部分，镜像域名和移动版主机得到相同的特征
+- 路径：各段(去掉 .html 等扩展名和 index)及相邻两段的组合，以及查询参数
+
+两两比较需要 O(n²) 次，10 万个链接就无法接受。这里用局部敏感哈希(LSH)找候选：
+签名被切成 bands 段，任意一段完全相同的站点才成为候选，再用签名估计相似度确认。
+每一段单独处理(建立该段的桶后立即丢弃)，同一个桶中每个站点最多与之前的 MAX_BUCKET_COMPARISONS 个站点比较，
+相似度达到阈值的站点用并查集合并为一组，总耗时与链接数大致成线性关系。
+
+action 为 report 时只输出找到的近似重复组；为 merge 时每组只保留最先出现的站点
+(现有JSON中的站点总是排在新站点之前)，保留的站点没有图标时使用被合并站点的图标。
+"""
+import hashlib
+import json
+import re
+import unicodedata
+
+from .dedup import TRACKING_PARAMS, TRACKING_PREFIXES
+from .engine import _noop
+from .model import GroupSites
+
+NEAR_DUP_ACTIONS = ('report', 'merge')
+NEAR_DUP_REPORT_VERSION = 1
+
+DEFAULT_THRESHOLD = 0.8
+# MinHash 签名的长度；越长估计越准确，每个站点占用 4 * NUM_PERM 字节
+DEFAULT_NUM_PERM = 64
+# 同一个 LSH 桶中每个站点最多比较的站点数，避免大量相同标题的站点落入同一个桶时退化为平方复杂度；
+# 真正相似的站点通常在多个段中落入同一个桶，与相邻几个站点比较已经足以把整组连起来
+MAX_BUCKET_COMPARISONS = 4
+# 缓存最近用到的特征的哈希值(标题中的词、主机等特征会反复出现)，缓存满时清空
+FEATURE_CACHE_SIZE = 16384
+# 日志中最多列出的近似重复组数
+LOG_CLUSTERS = 20
+
+_WORD = re.compile(r"\w+")
+_CJK = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯]")
+_STOPWORDS = frozenset(("the", "a", "an", "of", "and", "to", "in", "for", "on", "with", "at", "by", "www", "html"))
+# 同一个意思的不同写法归一为同一个词
+_ALIASES = {
+    "docs": "doc", "documentation": "doc", "documents": "doc", "document": "doc", "manual": "doc",
+    "homepage": "home", "index": "home", "main": "home",
+    "blogs": "blog", "articles": "article", "posts": "post",
+    "guides": "guide", "tutorials": "tutorial", "references": "reference", "ref": "reference",
+    "文档": "doc", "首页": "home", "主页": "home", "官网": "home",
+}
+_HOST_PREFIXES = ("www", "m", "mobile", "wap", "amp", "touch")
+_SECOND_LEVEL = frozenset(("co", "com", "net", "org", "gov", "edu", "ac"))
+_PATH_EXTENSIONS = (".html", ".htm", ".shtml", ".php", ".asp", ".aspx", ".jsp")
+
+
+def _choose_bands(num_perm, threshold):
+    """选择每段的行数 rows：在相似度为 threshold 的两个站点至少有 99% 的概率成为候选的前提下取最大值"""
+    best = 1
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= 0.99:
+            best = rows
+    return num_perm // best, best
+
+
+def title_features(title):
+    """标题的特征：单词，中日韩文字按相邻两个字切分"""
+    features = []
+    for word in _WORD.findall(unicodedata.normalize('NFKC', title).lower()):
+        if _CJK.search(word) and len(word) > 2:
+            features.extend("t:" + _ALIASES.get(word[i:i + 2], word[i:i + 2]) for i in range(len(word) - 1))
+        elif word not in _STOPWORDS:
+            features.append("t:" + _ALIASES.get(word, word))
+    return features
+
+
+def url_features(url):
+    """地址的特征：主机的主体部分、路径各段及相邻两段、查询参数"""
+    url = url.strip()
+    scheme, sep, rest = url.partition('://')
+    if not sep:
+        return ["u:" + url] if url else []
+    rest = rest.partition('#')[0]
+    rest, _, query = rest.partition('?')
+    host, _, path = rest.partition('/')
+    host = host.rpartition('@')[2].partition(':')[0].lower().rstrip('.')
+
+    labels = host.split('.')
+    while len(labels) > 2 and labels[0] in _HOST_PREFIXES:
+        labels.pop(0)
+    if len(labels) > 1:
+        labels.pop()  # 顶级域名，镜像域名通常只有这里不同
+        if len(labels) > 1 and labels[-1] in _SECOND_LEVEL:
+            labels.pop()
+    features = ["h:" + ".".join(labels)]
+
+    segments = []
+    for segment in path.lower().split('/'):
+        if segment.endswith(_PATH_EXTENSIONS):
+            segment = segment.rpartition('.')[0]
+        if segment and segment != "index":
+            segments.append(_ALIASES.get(segment, segment))
+    features.extend("p:" + segment for segment in segments)
+    features.extend("p2:" + a + "/" + b for a, b in zip(segments, segments[1:]))
+    for param in query.split('&'):
+        name = param.partition('=')[0].lower()
+        if param and name not in TRACKING_PARAMS and not name.startswith(TRACKING_PREFIXES):
+            features.append("q:" + param)
+    return features
+
+
+# 整数中 1 的个数；int.bit_count 需要 Python 3.10
+_popcount = getattr(int, "bit_count", None) or (lambda value: bin(value).count("1"))
+
+
+def _lanes(num_perm, value):
+    """num_perm 个 32 位的通道中每个都等于 value 的整数"""
+    return int.from_bytes(value.to_bytes(4, 'little') * num_perm, 'little')
+
+
+class NearDuplicateFinder:
+    """用 MinHash 签名和 LSH 查找近似重复的站点
+
+    签名的 num_perm 个 31 位哈希值打包在一个大整数中(每个值占 32 位的一个通道，最高位留作借位)，
+    逐通道取最小值、统计相同的通道数都只需要几次整数运算，不必逐个比较。
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, action='report', num_perm=DEFAULT_NUM_PERM, log=None):
+        if action not in NEAR_DUP_ACTIONS:
+            raise ValueError(f"未知的近似重复处理方式: {action}")
+        if not 0 < threshold <= 1:
+            raise ValueError(f"相似度阈值必须在 0 到 1 之间: {threshold}")
+        self.threshold = threshold
+        self.action = action
+        self.num_perm = num_perm
+        self.bands, self.rows = _choose_bands(num_perm, threshold)
+        self.log = log or _noop
+        self._values = _lanes(num_perm, 0x7FFFFFFF)  # 每个通道的数值位
+        self._guards = _lanes(num_perm, 0x80000000)  # 每个通道的最高位
+        self._ones = _lanes(num_perm, 1)
+        self._feature_hashes = {}
+        self.clusters = []  # [{"similarity", "sites": [{"group", "id", "name", "url"}]}]
+        self.stats = {"sites": 0, "candidates": 0, "comparisons": 0, "clusters": 0, "merged": 0}
+
+    def _feature_hash(self, feature):
+        """特征的 num_perm 个哈希值：SHAKE-128 的输出按 32 位切分，去掉每个通道的最高位"""
+        value = self._feature_hashes.get(feature)
+        if value is None:
+            if len(self._feature_hashes) >= FEATURE_CACHE_SIZE:
+                self._feature_hashes.clear()
+            digest = hashlib.shake_128(feature.encode('utf-8')).digest(4 * self.num_perm)
+            value = self._feature_hashes[feature] = int.from_bytes(digest, 'little') & self._values
+        return value
+
+    def signature(self, features):
+        """特征集合的 MinHash 签名(打包的整数)：各个特征的哈希值逐通道取最小值"""
+        guards = self._guards
+        result = None
+        for feature in set(features):
+            value = self._feature_hash(feature)
+            if result is None:
+                result = value
+                continue
+            # 通道的最高位在相减后仍为 1 说明 result >= value，这些通道换成 value
+            mask = ((((result | guards) - value) & guards) >> 31) * 0x7FFFFFFF
+            result ^= (result ^ value) & mask
+        return result
+
+    def similarity(self, a, b):
+        """两个签名中相同的通道所占的比例，即 Jaccard 相似度的估计"""
+        different = (((a ^ b) | self._guards) - self._ones) & self._guards
+        return 1 - _popcount(different) / self.num_perm
+
+    def find(self, sites):
+        """sites 为 (名称, 地址) 的序列，返回近似重复的组：每组为站点下标的列表(按下标排序)和组内的最低相似度"""
+        num_perm = self.num_perm
+        stride = 4 * num_perm
+        data = bytearray()  # 所有签名依次排列，每个 stride 字节
+        indexes = []  # 有签名的站点在 sites 中的下标
+        for index, (name, url) in enumerate(sites):
+            features = title_features(name or "") + url_features(url or "")
+            if features:
+                data += self.signature(features).to_bytes(stride, 'little')
+                indexes.append(index)
+        data = bytes(data)
+        self.stats["sites"] += len(indexes)
+
+        parent = list(range(len(indexes)))
+        similarity = {}  # 根 -> 合并时的最低相似度
+
+        def root(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        def signature(position):
+            return int.from_bytes(data[position * stride:(position + 1) * stride], 'little')
+
+        threshold = self.threshold
+        width = 4 * self.rows
+        for band in range(self.bands):
+            # 每一段的键直接从签名的字节中切出，桶用完即丢弃
+            buckets = {}
+            for position, key in enumerate(data[o:o + width] for o in range(band * width, len(data), stride)):
+                bucket = buckets.get(key)
+                if bucket is None:
+                    buckets[key] = position
+                elif isinstance(bucket, int):
+                    buckets[key] = [bucket, position]
+                else:
+                    bucket.append(position)
+            for bucket in buckets.values():
+                if isinstance(bucket, int):
+                    continue
+                self.stats["candidates"] += len(bucket) - 1
+                for j in range(1, len(bucket)):
+                    b = bucket[j]
+                    sig_b = None
+                    for a in bucket[max(0, j - MAX_BUCKET_COMPARISONS):j]:
+                        root_a, root_b = root(a), root(b)
+                        if root_a == root_b:
+                            continue
+                        self.stats["comparisons"] += 1
+                        if sig_b is None:
+                            sig_b = signature(b)
+                        value = self.similarity(signature(a), sig_b)
+                        if value >= threshold:
+                            low, high = min(root_a, root_b), max(root_a, root_b)
+                            parent[high] = low
+                            similarity[low] = min(value, similarity.get(low, 1.0), similarity.pop(high, 1.0))
+            del buckets
+
+        groups = {}
+        for position in range(len(indexes)):
+            top = root(position)
+            if top != position or position in similarity:
+                groups.setdefault(top, []).append(indexes[position])
+        clusters = [(members, round(similarity.get(top, 1.0), 3))
+                    for top, members in sorted(groups.items()) if len(members) > 1]
+        self.stats["clusters"] += len(clusters)
+        return clusters
+
+    def apply(self, result, log=None):
+        """查找结果中的近似重复站点并按 action 处理，返回被合并(删除)的站点数"""
+        log = log or self.log
+        groups = result.get("groups", [])
+        locations = []  # 站点下标 -> (分组下标, 组内下标)
+        fields = []
+        for group_index, group in enumerate(groups):
+            sites = group.get("sites", ())
+            if isinstance(sites, GroupSites) and not sites.table.changes:
+                # 按列存储的站点直接读取列，不逐个创建记录
+                fields.extend(zip(sites.table.names[sites.start:sites.stop], sites.table.urls[sites.start:sites.stop]))
+            else:
+                fields.extend((site.get("name"), site.get("url")) for site in sites)
+            locations.extend((group_index, site_index) for site_index in range(len(sites)))
+
+        clusters = self.find(fields)
+        del fields
+        found = []
+        removed = {}  # 分组下标 -> 要删除的组内下标
+        for members, similarity in clusters:
+            cluster_sites = []
+            for index in members:
+                group = groups[locations[index][0]]
+                site = group["sites"][locations[index][1]]
+                cluster_sites.append({"group": group.get("name"), "id": site.get("id"),
+                                      "name": site.get("name"), "url": site.get("url")})
+            found.append({"similarity": similarity, "sites": cluster_sites})
+            if self.action == 'merge':
+                keep_group, keep_index = locations[members[0]]
+                kept = groups[keep_group]["sites"][keep_index]
+                for index in members[1:]:
+                    group_index, site_index = locations[index]
+                    site = groups[group_index]["sites"][site_index]
+                    if not kept.get("icon") and site.get("icon"):
+                        kept["icon"] = site["icon"]
+                    removed.setdefault(group_index, set()).add(site_index)
+
+        merged = 0
+        if removed:
+            for group_index, indexes in removed.items():
+                group = groups[group_index]
+                # 按列存储的分组不能删除行，转换为普通的站点列表
+                group["sites"] = [dict(site) for i, site in enumerate(group["sites"]) if i not in indexes]
+                merged += len(indexes)
+            groups[:] = [g for i, g in enumerate(groups) if i not in removed or g["sites"]]
+        self.stats["merged"] += merged
+        self.clusters.extend(found)
+
+        log(self.summary())
+        for cluster in found[:LOG_CLUSTERS]:
+            names = "、".join(f"{site['name']} <{site['url']}>" for site in cluster["sites"][:5])
+            more = f" 等 {len(cluster['sites'])} 个" if len(cluster["sites"]) > 5 else ""
+            log(f"  近似重复(相似度 {cluster['similarity']}): {names}{more}")
+        if len(found) > LOG_CLUSTERS:
+            log(f"  ……另有 {len(found) - LOG_CLUSTERS} 组")
+        return merged
+
+    def write_report(self, path):
+        """把找到的近似重复组写入JSON文件"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"version": NEAR_DUP_REPORT_VERSION, "threshold": self.threshold, "action": self.action,
+                       "stats": self.stats, "clusters": self.clusters}, f, ensure_ascii=False, indent=2)
+
+    def summary(self):
+        s = self.stats
+        text = (f"近似重复(相似度 ≥ {self.threshold}): {s['sites']} 个站点，{s['clusters']} 组，"
+                f"候选 {s['candidates']} 个，比较 {s['comparisons']} 次")
+        if self.action == 'merge':
+            text += f"，合并了 {s['merged']} 个站点"
+        return text
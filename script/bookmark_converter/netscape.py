@@ -0,0 +1,241 @@
+"""Netscape 书签HTML格式(DT/H3/DL/A 结构)的解析
+
+文件夹由 ``<DT><H3>名称</H3><DL>...</DL>`` 表示，链接由 ``<DT><A HREF=...>`` 表示。
+浏览器导出的文件里 DT、P 标签通常不闭合，但 DL 总是成对出现，
+因此这里以 DL 的嵌套关系来确定文件夹层级：每个 H3 之后出现的第一个 DL 就是该文件夹的内容。
+
+解析分两层：
+1. 解析后端按文档顺序产出事件 (FOLDER_START, 名称)、(LINK, 链接)、(FOLDER_END, None)。
+   流式后端基于标准库 html.parser 增量读取；BeautifulSoup 后端作为格式错误文件的备选。
+2. iter_folders 将事件组装为文件夹，每个文件夹在其 DL 结束时产出，
+   只包含直接属于它的链接，因此内存占用只与当前打开的各级文件夹有关。
+
+链接用 __slots__ 记录(Link)而不是字典表示，图标字符串在创建时驻留(sys.intern)，
+同一个图标在整个解析结果中只保留一份。
+"""
+import sys
+from html.parser import HTMLParser
+
+# 完整文件夹路径的分隔符
+PATH_SEPARATOR = "/"
+
+# 解析事件类型
+FOLDER_START = "folder_start"
+FOLDER_END = "folder_end"
+LINK = "link"
+
+# 流式读取时每次送入解析器的字符数
+CHUNK_SIZE = 1024 * 1024
+
+
+class Link:
+    """书签链接
+
+    每个链接只有五个字段，__slots__ 记录比同样内容的字典小得多。
+    add_date 为添加时间(Unix 秒数的字符串)，private 对应书签的 PRIVATE="1" 属性。
+    也可以像字典一样用 link["url"] 读取字段。
+    """
+
+    __slots__ = ('name', 'url', 'icon', 'add_date', 'private')
+
+    def __init__(self, name, url, icon='', add_date='', private=False):
+        self.name = name
+        self.url = url
+        self.icon = icon
+        self.add_date = add_date
+        self.private = private
+
+    def __getitem__(self, key):
+        if key not in Link.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def _fields(self):
+        return self.name, self.url, self.icon, self.add_date, self.private
+
+    def __eq__(self, other):
+        if not isinstance(other, Link):
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    def __reduce__(self):
+        return Link, self._fields()
+
+    def __repr__(self):
+        return f"Link(name={self.name!r}, url={self.url!r})"
+
+
+def make_link(name, url, icon='', add_date='', private=False):
+    """构造链接数据；相同的图标(通常是很长的 data URI)共用同一个字符串对象"""
+    return Link(name, url, sys.intern(icon) if icon else '', add_date or '', bool(private))
+
+
+class StreamingBookmarkParser(HTMLParser):
+    """基于 html.parser 的增量书签解析器
+
+    通过 feed() 分块送入文本，解析出的事件暂存在 events 中，由调用方在每次 feed 后取走。
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.events = []
+        self._dl_stack = []  # 每个打开的 DL 是否对应一个文件夹
+        self._pending_name = None  # 最近一个尚未找到 DL 的 H3 名称
+        self._text = None  # 正在收集的 H3/A 文本
+        self._link_attrs = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'dl':
+            is_folder = self._pending_name is not None
+            self._dl_stack.append(is_folder)
+            if is_folder:
+                self.events.append((FOLDER_START, self._pending_name))
+                self._pending_name = None
+        elif tag == 'h3':
+            self._text = []
+        elif tag == 'a':
+            self._pending_name = None
+            self._text = []
+            self._link_attrs = dict(attrs)
+
+    def handle_endtag(self, tag):
+        if tag == 'dl':
+            if self._dl_stack and self._dl_stack.pop():
+                self.events.append((FOLDER_END, None))
+        elif tag == 'h3' and self._text is not None:
+            self._pending_name = ''.join(self._text).strip()
+            self._text = None
+        elif tag == 'a' and self._link_attrs is not None:
+            self._emit_link()
+
+    def handle_data(self, data):
+        if self._text is not None:
+            self._text.append(data)
+
+    def _emit_link(self):
+        attrs = self._link_attrs
+        self.events.append((LINK, make_link(
+            ''.join(self._text).strip(),
+            attrs.get('href') or '',
+            attrs.get('icon') or attrs.get('icon_uri'),
+            attrs.get('add_date'),
+            attrs.get('private') == '1'
+        )))
+        self._text = None
+        self._link_attrs = None
+
+    def close(self):
+        super().close()
+        # 未闭合的 A 标签
+        if self._link_attrs is not None:
+            self._emit_link()
+        # 未闭合的文件夹
+        while self._dl_stack:
+            if self._dl_stack.pop():
+                self.events.append((FOLDER_END, None))
+
+
+def iter_stream_events(chunks):
+    """流式后端：从文本块序列增量解析出事件"""
+    parser = StreamingBookmarkParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        if parser.events:
+            yield from parser.events
+            parser.events = []
+    parser.close()
+    yield from parser.events
+
+
+def iter_soup_events(soup):
+    """BeautifulSoup 后端：单次遍历已构建的树，产出事件
+
+    每个节点只访问一次，整体复杂度与节点数成线性关系。
+    """
+    from bs4.element import Tag  # 延迟导入
+
+    pending_name = None  # 最近一个尚未找到 DL 的 H3 名称
+    # 栈中元素为 (节点, 是否为离开文件夹的标记)
+    stack = [(soup, False)]
+
+    while stack:
+        node, leaving = stack.pop()
+        if leaving:
+            yield FOLDER_END, None
+            continue
+
+        name = node.name
+        if name == 'a':
+            pending_name = None
+            yield LINK, make_link(
+                node.get_text().strip(),
+                node.get('href', ''),
+                node.get('icon') or node.get('icon_uri', ''),
+                node.get('add_date', ''),
+                node.get('private') == '1'
+            )
+            continue
+        if name == 'h3':
+            pending_name = node.get_text().strip()
+            continue
+        if name == 'dl' and pending_name is not None:
+            yield FOLDER_START, pending_name
+            stack.append((node, True))
+            pending_name = None
+
+        # 子节点逆序入栈，保证按文档顺序处理
+        children = [child for child in node.contents if isinstance(child, Tag)]
+        for child in reversed(children):
+            stack.append((child, False))
+
+
+def folder_display_name(path, full_path=False):
+    """文件夹在输出中的名称：最后一级名称，或完整路径 "A/B/C" """
+    if full_path:
+        return PATH_SEPARATOR.join(path)
+    return path[-1]
+
+
+def iter_folders(events, full_path=False, uncategorized_name="未分类"):
+    """将解析事件组装为文件夹并逐个产出
+
+    每个文件夹在结束时产出，只包含直接属于它的链接，没有链接的文件夹被跳过。
+    "order" 为文件夹在文档中出现的先后序号，用于保持原有的显示顺序。
+    不在任何文件夹中的链接最后以"未分类"文件夹产出。
+    """
+    stack = []
+    unclassified_links = []
+    order = 0
+
+    for kind, value in events:
+        if kind == LINK:
+            (stack[-1]["links"] if stack else unclassified_links).append(value)
+        elif kind == FOLDER_START:
+            path = (stack[-1]["_path"] if stack else ()) + (value,)
+            stack.append({
+                "name": folder_display_name(path, full_path),
+                "path": PATH_SEPARATOR.join(path),
+                "order": order,
+                "links": [],
+                "_path": path
+            })
+            order += 1
+        elif kind == FOLDER_END and stack:
+            folder = stack.pop()
+            del folder["_path"]
+            if folder["links"]:
+                yield folder
+
+    while stack:
+        folder = stack.pop()
+        del folder["_path"]
+        if folder["links"]:
+            yield folder
+
+    if unclassified_links:
+        yield {
+            "name": uncategorized_name,
+            "path": "",
+            "order": order,
+            "links": unclassified_links
+        }
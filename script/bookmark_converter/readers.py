@@ -0,0 +1,398 @@
+"""书签输入格式的读取器注册表
+
+除了浏览器导出的 Netscape HTML，还可以直接读取浏览器自己的书签存储，省去手动导出：
+
+- chrome：Chrome/Edge 配置目录中的 Bookmarks 文件(JSON)，同目录下有 Favicons 数据库时一并读取图标
+- firefox：places.sqlite，只读打开，一次连接查询 moz_bookmarks/moz_places；图标来自同目录的 favicons.sqlite
+- safari：Bookmarks.plist(二进制或XML)，用 plistlib 读取
+
+每个读取器把原始数据转换为与 HTML 解析相同的事件流(FOLDER_START/LINK/FOLDER_END)，
+再交给 netscape.iter_folders 组装文件夹，因此产出的文件夹与导出的HTML完全一致，
+convert_to_json_format 无需区分来源。文件夹层级也按各浏览器导出HTML时的结构排列。
+
+格式默认根据文件开头的特征字节自动判断，新的格式用 register_reader 注册即可。
+判断格式和读取共用同一个打开的 source.InputFile，文件只打开和映射一次。
+HTML、Chrome 和 Safari 书签也可以放在 .gz/.zip 压缩包中直接读取(见 source 模块)，判断格式时查看的是解压后的内容。
+"""
+import base64
+import json
+import os
+import plistlib
+import sqlite3
+from collections import defaultdict
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+from .engine import UNCATEGORIZED_NAME, _iter_html_folders, _logged, _noop
+from .netscape import FOLDER_END, FOLDER_START, LINK, iter_folders, make_link
+from .source import InputFile
+
+# 格式名 -> (读取函数, 特征判断函数)；按注册顺序判断，html 是默认格式
+READERS = {}
+
+# Chrome 时间戳从 1601-01-01 起，单位为微秒
+_WEBKIT_EPOCH_OFFSET = 11644473600
+
+_SQLITE_MAGIC = b"SQLite format 3\x00"
+
+
+def register_reader(name, sniff=None):
+    """注册读取器
+
+    reader(source, log, progress, full_path, parser) 产出文件夹，source 为已经打开的 source.InputFile
+    (文件路径为 source.path)；sniff(head) 根据文件开头的字节判断是否为该格式，没有 sniff 的格式只能显式指定。
+    """
+    def decorator(reader):
+        READERS[name] = (reader, sniff)
+        return reader
+    return decorator
+
+
+def input_formats():
+    """可选的输入格式"""
+    return ('auto',) + tuple(READERS)
+
+
+def detect_format(path):
+    """根据文件开头的特征字节判断输入格式，无法识别时按 HTML 处理"""
+    with InputFile(path) as source:
+        return _sniff_format(source.head)
+
+
+def _sniff_format(head):
+    for name, (_, sniff) in READERS.items():
+        if sniff is not None and sniff(head):
+            return name
+    return 'html'
+
+
+def iter_input_folders(path, log=None, progress=None, full_path=False, parser='auto', input_format='auto',
+                       source=None):
+    """读取任意支持格式的书签文件，逐个产出文件夹
+
+    source 为已经打开的 path 的 InputFile 时直接使用(由调用方关闭)，否则打开 path 并在读取完后关闭。
+    """
+    if input_format != 'auto' and input_format not in READERS:
+        raise ValueError(f"未知的输入格式: {input_format}")
+    if source is None:
+        return _read_input(path, log, progress, full_path, parser, input_format)
+    return _iter_source_folders(source, log or _noop, progress or _noop, full_path, parser, input_format)
+
+
+def _read_input(path, log, progress, full_path, parser, input_format):
+    with InputFile(path) as source:
+        yield from iter_input_folders(path, log, progress, full_path, parser, input_format, source)
+
+
+def _iter_source_folders(source, log, progress, full_path, parser, input_format):
+    if input_format == 'auto':
+        input_format = _sniff_format(source.head)
+        if input_format != 'html':
+            log(f"识别为 {input_format} 书签数据")
+    reader, _ = READERS[input_format]
+    return reader(source, log, progress, full_path, parser)
+
+
+def _events_to_folders(events, full_path, log, progress):
+    yield from _logged(iter_folders(events, full_path, UNCATEGORIZED_NAME), log)
+    progress(70)
+
+
+def _read_documents(source):
+    """读出输入文件中各个文档的全部字节；压缩包中可能有多个文档"""
+    return [document.read() for document in source.documents()]
+
+
+def _unix_seconds(value):
+    return str(int(value)) if value else ''
+
+
+def _mime_from_bytes(data):
+    if data.startswith(b"\x89PNG"):
+        return "image/png"
+    if data.startswith(b"\x00\x00\x01\x00"):
+        return "image/x-icon"
+    if data.startswith(b"GIF8"):
+        return "image/gif"
+    if data.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if data[:8].startswith(b"RIFF") and data[8:12] == b"WEBP":
+        return "image/webp"
+    if b"<svg" in data[:256]:
+        return "image/svg+xml"
+    return "image/png"
+
+
+def _data_uri(data):
+    return f"data:{_mime_from_bytes(data)};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+def _connect_readonly(path, log):
+    """只读打开 SQLite 数据库；浏览器运行时数据库被锁定，改用 immutable 模式读取已写入主文件的内容"""
+    uri = "file:" + quote(os.path.abspath(path))
+    try:
+        conn = sqlite3.connect(uri + "?mode=ro", uri=True)
+        conn.execute("SELECT 1 FROM sqlite_master LIMIT 1")
+        return conn
+    except sqlite3.OperationalError as e:
+        if "locked" not in str(e):
+            raise
+        log("数据库正被浏览器使用，以快照方式读取(浏览器关闭后读取的数据最完整)")
+        return sqlite3.connect(uri + "?mode=ro&immutable=1", uri=True)
+
+
+# ---- Netscape HTML ----
+
+@register_reader('html')
+def read_html(source, log, progress, full_path, parser):
+    return _iter_html_folders(source, log, progress, full_path, parser)
+
+
+# ---- Chrome / Edge ----
+
+def _sniff_chrome(head):
+    text = head.lstrip(b"\xef\xbb\xbf \t\r\n")
+    return text.startswith(b"{") and b'"roots"' in head
+
+
+def _chrome_icons(path, urls, log):
+    """读取 Bookmarks 同目录的 Favicons 数据库：页面地址 -> data URI(只保留书签中出现的地址)"""
+    favicons = os.path.join(os.path.dirname(os.path.abspath(path)), "Favicons")
+    if not os.path.exists(favicons) or not urls:
+        return {}
+    icons = {}
+    conn = _connect_readonly(favicons, log)
+    try:
+        # 每个页面优先使用 16 像素以上最小的图标
+        rows = conn.execute(
+            "SELECT m.page_url, b.image_data, b.width FROM icon_mapping m "
+            "JOIN favicon_bitmaps b ON b.icon_id = m.icon_id "
+            "WHERE b.image_data IS NOT NULL ORDER BY b.width"
+        )
+        for page_url, data, width in rows:
+            if page_url in urls and (page_url not in icons or (width >= 16 and icons[page_url][0] < 16)):
+                icons[page_url] = (width, data)
+    except sqlite3.DatabaseError as e:
+        log(f"读取 Favicons 失败，忽略图标: {e}")
+        return {}
+    finally:
+        conn.close()
+    return {url: _data_uri(data) for url, (_, data) in icons.items()}
+
+
+def _chrome_urls(nodes):
+    urls = set()
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if node.get("type") == "url":
+            urls.add(node.get("url", ""))
+        else:
+            stack.extend(node.get("children", []))
+    return urls
+
+
+def _chrome_events(node, icons):
+    stack = [(node, False)]
+    while stack:
+        node, leaving = stack.pop()
+        if leaving:
+            yield FOLDER_END, None
+            continue
+        if node.get("type") == "url":
+            url = node.get("url", "")
+            added = int(node.get("date_added") or 0)
+            seconds = added // 1000000 - _WEBKIT_EPOCH_OFFSET if added else 0
+            yield LINK, make_link(node.get("name", ""), url, icons.get(url, ''), _unix_seconds(max(seconds, 0)))
+            continue
+        yield FOLDER_START, node.get("name", "")
+        stack.append((node, True))
+        for child in reversed(node.get("children", [])):
+            stack.append((child, False))
+
+
+@register_reader('chrome', _sniff_chrome)
+def read_chrome(source, log, progress, full_path, parser):
+    all_roots = []
+    for data in _read_documents(source):
+        roots = json.loads(data.decode('utf-8-sig')).get("roots")
+        if not isinstance(roots, dict):
+            raise ValueError("不是 Chrome 书签文件: 缺少 roots")
+        all_roots.append(roots)
+    progress(30)
+    urls = _chrome_urls(r for roots in all_roots for r in roots.values() if isinstance(r, dict))
+    icons = _chrome_icons(source.path, urls, log)
+    progress(50)
+
+    def events():
+        # 与 Chrome 导出的HTML一致：书签栏是一个文件夹，其他书签和移动设备书签直接放在顶层
+        for roots in all_roots:
+            if "bookmark_bar" in roots:
+                yield from _chrome_events(roots["bookmark_bar"], icons)
+            for key in ("other", "synced"):
+                for child in roots.get(key, {}).get("children", []):
+                    yield from _chrome_events(child, icons)
+
+    return _events_to_folders(events(), full_path, log, progress)
+
+
+# ---- Firefox ----
+
+def _sniff_sqlite(head):
+    return head.startswith(_SQLITE_MAGIC)
+
+
+# places.sqlite 中各个根文件夹的 guid 与导出HTML时使用的名称；菜单的内容直接放在顶层，标签不导出
+_FIREFOX_ROOTS = (
+    ("menu________", None),
+    ("toolbar_____", "Bookmarks Toolbar"),
+    ("unfiled_____", "Other Bookmarks"),
+    ("mobile______", "Mobile Bookmarks"),
+)
+_FIREFOX_BOOKMARK = 1
+_FIREFOX_FOLDER = 2
+
+
+def _firefox_icons(path, urls, log):
+    """读取 places.sqlite 同目录的 favicons.sqlite：页面地址 -> data URI(只保留书签中出现的地址)"""
+    favicons = os.path.join(os.path.dirname(os.path.abspath(path)), "favicons.sqlite")
+    if not os.path.exists(favicons) or not urls:
+        return {}
+    icons = {}
+    conn = _connect_readonly(favicons, log)
+    try:
+        rows = conn.execute(
+            "SELECT p.page_url, i.data, i.width FROM moz_pages_w_icons p "
+            "JOIN moz_icons_to_pages ip ON ip.page_id = p.id "
+            "JOIN moz_icons i ON i.id = ip.icon_id "
+            "WHERE i.data IS NOT NULL ORDER BY i.width"
+        )
+        for page_url, data, width in rows:
+            if page_url in urls and (page_url not in icons or (width >= 16 and icons[page_url][0] < 16)):
+                icons[page_url] = (width, data)
+    except sqlite3.DatabaseError as e:
+        log(f"读取 favicons.sqlite 失败，忽略图标: {e}")
+        return {}
+    finally:
+        conn.close()
+    return {url: _data_uri(data) for url, (_, data) in icons.items()}
+
+
+@register_reader('firefox', _sniff_sqlite)
+def read_firefox(source, log, progress, full_path, parser):
+    if source.compression is not None:
+        raise ValueError("places.sqlite 需要解压后读取")
+    conn = _connect_readonly(source.path, log)
+    try:
+        rows = conn.execute(
+            "SELECT b.id, b.type, b.parent, b.title, b.dateAdded, b.guid, p.url "
+            "FROM moz_bookmarks b LEFT JOIN moz_places p ON p.id = b.fk "
+            "ORDER BY b.parent, b.position"
+        ).fetchall()
+    except sqlite3.DatabaseError as e:
+        raise ValueError(f"不是 Firefox 书签数据库: {e}")
+    finally:
+        conn.close()
+    progress(30)
+
+    children = defaultdict(list)
+    guids = {}
+    for row in rows:
+        children[row[2]].append(row)
+        guids[row[5]] = row
+    urls = {row[6] for row in rows if row[1] == _FIREFOX_BOOKMARK and row[6]}
+    icons = _firefox_icons(source.path, urls, log)
+    progress(50)
+
+    def walk(folder_id):
+        stack = [(row, False) for row in reversed(children.get(folder_id, []))]
+        while stack:
+            row, leaving = stack.pop()
+            if leaving:
+                yield FOLDER_END, None
+                continue
+            item_id, kind, _, title, added, _, url = row
+            if kind == _FIREFOX_BOOKMARK and url and not url.startswith("place:"):
+                # dateAdded 单位为微秒
+                yield LINK, make_link(title or '', url, icons.get(url, ''), _unix_seconds((added or 0) // 1000000))
+            elif kind == _FIREFOX_FOLDER:
+                yield FOLDER_START, title or ''
+                stack.append((row, True))
+                for child in reversed(children.get(item_id, [])):
+                    stack.append((child, False))
+
+    def events():
+        for guid, name in _FIREFOX_ROOTS:
+            root = guids.get(guid)
+            if root is None:
+                continue
+            if name is None:
+                yield from walk(root[0])
+            elif children.get(root[0]):
+                yield FOLDER_START, name
+                yield from walk(root[0])
+                yield FOLDER_END, None
+
+    return _events_to_folders(events(), full_path, log, progress)
+
+
+# ---- Safari ----
+
+def _sniff_plist(head):
+    if head.startswith(b"bplist00"):
+        return True
+    text = head.lstrip(b"\xef\xbb\xbf \t\r\n")
+    return text.startswith(b"<?xml") and b"<plist" in head
+
+
+# Safari 内部的根文件夹名称与导出HTML时使用的名称
+_SAFARI_TITLES = {
+    "BookmarksBar": "Favorites",
+    "BookmarksMenu": "Bookmarks Menu",
+    "com.apple.ReadingList": "Reading List",
+}
+
+
+def _plist_seconds(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return _unix_seconds(value.timestamp())
+    return ''
+
+
+def _safari_events(node):
+    stack = [(child, False) for child in reversed(node.get("Children", []))]
+    while stack:
+        node, leaving = stack.pop()
+        if leaving:
+            yield FOLDER_END, None
+            continue
+        kind = node.get("WebBookmarkType")
+        if kind == "WebBookmarkTypeLeaf":
+            title = node.get("URIDictionary", {}).get("title") or node.get("Title", "")
+            added = node.get("ReadingList", {}).get("DateAdded")
+            yield LINK, make_link(title, node.get("URLString", ""), '', _plist_seconds(added))
+        elif kind == "WebBookmarkTypeList":
+            title = node.get("Title", "")
+            yield FOLDER_START, _SAFARI_TITLES.get(title, title)
+            stack.append((node, True))
+            for child in reversed(node.get("Children", [])):
+                stack.append((child, False))
+        # WebBookmarkTypeProxy(历史记录等)不是书签，跳过
+
+
+@register_reader('safari', _sniff_plist)
+def read_safari(source, log, progress, full_path, parser):
+    nodes = []
+    for data in _read_documents(source):
+        try:
+            node = plistlib.loads(data)
+        except plistlib.InvalidFileException as e:
+            raise ValueError(f"不是 Safari 书签文件: {e}")
+        if not isinstance(node, dict) or node.get("WebBookmarkType") != "WebBookmarkTypeList":
+            raise ValueError("不是 Safari 书签文件")
+        nodes.append(node)
+    progress(50)
+    events = (event for node in nodes for event in _safari_events(node))
+    return _events_to_folders(events, full_path, log, progress)
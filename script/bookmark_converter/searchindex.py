@@ -0,0 +1,469 @@
+"""前端站内搜索使用的预计算索引
+
+前端的 src/utils/search.ts 每次输入都对所有站点的名称、地址、描述、备注执行 toLowerCase().includes()，
+站点有几万个时输入会明显卡顿。转换时可以顺便生成一个搜索索引文件(与结果一起发布)，前端加载后按索引查找：
+
+- 子串查找：每个字段小写后按相邻 GRAM_SIZE 个字符切分(字段末尾补 GRAM_SIZE - 1 个 "\\0")，
+  记录每个片段出现在哪些文档中。查询时取查询串各片段文档列表的交集作为候选，
+  再对候选逐一执行与 search.ts 相同的子串判断，因此结果与原来的线性搜索完全一致。
+  短于 GRAM_SIZE 的查询取以它开头的所有片段的并集(片段按字典序排列，二分查找即可)。
+  出现在一半以上文档中的片段(如 "htt")改为保存不含它的文档(common)，两种列表都不会超过文档数的一半；
+  查询时用前者求交集，再去掉后者中的文档。
+- 词项前缀查找：名称、描述、备注中的单词(NFKC 规范化并小写)、地址主机名按 . 和 - 切分的各段，
+  以及中文名称的全拼和首字母(需要安装 pypinyin，未安装时不生成)。词项按字典序排列，
+  查询时取以查询串开头的所有词项的文档，用于"bd" 找到 "百度" 这类子串搜索找不到的结果。
+
+导入时 worker 会重新分配站点ID，因此索引中的站点用 [分组序号, 地址] 表示，
+与 worker 导入时按分组和地址判断站点是否已存在的方式一致；文档序号先是所有站点，再是所有分组，
+与 search.ts 返回结果的顺序相同。文档列表按差分编码保存。
+
+    python -m bookmark_converter.searchindex result.json -o result.search.json --queries 2000
+
+命令行会生成索引，并用随机查询对比索引与线性子串搜索的结果和耗时，结果不一致时退出码为 1。
+"""
+import argparse
+import bisect
+import json
+import os
+import random
+import re
+import sys
+import time
+import unicodedata
+from itertools import accumulate
+from urllib.parse import urlsplit
+
+from .engine import _noop, load_json_file
+
+SEARCH_INDEX_VERSION = 1
+
+# 与 search.ts 中匹配的字段和顺序一致；分组只匹配名称
+SEARCH_FIELDS = ('name', 'url', 'description', 'notes')
+
+GRAM_SIZE = 3
+# 片段出现的文档数超过文档数 * COMMON_SHARE 时改为保存不含该片段的文档
+COMMON_SHARE = 0.5
+
+# 命令行统计耗时时的结果数分档(上限)
+RESULT_BUCKETS = (0, 10, 100, 1000, float('inf'))
+
+_PAD = "\0" * (GRAM_SIZE - 1)
+# JavaScript 的 String.prototype.trim 去掉的空白字符
+_JS_WHITESPACE = "\t\n\v\f\r \u00a0\u1680\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000\ufeff"
+_WORD_RE = re.compile(r"[^\W_]+")
+_HOST_SPLIT_RE = re.compile(r"[.\-]+")
+_CJK_RE = re.compile("[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+
+_pinyin_module = None
+
+
+def search_index_path_for(output_path):
+    """输出文件对应的默认搜索索引文件路径"""
+    return os.path.splitext(output_path)[0] + ".search.json"
+
+
+def _load_pinyin():
+    """按需导入 pypinyin；未安装时返回 None(只尝试一次)"""
+    global _pinyin_module
+    if _pinyin_module is None:
+        try:
+            import pypinyin
+        except ImportError:
+            pypinyin = False
+        _pinyin_module = pypinyin
+    return _pinyin_module or None
+
+
+def normalize_query(query):
+    """与 search.ts 相同的查询串处理：小写并去掉首尾空白"""
+    return (query or "").lower().strip(_JS_WHITESPACE)
+
+
+def iter_documents(data):
+    """按索引的文档顺序产出 (类型, 分组名称, 站点或分组)
+
+    data 可以是转换结果(分组中带有 "sites")，也可以是 ExportData(顶层的 "sites" 带有 group_id)。
+    先产出所有站点，再产出所有分组。
+    """
+    groups = data.get("groups", [])
+    if "sites" in data:
+        names = {g.get("id"): g.get("name", "") for g in groups}
+        for site in data["sites"]:
+            yield 'site', names.get(site.get("group_id"), ""), site
+    else:
+        for group in groups:
+            name = group.get("name", "")
+            for site in group.get("sites", ()):
+                yield 'site', name, site
+    for group in groups:
+        yield 'group', group.get("name", ""), group
+
+
+def document_fields(kind, item):
+    """文档中参与子串匹配的字段值(未小写)，顺序与 SEARCH_FIELDS 一致；分组只有名称"""
+    if kind == 'group':
+        return (item.get("name") or "",)
+    return tuple(item.get(field) or "" for field in SEARCH_FIELDS)
+
+
+def document_terms(kind, item, pinyin=None):
+    """文档的词项：单词、主机名各段，以及 pinyin 可用时中文名称的全拼和首字母"""
+    terms = set()
+    name = item.get("name") or ""
+    texts = (name,) if kind == 'group' else (name, item.get("description") or "", item.get("notes") or "")
+    for text in texts:
+        if text:
+            terms.update(_WORD_RE.findall(unicodedata.normalize('NFKC', text).lower()))
+    if kind == 'site' and item.get("url"):
+        try:
+            host = urlsplit(item["url"]).hostname or ""
+        except ValueError:
+            host = ""
+        terms.update(part for part in _HOST_SPLIT_RE.split(host) if part and part != 'www')
+    if pinyin is not None and _CJK_RE.search(name):
+        syllables = [s.lower() for s in pinyin.lazy_pinyin(name, errors='ignore') if s.isalnum()]
+        if syllables:
+            terms.add("".join(syllables))
+            terms.add("".join(s[0] for s in syllables))
+    return terms
+
+
+def _grams(text):
+    """字段(已小写)中所有长度为 GRAM_SIZE 的片段，末尾补 "\\0" 使每个位置都有一个片段"""
+    padded = text + _PAD
+    return {padded[i:i + GRAM_SIZE] for i in range(len(text))}
+
+
+def _delta_encode(docs):
+    previous = 0
+    encoded = []
+    for doc in docs:
+        encoded.append(doc - previous)
+        previous = doc
+    return encoded
+
+
+def build_search_index(data, log=None, pinyin=True):
+    """为转换结果(或 ExportData)生成搜索索引，返回可以直接写成 JSON 的字典"""
+    log = log or _noop
+    pinyin = _load_pinyin() if pinyin else None
+    if pinyin is None:
+        log("未安装 pypinyin，搜索索引中不包含拼音")
+
+    group_positions = {}
+    groups = []
+    sites = []
+    postings = {}
+    term_postings = {}
+    doc = 0
+    for kind, group_name, item in iter_documents(data):
+        if kind == 'site':
+            position = group_positions.get(group_name)
+            if position is None:
+                position = group_positions[group_name] = len(group_positions)
+            sites.append([position, item.get("url") or ""])
+        else:
+            groups.append(group_name)
+        grams = set()
+        for value in document_fields(kind, item):
+            if value:
+                grams |= _grams(value.lower())
+        for gram in grams:
+            docs = postings.get(gram)
+            if docs is None:
+                postings[gram] = [doc]
+            else:
+                docs.append(doc)
+        for term in document_terms(kind, item, pinyin):
+            docs = term_postings.get(term)
+            if docs is None:
+                term_postings[term] = [doc]
+            else:
+                docs.append(doc)
+        doc += 1
+
+    # 站点中的分组序号指向 site_groups；分组文档单独列出，两者都按首次出现的顺序
+    site_groups = sorted(group_positions, key=group_positions.get)
+    limit = int(doc * COMMON_SHARE)
+    grams = {}
+    common = {}
+    for gram in sorted(postings):
+        docs = postings[gram]
+        if len(docs) > limit:
+            present = set(docs)
+            common[gram] = _delta_encode([d for d in range(doc) if d not in present])
+        else:
+            grams[gram] = _delta_encode(docs)
+    terms = sorted(term_postings)
+    log(f"搜索索引: {len(sites)} 个站点，{len(groups)} 个分组，{len(grams)} 个片段"
+        f"(另有 {len(common)} 个常见片段)，{len(terms)} 个词项")
+    return {
+        "version": SEARCH_INDEX_VERSION,
+        "gram_size": GRAM_SIZE,
+        "fields": list(SEARCH_FIELDS),
+        "site_groups": site_groups,
+        "documents": doc,
+        "sites": sites,
+        "groups": groups,
+        "grams": grams,
+        "common": common,
+        "terms": terms,
+        "term_docs": [_delta_encode(term_postings[term]) for term in terms],
+    }
+
+
+def write_search_index(data, path, log=None, pinyin=True):
+    """生成搜索索引并写入 path(紧凑的 JSON)，返回索引"""
+    index = build_search_index(data, log, pinyin)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    if log:
+        log(f"搜索索引已保存到: {path}({os.path.getsize(path) / 1024 / 1024:.1f} MB)")
+    return index
+
+
+class SearchIndex:
+    """加载后的搜索索引
+
+    查询结果中的站点需要用原始数据逐一判断，bind 传入生成索引时的结果(或导入后的 ExportData)，
+    按 [分组名称, 地址] 找到每个文档对应的字段并预先小写。文档列表在第一次用到时才解码。
+    """
+
+    def __init__(self, data):
+        if data.get("version") != SEARCH_INDEX_VERSION or data.get("gram_size") != GRAM_SIZE:
+            raise ValueError(f"不支持的搜索索引版本: {data.get('version')}")
+        site_groups = data["site_groups"]
+        self.docs = [('site', site_groups[position], url) for position, url in data["sites"]]
+        self.docs.extend(('group', name, None) for name in data["groups"])
+        self._grams = data["grams"]
+        self._gram_keys = sorted(self._grams)
+        self.documents = data["documents"]
+        self._common = data["common"]
+        self._common_keys = sorted(self._common)
+        self._terms = data["terms"]
+        self._term_docs = data["term_docs"]
+        self._decoded = {}
+        self._texts = None
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def bind(self, data):
+        """关联原始数据；索引中的文档在数据中找不到时不会出现在结果中"""
+        pending = {}
+        for kind, group_name, item in iter_documents(data):
+            key = (kind, group_name, item.get("url") if kind == 'site' else None)
+            pending.setdefault(key, []).append(tuple(value.lower() for value in document_fields(kind, item)))
+        texts = []
+        for doc in self.docs:
+            values = pending.get(doc)
+            texts.append(values.pop(0) if values else None)
+        self._texts = texts
+        return self
+
+    def _postings(self, key, encoded):
+        docs = self._decoded.get(key)
+        if docs is None:
+            docs = self._decoded[key] = frozenset(accumulate(encoded))
+        return docs
+
+    def _prefix_keys(self, keys, prefix):
+        start = bisect.bisect_left(keys, prefix)
+        end = start
+        while end < len(keys) and keys[end].startswith(prefix):
+            end += 1
+        return keys[start:end]
+
+    def candidates(self, query):
+        """可能包含查询串的文档序号(升序)；返回 None 表示无法缩小范围，需要检查所有文档"""
+        if "\0" in query:
+            return None
+        if len(query) < GRAM_SIZE:
+            if self._prefix_keys(self._common_keys, query):
+                return None
+            docs = set()
+            for gram in self._prefix_keys(self._gram_keys, query):
+                docs |= self._postings(('g', gram), self._grams[gram])
+            return sorted(docs)
+        present = []
+        absent = []
+        for gram in {query[i:i + GRAM_SIZE] for i in range(len(query) - GRAM_SIZE + 1)}:
+            if gram in self._grams:
+                present.append(self._postings(('g', gram), self._grams[gram]))
+            elif gram in self._common:
+                absent.append(self._postings(('c', gram), self._common[gram]))
+            else:
+                return []
+        if present:
+            present.sort(key=len)
+            docs = present[0].intersection(*present[1:])
+        else:
+            docs = frozenset(range(self.documents))
+        if absent:
+            docs = docs.difference(*absent)
+        return sorted(docs)
+
+    def search(self, query, terms=False):
+        """与 search.ts 的 searchInternal 结果相同的查找
+
+        返回 [(类型, 分组名称, 地址或 None, 匹配的字段)]；terms 为 True 时在后面追加只由词项前缀
+        (如拼音首字母)匹配到的文档，其匹配字段为 ["terms"]。
+        """
+        if self._texts is None:
+            raise ValueError("查询前需要先用 bind 关联原始数据")
+        query = normalize_query(query)
+        if not query:
+            return []
+        docs = self.candidates(query)
+        if docs is None:
+            docs = range(len(self.docs))
+        results = []
+        matched_docs = set()
+        for doc in docs:
+            values = self._texts[doc]
+            if values is None:
+                continue
+            fields = [SEARCH_FIELDS[i] for i, value in enumerate(values) if query in value]
+            if fields:
+                results.append(self.docs[doc] + (fields,))
+                matched_docs.add(doc)
+        if terms:
+            extra = set()
+            start = bisect.bisect_left(self._terms, query)
+            for position in range(start, len(self._terms)):
+                if not self._terms[position].startswith(query):
+                    break
+                extra.update(self._postings(('t', position), self._term_docs[position]))
+            for doc in sorted(extra - matched_docs):
+                if self._texts[doc] is not None:
+                    results.append(self.docs[doc] + (["terms"],))
+        return results
+
+
+def substring_search(query, data):
+    """search.ts 中线性搜索的移植，用作对照：每次查询都对所有文档的字段小写后判断"""
+    query = normalize_query(query)
+    if not query:
+        return []
+    results = []
+    for kind, group_name, item in iter_documents(data):
+        fields = [SEARCH_FIELDS[i] for i, value in enumerate(document_fields(kind, item))
+                  if value and query in value.lower()]
+        if fields:
+            results.append((kind, group_name, item.get("url") if kind == 'site' else None, fields))
+    return results
+
+
+def sample_queries(data, count, seed=0):
+    """从数据中随机生成查询：名称和地址的子串、单词、大小写和空白变化，以及找不到的串"""
+    rng = random.Random(seed)
+    documents = [(kind, item) for kind, _, item in iter_documents(data)]
+    if not documents:
+        return []
+    queries = []
+    while len(queries) < count:
+        kind, item = rng.choice(documents)
+        pick = rng.random()
+        if pick < 0.1:
+            queries.append("zq" + "".join(rng.choice("xjkvw") for _ in range(rng.randint(2, 5))))
+            continue
+        text = (item.get("name") if kind == 'group' or pick < 0.55 else item.get("url")) or ""
+        if not text:
+            continue
+        if pick < 0.7:
+            words = _WORD_RE.findall(text)
+            query = rng.choice(words) if words else text
+        else:
+            length = min(len(text), rng.choice((1, 2, 2, 3, 4, 5, 6, 8, 12)))
+            start = rng.randint(0, len(text) - length)
+            query = text[start:start + length]
+        if rng.random() < 0.1:
+            query = " " + query.upper() + " "
+        queries.append(query)
+    return queries
+
+
+def _percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))] if values else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bookmark_converter.searchindex",
+                                     description="生成前端搜索索引，并与线性子串搜索比较结果和耗时")
+    parser.add_argument("input", help="转换结果JSON或 ExportData JSON")
+    parser.add_argument("-o", "--output", help="搜索索引文件(默认不保存)")
+    parser.add_argument("--queries", type=int, default=1000, help="随机查询数(默认 1000，为 0 时不比较)")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子(默认 0)")
+    parser.add_argument("--no-pinyin", action="store_true", help="不生成拼音词项")
+    args = parser.parse_args(argv)
+
+    def log(message):
+        print(message, file=sys.stderr)
+
+    data = load_json_file(args.input)
+    started = time.perf_counter()
+    if args.output:
+        index_data = write_search_index(data, args.output, log, not args.no_pinyin)
+    else:
+        index_data = build_search_index(data, log, not args.no_pinyin)
+    build_seconds = time.perf_counter() - started
+    encoded = json.dumps(index_data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    log(f"生成耗时 {build_seconds:.2f} 秒，索引大小 {len(encoded) / 1024 / 1024:.1f} MB")
+    if not args.queries:
+        return 0
+
+    started = time.perf_counter()
+    index = SearchIndex(json.loads(encoded)).bind(data)
+    log(f"加载耗时 {time.perf_counter() - started:.2f} 秒")
+    del index_data, encoded
+
+    mismatches = []
+    linear_times = []
+    index_times = []
+    # 索引搜索的耗时主要取决于结果数(每个结果都要逐一判断)，按结果数分档统计
+    by_results = {limit: [] for limit in RESULT_BUCKETS}
+    for query in sample_queries(data, args.queries, args.seed):
+        started = time.perf_counter()
+        expected = substring_search(query, data)
+        linear_times.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        actual = index.search(query)
+        seconds = time.perf_counter() - started
+        index_times.append(seconds)
+        by_results[next(limit for limit in RESULT_BUCKETS if len(expected) <= limit)].append(seconds)
+        if actual != expected:
+            mismatches.append(query)
+
+    def line(name, times):
+        return (f"{name}: {len(times)} 个查询，平均 {sum(times) / len(times) * 1000:.3f} ms，"
+                f"中位数 {_percentile(times, 0.5) * 1000:.3f} ms，p99 {_percentile(times, 0.99) * 1000:.3f} ms")
+
+    print(f"{len(index.docs)} 个文档")
+    print(line("线性搜索", linear_times))
+    print(line("索引搜索", index_times))
+    previous = 0
+    for limit, times in by_results.items():
+        if times:
+            if limit == previous:
+                label = f"{limit}"
+            elif limit == RESULT_BUCKETS[-1]:
+                label = f"{previous}+"
+            else:
+                label = f"{previous}-{limit}"
+            print(line(f"  结果数 {label}", times))
+        previous = limit + 1
+    print(f"加速 {sum(linear_times) / max(sum(index_times), 1e-9):.1f} 倍")
+    if mismatches:
+        print(f"{len(mismatches)} 个查询的结果不一致，例如: {mismatches[:5]!r}")
+        return 1
+    print("所有查询的结果与线性搜索一致")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
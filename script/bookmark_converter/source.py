@@ -0,0 +1,388 @@
+"""书签文件的输入层
+
+文件只以 mmap 方式映射一次，之后的所有读取都来自这块映射(判断格式、计算缓存指纹和解析共用同一个 InputFile)：
+
+- 普通文件：按块切出 memoryview 直接交给解码器，不复制也不整体读入
+- .gz：用 gzip 边读边解压；.zip：按顺序逐个解压其中的文件，每个文件作为一个文档
+  (是否为压缩包根据文件开头的特征字节判断，与扩展名无关)
+- 已经处理过的页面通过 madvise 交还给系统，常驻内存不随文件大小增长
+
+编码从文档开头判断：BOM 优先，其次是 UTF-16 的零字节特征，
+再其次是 ``<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=...">`` 中声明的编码。
+没有声明或声明为 UTF-8 时，从第一个非 ASCII 字节开始暂存一段数据判断是 UTF-8 还是 GB18030(GBK 的超集)，
+判断完成前不产出这段文本，不需要重新读取文件。
+
+解码是增量进行的，任何时候都不会构造与文件等长的字符串。
+"""
+import codecs
+import io
+import mmap
+import os
+import re
+
+# 判断格式和编码时查看的文档开头字节数
+SNIFF_BYTES = 4096
+
+# 每次交给解码器的字节数
+READ_SIZE = 1024 * 1024
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZIP_MAGIC = b"PK\x03\x04"
+
+# 浏览器只识别 UTF-8 和 UTF-16 的 BOM
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+)
+
+_META_CHARSET = re.compile(rb"<meta[^>]*?charset\s*=\s*[\"']?\s*([a-z0-9_.:-]+)", re.IGNORECASE)
+
+# 与浏览器(WHATWG Encoding 标准)一致，声明的编码按其常用的超集解码
+_ENCODING_SUPERSETS = {
+    'ascii': 'cp1252',
+    'iso8859-1': 'cp1252',
+    'gb2312': 'gb18030',
+    'gbk': 'gb18030',
+    'big5': 'big5hkscs',
+    'shift_jis': 'cp932',
+    'euc_kr': 'cp949',
+}
+
+_MADV_DONTNEED = getattr(mmap, 'MADV_DONTNEED', None)
+
+# 未声明编码时，合法的多字节 UTF-8 字符累计达到这么多字节就确定为 UTF-8
+# (GBK 文本碰巧是合法 UTF-8 的概率随长度迅速下降)
+UTF8_EVIDENCE_BYTES = 256
+
+# 未声明编码时最多暂存这么多字节来判断编码，超过后按 UTF-8 继续
+DECIDE_BYTES = 1024 * 1024
+
+_NON_ASCII = re.compile(rb"[\x80-\xff]")
+
+
+def _normalize_encoding(name):
+    """规范化声明的编码名称，无法识别时返回 None"""
+    try:
+        name = codecs.lookup(name.decode('ascii')).name
+    except (LookupError, UnicodeDecodeError):
+        return None
+    if name.startswith('utf-16') or name.startswith('utf-32'):
+        # 文件开头能按 ASCII 读出 META 说明并不是 UTF-16，浏览器此时按 UTF-8 处理
+        return 'utf-8'
+    return _ENCODING_SUPERSETS.get(name, name)
+
+
+def sniff_encoding(head):
+    """根据文档开头的字节判断编码，返回 (编码, BOM 长度)；编码为 None 表示未声明"""
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding, len(bom)
+    if len(head) >= 2:
+        if head[0] == 0 and head[1] != 0:
+            return 'utf-16-be', 0
+        if head[0] != 0 and head[1] == 0:
+            return 'utf-16-le', 0
+    match = _META_CHARSET.search(head)
+    if match:
+        return _normalize_encoding(match.group(1)), 0
+    return None, 0
+
+
+class _Utf8OrGb18030Decoder:
+    """未声明编码时使用的增量解码器
+
+    第一个非 ASCII 字节之前的内容两种编码的结果相同，直接交给解析器。
+    从第一个非 ASCII 字节开始暂存原始字节并试着按 UTF-8 解码，暂不产出文本，直到能够确定编码：
+    - 出现非法的 UTF-8 字节：从第一个非 ASCII 字节开始按 GB18030(GBK 的超集)重新解码暂存的字节
+    - 合法的多字节 UTF-8 字符累计达到 UTF8_EVIDENCE_BYTES 字节、暂存达到 DECIDE_BYTES 字节或文件结束：
+      确定为 UTF-8
+    确定为 UTF-8 之后再遇到非法字节说明文件混用了编码，直接抛出 UnicodeDecodeError。
+    暂存的字节不超过 DECIDE_BYTES 加一个读取块。
+    """
+
+    def __init__(self, on_fallback):
+        self.encoding = None  # 确定之前为 None
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._pending = bytearray()  # 从第一个非 ASCII 字节开始暂存的字节
+        self._held = []  # 暂存字节按 UTF-8 解码出的文本
+        self._evidence = 0
+        self._on_fallback = on_fallback
+
+    def decode(self, data, final=False):
+        if self.encoding is not None:
+            return self._decoder.decode(data, final)
+        prefix = ''
+        if not self._pending:
+            match = _NON_ASCII.search(data)
+            if match is None:
+                return str(data, 'ascii')
+            prefix = str(data[:match.start()], 'ascii')
+            data = data[match.start():]
+        self._pending += data
+        try:
+            text = self._decoder.decode(data, final)
+        except UnicodeDecodeError:
+            self.encoding = 'gb18030'
+            self._decoder = codecs.getincrementaldecoder('gb18030')()
+            self._on_fallback()
+            return prefix + self._take(self._decoder.decode(self._pending, final))
+        self._held.append(text)
+        self._evidence += len(text.encode('utf-8')) - len(text)
+        if final or self._evidence >= UTF8_EVIDENCE_BYTES or len(self._pending) >= DECIDE_BYTES:
+            self.encoding = 'utf-8'
+            return prefix + self._take(''.join(self._held))
+        return prefix
+
+    def _take(self, text):
+        """确定编码后释放暂存的数据"""
+        self._pending = None
+        self._held = None
+        return text
+
+
+class _MapReader(io.RawIOBase):
+    """把 mmap 包装为可定位的只读文件对象，供 gzip/zipfile 使用"""
+
+    def __init__(self, data):
+        super().__init__()
+        self._map = data
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def read(self, size=-1):
+        return self._map.read(size)
+
+    def readinto(self, buffer):
+        data = self._map.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        self._map.seek(offset, whence)
+        return self._map.tell()
+
+    def tell(self):
+        return self._map.tell()
+
+
+class Document:
+    """输入中的一个文档
+
+    name 为压缩包中的文件名(普通文件和 .gz 为 None)，head 为开头最多 SNIFF_BYTES 个字节。
+    chunks() 按顺序产出全部字节块(包括 head)，只能迭代一次。
+    """
+
+    def __init__(self, name, head, rest):
+        self.name = name
+        self.head = head
+        self._rest = rest
+
+    def chunks(self):
+        if self.head:
+            yield self.head
+        yield from self._rest
+
+    def read(self):
+        """读出整个文档的字节；只用于本来就需要完整数据的格式(如 JSON、plist)"""
+        return b''.join(self.chunks())
+
+
+class InputFile:
+    """以 mmap 方式打开的输入文件，用作上下文管理器
+
+    documents() 逐个产出其中的文档，可以多次调用，每次都从头开始；
+    position 为已经读到的文件位置，用于按字节显示进度。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self._file = open(path, 'rb')
+        self._map = None
+        self._offset = 0
+        self._released = 0
+        self._head = None
+        if self.size:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(self._map, 'madvise'):
+                self._map.madvise(mmap.MADV_SEQUENTIAL)
+        head = self._map[:len(_ZIP_MAGIC)] if self._map is not None else b''
+        if head.startswith(_GZIP_MAGIC):
+            self.compression = 'gzip'
+        elif head.startswith(_ZIP_MAGIC):
+            self.compression = 'zip'
+        else:
+            self.compression = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                pass  # 调用方仍持有数据块的视图，映射在视图释放后由垃圾回收关闭
+            self._map = None
+        self._file.close()
+
+    @property
+    def head(self):
+        """第一个文档开头最多 SNIFF_BYTES 个字节，用于判断输入格式"""
+        if self._head is None:
+            documents = self.documents()
+            try:
+                self._head = next(documents).head
+            finally:
+                documents.close()
+        return self._head
+
+    @property
+    def position(self):
+        if self._map is None:
+            return self.size
+        return self._offset if self.compression is None else self._map.tell()
+
+    def _release(self):
+        """已读过的页面不再需要，通知系统回收"""
+        if _MADV_DONTNEED is None or not hasattr(self._map, 'madvise'):
+            return
+        end = self.position - self.position % mmap.ALLOCATIONGRANULARITY
+        if end > self._released:
+            self._map.madvise(_MADV_DONTNEED, self._released, end - self._released)
+            self._released = end
+
+    def raw_chunks(self):
+        """按顺序产出文件的原始字节块(压缩包不解压)，用于计算内容哈希"""
+        if self._map is None:
+            return
+        with memoryview(self._map) as view:
+            for start in range(0, self.size, READ_SIZE):
+                chunk = view[start:start + READ_SIZE]
+                yield chunk
+                chunk.release()
+
+    def documents(self):
+        if self._map is None:
+            yield Document(None, b'', iter(()))
+            return
+        self._map.seek(0)
+        self._released = 0
+        if self.compression == 'gzip':
+            import gzip  # 压缩包不常见，用到时才导入
+
+            with gzip.GzipFile(fileobj=_MapReader(self._map)) as stream:
+                yield self._stream_document(None, stream)
+        elif self.compression == 'zip':
+            import zipfile
+
+            try:
+                archive = zipfile.ZipFile(_MapReader(self._map))
+            except zipfile.BadZipFile as e:
+                raise ValueError(f"无法读取压缩包: {e}")
+            with archive:
+                members = [info for info in archive.infolist() if not info.is_dir()
+                           and not info.filename.startswith('__MACOSX/')
+                           and not os.path.basename(info.filename).startswith('.')]
+                if not members:
+                    raise ValueError("压缩包中没有文件")
+                for info in members:
+                    with archive.open(info) as stream:
+                        yield self._stream_document(info.filename, stream)
+        else:
+            head_size = min(SNIFF_BYTES, self.size)
+            yield Document(None, self._map[:head_size], self._map_chunks(head_size))
+
+    def _map_chunks(self, start):
+        self._offset = start
+        with memoryview(self._map) as view:
+            while self._offset < self.size:
+                end = min(self._offset + READ_SIZE, self.size)
+                chunk = view[self._offset:end]
+                self._offset = end
+                yield chunk
+                chunk.release()
+                self._release()
+
+    def _stream_document(self, name, stream):
+        def rest():
+            while True:
+                data = stream.read(READ_SIZE)
+                if not data:
+                    break
+                yield data
+                self._release()
+        return Document(name, stream.read(SNIFF_BYTES), rest())
+
+    def iter_text(self, log, progress=None):
+        """见 iter_text"""
+        for document in self.documents():
+            if document.name:
+                log(f"读取压缩包中的文件: {document.name}")
+            yield document.name, _with_progress(iter_document_text(document, log), self, progress)
+
+    def read_text(self, log):
+        """见 read_text"""
+        return ''.join(chunk for _, chunks in self.iter_text(log) for chunk in chunks)
+
+
+def iter_document_text(document, log):
+    """增量解码文档，产出文本块"""
+    encoding, bom_size = sniff_encoding(document.head)
+    if encoding is None or encoding == 'utf-8':
+        decoder = _Utf8OrGb18030Decoder(lambda: log("UTF-8编码读取失败，改用 GB18030 编码继续读取"))
+    else:
+        log(f"文件编码: {encoding}")
+        decoder = codecs.getincrementaldecoder(encoding)()
+    skip = bom_size
+    for data in document.chunks():
+        if skip:
+            data, skip = data[skip:], 0
+        text = decoder.decode(data)
+        if text:
+            yield text
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+def iter_text(path, log, progress=None):
+    """逐个文档增量解码输入文件，产出 (文档名称, 文本块迭代器)
+
+    progress(percent) 按已读取的文件字节数报告 0-100 的进度。
+    """
+    with InputFile(path) as source:
+        yield from source.iter_text(log, progress)
+
+
+def _with_progress(chunks, source, progress):
+    for chunk in chunks:
+        if progress is not None and source.size:
+            progress(100 * source.position / source.size)
+        yield chunk
+
+
+def read_text(path, log):
+    """读出输入文件的全部文本；压缩包中有多个文件时依次连接"""
+    with InputFile(path) as source:
+        return source.read_text(log)
+
+
+def read_head(path):
+    """读出第一个文档开头的字节，用于判断输入格式"""
+    with InputFile(path) as source:
+        return source.head
+
+
+def is_archive(path):
+    """是否为 .gz/.zip 压缩包"""
+    with InputFile(path) as source:
+        return source.compression is not None
@@ -0,0 +1,161 @@
+"""生成可直接批量导入 D1 的 SQL 文件
+
+表结构见仓库根目录的 init_table.sql 和 migrations/002_add_is_public.sql。
+通过 /api/import 导入时每个分组、每个站点都要单独查询数据库，几万条书签就是几万次往返；
+这里改为生成带显式ID的多行 INSERT 语句，用 ``wrangler d1 execute <DB> --file result.sql`` 一次导入。
+
+生成的语句使用字面量而不是绑定参数，因此不受参数个数限制；
+每条语句的长度和行数都有上限(D1 单条语句最长 100KB)，超出时拆分为多条。
+不写 BEGIN/COMMIT，因为 D1 不允许在文件中显式使用事务。
+"""
+from .engine import _noop
+
+# D1 单条 SQL 语句的长度上限为 100,000 字节，留出余量
+DEFAULT_MAX_STATEMENT_BYTES = 90000
+# 每条 INSERT 的最大行数
+DEFAULT_MAX_ROWS = 500
+
+GROUP_COLUMNS = ("id", "name", "order_num", "is_public", "created_at", "updated_at")
+SITE_COLUMNS = ("id", "group_id", "name", "url", "icon", "description", "notes", "order_num",
+                "is_public", "created_at", "updated_at")
+CONFIG_COLUMNS = ("key", "value")
+
+
+class SqlExpression(str):
+    """原样写入 SQL 的表达式(不加引号)"""
+
+
+# 缺少时间戳时使用数据库的当前时间，与表的默认值一致
+CURRENT_TIMESTAMP = SqlExpression("CURRENT_TIMESTAMP")
+
+
+def sql_literal(value):
+    """将 Python 值转换为 SQLite 字面量"""
+    if isinstance(value, SqlExpression):
+        return str(value)
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    # SQLite 字符串中单引号写两次；NUL 字符无法出现在 SQL 文本中，直接去掉
+    return "'" + str(value).replace("\x00", "").replace("'", "''") + "'"
+
+
+def upsert_clause(columns, key="id"):
+    """按主键更新已有行的 ON CONFLICT 子句
+
+    与 INSERT OR REPLACE 不同，已有的行不会被先删除再插入，
+    因此不会触发外键的 ON DELETE CASCADE(替换分组时删掉其中所有站点)。
+    """
+    updates = ", ".join(f"{column} = excluded.{column}" for column in columns if column != key)
+    return f"\nON CONFLICT({key}) DO UPDATE SET {updates}"
+
+
+def iter_insert_statements(table, columns, rows, verb="INSERT", max_bytes=DEFAULT_MAX_STATEMENT_BYTES,
+                           max_rows=DEFAULT_MAX_ROWS, log=None, conflict="", shrink=None):
+    """把行数据拼成若干条多行 INSERT 语句
+
+    rows 中每一项是与 columns 对应的值元组。单行本身就超过 max_bytes 时先用 shrink(row) 缩小
+    (返回 None 表示无法缩小)，仍然超过时单独成一条语句并记录警告。
+    conflict 为附加在每条语句末尾的子句(如 upsert_clause 的结果)。
+    """
+    log = log or _noop
+    head = f"{verb} INTO {table} ({', '.join(columns)}) VALUES\n"
+    head_size = len(head.encode('utf-8')) + len(conflict.encode('utf-8'))
+
+    values = []
+    size = head_size
+    for row in rows:
+        text, text_size = _row_text(row)
+        if head_size + text_size > max_bytes and shrink is not None:
+            smaller = shrink(row)
+            if smaller is not None:
+                text, text_size = _row_text(smaller)
+        if values and (size + text_size > max_bytes or len(values) >= max_rows):
+            yield head + ",\n".join(values) + conflict + ";\n"
+            values = []
+            size = head_size
+        if head_size + text_size > max_bytes:
+            log(f"警告: {table} 表中有一行长度为 {text_size} 字节，超过单条语句的上限")
+        values.append(text)
+        size += text_size
+    if values:
+        yield head + ",\n".join(values) + conflict + ";\n"
+
+
+def _row_text(row):
+    """一行的 VALUES 文本及其字节数(包括分隔符 ",\n" 或结尾 ";\n")"""
+    text = "(" + ", ".join(sql_literal(v) for v in row) + ")"
+    return text, len(text.encode('utf-8')) + 2
+
+
+def _timestamp(record, key):
+    return record.get(key) or CURRENT_TIMESTAMP
+
+
+def _group_rows(groups):
+    for g in groups:
+        yield (g["id"], g["name"], g["order_num"], g.get("is_public", 1),
+               _timestamp(g, "created_at"), _timestamp(g, "updated_at"))
+
+
+def _site_rows(groups, icons):
+    from .icons import resolve_icon
+
+    for g in groups:
+        for s in g.get("sites", []):
+            icon = resolve_icon(s.get("icon"), icons) if icons else s.get("icon")
+            yield (s["id"], s["group_id"], s["name"], s["url"], icon or "",
+                   s.get("description", ""), s.get("notes", ""), s["order_num"],
+                   s.get("is_public", 1), _timestamp(s, "created_at"), _timestamp(s, "updated_at"))
+
+
+def _site_row_without_icon(log):
+    """iter_insert_statements 的 shrink：单个站点本身就超出上限时(通常是图标过大)去掉图标"""
+    icon = SITE_COLUMNS.index("icon")
+
+    def shrink(row):
+        if not row[icon]:
+            return None
+        log(f"站点 {row[SITE_COLUMNS.index('name')]} 的图标过大，已在 SQL 中去掉图标")
+        return row[:icon] + ("",) + row[icon + 1:]
+    return shrink
+
+
+def write_sql(result, output_path, replace=False, include_configs=True,
+              max_bytes=DEFAULT_MAX_STATEMENT_BYTES, max_rows=DEFAULT_MAX_ROWS, log=None):
+    """将转换结果写成 SQL 文件，返回写出的语句数
+
+    replace 为 True 时用 INSERT ... ON CONFLICT(id) DO UPDATE 覆盖ID相同的已有分组和站点，
+    不在文件中的站点保持不变；否则使用普通 INSERT，适合导入到新建的数据库。
+    created_at/updated_at 缺失时写入 CURRENT_TIMESTAMP，与表的默认值一致。
+    """
+    log = log or _noop
+    groups = result["groups"]
+    icons = result.get("icons") or {}
+    count = 0
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write("-- 由书签转换工具生成，表结构见 init_table.sql\n")
+        f.write("-- 导入: wrangler d1 execute <数据库名> --file <本文件>\n\n")
+
+        sections = [
+            ("groups", GROUP_COLUMNS, _group_rows(groups), upsert_clause(GROUP_COLUMNS) if replace else "", None),
+            ("sites", SITE_COLUMNS, _site_rows(groups, icons), upsert_clause(SITE_COLUMNS) if replace else "",
+             _site_row_without_icon(log)),
+        ]
+        if include_configs and result.get("configs"):
+            # DB_INITIALIZED 在初始化数据库时已经写入，配置统一覆盖
+            configs = ((k, v) for k, v in result["configs"].items())
+            sections.append(("configs", CONFIG_COLUMNS, configs, upsert_clause(CONFIG_COLUMNS, "key"), None))
+
+        for table, columns, rows, conflict, shrink in sections:
+            for statement in iter_insert_statements(table, columns, rows, "INSERT", max_bytes, max_rows, log,
+                                                    conflict, shrink):
+                f.write(statement)
+                count += 1
+
+    log(f"已生成 {count} 条 SQL 语句: {output_path}")
+    return count
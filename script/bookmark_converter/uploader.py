@@ -0,0 +1,355 @@
+"""把导入包直接上传到导航站 worker 的 /api/import
+
+流程：登录(POST /api/login，取回 auth_token Cookie) -> 用有限的并发数逐个发送导入包 -> 汇总结果。
+
+- 所有请求共用一个保持连接(keep-alive)的连接池，连接数等于并发数，不会为每个请求重新握手
+- 遇到 429 和 5xx 响应或网络错误时按指数退避重试，优先使用服务器返回的 Retry-After
+- 每个成功的导入包都记录到检查点文件(按内容哈希)，中途失败后重新运行会跳过已完成的导入包
+- worker 按名称合并分组，两个请求同时创建同名分组会产生重复分组，
+  因此引用了相同分组名称的导入包不会同时发送
+
+导入包就是 writer.ExportWriter 写出的 ExportData 文件，每个都必须小于 worker 的 MAX_BODY_SIZE。
+"""
+import hashlib
+import http.client
+import json
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from urllib.parse import urlsplit
+
+from .engine import _noop
+from .incremental import _write_json_atomic
+from .writer import DEFAULT_MAX_BYTES, MAX_BODY_SIZE, write_export
+
+CHECKPOINT_VERSION = 1
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RETRIES = 5
+DEFAULT_TIMEOUT = 60
+# 第一次重试前等待的秒数，之后每次翻倍
+DEFAULT_BACKOFF = 0.5
+MAX_BACKOFF = 30
+
+
+class UploadError(Exception):
+    """上传失败(认证失败、请求被拒绝或重试次数用尽)"""
+
+    def __init__(self, message, status=None, body=None):
+        super().__init__(message)
+        self.status = status
+        self.body = body
+
+
+def _is_retryable(status):
+    return status == 429 or status >= 500
+
+
+def checkpoint_path_for(path):
+    """导入包对应的默认检查点文件路径"""
+    return os.path.splitext(path)[0] + ".upload.json"
+
+
+class Bundle:
+    """一个待上传的导入包"""
+
+    def __init__(self, name, body):
+        self.name = name
+        self.body = body  # UTF-8 编码的请求体
+        data = json.loads(body)
+        # 检查点按内容识别导入包；重新生成的导入包只有导出时间不同时仍视为同一个
+        content = {k: v for k, v in data.items() if k != "exportDate"}
+        canonical = json.dumps(content, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+        self.digest = hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
+        self.site_count = len(data.get("sites", []))
+        self.group_names = sorted({g.get("name", "") for g in data.get("groups", [])})
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, 'rb') as f:
+            return cls(path, f.read())
+
+
+class ConnectionPool:
+    """同一主机的保持连接池"""
+
+    def __init__(self, base_url, size=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT):
+        parts = urlsplit(base_url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(f"不支持的地址: {base_url}")
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self.created = 0  # 新建连接数，用于确认连接被复用
+
+    def _connect(self):
+        self.created += 1
+        if self.scheme == 'https':
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method, path, body=None, headers=None):
+        """发送请求，返回 (状态码, 响应头, 响应体)"""
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                conn.request(method, self.prefix + path, body, headers or {})
+                response = conn.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                self._idle.put(conn)
+            return response.status, response.headers, data
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class UploadCheckpoint:
+    """已成功上传的导入包(内容哈希 -> 导入结果)"""
+
+    def __init__(self, path=None, target=None):
+        self.path = path
+        self.target = target
+        self.done = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != CHECKPOINT_VERSION:
+                raise ValueError(f"不支持的检查点版本: {data.get('version')}")
+            # 换了目标站点时之前的记录不再有效
+            if data.get("target") == target:
+                self.done = data.get("done", {})
+
+    def __contains__(self, bundle):
+        return bundle.digest in self.done
+
+    def mark(self, bundle, stats):
+        with self._lock:
+            self.done[bundle.digest] = {"name": bundle.name, "sites": bundle.site_count, "stats": stats}
+            if self.path:
+                _write_json_atomic({"version": CHECKPOINT_VERSION, "target": self.target, "done": self.done},
+                                   self.path)
+
+
+class Uploader:
+    """并发上传导入包"""
+
+    def __init__(self, base_url, username=None, password=None, token=None, concurrency=DEFAULT_CONCURRENCY,
+                 retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, timeout=DEFAULT_TIMEOUT, checkpoint_path=None,
+                 log=None, progress=None):
+        self.base_url = base_url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.token = token
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
+        self.backoff = backoff
+        self.log = log or _noop
+        self.progress = progress or _noop
+        self.pool = ConnectionPool(self.base_url, self.concurrency, timeout)
+        self.checkpoint = UploadCheckpoint(checkpoint_path, self.base_url)
+        self.latencies = []
+        self._group_locks = {}
+        self._locks_guard = threading.Lock()
+        self._auth_lock = threading.Lock()
+        self._done_sites = 0
+        self._total_sites = 0
+
+    def _headers(self):
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Cookie"] = f"auth_token={self.token}"
+        return headers
+
+    def _send(self, method, path, body=None, retry_429=True):
+        """发送请求，429/5xx 和网络错误时退避重试；返回 (状态码, 响应头, 响应体, 耗时)"""
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                status, headers, data = self.pool.request(method, path, body, self._headers())
+                error = None
+            except (OSError, http.client.HTTPException) as e:
+                status, headers, data, error = None, None, b"", e
+            elapsed = time.perf_counter() - started
+            if error is None and (not _is_retryable(status) or (status == 429 and not retry_429)):
+                return status, headers, data, elapsed
+            if attempt >= self.retries:
+                reason = f"HTTP {status}" if error is None else str(error)
+                raise UploadError(f"{method} {path} 重试 {attempt} 次后仍然失败: {reason}", status, data)
+            delay = self._delay(attempt, headers)
+            reason = f"HTTP {status}" if error is None else type(error).__name__
+            self.log(f"{method} {path} 失败({reason})，{delay:.1f} 秒后重试")
+            time.sleep(delay)
+            attempt += 1
+
+    def _delay(self, attempt, headers):
+        retry_after = headers.get("Retry-After") if headers else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), MAX_BACKOFF)
+        # 加入随机抖动，避免并发请求在同一时刻重试
+        return min(self.backoff * (2 ** attempt), MAX_BACKOFF) * random.uniform(0.5, 1.0)
+
+    def login(self):
+        """登录并保存 auth_token；没有用户名时不登录(worker 未启用认证)"""
+        if not self.username:
+            return
+        body = json.dumps({"username": self.username, "password": self.password or "", "rememberMe": False})
+        # 登录限流为 15 分钟 5 次，每次重试都会消耗次数，所以 429 时不重试
+        status, headers, data, _ = self._send("POST", "/api/login", body.encode('utf-8'), retry_429=False)
+        result = _json_or_none(data) or {}
+        if status != 200 or not result.get("success"):
+            raise UploadError(f"登录失败: {result.get('message') or f'HTTP {status}'}", status, data)
+
+        cookie = SimpleCookie()
+        for header in headers.get_all("Set-Cookie") or []:
+            cookie.load(header)
+        if "auth_token" not in cookie:
+            raise UploadError("登录成功但响应中没有 auth_token", status, data)
+        self.token = cookie["auth_token"].value
+        self.log(f"已登录: {self.username}")
+
+    def _group_lock_list(self, bundle):
+        with self._locks_guard:
+            return [self._group_locks.setdefault(name, threading.Lock()) for name in bundle.group_names]
+
+    def upload_bundle(self, bundle):
+        """上传单个导入包，返回 worker 返回的统计信息"""
+        if len(bundle.body) > MAX_BODY_SIZE:
+            raise UploadError(f"{bundle.name} 大小为 {len(bundle.body)} 字节，超过 worker 的 1MB 限制，"
+                              f"请用 --max-bytes 重新拆分")
+
+        locks = self._group_lock_list(bundle)  # 已按名称排序，依次加锁不会死锁
+        for lock in locks:
+            lock.acquire()
+        try:
+            token = self.token
+            status, _, data, elapsed = self._send("POST", "/api/import", bundle.body)
+            if status == 401 and self.username:
+                # 令牌过期时重新登录一次；其他线程已经重新登录过的就直接使用新令牌
+                with self._auth_lock:
+                    if self.token == token:
+                        self.login()
+                status, _, data, elapsed = self._send("POST", "/api/import", bundle.body)
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+        result = _json_or_none(data)
+        if status != 200 or not isinstance(result, dict) or not result.get("success"):
+            message = (result or {}).get("message") or (result or {}).get("error") or data[:200].decode('utf-8', 'replace')
+            errors = (result or {}).get("errors")
+            if errors:
+                message += ": " + "; ".join(errors[:5])
+            raise UploadError(f"{bundle.name} 导入失败(HTTP {status}): {message}", status, data)
+
+        self.latencies.append(elapsed)
+        self.checkpoint.mark(bundle, result.get("stats"))
+        with self._locks_guard:
+            self._done_sites += bundle.site_count
+            done = self._done_sites
+        self.log(f"已导入 {os.path.basename(bundle.name)}: {bundle.site_count} 个站点，耗时 {elapsed * 1000:.0f} ms")
+        if self._total_sites:
+            self.progress(done * 100 // self._total_sites)
+        return result.get("stats")
+
+    def upload(self, bundles):
+        """登录并上传所有导入包，返回统计信息；失败的导入包记录在 failed 中，不影响其他导入包"""
+        bundles = list(bundles)
+        pending = [b for b in bundles if b not in self.checkpoint]
+        skipped = len(bundles) - len(pending)
+        if skipped:
+            self.log(f"检查点中已有 {skipped} 个导入包完成，跳过")
+        self._total_sites = sum(b.site_count for b in pending)
+        self._done_sites = 0
+
+        report = {"bundles": len(pending), "skipped": skipped, "sites": 0, "failed": [],
+                  "seconds": 0.0, "sites_per_second": 0.0, "latency": {}}
+        if not pending:
+            return report
+
+        started = time.perf_counter()
+        try:
+            if not self.token:
+                self.login()
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                futures = [(b, executor.submit(self.upload_bundle, b)) for b in pending]
+                for bundle, future in futures:
+                    try:
+                        future.result()
+                        report["sites"] += bundle.site_count
+                    except UploadError as e:
+                        self.log(str(e))
+                        report["failed"].append({"name": bundle.name, "status": e.status, "error": str(e)})
+        finally:
+            self.pool.close()
+
+        seconds = time.perf_counter() - started
+        report["seconds"] = round(seconds, 3)
+        report["sites_per_second"] = round(report["sites"] / seconds, 1) if seconds else 0.0
+        report["latency"] = latency_summary(self.latencies)
+        self.log(
+            f"上传完成: {report['sites']} 个站点，{len(pending) - len(report['failed'])}/{len(pending)} 个导入包，"
+            f"耗时 {seconds:.2f} 秒，{report['sites_per_second']} 站点/秒，"
+            f"单次请求 p50 {report['latency'].get('p50_ms', 0)} ms / "
+            f"p95 {report['latency'].get('p95_ms', 0)} ms，新建连接 {self.pool.created} 个"
+        )
+        return report
+
+
+def _json_or_none(data):
+    try:
+        return json.loads(data)
+    except ValueError:
+        return None
+
+
+def latency_summary(latencies):
+    """请求耗时的分位数(毫秒)"""
+    if not latencies:
+        return {}
+    ordered = sorted(latencies)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+    return {"count": len(ordered), "p50_ms": pick(0.5), "p95_ms": pick(0.95), "max_ms": round(ordered[-1] * 1000, 1)}
+
+
+def load_bundles(paths, workdir, max_bytes=DEFAULT_MAX_BYTES, log=None):
+    """读取待上传的文件
+
+    ExportData 格式的文件直接作为导入包；转换工具的嵌套格式(分组内嵌站点)先按 max_bytes 拆分到 workdir 中。
+    """
+    log = log or _noop
+    bundles = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict) and "sites" in data:
+            bundles.append(Bundle.from_file(path))
+            continue
+        log(f"{path} 不是导出格式，拆分为导入包")
+        base = os.path.splitext(os.path.basename(path))[0]
+        for shard in write_export(data, os.path.join(workdir, base + ".json"), max_bytes, log=log):
+            bundles.append(Bundle.from_file(shard))
+    return bundles
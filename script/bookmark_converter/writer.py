@@ -0,0 +1,294 @@
+"""按导航站原生导出格式(ExportData)流式写出，并可按大小分片
+
+worker 的 /api/import 接收的是扁平结构：
+
+    {"version": "1.0", "exportDate": "...", "groups": [...], "sites": [...], "configs": {...}}
+
+并且请求体不能超过 1MB(worker/index.ts 中的 MAX_BODY_SIZE)。
+ExportWriter 逐条写出记录，不在内存中构建整个文档；指定 max_bytes 时按字节预算拆分为多个导入包：
+- 每个分片都带有其中站点所引用的分组，站点的 group_id 不会失去对应的分组
+  (同一分组的站点分到多个分片时，分组记录会在每个分片中重复出现，导入时按名称合并)
+- 完整配置只写入第一个分片，其余分片的 configs 为空对象
+- 增量文件的 "removed"(已删除站点的列表，见 incremental 模块)也只写入第一个分片，worker 导入时忽略这个键
+- 写出前按 worker 的 validateExportData 规则整理记录，保证每个分片都能通过验证
+"""
+import json
+import os
+import re
+from datetime import datetime, timezone
+
+from .engine import _noop
+
+EXPORT_VERSION = "1.0"
+
+# worker 允许的最大请求体(1MB)，默认预算留出余量
+MAX_BODY_SIZE = 1024 * 1024
+DEFAULT_MAX_BYTES = MAX_BODY_SIZE - 16 * 1024
+
+GROUP_FIELDS = ("id", "name", "order_num", "is_public", "created_at", "updated_at")
+SITE_FIELDS = ("id", "group_id", "name", "url", "icon", "description", "notes", "order_num",
+               "is_public", "created_at", "updated_at")
+
+_SCHEME_RE = re.compile(r'^[A-Za-z][A-Za-z0-9+.\-]*:')
+_SPECIAL_SCHEMES = ('http', 'https', 'ftp', 'ws', 'wss')
+
+
+def is_valid_url(url):
+    """近似判断 URL 能否被 JavaScript 的 new URL() 解析"""
+    if not isinstance(url, str) or not _SCHEME_RE.match(url):
+        return False
+    scheme, _, rest = url.partition(':')
+    if scheme.lower() in _SPECIAL_SCHEMES:
+        host = rest.lstrip('/').split('/', 1)[0].split('?', 1)[0].split('#', 1)[0]
+        host = host.rpartition('@')[2]
+        return bool(host) and not any(c in host for c in ' <>^|\\')
+    return True
+
+
+def validate_export_data(data):
+    """按 worker 中 validateExportData 的规则检查导出数据，返回错误列表"""
+    errors = []
+    if not isinstance(data, dict):
+        return ["数据必须是对象"]
+    if not data.get("version") or not isinstance(data.get("version"), str):
+        errors.append("缺少或无效的版本信息")
+    if not data.get("exportDate") or not isinstance(data.get("exportDate"), str):
+        errors.append("缺少或无效的导出日期")
+
+    groups = data.get("groups")
+    if not isinstance(groups, list):
+        errors.append("groups 必须是数组")
+    else:
+        for index, g in enumerate(groups):
+            if not isinstance(g, dict):
+                errors.append(f"groups[{index}]: 必须是对象")
+                continue
+            if not g.get("name") or not isinstance(g.get("name"), str):
+                errors.append(f"groups[{index}]: name 必须是字符串")
+            if not _is_number(g.get("order_num")):
+                errors.append(f"groups[{index}]: order_num 必须是数字")
+
+    sites = data.get("sites")
+    if not isinstance(sites, list):
+        errors.append("sites 必须是数组")
+    else:
+        for index, s in enumerate(sites):
+            if not isinstance(s, dict):
+                errors.append(f"sites[{index}]: 必须是对象")
+                continue
+            if not s.get("name") or not isinstance(s.get("name"), str):
+                errors.append(f"sites[{index}]: name 必须是字符串")
+            if not s.get("url") or not isinstance(s.get("url"), str):
+                errors.append(f"sites[{index}]: url 必须是字符串")
+            elif not is_valid_url(s["url"]):
+                errors.append(f"sites[{index}]: url 格式无效")
+            if not _is_number(s.get("group_id")):
+                errors.append(f"sites[{index}]: group_id 必须是数字")
+            if not _is_number(s.get("order_num")):
+                errors.append(f"sites[{index}]: order_num 必须是数字")
+
+    if not isinstance(data.get("configs"), dict):
+        errors.append("configs 必须是对象")
+    return errors
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _pick(record, fields):
+    return {k: record[k] for k in fields if k in record}
+
+
+def shard_path(output_path, index):
+    """第 index 个分片的文件名：result.json -> result.001.json"""
+    base, ext = os.path.splitext(output_path)
+    return f"{base}.{index:03d}{ext or '.json'}"
+
+
+class ExportWriter:
+    """流式写出 ExportData 格式
+
+    先用 add_group 登记分组，再用 add_site 逐个写出站点，最后调用 close()。
+    sites 数组直接写入文件；分组记录较少，在每个分片结束时写出该分片引用到的分组。
+    """
+
+    def __init__(self, output_path, configs=None, max_bytes=None, compact=True, log=None,
+                 export_date=None, removed=None):
+        self.output_path = output_path
+        self.configs = configs or {}
+        self.removed = removed
+        self.max_bytes = max_bytes
+        self.compact = compact
+        self.log = log or _noop
+        self.export_date = export_date or datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+        self.paths = []
+        self.skipped = 0
+        self.site_count = 0
+        self._groups = {}  # 分组ID -> 序列化后的分组记录
+        self._file = None
+        self._shard_groups = None
+        self._shard_configs = None
+        self._shard_removed = None
+        self._written_groups = set()  # 已写入任意分片的分组ID
+        self._sites_in_shard = 0
+        self._size = 0
+        self._tail_size = 0
+        self._sep = '\n' if not compact else ''
+
+    def _dumps(self, record):
+        return json.dumps(record, ensure_ascii=False, separators=(',', ':') if self.compact else None)
+
+    def _tail(self, group_ids, configs, removed=None):
+        """分片结尾：groups、configs、removed(只有增量文件的第一个分片才有)、version、exportDate"""
+        sep = self._sep
+        groups = (',' + sep).join(self._groups[gid] for gid in group_ids)
+        removed = f"\"removed\":{self._dumps(removed)},{sep}" if removed is not None else ''
+        return (f"{sep}],{sep}\"groups\":[{sep}{groups}{sep}],{sep}"
+                f"\"configs\":{self._dumps(configs)},{sep}{removed}"
+                f"\"version\":{self._dumps(EXPORT_VERSION)},{sep}"
+                f"\"exportDate\":{self._dumps(self.export_date)}{sep}}}{sep}")
+
+    def _open_shard(self):
+        index = len(self.paths) + 1
+        path = shard_path(self.output_path, index) if self.max_bytes else self.output_path
+        self.paths.append(path)
+        self._file = open(path, 'w', encoding='utf-8')
+        self._shard_groups = []
+        self._shard_configs = self.configs if index == 1 else {}
+        self._shard_removed = self.removed if index == 1 else None
+        head = '{' + self._sep + '"sites":[' + self._sep
+        self._file.write(head)
+        self._size = len(head.encode('utf-8'))
+        self._tail_size = len(self._tail([], self._shard_configs, self._shard_removed).encode('utf-8'))
+        self._sites_in_shard = 0
+
+    def _close_shard(self):
+        self._file.write(self._tail(self._shard_groups, self._shard_configs, self._shard_removed))
+        self._file.close()
+        self._file = None
+
+    def add_group(self, group):
+        """登记分组"""
+        record = _pick(group, GROUP_FIELDS)
+        if not record.get("name"):
+            record["name"] = "未命名分组"
+        self._groups[group["id"]] = self._dumps(record)
+
+    def _sanitize_site(self, site):
+        record = _pick(site, SITE_FIELDS)
+        url = (record.get("url") or "").strip()
+        if url and not is_valid_url(url):
+            url = "https://" + url  # 与 worker 的 validateSite 一致，缺少协议时补上 https://
+        if not is_valid_url(url):
+            return None
+        record["url"] = url
+        if not record.get("name"):
+            record["name"] = url
+        return record
+
+    def add_site(self, site):
+        """写出一个站点；URL 无效的站点会被跳过"""
+        record = self._sanitize_site(site)
+        if record is None:
+            self.skipped += 1
+            self.log(f"跳过URL无效的站点: {site.get('name', '')} ({site.get('url', '')})")
+            return
+        group_id = record["group_id"]
+        if group_id not in self._groups:
+            raise ValueError(f"站点 {record['name']} 引用了未登记的分组 {group_id}")
+
+        text = self._dumps(record)
+        if self.max_bytes:
+            text = self._fit(record, text)
+
+        if self._file is None:
+            self._open_shard()
+        new_group = group_id not in self._shard_groups
+        cost = self._record_cost(text, group_id, new_group)
+        if self.max_bytes and self._sites_in_shard and self._projected(cost) > self.max_bytes:
+            self._close_shard()
+            self._open_shard()
+            new_group = True
+            cost = self._record_cost(text, group_id, new_group)
+
+        if self._sites_in_shard:
+            self._file.write(',' + self._sep)
+        self._file.write(text)
+        if new_group:
+            self._shard_groups.append(group_id)
+            self._written_groups.add(group_id)
+        self._size += cost
+        self._sites_in_shard += 1
+        self.site_count += 1
+
+    def _record_cost(self, text, group_id, new_group):
+        """写入一个站点后分片增加的字节数(包括新引用的分组)"""
+        cost = len(text.encode('utf-8')) + 2
+        if new_group:
+            cost += len(self._groups[group_id].encode('utf-8')) + 2
+        return cost
+
+    def _projected(self, cost):
+        """加上结尾后的分片大小"""
+        return self._size + cost + self._tail_size
+
+    def _fit(self, record, text):
+        """单个站点本身就超出预算时(通常是图标过大)去掉图标"""
+        group_text = self._groups[record["group_id"]]
+        overhead = len(self._tail([], self.configs).encode('utf-8')) + len(group_text.encode('utf-8')) + 64
+        if len(text.encode('utf-8')) + overhead > self.max_bytes and record.get("icon"):
+            self.log(f"站点 {record['name']} 的图标过大，已在导入包中去掉图标")
+            record = dict(record, icon="")
+            text = self._dumps(record)
+        return text
+
+    def close(self):
+        """结束写出，返回所有输出文件的路径"""
+        if self._file is None:
+            self._open_shard()  # 没有任何站点时也写出一个有效的文件
+
+        # 没有站点的分组写入最后一个分片，放不下时另起一个分片
+        for gid in self._groups:
+            if gid in self._written_groups:
+                continue
+            cost = len(self._groups[gid].encode('utf-8')) + 2
+            if self.max_bytes and self._shard_groups and self._projected(cost) > self.max_bytes:
+                self._close_shard()
+                self._open_shard()
+            self._shard_groups.append(gid)
+            self._written_groups.add(gid)
+            self._size += cost
+
+        self._close_shard()
+        return self.paths
+
+
+def write_export(result, output_path, max_bytes=None, compact=True, log=None):
+    """将转换结果(嵌套的 groups/sites)按 ExportData 格式写出，返回输出文件列表
+
+    max_bytes 为每个导入包的字节上限，不指定时写出单个文件。
+    table 模式的图标引用会先还原为 data URI，因为 worker 无法识别引用。
+    增量结果中的 "removed" 写入第一个分片。
+    """
+    from .icons import resolve_icon
+
+    log = log or _noop
+    icons = result.get("icons") or {}
+    writer = ExportWriter(output_path, result.get("configs"), max_bytes, compact, log,
+                          removed=result.get("removed"))
+
+    for group in result["groups"]:
+        writer.add_group(group)
+    for group in result["groups"]:
+        for site in group.get("sites", []):
+            if icons:
+                site = dict(site, icon=resolve_icon(site.get("icon"), icons))
+            writer.add_site(site)
+
+    paths = writer.close()
+    if max_bytes:
+        log(f"已拆分为 {len(paths)} 个导入包，共 {writer.site_count} 个站点")
+    if writer.skipped:
+        log(f"跳过了 {writer.skipped} 个URL无效的站点")
+    return paths
@@ -1,9 +1,47 @@
 import json
 import os
+import queue
+import threading
+import traceback
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox, scrolledtext
-from bs4 import BeautifulSoup
-from datetime import datetime
+
+from bookmark_converter import (
+    DEDUP_POLICIES,
+    LINK_ACTIONS,
+    NEAR_DUP_ACTIONS,
+    ConversionCancelled,
+    FaviconResolver,
+    IconCache,
+    LinkCache,
+    LinkChecker,
+    Metrics,
+    NearDuplicateFinder,
+    ParseCache,
+    SiteIndex,
+    build_result,
+    convert_to_json_format,
+    count_result,
+    default_configs,
+    describe_icon,
+    icon_cache_path_for,
+    link_cache_path_for,
+    parse_bookmarks,
+    search_index_path_for,
+    to_plain,
+    write_result,
+    write_search_index,
+)
+
+# 界面刷新间隔(毫秒)：后台任务的日志和进度按这个频率批量显示
+FRAME_INTERVAL = 50
+# 日志区域最多保留的行数，超出时删除最早的内容
+LOG_MAX_LINES = 5000
+# 预览树每次加载的节点数，其余节点通过"显示更多"继续加载
+PREVIEW_PAGE_SIZE = 500
+# 原始JSON每页显示的字符数
+RAW_PAGE_CHARS = 20000
+
 
 class BookmarkConverterApp:
     def __init__(self, root):
@@ -17,9 +55,32 @@ class BookmarkConverterApp:
         self.output_file_path = tk.StringVar(value="result.json")  # 默认输出文件名
         self.site_title = tk.StringVar(value="导航站")
         self.site_name = tk.StringVar(value="导航站")
+        self.full_path = tk.BooleanVar(value=False)  # 分组名称是否使用完整文件夹路径
+        self.dedup_policy = tk.StringVar(value="skip")  # 重复链接的处理方式
+        self.fetch_icons = tk.BooleanVar(value=False)  # 是否为没有图标的站点获取网站图标
+        self.dead_links = tk.StringVar(value="off")  # 链接检查：off 不检查，其他为失效链接的处理方式
+        self.near_dups = tk.StringVar(value="off")  # 近似重复：off 不检查，其他为近似重复站点的处理方式
+        self.search_index = tk.BooleanVar(value=False)  # 是否同时生成前端搜索索引
+        
+        # 后台任务：解析和转换在工作线程中进行，界面线程只负责按帧显示队列中的日志和进度
+        self.events = queue.Queue()
+        self.worker = None
+        self.cancel_event = threading.Event()
+        
+        # 解析结果缓存：书签文件未变化时，预览后转换或修改配置后重新转换都不再重新解析
+        self.parse_cache = ParseCache()
+        
+        # 预览数据：树节点按需加载，原始JSON按页生成
+        self.preview_result = None
+        self.raw_chunks = None
+        self.raw_buffer = ""
+        self.raw_pages = []
+        self.raw_page = 0
         
         # 创建界面
         self.create_widgets()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(FRAME_INTERVAL, self.drain_events)
     
     def create_widgets(self):
         # 创建选项卡控件
@@ -48,7 +109,7 @@ class BookmarkConverterApp:
         input_frame.pack(fill=tk.X, padx=5, pady=5)
         
         # 书签文件选择
-        ttk.Label(input_frame, text="书签HTML文件:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
+        ttk.Label(input_frame, text="书签文件:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
         ttk.Entry(input_frame, textvariable=self.bookmark_file_path, width=50).grid(row=0, column=1, padx=5, pady=5)
         ttk.Button(input_frame, text="浏览...", command=self.browse_bookmark_file).grid(row=0, column=2, padx=5, pady=5)
         
@@ -69,8 +130,12 @@ class BookmarkConverterApp:
         button_frame = ttk.Frame(main_frame)
         button_frame.pack(fill=tk.X, padx=5, pady=10)
         
-        ttk.Button(button_frame, text="预览结果", command=self.preview_json, width=15).pack(side=tk.RIGHT, padx=5)
-        ttk.Button(button_frame, text="开始转换", command=self.start_conversion, width=15).pack(side=tk.RIGHT, padx=5)
+        self.cancel_button = ttk.Button(button_frame, text="取消", command=self.cancel_task, width=15, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.RIGHT, padx=5)
+        self.preview_button = ttk.Button(button_frame, text="预览结果", command=self.preview_json, width=15)
+        self.preview_button.pack(side=tk.RIGHT, padx=5)
+        self.convert_button = ttk.Button(button_frame, text="开始转换", command=self.start_conversion, width=15)
+        self.convert_button.pack(side=tk.RIGHT, padx=5)
         
         # 日志区域
         log_frame = ttk.LabelFrame(main_frame, text="处理日志", padding=10)
@@ -99,13 +164,57 @@ class BookmarkConverterApp:
         ttk.Label(config_inner_frame, text="网站名称:").grid(row=1, column=0, sticky=tk.W, padx=5, pady=10)
         ttk.Entry(config_inner_frame, textvariable=self.site_name, width=50).grid(row=1, column=1, padx=5, pady=10, sticky=tk.W)
         
-        ttk.Label(config_inner_frame, text="自定义CSS:").grid(row=2, column=0, sticky=tk.NW, padx=5, pady=10)
+        ttk.Checkbutton(config_inner_frame, text="分组名称使用完整文件夹路径(如 A/B/C)", variable=self.full_path).grid(row=2, column=1, padx=5, pady=10, sticky=tk.W)
+        
+        ttk.Label(config_inner_frame, text="重复链接:").grid(row=3, column=0, sticky=tk.W, padx=5, pady=10)
+        ttk.Combobox(config_inner_frame, textvariable=self.dedup_policy, values=DEDUP_POLICIES + ('off',), state="readonly", width=15).grid(row=3, column=1, padx=5, pady=10, sticky=tk.W)
+        
+        ttk.Label(config_inner_frame, text="自定义CSS:").grid(row=4, column=0, sticky=tk.NW, padx=5, pady=10)
         self.custom_css_text = scrolledtext.ScrolledText(config_inner_frame, wrap=tk.WORD, width=60, height=20)
-        self.custom_css_text.grid(row=2, column=1, padx=5, pady=10, sticky=tk.W)
+        self.custom_css_text.grid(row=4, column=1, padx=5, pady=10, sticky=tk.W)
+        
+        ttk.Checkbutton(config_inner_frame, text="为缺少图标的站点获取网站图标(需要联网)", variable=self.fetch_icons).grid(row=5, column=1, padx=5, pady=10, sticky=tk.W)
+        
+        ttk.Label(config_inner_frame, text="检查失效链接:").grid(row=6, column=0, sticky=tk.W, padx=5, pady=10)
+        ttk.Combobox(config_inner_frame, textvariable=self.dead_links, values=('off',) + LINK_ACTIONS, state="readonly", width=15).grid(row=6, column=1, padx=5, pady=10, sticky=tk.W)
+        
+        ttk.Label(config_inner_frame, text="近似重复:").grid(row=7, column=0, sticky=tk.W, padx=5, pady=10)
+        ttk.Combobox(config_inner_frame, textvariable=self.near_dups, values=('off',) + NEAR_DUP_ACTIONS, state="readonly", width=15).grid(row=7, column=1, padx=5, pady=10, sticky=tk.W)
+        
+        ttk.Checkbutton(config_inner_frame, text="同时生成站内搜索索引(输出文件名.search.json)", variable=self.search_index).grid(row=8, column=1, padx=5, pady=10, sticky=tk.W)
         
         # ===== 预览选项卡内容 =====
-        self.preview_text = scrolledtext.ScrolledText(preview_frame, wrap=tk.WORD, width=80, height=30)
-        self.preview_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        # 分组和站点只在展开时插入，打开预览的耗时与数据量无关
+        preview_pane = ttk.PanedWindow(preview_frame, orient=tk.VERTICAL)
+        preview_pane.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        tree_frame = ttk.Frame(preview_pane)
+        self.preview_tree = ttk.Treeview(tree_frame, columns=("count", "detail"), selectmode="browse")
+        self.preview_tree.heading("#0", text="名称")
+        self.preview_tree.heading("count", text="数量")
+        self.preview_tree.heading("detail", text="地址 / 图标")
+        self.preview_tree.column("#0", width=280)
+        self.preview_tree.column("count", width=80, anchor=tk.E)
+        self.preview_tree.column("detail", width=420)
+        tree_scroll = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.preview_tree.yview)
+        self.preview_tree.configure(yscrollcommand=tree_scroll.set)
+        self.preview_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        tree_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.preview_tree.bind("<<TreeviewOpen>>", self.on_preview_open)
+        self.preview_tree.bind("<<TreeviewSelect>>", self.on_preview_select)
+        preview_pane.add(tree_frame, weight=3)
+        
+        raw_frame = ttk.Frame(preview_pane)
+        raw_bar = ttk.Frame(raw_frame)
+        raw_bar.pack(fill=tk.X)
+        ttk.Label(raw_bar, text="选中节点的原始JSON").pack(side=tk.LEFT)
+        ttk.Button(raw_bar, text="下一页", command=lambda: self.show_raw_page(self.raw_page + 1)).pack(side=tk.RIGHT)
+        ttk.Button(raw_bar, text="上一页", command=lambda: self.show_raw_page(self.raw_page - 1)).pack(side=tk.RIGHT)
+        self.raw_page_var = tk.StringVar()
+        ttk.Label(raw_bar, textvariable=self.raw_page_var).pack(side=tk.RIGHT, padx=10)
+        self.preview_text = scrolledtext.ScrolledText(raw_frame, wrap=tk.WORD, width=80, height=10)
+        self.preview_text.pack(fill=tk.BOTH, expand=True)
+        preview_pane.add(raw_frame, weight=1)
         
         # ===== 帮助选项卡内容 =====
         help_text = scrolledtext.ScrolledText(help_frame, wrap=tk.WORD, width=80, height=25)
@@ -151,19 +260,43 @@ class BookmarkConverterApp:
 3. 设置输出JSON文件路径
 4. 在"配置设置"选项卡中，设置网站标题和名称
 5. 点击"开始转换"按钮
-6. 等待处理完成
+6. 等待处理完成(处理在后台进行，界面不会卡住；可随时点击"取消"按钮中止)
 7. 查看日志区域的处理结果
 
 ### 3. 高级功能
 
-- 在转换前可以点击"预览结果"查看生成的JSON结构
+- 在转换前可以点击"预览结果"查看生成的JSON结构：展开分组查看站点，选中节点可分页查看其原始JSON
 - 在"配置设置"选项卡中可以自定义网站标题、名称和CSS样式
 
+### 4. 命令行模式
+
+无需图形界面，可在服务器或定时任务中直接运行(在 script 目录下执行)：
+
+    python -m bookmark_converter convert bookmarks.html -o result.json --merge old.json --title 导航站
+
+转换后可直接上传到导航站(失败时重新运行同一命令会从检查点继续)：
+
+    python -m bookmark_converter upload result.json --url https://你的导航站地址 --username admin
+
+### 5. 直接读取浏览器书签
+
+不导出HTML也可以直接选择浏览器保存书签的文件，格式会自动识别：
+
+- Chrome/Edge：配置目录中的 Bookmarks 文件(如 Chrome 的 User Data/Default/Bookmarks)，同目录的 Favicons 提供图标
+- Firefox：配置目录中的 places.sqlite，同目录的 favicons.sqlite 提供图标(以只读方式打开，建议先关闭 Firefox)
+- Safari：~/Library/Safari/Bookmarks.plist
+
+书签HTML、Chrome Bookmarks 和 Safari Bookmarks.plist 也可以压缩为 .gz 或 .zip 后直接选择，无需先解压。
+
 ## 注意事项
 
 - 本工具会自动将未分类的链接归入"未分类"文件夹
+- 每个链接只归入离它最近的文件夹，嵌套文件夹不会重复包含子文件夹中的链接
+- 重复链接按规范化地址判断(忽略 http/https、末尾斜杠、默认端口和 utm_ 等跟踪参数)，
+  可在"配置设置"中选择跳过(skip)、更新已有站点(update)、都保留(keep-both)或不检查(off)
 - 如果遇到解析错误，请尝试使用不同浏览器导出书签
-- 如果文件编码问题，工具会尝试多种编码方式读取
+- 文件编码根据 BOM 和 HTML 中的 charset 声明自动识别(支持 UTF-8、UTF-16、GBK、Big5、Shift-JIS 等)，
+  未声明编码时先按 UTF-8 读取，失败则按 GBK(GB18030) 读取
         """
         
         help_text.insert(tk.END, help_content)
@@ -174,8 +307,12 @@ class BookmarkConverterApp:
     
     def browse_bookmark_file(self):
         file_path = filedialog.askopenfilename(
-            title="选择书签HTML文件",
-            filetypes=[("HTML Files", "*.html *.htm"), ("Text Files", "*.txt"), ("All Files", "*.*")]
+            title="选择书签文件",
+            filetypes=[("HTML Files", "*.html *.htm"),
+                       ("压缩的书签文件", "*.gz *.zip"),
+                       ("浏览器书签数据(Chrome Bookmarks / Firefox places.sqlite / Safari Bookmarks.plist)",
+                        "Bookmarks *.sqlite *.plist"),
+                       ("Text Files", "*.txt"), ("All Files", "*.*")]
         )
         if file_path:
             self.bookmark_file_path.set(file_path)
@@ -220,194 +357,188 @@ class BookmarkConverterApp:
             self.log(f"已设置输出文件路径: {file_path}")
     
     def log(self, message):
-        """添加消息到日志区域"""
-        self.log_text.insert(tk.END, message + "\n")
-        self.log_text.see(tk.END)
-        self.root.update_idletasks()
+        """添加消息到日志区域(可在任意线程中调用，由界面线程批量显示)"""
+        self.events.put(("log", message))
     
-    def parse_bookmarks(self, html_content):
-        """解析书签HTML内容，提取所有文件夹和链接，并处理未分类链接"""
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # 所有文件夹和链接的容器
-        folders = []
-        all_links = set()  # 用于跟踪所有链接
-        processed_links = set()  # 用于跟踪已处理的链接
-        
-        # 进度更新
-        self.progress_var.set(20)
-        self.root.update_idletasks()
-        
-        # 查找所有的DT元素（可能是文件夹或链接）
-        all_dt = soup.find_all('dt')
-        
-        # 查找所有包含H3的DT元素（这些是文件夹）
-        folder_count = 0
-        for dt in all_dt:
-            h3 = dt.find('h3')
-            if not h3:
-                continue  # 不是文件夹，跳过
-            
-            folder_name = h3.get_text().strip()
-            folder = {
-                "name": folder_name,
-                "links": []
-            }
-            
-            # 查找此文件夹下的DL元素（包含链接）
-            dl = dt.find('dl')
-            if not dl:
-                continue  # 没有子元素，跳过
-            
-            # 查找DL下的所有A元素（链接）
-            link_count = 0
-            for a in dl.find_all('a'):
-                link = {
-                    "name": a.get_text().strip(),
-                    "url": a.get('href', ''),
-                    "icon": a.get('icon', '') if a.get('icon') else '',
-                    "add_date": a.get('add_date', '') if a.get('add_date') else ''
-                }
-                folder["links"].append(link)
-                processed_links.add(a.get('href', ''))  # 标记此链接已处理
-                link_count += 1
-            
-            # 只添加有链接的文件夹
-            if folder["links"]:
-                folders.append(folder)
-                folder_count += 1
-                self.log(f"处理文件夹 '{folder_name}' 中的 {link_count} 个链接")
-        
-        self.progress_var.set(50)
-        self.root.update_idletasks()
-        
-        # 收集所有链接
-        for a in soup.find_all('a'):
-            all_links.add(a.get('href', ''))
-        
-        # 找出未分类的链接
-        unclassified_links = all_links - processed_links
-        
-        # 如果有未分类的链接，创建"未分类"文件夹
-        if unclassified_links:
-            unclassified_folder = {
-                "name": "未分类",
-                "links": []
-            }
-            
-            # 遍历所有链接，找出未分类的
-            unclassified_count = 0
-            for a in soup.find_all('a'):
-                if a.get('href', '') in unclassified_links:
-                    link = {
-                        "name": a.get_text().strip(),
-                        "url": a.get('href', ''),
-                        "icon": a.get('icon', '') if a.get('icon') else '',
-                        "add_date": a.get('add_date', '') if a.get('add_date') else ''
-                    }
-                    unclassified_folder["links"].append(link)
-                    unclassified_count += 1
-            
-            # 添加未分类文件夹
-            if unclassified_folder["links"]:
-                folders.append(unclassified_folder)
-                self.log(f"将 {unclassified_count} 个未分类的链接归入'未分类'文件夹")
+    def set_progress(self, value):
+        """更新进度条(可在任意线程中调用)"""
+        self.events.put(("progress", value))
+    
+    def worker_log(self, message):
+        """后台任务使用的日志回调，任务被取消时中止解析"""
+        if self.cancel_event.is_set():
+            raise ConversionCancelled()
+        self.events.put(("log", message))
+    
+    def worker_progress(self, value):
+        """后台任务使用的进度回调，任务被取消时中止解析"""
+        if self.cancel_event.is_set():
+            raise ConversionCancelled()
+        self.events.put(("progress", value))
+    
+    def drain_events(self):
+        """按固定帧率取出队列中的事件：日志合并为一次插入，进度只取最后一个值"""
+        lines = []
+        progress = None
+        finished = []
+        try:
+            while True:
+                kind, *payload = self.events.get_nowait()
+                if kind == "log":
+                    lines.append(payload[0])
+                elif kind == "progress":
+                    progress = payload[0]
+                else:
+                    finished.append((kind, payload))
+        except queue.Empty:
+            pass
+        
+        if lines:
+            # 一帧内超过上限的日志只显示最后的部分
+            self.log_text.insert(tk.END, "\n".join(lines[-LOG_MAX_LINES:]) + "\n")
+            excess = int(self.log_text.index("end-1c").split(".")[0]) - 1 - LOG_MAX_LINES
+            if excess > 0:
+                self.log_text.delete("1.0", f"{excess + 1}.0")
+            self.log_text.see(tk.END)
+        if progress is not None:
+            self.progress_var.set(progress)
+        for kind, payload in finished:
+            self.finish_task(kind, *payload)
+        
+        self.root.after(FRAME_INTERVAL, self.drain_events)
+    
+    def run_in_background(self, task, on_done, status):
+        """在工作线程中执行 task()，完成后在界面线程中调用 on_done(结果)"""
+        self.cancel_event.clear()
+        self.set_busy(True)
+        self.status_var.set(status)
         
-        self.progress_var.set(70)
-        self.root.update_idletasks()
+        def run():
+            try:
+                self.events.put(("done", on_done, task()))
+            except ConversionCancelled:
+                self.events.put(("cancelled",))
+            except Exception as e:
+                traceback.print_exc()
+                self.events.put(("error", e))
         
-        return folders
+        self.worker = threading.Thread(target=run, daemon=True)
+        self.worker.start()
+    
+    def finish_task(self, kind, *payload):
+        """后台任务结束后的处理(界面线程)"""
+        self.worker = None
+        self.set_busy(False)
+        if kind == "done":
+            on_done, result = payload
+            on_done(result)
+        elif kind == "cancelled":
+            self.log_text.insert(tk.END, "已取消\n")
+            self.log_text.see(tk.END)
+            self.status_var.set("已取消")
+        else:
+            error = payload[0]
+            self.log_text.insert(tk.END, f"处理过程中发生错误: {str(error)}\n")
+            self.log_text.see(tk.END)
+            self.status_var.set("处理出错")
+            messagebox.showerror("错误", f"处理过程中发生错误：\n{str(error)}")
+    
+    def is_busy(self):
+        """有后台任务正在进行时提示并返回 True"""
+        if self.worker is not None and self.worker.is_alive():
+            messagebox.showinfo("提示", "已有任务正在进行，请等待完成或点击取消")
+            return True
+        return False
+    
+    def set_busy(self, busy):
+        """任务进行中时禁用开始和预览按钮，启用取消按钮"""
+        self.convert_button.configure(state=tk.DISABLED if busy else tk.NORMAL)
+        self.preview_button.configure(state=tk.DISABLED if busy else tk.NORMAL)
+        self.cancel_button.configure(state=tk.NORMAL if busy else tk.DISABLED)
+    
+    def cancel_task(self):
+        """请求取消当前任务，工作线程在下一次回调时停止"""
+        if self.worker is not None and self.worker.is_alive():
+            self.cancel_event.set()
+            self.status_var.set("正在取消...")
+    
+    def on_close(self):
+        self.cancel_event.set()
+        self.root.destroy()
+    
+    def current_configs(self):
+        """根据配置选项卡生成新数据结构使用的配置"""
+        return default_configs(
+            self.site_title.get(),
+            self.site_name.get(),
+            self.custom_css_text.get(1.0, tk.END)
+        )
+    
+    def parse_bookmarks(self, html_content):
+        """解析书签HTML内容，提取所有文件夹和链接，并处理未分类链接"""
+        return parse_bookmarks(html_content, self.log, self.set_progress, self.full_path.get())
     
     def convert_to_json_format(self, folders, existing_data=None):
         """将文件夹和链接转换为特定的JSON格式"""
-        # 如果有现有数据，获取下一个可用的ID
-        if existing_data and 'groups' in existing_data:
-            try:
-                next_group_id = max([g["id"] for g in existing_data['groups']]) + 1 if existing_data['groups'] else 1
-                
-                # 获取所有站点ID
-                all_site_ids = []
-                for g in existing_data['groups']:
-                    if 'sites' in g:
-                        for s in g['sites']:
-                            if 'id' in s:
-                                all_site_ids.append(s["id"])
-                
-                next_site_id = max(all_site_ids) + 1 if all_site_ids else 1
-                next_order = max([g["order_num"] for g in existing_data['groups']]) + 1 if existing_data['groups'] else 0
-                existing_groups = existing_data['groups']
-                configs = existing_data.get('configs', {})
-            except Exception as e:
-                self.log(f"解析现有JSON数据时出错: {str(e)}")
-                self.log("将创建新的JSON数据结构")
-                next_group_id = 1
-                next_site_id = 1
-                next_order = 0
-                existing_groups = []
-                configs = {
-                    "site.title": self.site_title.get(),
-                    "site.name": self.site_name.get(),
-                    "site.customCss": self.custom_css_text.get(1.0, tk.END),
-                    "DB_INITIALIZED": "true"
-                }
-        else:
-            next_group_id = 1
-            next_site_id = 1
-            next_order = 0
-            existing_groups = []
-            configs = {
-                "site.title": self.site_title.get(),
-                "site.name": self.site_name.get(),
-                "site.customCss": self.custom_css_text.get(1.0, tk.END),
-                "DB_INITIALIZED": "true"
-            }
-        
-        # 转换文件夹为groups格式
-        new_groups = []
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        for folder in folders:
-            group = {
-                "id": next_group_id,
-                "name": folder["name"],
-                "order_num": next_order,
-                "sites": []
-            }
-            
-            # 添加链接作为sites
-            for i, link in enumerate(folder["links"]):
-                site = {
-                    "id": next_site_id,
-                    "group_id": next_group_id,
-                    "name": link["name"],
-                    "url": link["url"],
-                    "icon": link["icon"],
-                    "description": "",
-                    "notes": "",
-                    "order_num": i,
-                    "created_at": current_time,
-                    "updated_at": current_time
-                }
-                group["sites"].append(site)
-                next_site_id += 1
-            
-            new_groups.append(group)
-            next_group_id += 1
-            next_order += 1
-        
-        # 合并现有组和新组
-        final_groups = existing_groups + new_groups
-        
-        # 创建最终的JSON结构
-        result = {
-            "groups": final_groups,
-            "configs": configs
+        return convert_to_json_format(folders, existing_data, self.current_configs(), self.log)
+    
+    def current_settings(self):
+        """读取转换选项；Tk 变量只能在界面线程中读取，需在启动后台任务前调用"""
+        return {
+            "json_path": self.json_file_path.get(),
+            "configs": self.current_configs(),
+            "full_path": self.full_path.get(),
+            "dedup_policy": self.dedup_policy.get(),
+            "fetch_icons": self.fetch_icons.get(),
+            "icon_cache_path": icon_cache_path_for(self.output_file_path.get() or "result.json"),
+            "dead_links": self.dead_links.get(),
+            "link_cache_path": link_cache_path_for(self.output_file_path.get() or "result.json"),
+            "near_dups": self.near_dups.get(),
+            "search_index": self.search_index.get(),
         }
-        
+    
+    def build_result(self, bookmark_path, settings, metrics=None, preview=False):
+        """流式解析书签文件并与现有JSON合并，未找到书签时返回 None(在工作线程中运行)
+
+        preview 为 True 时只解析、转换和去重，跳过链接检查、网站图标和近似重复这几个阶段：
+        预览不发出网络请求，显示的是这些阶段处理之前的内容。
+        """
+        policy = settings["dedup_policy"]
+        site_index = SiteIndex(policy) if policy != 'off' else None
+        favicons = None
+        if settings["fetch_icons"] and not preview:
+            favicons = FaviconResolver(IconCache(settings["icon_cache_path"]), log=self.worker_log)
+        link_checker = None
+        if settings["dead_links"] != 'off' and not preview:
+            link_checker = LinkChecker(LinkCache(settings["link_cache_path"]), settings["dead_links"],
+                                       log=self.worker_log)
+        near_duplicates = None
+        if settings["near_dups"] != 'off' and not preview:
+            near_duplicates = NearDuplicateFinder(action=settings["near_dups"], log=self.worker_log)
+        result = build_result(
+            bookmark_path,
+            settings["json_path"],
+            settings["configs"],
+            self.worker_log,
+            self.worker_progress,
+            settings["full_path"],
+            site_index=site_index,
+            cache=self.parse_cache,
+            metrics=metrics,
+            favicons=favicons,
+            link_checker=link_checker,
+            near_duplicates=near_duplicates,
+            columnar=True
+        )
+        if result is not None and site_index is not None:
+            self.worker_log(site_index.summary())
         return result
 
     def preview_json(self):
         """预览生成的JSON结构"""
+        if self.is_busy():
+            return
+        
         bookmark_path = self.bookmark_file_path.get()
         if not bookmark_path:
             messagebox.showerror("错误", "请先选择书签HTML文件！")
@@ -417,68 +548,159 @@ class BookmarkConverterApp:
             messagebox.showerror("错误", f"文件不存在: {bookmark_path}")
             return
         
-        try:
-            # 清空预览文本
-            self.preview_text.delete(1.0, tk.END)
-            
-            # 更新状态
-            self.status_var.set("正在生成预览...")
-            
-            # 读取HTML文件
-            self.log("正在读取书签文件进行预览...")
-            try:
-                with open(bookmark_path, 'r', encoding='utf-8') as f:
-                    html_content = f.read()
-            except UnicodeDecodeError:
-                # 尝试其他编码
-                self.log("UTF-8编码读取失败，尝试使用其他编码...")
-                with open(bookmark_path, 'r', encoding='gbk') as f:
-                    html_content = f.read()
-            
-            # 解析书签
-            self.log("正在解析书签...")
-            folders = self.parse_bookmarks(html_content)
-            
-            if not folders:
-                messagebox.showwarning("警告", "未找到有效的书签文件夹！")
-                self.status_var.set("预览失败")
-                return
-            
-            # 查看是否有现有JSON文件
-            json_path = self.json_file_path.get()
-            existing_data = None
-            
-            if json_path and os.path.exists(json_path):
-                try:
-                    with open(json_path, 'r', encoding='utf-8') as f:
-                        existing_data = json.load(f)
-                    self.log(f"已加载现有JSON文件进行预览: {json_path}")
-                except Exception as e:
-                    self.log(f"加载JSON文件失败: {str(e)}")
-            
-            # 转换为JSON格式
-            self.log("正在生成JSON预览...")
-            result = self.convert_to_json_format(folders, existing_data)
-            
-            # 显示预览
-            json_str = json.dumps(result, ensure_ascii=False, indent=2)
-            self.preview_text.insert(tk.END, json_str)
-            
-            # 更新状态
-            self.status_var.set("预览生成完成")
-            self.log("JSON预览生成完成")
-            
-            # 切换到预览选项卡
-            notebook = self.root.nametowidget(self.root.children['!notebook'])
-            notebook.select(2)  # 预览选项卡的索引是2
-            
-        except Exception as e:
-            messagebox.showerror("预览错误", f"生成预览时发生错误：\n{str(e)}")
-            self.log(f"预览错误: {str(e)}")
+        self.log("正在生成JSON预览...")
+        settings = self.current_settings()
+        if settings["fetch_icons"] or settings["dead_links"] != 'off' or settings["near_dups"] != 'off':
+            self.log("预览不检查链接、不获取网站图标、不处理近似重复，这些选项只在转换时生效")
+
+        self.run_in_background(lambda: self.build_result(bookmark_path, settings, preview=True), self.show_preview,
+                               "正在生成预览...")
+    
+    def show_preview(self, result):
+        """显示预览树(界面线程)，只插入第一页分组"""
+        if result is None:
+            messagebox.showwarning("警告", "未找到有效的书签文件夹！")
             self.status_var.set("预览失败")
+            return
+        
+        self.preview_result = result
+        tree = self.preview_tree
+        tree.delete(*tree.get_children())
+        self.set_raw_node(None)
+        
+        total_groups, total_sites = count_result(result)
+        tree.insert("", tk.END, iid="configs", text="配置", values=(len(result.get("configs") or {}), ""))
+        if result.get("icons"):
+            tree.insert("", tk.END, iid="icons", text="图标表", values=(len(result["icons"]), ""))
+        self.load_preview_groups(0)
+        self.log(f"预览: {total_groups} 个分组，{total_sites} 个站点")
+        
+        # 更新状态
+        self.status_var.set("预览生成完成")
+        self.log("JSON预览生成完成")
+        
+        # 切换到预览选项卡
+        notebook = self.root.nametowidget(self.root.children['!notebook'])
+        notebook.select(2)  # 预览选项卡的索引是2
+    
+    def load_preview_groups(self, start):
+        """插入从 start 开始的一页分组；有站点的分组带一个占位子节点，展开时再加载站点"""
+        tree = self.preview_tree
+        groups = self.preview_result["groups"]
+        end = min(start + PREVIEW_PAGE_SIZE, len(groups))
+        for index in range(start, end):
+            group = groups[index]
+            sites = group.get("sites", [])
+            iid = f"g{index}"
+            tree.insert("", tk.END, iid=iid, text=group["name"], values=(len(sites), f"ID {group.get('id', '')}"))
+            if sites:
+                tree.insert(iid, tk.END, iid=iid + ":loading", text="加载中...")
+        if end < len(groups):
+            tree.insert("", tk.END, iid=f"more:g:{end}", text=f"显示更多分组(剩余 {len(groups) - end} 个)")
+    
+    def load_preview_sites(self, group_index, start):
+        """在分组节点下插入从 start 开始的一页站点"""
+        tree = self.preview_tree
+        parent = f"g{group_index}"
+        sites = self.preview_result["groups"][group_index].get("sites", [])
+        end = min(start + PREVIEW_PAGE_SIZE, len(sites))
+        for index in range(start, end):
+            site = sites[index]
+            detail = site.get("url", "")
+            icon = describe_icon(site.get("icon"))
+            if icon:
+                detail += f"  [{icon}]"
+            tree.insert(parent, tk.END, iid=f"s{group_index}:{index}", text=site.get("name", ""), values=("", detail))
+        if end < len(sites):
+            tree.insert(parent, tk.END, iid=f"more:s:{group_index}:{end}",
+                        text=f"显示更多站点(剩余 {len(sites) - end} 个)")
+    
+    def on_preview_open(self, event):
+        """展开分组时把占位节点换成站点"""
+        iid = self.preview_tree.focus()
+        placeholder = iid + ":loading"
+        if self.preview_tree.exists(placeholder):
+            self.preview_tree.delete(placeholder)
+            self.load_preview_sites(int(iid[1:]), 0)
+    
+    def on_preview_select(self, event):
+        """选中"显示更多"时加载下一页，选中其他节点时显示其原始JSON"""
+        selection = self.preview_tree.selection()
+        if not selection:
+            return
+        iid = selection[0]
+        if iid.startswith("more:"):
+            self.preview_tree.delete(iid)
+            parts = iid.split(":")
+            if parts[1] == "g":
+                self.load_preview_groups(int(parts[2]))
+            else:
+                self.load_preview_sites(int(parts[2]), int(parts[3]))
+            return
+        self.set_raw_node(self.preview_node(iid))
+    
+    def preview_node(self, iid):
+        """树节点对应的数据"""
+        result = self.preview_result
+        if iid in ("configs", "icons"):
+            return result.get(iid)
+        if iid.endswith(":loading"):
+            return None
+        if iid.startswith("g"):
+            return result["groups"][int(iid[1:])]
+        group_index, _, site_index = iid[1:].partition(":")
+        return result["groups"][int(group_index)]["sites"][int(site_index)]
+    
+    def set_raw_node(self, record):
+        """切换原始JSON视图显示的节点；JSON 由编码器逐段生成，只编码到需要显示的页
+
+        按列存储的站点由 to_plain 转换为字典后再编码。
+        """
+        encoder = json.JSONEncoder(ensure_ascii=False, indent=2, default=to_plain)
+        self.raw_chunks = None if record is None else encoder.iterencode(record)
+        self.raw_buffer = ""
+        self.raw_pages = []
+        self.show_raw_page(0)
+    
+    def raw_page_text(self, page):
+        """第 page 页的文本，超出末尾时返回 None"""
+        while len(self.raw_pages) <= page:
+            if len(self.raw_buffer) < RAW_PAGE_CHARS and self.raw_chunks is not None:
+                for chunk in self.raw_chunks:
+                    self.raw_buffer += chunk
+                    if len(self.raw_buffer) >= RAW_PAGE_CHARS:
+                        break
+                else:
+                    self.raw_chunks = None
+            if not self.raw_buffer:
+                return None
+            self.raw_pages.append(self.raw_buffer[:RAW_PAGE_CHARS])
+            self.raw_buffer = self.raw_buffer[RAW_PAGE_CHARS:]
+        return self.raw_pages[page]
+    
+    def show_raw_page(self, page):
+        """显示原始JSON的第 page 页"""
+        page = max(page, 0)
+        text = self.raw_page_text(page)
+        if text is None:
+            if page > 0:
+                return  # 已经是最后一页
+            text = ""
+        self.raw_page = page
+        self.preview_text.delete(1.0, tk.END)
+        self.preview_text.insert(tk.END, text)
+        if not self.raw_pages:
+            self.raw_page_var.set("")
+        elif self.raw_chunks is None and not self.raw_buffer:
+            self.raw_page_var.set(f"第 {page + 1} / {len(self.raw_pages)} 页")
+        else:
+            self.raw_page_var.set(f"第 {page + 1} 页")
     
     def start_conversion(self):
         """开始转换过程"""
+        if self.is_busy():
+            return
+        
         # 验证输入
         bookmark_path = self.bookmark_file_path.get()
         if not bookmark_path:
@@ -501,73 +723,49 @@ class BookmarkConverterApp:
         self.progress_var.set(0)
         self.status_var.set("处理中...")
         
-        try:
-            # 读取HTML文件
-            self.log(f"读取书签文件: {bookmark_path}")
-            try:
-                with open(bookmark_path, 'r', encoding='utf-8') as f:
-                    html_content = f.read()
-            except UnicodeDecodeError:
-                # 尝试其他编码
-                self.log("UTF-8编码读取失败，尝试使用其他编码...")
-                with open(bookmark_path, 'r', encoding='gbk') as f:
-                    html_content = f.read()
-            
-            # 解析书签
-            self.log("正在解析书签...")
-            folders = self.parse_bookmarks(html_content)
-            
-            if not folders:
-                self.log("警告: 没有找到有效的书签文件夹!")
-                self.status_var.set("处理完成，但未找到书签")
-                messagebox.showwarning("警告", "未找到有效的书签文件夹！")
-                return
-            
-            # 查看是否有现有JSON文件
-            json_path = self.json_file_path.get()
-            existing_data = None
-            
-            if json_path and os.path.exists(json_path):
-                self.log(f"读取现有JSON文件: {json_path}")
-                try:
-                    with open(json_path, 'r', encoding='utf-8') as f:
-                        existing_data = json.load(f)
-                except Exception as e:
-                    self.log(f"加载JSON文件失败: {str(e)}")
-                    self.log("将创建新的JSON数据")
-            
-            # 转换为JSON格式
-            self.log("正在转换为JSON格式...")
-            result = self.convert_to_json_format(folders, existing_data)
-            
-            self.progress_var.set(90)
-            self.root.update_idletasks()
+        settings = self.current_settings()
+        
+        def task():
+            # 流式解析书签并转换为JSON格式；进度按已读取的字节数(0-70)和已写出的站点数(70-100)更新
+            metrics = Metrics()
+            result = self.build_result(bookmark_path, settings, metrics)
+            if result is None:
+                return None, metrics
             
             # 保存结果
-            self.log(f"正在保存结果到: {output_path}")
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(result, f, ensure_ascii=False, indent=2)
-            
-            self.progress_var.set(100)
-            self.root.update_idletasks()
-            
-            # 统计信息
-            total_groups = len(result['groups'])
-            total_sites = sum(len(g['sites']) for g in result['groups'])
-            
-            self.log("\n处理完成!")
-            self.log(f"共处理了 {total_groups} 个分组，{total_sites} 个链接")
-            self.log(f"结果已保存到: {os.path.abspath(output_path)}")
-            
-            self.status_var.set("处理完成")
-            messagebox.showinfo("完成", f"转换完成！\n共有 {total_groups} 个分组，{total_sites} 个链接。")
-            
-        except Exception as e:
-            self.log(f"处理过程中发生错误: {str(e)}")
-            self.status_var.set("处理出错")
-            messagebox.showerror("错误", f"处理过程中发生错误：\n{str(e)}")
-            import traceback
-            traceback.print_exc()
+            self.worker_log(f"正在保存结果到: {output_path}")
+            counts = count_result(result)
+            with metrics.span('write', counts[1]):
+                write_result(result, output_path,
+                             progress=lambda percent: self.worker_progress(70 + 0.3 * percent))
+            if settings["search_index"]:
+                with metrics.span('search', counts[1]):
+                    write_search_index(result, search_index_path_for(output_path), self.worker_log)
+            
+            self.set_progress(100)
+            return counts, metrics
+        
+        self.run_in_background(task, lambda done: self.finish_conversion(*done, output_path), "处理中...")
+    
+    def finish_conversion(self, counts, metrics, output_path):
+        """转换完成后显示统计信息和各阶段耗时(界面线程)"""
+        if counts is None:
+            self.log("警告: 没有找到有效的书签文件夹!")
+            self.log("\n各阶段统计:\n" + metrics.summary())
+            self.status_var.set("处理完成，但未找到书签")
+            messagebox.showwarning("警告", "未找到有效的书签文件夹！")
+            return
+        
+        # 统计信息
+        total_groups, total_sites = counts
+        
+        self.log("\n处理完成!")
+        self.log(f"共处理了 {total_groups} 个分组，{total_sites} 个链接")
+        self.log(f"结果已保存到: {os.path.abspath(output_path)}")
+        self.log("\n各阶段统计:\n" + metrics.summary())
+        
+        self.status_var.set("处理完成")
+        messagebox.showinfo("完成", f"转换完成！\n共有 {total_groups} 个分组，{total_sites} 个链接。")
 
 def main():
     root = tk.Tk()
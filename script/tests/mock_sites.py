@@ -0,0 +1,202 @@
+"""本地模拟的网站，用于离线测试网站图标的获取和链接检查
+
+一个服务器按请求的 Host 头模拟任意多个网站，配合 FaviconResolver 和 LinkChecker 的 connect_to 使用。
+网站的行为由主机名的第一段前缀决定，其他主机名按名称的哈希在前四种行为中固定选择一种：
+
+- link-*：首页用 <link rel="shortcut icon"> 声明图标(以分块编码返回)
+- touch-*：首页只声明 apple-touch-icon
+- ico-*：首页没有声明，/favicon.ico 返回图片
+- none-*：首页没有声明，/favicon.ico 返回 404
+- redirect-*：首页重定向到同名的 link- 网站
+- slow-*：每个请求都等待 slow 秒(用于测试超时)
+- error-*：所有请求返回 500
+- close-*：读到请求后直接关闭连接
+- nohead-*：HEAD 请求返回 405，GET 正常
+- gone-*：所有请求返回 410
+
+前四种网站上，首页和图标以外的页面按路径的哈希固定选择：约 5% 返回 404，5% 返回 410，
+5% 永久重定向(301)到 /moved 下的同名页面，5% 临时重定向(302)，5% 的 HEAD 请求返回 405，其余返回页面；
+以 /missing 开头的路径总是返回 404。
+
+    python -m tests.mock_sites --port 8790 --latency 0.05
+"""
+import argparse
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BEHAVIOURS = ('link', 'touch', 'ico', 'none', 'redirect', 'slow', 'error', 'close', 'nohead', 'gone')
+
+_ICON_BYTES = b"\x00\x00\x01\x00\x01\x00\x10\x10" + bytes(range(256)) * 4
+
+_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{host}</title>{links}</head>
+<body><h1>{host}</h1>{filler}</body></html>
+"""
+
+
+_NOT_FOUND = (404, {"Content-Type": "text/html"}, b"<h1>Not Found</h1>", False)
+
+
+def behaviour_of(host):
+    """主机名对应的行为"""
+    prefix = host.split('.', 1)[0].split('-', 1)[0]
+    if prefix in BEHAVIOURS:
+        return prefix
+    return BEHAVIOURS[zlib.crc32(host.encode('utf-8')) % 4]
+
+
+class MockSites:
+    """模拟网站服务器；requests 统计每个主机收到的请求数"""
+
+    def __init__(self, latency=0.0, slow=30.0):
+        self.latency = latency
+        self.slow = slow
+        self.requests = {}
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def total_requests(self):
+        return sum(self.requests.values())
+
+    def start(self, host="127.0.0.1", port=0):
+        """在后台线程中启动服务器，返回 (主机, 端口)"""
+        sites = self
+
+        class Handler(_Handler):
+            pass
+        Handler.sites = sites
+
+        self._server = _Server((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address[:2]
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def handle(self, host, path, method='GET'):
+        """返回 (状态码, 响应头, 响应体, 是否分块编码)；响应体为 None 时直接关闭连接"""
+        with self._lock:
+            self.requests[host] = self.requests.get(host, 0) + 1
+        behaviour = behaviour_of(host)
+        if self.latency:
+            time.sleep(self.latency)
+        if behaviour == 'slow':
+            time.sleep(self.slow)
+        if behaviour == 'close':
+            return 0, {}, None, False
+        if behaviour == 'error':
+            return 500, {"Content-Type": "text/plain"}, b"error", False
+        if behaviour == 'gone':
+            return 410, {"Content-Type": "text/html"}, b"<h1>Gone</h1>", False
+        if behaviour == 'nohead' and method == 'HEAD':
+            return 405, {"Allow": "GET", "Content-Type": "text/html"}, b"", False
+        if behaviour == 'redirect':
+            target = "link-" + host.split('-', 1)[1] if '-' in host else "link-" + host
+            return 301, {"Location": f"http://{target}{path}"}, b"", False
+        full_path = path
+        path = path.split('?', 1)[0]
+
+        if path == '/' or behaviour == 'nohead':
+            links = ""
+            if behaviour == 'link':
+                links = '<link rel="stylesheet" href="/style.css"><link rel="shortcut icon" href="/static/fav.png">'
+            elif behaviour == 'touch':
+                links = '<link rel="apple-touch-icon" href="touch.png">'
+            page = _PAGE.format(host=host, links=links, filler="<p>mock</p>" * 200).encode('utf-8')
+            return 200, {"Content-Type": "text/html; charset=utf-8"}, page, behaviour == 'link'
+        if path == '/favicon.ico' and behaviour == 'ico':
+            return 200, {"Content-Type": "image/x-icon"}, _ICON_BYTES, False
+        if path in ('/static/fav.png', '/touch.png') and behaviour in ('link', 'touch'):
+            return 200, {"Content-Type": "image/png"}, _ICON_BYTES, False
+        if path == '/favicon.ico' or path.startswith('/missing'):
+            return _NOT_FOUND
+        if path.startswith('/moved/'):
+            return 200, {"Content-Type": "text/html; charset=utf-8"}, _PAGE.format(
+                host=host, links="", filler="<p>moved</p>").encode('utf-8'), False
+
+        pick = zlib.crc32(full_path.encode('utf-8')) % 20
+        if pick == 0:
+            return _NOT_FOUND
+        if pick == 1:
+            return 410, {"Content-Type": "text/html"}, b"<h1>Gone</h1>", False
+        if pick in (2, 3):
+            return 301 if pick == 2 else 302, {"Location": "/moved" + full_path}, b"", False
+        if pick == 4 and method == 'HEAD':
+            return 405, {"Allow": "GET", "Content-Type": "text/html"}, b"", False
+        page = _PAGE.format(host=host, links="", filler="<p>page</p>" * 20).encode('utf-8')
+        return 200, {"Content-Type": "text/html; charset=utf-8"}, page, False
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # 大量并发连接时不丢弃连接请求
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 支持保持连接
+    sites = None
+
+    def setup(self):
+        super().setup()
+        with self.sites._lock:
+            self.sites.connections += 1
+
+    def do_GET(self):
+        host = (self.headers.get("Host") or "").rsplit(':', 1)[0].lower()
+        status, headers, body, chunked = self.sites.handle(host, self.path, self.command)
+        if body is None:
+            self.close_connection = True
+            return
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        if self.command == 'HEAD':
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+        elif chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for start in range(0, len(body), 1000):
+                part = body[start:start + 1000]
+                self.wfile.write(f"{len(part):x}\r\n".encode('ascii') + part + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    do_HEAD = do_GET
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="tests.mock_sites",
+                                     description="本地模拟的网站(测试网站图标获取和链接检查)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求增加的延迟(秒)")
+    parser.add_argument("--slow", type=float, default=30.0, help="slow-* 网站每个请求的延迟(秒，默认 30)")
+    args = parser.parse_args(argv)
+
+    sites = MockSites(args.latency, args.slow)
+    host, port = sites.start(args.host, args.port)
+    print(f"模拟网站已启动: {host}:{port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        sites.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,288 @@
+"""本地模拟的 worker，用于离线测试上传
+
+只实现上传用到的几个接口，行为与 worker/index.ts 保持一致：
+- POST /api/login：校验用户名密码，成功时通过 Set-Cookie 返回 auth_token；15 分钟内最多 5 次(429)
+- 其他 /api/ 接口需要 auth_token Cookie 或 Authorization: Bearer 头，否则返回 401 "请先登录"
+- 请求体超过 MAX_BODY_SIZE 时抛错，由外层统一返回 500 "API 请求失败"
+- POST /api/import：先按 validateExportData 验证(400)，再按 importData 的规则合并分组和站点
+- GET /api/export：返回当前数据
+
+另外可以注入故障：按比例随机返回 429/503，或为每个请求增加延迟。
+与 worker 一样，导入时先查询同名分组再创建，两次操作之间有 latency 的间隔：
+两个请求同时创建同名分组会产生重复分组，duplicate_groups 记录这种情况的次数。
+
+    python -m tests.mock_worker --port 8788 --username admin --password admin
+"""
+import argparse
+import json
+import random
+import secrets
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bookmark_converter.writer import EXPORT_VERSION, MAX_BODY_SIZE, validate_export_data
+
+LOGIN_LIMIT = 5
+LOGIN_WINDOW = 15 * 60
+
+
+class MockWorker:
+    """worker 的内存版本"""
+
+    def __init__(self, username="admin", password="admin", auth_enabled=True, fail_rate=0.0, latency=0.0,
+                 seed=None):
+        self.username = username
+        self.password = password
+        self.auth_enabled = auth_enabled
+        self.fail_rate = fail_rate
+        self.latency = latency
+        self.random = random.Random(seed)
+        self.groups = []
+        self.groups_by_name = {}  # 名称 -> 最先创建的分组
+        self.duplicate_groups = 0
+        self.sites = {}  # (分组ID, URL) -> 站点
+        self.configs = {}
+        self.tokens = set()
+        self.requests = 0
+        self.connections = 0
+        self.injected_failures = 0
+        self._login_attempts = {}
+        self._next_group_id = 1
+        self._next_site_id = 1
+        self._lock = threading.Lock()
+        self._server = None
+
+    # ---- 服务器 ----
+
+    def start(self, host="127.0.0.1", port=0):
+        """在后台线程中启动服务器，返回基础地址"""
+        worker = self
+
+        class Handler(_Handler):
+            pass
+        Handler.worker = worker
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://{host}:{self._server.server_address[1]}"
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    # ---- 路由 ----
+
+    def handle(self, method, path, headers, body, client):
+        """处理一个请求，返回 (状态码, 响应头, 响应体)"""
+        with self._lock:
+            self.requests += 1
+            inject = self.fail_rate and self.random.random() < self.fail_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if not path.startswith("/api/"):
+            return 404, {}, "Not Found"
+        path = path[len("/api/"):]
+        if inject and path != "login":
+            with self._lock:
+                self.injected_failures += 1
+            status = self.random.choice((429, 503))
+            return status, {"Retry-After": "0"} if status == 429 else {}, "服务暂时不可用"
+
+        try:
+            if path == "login" and method == "POST":
+                return self._login(headers, body, client)
+            if self.auth_enabled and not self._authenticated(headers):
+                return 401, {"WWW-Authenticate": "Bearer"}, "请先登录"
+            if path == "import" and method == "POST":
+                return self._import(_parse_body(headers, body))
+            if path == "export" and method == "GET":
+                return 200, {}, self.export_data()
+            return 404, {}, "API路径不存在"
+        except Exception:
+            # 与 createErrorResponse 一致：不暴露具体错误
+            return 500, {}, {"success": False, "message": "API 请求失败", "errorId": uuid.uuid4().hex[:12]}
+
+    def _login(self, headers, body, client):
+        with self._lock:
+            now = time.time()
+            attempts = [t for t in self._login_attempts.get(client, []) if now - t < LOGIN_WINDOW]
+            if len(attempts) >= LOGIN_LIMIT:
+                return 429, {}, {"success": False, "message": "登录尝试次数过多，请稍后再试 (15分钟内最多5次)"}
+            attempts.append(now)
+            self._login_attempts[client] = attempts
+        try:
+            data = _parse_body(headers, body)
+        except ValueError as e:
+            return 400, {}, {"success": False, "message": str(e)}
+        if not isinstance(data, dict) or not data.get("username") or not data.get("password"):
+            return 400, {}, {"success": False, "message": "验证失败: 用户名和密码不能为空"}
+        if data["username"] != self.username or data["password"] != self.password:
+            return 200, {}, {"success": False, "message": "用户名或密码错误"}
+
+        token = secrets.token_hex(16)
+        with self._lock:
+            self.tokens.add(token)
+        max_age = 30 * 24 * 60 * 60 if data.get("rememberMe") else 7 * 24 * 60 * 60
+        cookie = f"auth_token={token}; HttpOnly; Secure; SameSite=Strict; Max-Age={max_age}; Path=/"
+        return 200, {"Set-Cookie": cookie}, {"success": True, "message": "登录成功"}
+
+    def _authenticated(self, headers):
+        token = None
+        for item in (headers.get("Cookie") or "").split(';'):
+            key, _, value = item.strip().partition('=')
+            if key == "auth_token":
+                token = value
+        if not token:
+            auth_type, _, header_token = (headers.get("Authorization") or "").partition(' ')
+            if auth_type == "Bearer" and header_token:
+                token = header_token
+        return token in self.tokens
+
+    def _import(self, data):
+        errors = validate_export_data(data)
+        if errors:
+            return 400, {}, {"success": False, "message": "导入数据验证失败", "errors": errors}
+
+        stats = {
+            "groups": {"total": len(data["groups"]), "created": 0, "merged": 0},
+            "sites": {"total": len(data["sites"]), "created": 0, "updated": 0, "skipped": 0},
+        }
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        group_map = {}
+        for group in data["groups"]:
+            with self._lock:
+                existing = self.groups_by_name.get(group["name"])
+            if existing:
+                stats["groups"]["merged"] += 1
+            else:
+                # 查询和插入不在同一个事务中
+                if self.latency:
+                    time.sleep(self.latency)
+                with self._lock:
+                    if group["name"] in self.groups_by_name:
+                        self.duplicate_groups += 1
+                    existing = {
+                        "id": self._next_group_id, "name": group["name"], "order_num": group["order_num"],
+                        "is_public": 1, "created_at": now, "updated_at": now}
+                    self.groups.append(existing)
+                    self.groups_by_name.setdefault(group["name"], existing)
+                    self._next_group_id += 1
+                stats["groups"]["created"] += 1
+            if group.get("id"):
+                group_map[group["id"]] = existing["id"]
+
+        with self._lock:
+            for site in data["sites"]:
+                group_id = group_map.get(site["group_id"])
+                if not group_id:
+                    stats["sites"]["skipped"] += 1
+                    continue
+                existing = self.sites.get((group_id, site["url"]))
+                if existing:
+                    for key in ("name", "icon", "description", "notes"):
+                        existing[key] = site.get(key)
+                    existing["updated_at"] = now
+                    stats["sites"]["updated"] += 1
+                else:
+                    self.sites[(group_id, site["url"])] = dict(site, id=self._next_site_id, group_id=group_id)
+                    self._next_site_id += 1
+                    stats["sites"]["created"] += 1
+
+            for key, value in data["configs"].items():
+                if key != "DB_INITIALIZED":
+                    self.configs[key] = value
+        return 200, {}, {"success": True, "stats": stats}
+
+    def export_data(self):
+        with self._lock:
+            return {
+                "groups": list(self.groups),
+                "sites": list(self.sites.values()),
+                "configs": dict(self.configs),
+                "version": EXPORT_VERSION,
+                "exportDate": datetime.now(timezone.utc).isoformat(),
+            }
+
+
+def _parse_body(headers, body):
+    """与 validateRequestBody 一致：先查 Content-Length，再查实际长度(按 JavaScript 字符串长度计算)"""
+    length = headers.get("Content-Length")
+    if length and int(length) > MAX_BODY_SIZE:
+        raise ValueError("请求体过大，最大允许 1MB")
+    text = body.decode('utf-8', 'replace')
+    if len(text.encode('utf-16-le')) // 2 > MAX_BODY_SIZE:
+        raise ValueError("请求体过大，最大允许 1MB")
+    try:
+        return json.loads(text)
+    except ValueError:
+        raise ValueError("无效的 JSON 格式")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 支持保持连接
+    worker = None
+
+    def setup(self):
+        super().setup()
+        with self.worker._lock:
+            self.worker.connections += 1
+
+    def _dispatch(self, method):
+        length = int(self.headers.get("Content-Length") or 0)
+        # 与 worker 一样读完整个请求体后再判断大小，保证连接可以继续使用
+        body = self.rfile.read(length) if length else b""
+        status, headers, payload = self.worker.handle(method, self.path, self.headers, body, self.client_address[0])
+        if isinstance(payload, (dict, list)):
+            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            content_type = "application/json"
+        else:
+            data = payload.encode('utf-8')
+            content_type = "text/plain; charset=utf-8"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="tests.mock_worker", description="本地模拟的导航站 worker")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8788)
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--no-auth", action="store_true", help="不启用认证")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="随机返回 429/503 的比例")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求增加的延迟(秒)")
+    args = parser.parse_args(argv)
+
+    worker = MockWorker(args.username, args.password, not args.no_auth, args.fail_rate, args.latency)
+    url = worker.start(args.host, args.port)
+    print(f"模拟 worker 已启动: {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        worker.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
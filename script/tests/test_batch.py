@@ -0,0 +1,54 @@
+import json
+import os
+
+import pytest
+
+from bookmark_converter.batch import batch_convert
+from bookmark_converter.bench import bench_batch
+from bookmark_converter.corpus import write_corpus
+
+
+@pytest.fixture
+def corpora(tmp_path):
+    paths = []
+    for i in range(4):
+        path = tmp_path / f"bookmarks-{i}.html"
+        write_corpus(str(path), 300, depth=2, fanout=3, seed=i)
+        paths.append(str(path))
+    return paths
+
+
+def test_same_result_for_any_worker_count(corpora):
+    single, single_reports = batch_convert(corpora, workers=1)
+    pooled, pooled_reports = batch_convert(corpora, workers=2)
+    assert json.dumps(single, sort_keys=True) == json.dumps(pooled, sort_keys=True)
+    assert [(r["path"], r["links"]) for r in single_reports] == [(r["path"], r["links"]) for r in pooled_reports]
+    assert [r["path"] for r in pooled_reports] == corpora
+
+
+def test_bad_inputs_are_reported_and_skipped(corpora, tmp_path):
+    broken = tmp_path / "Bookmarks"
+    broken.write_text('{"version": 1, "roots": {"bookmark_bar": {"type": "folder", "chi', encoding="utf-8")
+    existing = tmp_path / "existing.json"
+    existing.write_text("{\"groups\": [", encoding="utf-8")
+    logged = []
+
+    result, reports = batch_convert([corpora[0], str(broken), corpora[1]], existing_path=str(existing),
+                                    workers=2, log=logged.append)
+    assert [r["error"] is not None for r in reports] == [False, True, False]
+    assert sum(len(g["sites"]) for g in result["groups"]) > 0
+    assert any(message.startswith("加载JSON文件失败") for message in logged)
+    assert "将创建新的JSON数据" in logged
+
+
+def test_bench_batch(corpora, tmp_path):
+    batch = bench_batch(1200, 3, [1, 2], str(tmp_path), {"depth": 2, "fanout": 3})
+    assert batch["files"] == 3 and batch["links"] == 1200
+    assert [entry["workers"] for entry in batch["workers"]] == [1, 2]
+    assert batch["workers"][0]["speedup"] == 1.0
+
+
+@pytest.mark.skipif((os.cpu_count() or 1) < 4, reason="需要至少 4 个 CPU 核")
+def test_parse_scales_with_workers(tmp_path):
+    batch = bench_batch(80000, 8, [1, 4], str(tmp_path), {"depth": 2, "fanout": 4})
+    assert batch["workers"][1]["speedup"] > 1.5
@@ -0,0 +1,88 @@
+import os
+import time
+
+from bookmark_converter.cache import FINGERPRINT_INDEX, ParseCache
+from bookmark_converter.corpus import write_corpus
+from bookmark_converter.readers import iter_input_folders
+
+
+def _corpus(tmp_path, links=2000):
+    path = str(tmp_path / "bookmarks.html")
+    write_corpus(path, links, depth=2, fanout=4, private_share=0.1)
+    return path
+
+
+def test_miss_streams_into_cache_and_hit_replays(tmp_path):
+    path = _corpus(tmp_path)
+    expected = list(iter_input_folders(path))
+    cache_dir = str(tmp_path / "cache")
+
+    cache = ParseCache(directory=cache_dir)
+    assert list(cache.folders(path)) == expected
+    assert cache.stats == {"memory_hits": 0, "disk_hits": 0, "misses": 1}
+    assert list(cache.folders(path)) == expected
+    assert cache.stats == {"memory_hits": 1, "disk_hits": 0, "misses": 1}
+    assert [name for name in os.listdir(cache_dir) if name.endswith(".bmc")]
+    assert not [name for name in os.listdir(cache_dir) if name.endswith(".tmp")]
+
+    # 新实例只能从磁盘读取；读取后保存在内存中
+    cache = ParseCache(directory=cache_dir)
+    assert list(cache.folders(path)) == expected
+    assert list(cache.folders(path)) == expected
+    assert cache.stats == {"memory_hits": 1, "disk_hits": 1, "misses": 0}
+
+    memory_only = ParseCache()
+    assert list(memory_only.folders(path)) == expected
+    assert list(memory_only.folders(path)) == expected
+    assert memory_only.stats == {"memory_hits": 1, "disk_hits": 0, "misses": 1}
+
+
+def test_interrupted_parse_is_not_cached(tmp_path):
+    path = _corpus(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+    cache = ParseCache(directory=cache_dir)
+
+    folders = cache.folders(path)
+    next(folders)
+    folders.close()
+
+    assert os.listdir(cache_dir) == []
+    assert cache.get(ParseCache.make_key(path)) is None
+
+
+def test_key_covers_sidecar_files(tmp_path):
+    path = _corpus(tmp_path, links=10)
+    key = ParseCache.make_key(path)
+    assert ParseCache.make_key(path) == key
+
+    keys = {key}
+    for name in ("bookmarks.html-wal", "Favicons", "favicons.sqlite", "favicons.sqlite-wal"):
+        sidecar = tmp_path / name
+        sidecar.write_bytes(b"v1")
+        keys.add(ParseCache.make_key(path))
+        sidecar.write_bytes(b"v2")
+        keys.add(ParseCache.make_key(path))
+    assert len(keys) == 9
+
+
+def test_unchanged_file_is_not_hashed_again(tmp_path):
+    path = _corpus(tmp_path, links=10)
+    cache_dir = str(tmp_path / "cache")
+    index = os.path.join(cache_dir, FINGERPRINT_INDEX)
+
+    # 刚修改过的文件不记录内容哈希
+    list(ParseCache(directory=cache_dir).folders(path))
+    assert not os.path.exists(index)
+
+    old = time.time() - 60
+    os.utime(path, (old, old))
+    expected = list(ParseCache(directory=cache_dir).folders(path))
+    assert os.path.exists(index)
+
+    # 大小和修改时间都不变时直接使用记录的哈希，不读取文件内容
+    with open(path, 'r+b') as f:
+        f.write(b"<!-- --")
+    os.utime(path, (old, old))
+    cache = ParseCache(directory=cache_dir)
+    assert list(cache.folders(path)) == expected
+    assert cache.stats == {"memory_hits": 0, "disk_hits": 1, "misses": 0}
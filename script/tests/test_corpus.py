@@ -0,0 +1,50 @@
+from bookmark_converter.bench import bench_size, check_thresholds, compare_baseline
+from bookmark_converter.corpus import parse_count, write_corpus
+from bookmark_converter.engine import parse_bookmarks, read_bookmark_file
+
+
+def test_counts_match_generated_file(tmp_path):
+    path = tmp_path / "bookmarks.html"
+    stats = write_corpus(str(path), 5000, depth=3, fanout=3, icon_share=0.4, duplicate_rate=0.1,
+                         non_ascii_share=0.5, uncategorized_share=0.02, private_share=0.1)
+    folders = parse_bookmarks(read_bookmark_file(str(path)), full_path=True)
+    links = [link for folder in folders for link in folder["links"]]
+
+    assert stats["links"] == len(links) == 5000
+    assert stats["folders"] == 3 + 9 + 27 == len([f for f in folders if f["path"]])
+    assert len(next(f for f in folders if not f["path"])["links"]) == 100
+    assert stats["icons"] == sum(1 for link in links if link.icon)
+    assert stats["private"] == sum(1 for link in links if link.private)
+    assert abs(stats["icons"] / 5000 - 0.4) < 0.05
+    assert abs(stats["duplicates"] / 5000 - 0.1) < 0.03
+    assert abs(stats["private"] / 5000 - 0.1) < 0.03
+    assert any(any(ord(c) > 127 for c in link.name) for link in links)
+
+
+def test_same_seed_same_file(tmp_path):
+    paths = [tmp_path / name for name in ("a.html", "b.html", "c.html")]
+    for path, seed in zip(paths, (1, 1, 2)):
+        write_corpus(str(path), 500, depth=2, fanout=3, near_duplicate_rate=0.05, seed=seed)
+    assert paths[0].read_bytes() == paths[1].read_bytes() != paths[2].read_bytes()
+
+
+def test_parse_count():
+    assert [parse_count(text) for text in ("1k", "10K", "1.5k", "1M", " 250 ")] == [1000, 10000, 1500, 1000000, 250]
+
+
+def test_bench_thresholds_and_baseline(tmp_path):
+    options = {"depth": 2, "fanout": 3, "icon_share": 0.3, "icon_size": 256}
+    entry = bench_size(1000, str(tmp_path), options)
+    assert entry["links"] == entry["corpus"]["links"] == 1000
+    assert all(stage["seconds"] > 0 and stage["peak_bytes"] > 0 for stage in entry["stages"].values())
+    # 第二次运行重复使用生成的文件
+    assert bench_size(1000, str(tmp_path), options, memory=False)["corpus"] == entry["corpus"]
+
+    assert check_thresholds([entry], {"default": {"parse": {"min_links_per_second": 1}}}) == []
+    violations = check_thresholds([entry], {"1k": {"write": {"max_seconds": 0}}})
+    assert len(violations) == 1 and violations[0].startswith("1000 个链接 write: seconds")
+
+    faster = {"results": [{"links": 1000, "stages": {
+        "parse": dict(entry["stages"]["parse"], links_per_second=entry["stages"]["parse"]["links_per_second"] * 2)}}]}
+    assert compare_baseline([entry], faster, 0.2)[0].startswith("1000 个链接 parse: 吞吐量")
+    assert compare_baseline([entry], {"results": [entry]}, 0.2) == []
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from bookmark_converter.dedup import SiteIndex, canonical_url
+from bookmark_converter.engine import build_result
+
+# A 中的地址在文档中最先出现；流式解析先产出 A1、B1 再产出 A、B
+BOOKMARKS = """<!DOCTYPE NETSCAPE-Bookmark-file-1>
+<DL><p>
+    <DT><H3>A</H3>
+    <DL><p>
+        <DT><A HREF="https://example.com/page">a</A>
+        <DT><H3>A1</H3>
+        <DL><p>
+            <DT><A HREF="https://x.example/">x1</A>
+        </DL><p>
+    </DL><p>
+    <DT><H3>B</H3>
+    <DL><p>
+        <DT><A HREF="https://example.com/page?utm_source=x">b</A>
+        <DT><A HREF="https://b.example/">only b</A>
+        <DT><H3>B1</H3>
+        <DL><p>
+            <DT><A HREF="https://example.com/page/">b1</A>
+            <DT><A HREF="https://x.example">x2</A>
+        </DL><p>
+    </DL><p>
+</DL><p>
+"""
+
+
+def _sites(result):
+    return [(g["name"], [(s["name"], s["url"]) for s in g["sites"]]) for g in result["groups"]]
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "bookmarks.html"
+    path.write_text(BOOKMARKS, encoding="utf-8")
+    return str(path)
+
+
+def test_canonical_url():
+    assert canonical_url("HTTPS://Example.com:443/page/?utm_source=x&b=2&a=1") == "example.com/page?a=1&b=2"
+
+
+def test_skip_keeps_first_in_document_order(source):
+    result = build_result(source, site_index=SiteIndex('skip'))
+    assert _sites(result) == [
+        ("A", [("a", "https://example.com/page")]),
+        ("A1", [("x1", "https://x.example/")]),
+        ("B", [("only b", "https://b.example/")]),
+    ]
+    # 删除被取代的站点后ID和 order_num 仍然连续
+    sites = [s for g in result["groups"] for s in g["sites"]]
+    assert [s["id"] for s in sites] == [1, 2, 3]
+    assert [s["order_num"] for s in sites] == [0, 0, 0]
+    assert json.loads(json.dumps(result))["groups"][2]["sites"][0]["group_id"] == 3
+
+
+def test_update_uses_last_name_in_document_order(source):
+    result = build_result(source, site_index=SiteIndex('update'))
+    assert _sites(result) == [
+        ("A", [("b1", "https://example.com/page")]),
+        ("A1", [("x2", "https://x.example/")]),
+        ("B", [("only b", "https://b.example/")]),
+    ]
+
+
+def test_keep_both(source):
+    result = build_result(source, site_index=SiteIndex('keep-both'))
+    assert sum(len(g["sites"]) for g in result["groups"]) == 6
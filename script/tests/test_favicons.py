@@ -0,0 +1,24 @@
+import pytest
+
+from bookmark_converter.favicons import FaviconResolver
+from mock_sites import MockSites
+
+
+@pytest.fixture
+def sites():
+    sites = MockSites(slow=0.2)
+    address = sites.start()
+    yield address
+    sites.stop()
+
+
+def test_requests_queued_for_one_host_do_not_block_other_hosts(sites):
+    resolver = FaviconResolver(concurrency=2, per_host=1, connect_to=sites)
+    # 同一个慢主机上的三个来源依次处理，每个来源的首页和 /favicon.ico 都要等待 0.2 秒
+    origins = [f"http://slow-a.test:{port}" for port in range(8001, 8004)] + ["http://link-a.test"]
+    icons = resolver.resolve(origins)
+
+    # 另一个主机的请求与第一个慢主机的请求同时进行，而不是排在慢主机的所有请求之后
+    assert list(icons)[0] == "http://link-a.test"
+    assert icons["http://link-a.test"] == "http://link-a.test/static/fav.png"
+    assert resolver.stats["fetched"] == 4 and resolver.stats["missing"] == 3
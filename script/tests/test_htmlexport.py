@@ -0,0 +1,55 @@
+import json
+
+from bookmark_converter.corpus import write_corpus
+from bookmark_converter.engine import build_result
+from bookmark_converter.htmlexport import _same_html, export_digest, export_html
+from bookmark_converter.writer import write_export
+
+
+def _to_json(html_path, json_path, max_bytes=None):
+    return write_export(build_result(str(html_path), keep_metadata=True), str(json_path), max_bytes=max_bytes)
+
+
+def _content(paths):
+    """导出数据中按分组排列的站点(不含ID、order_num 和 updated_at)"""
+    groups, sites = {}, []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        groups.update((g["id"], g) for g in data["groups"])
+        sites.extend(data["sites"])
+    sites.sort(key=lambda s: (groups[s["group_id"]]["order_num"], s["order_num"]))
+    return [(groups[s["group_id"]]["name"], s["name"], s["url"], s["icon"], s["created_at"], s.get("is_public", 1))
+            for s in sites]
+
+
+def test_html_json_round_trip(tmp_path):
+    source = tmp_path / "bookmarks.html"
+    stats = write_corpus(str(source), 3000, depth=2, fanout=4, private_share=0.1)
+
+    json1 = _to_json(source, tmp_path / "round-1.json")
+    html1 = tmp_path / "round-1.html"
+    exported = export_html(json1, str(html1), temp_dir=str(tmp_path))
+    json2 = _to_json(html1, tmp_path / "round-2.json")
+    html2 = tmp_path / "round-2.html"
+    export_html(json2, str(html2), temp_dir=str(tmp_path))
+
+    content = _content(json1)
+    assert content == _content(json2)
+    assert exported["private"] == sum(1 for site in content if site[5] == 0) > 0
+    assert exported["icons"] == sum(1 for site in content if site[3]) > 0
+    assert len(content) == exported["sites"] <= stats["links"]
+    assert export_digest(json1, str(tmp_path)) == export_digest(json2, str(tmp_path))
+    assert _same_html(str(html1), str(html2))
+
+
+def test_sharded_export_round_trip(tmp_path):
+    source = tmp_path / "bookmarks.html"
+    write_corpus(str(source), 2000, depth=2, fanout=3)
+
+    shards = _to_json(source, tmp_path / "shards.json", max_bytes=64 * 1024)
+    assert len(shards) > 1
+    html = tmp_path / "shards.html"
+    export_html(shards, str(html), temp_dir=str(tmp_path))
+
+    assert _content(_to_json(html, tmp_path / "again.json")) == _content(shards)
@@ -0,0 +1,78 @@
+import base64
+
+import pytest
+
+from bookmark_converter.engine import build_result
+from bookmark_converter.icons import ICON_REF_PREFIX, IconStore, decode_data_uri, resolve_icon
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(64))
+GIF = b"GIF89a" + bytes(range(32))
+PNG_URI = "data:image/png;base64," + base64.b64encode(PNG).decode("ascii")
+GIF_URI = "data:image/gif;base64," + base64.b64encode(GIF).decode("ascii")
+
+# 同一个网站的图标重复出现，另有一个普通图标地址和一个没有图标的链接
+BOOKMARKS = """<!DOCTYPE NETSCAPE-Bookmark-file-1>
+<DL><p>
+    <DT><H3>网站</H3>
+    <DL><p>
+        <DT><A HREF="https://a.example/1" ICON="{png}">a1</A>
+        <DT><A HREF="https://a.example/2" ICON="{png}">a2</A>
+        <DT><A HREF="https://a.example/3" ICON="{png}">a3</A>
+        <DT><A HREF="https://b.example/" ICON="{gif}">b</A>
+        <DT><A HREF="https://c.example/" ICON="https://c.example/favicon.ico">c</A>
+        <DT><A HREF="https://d.example/">d</A>
+    </DL><p>
+</DL><p>
+"""
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "bookmarks.html"
+    path.write_text(BOOKMARKS.format(png=PNG_URI, gif=GIF_URI), encoding="utf-8")
+    return str(path)
+
+
+def _icons(result):
+    return [site["icon"] for group in result["groups"] for site in group["sites"]]
+
+
+def test_inline_shares_one_string(source):
+    store = IconStore()
+    icons = _icons(build_result(source, icon_store=store))
+    assert icons == [PNG_URI] * 3 + [GIF_URI, "https://c.example/favicon.ico", ""]
+    assert icons[0] is icons[1] is icons[2]
+    assert (store.total, store.unique) == (4, 2)
+    assert store.saved_bytes == 2 * len(PNG_URI)
+
+
+def test_table_references_by_hash(source):
+    store = IconStore('table')
+    result = build_result(source, icon_store=store)
+    icons = _icons(result)
+    assert icons[0] == icons[1] == icons[2] != icons[3]
+    assert icons[0].startswith(ICON_REF_PREFIX) and icons[4:] == ["https://c.example/favicon.ico", ""]
+    assert len(result["icons"]) == 2
+    assert [resolve_icon(icon, result["icons"]) for icon in icons[:4]] == [PNG_URI] * 3 + [GIF_URI]
+    assert store.saved_bytes == store.original_bytes - len(PNG_URI) - len(GIF_URI) - sum(map(len, icons[:4])) > 0
+
+
+def test_sidecar_writes_each_image_once(source, tmp_path):
+    directory = tmp_path / "icons"
+    store = IconStore('sidecar', str(directory))
+    icons = _icons(build_result(source, icon_store=store))
+    files = sorted(directory.iterdir())
+    assert sorted(f.suffix for f in files) == [".gif", ".png"]
+    assert icons[0] == icons[2] == "icons/" + next(f.name for f in files if f.suffix == ".png")
+    assert {f.read_bytes() for f in files} == {PNG, GIF}
+    assert store.stored_bytes == len(PNG) + len(GIF)
+
+    with_url = IconStore('sidecar', str(directory), base_url="https://cdn.example/icons/")
+    assert with_url.add(PNG_URI) == "https://cdn.example/icons/" + icons[0].split("/")[-1]
+
+
+def test_decode_data_uri():
+    assert decode_data_uri(PNG_URI) == ("image/png", PNG)
+    assert decode_data_uri("data:image/svg+xml,%3Csvg%2F%3E") == ("image/svg+xml", b"<svg/>")
+    assert decode_data_uri("data:image/png;base64,abc") == (None, None)
+    assert decode_data_uri("https://a.example/favicon.ico") == (None, None)
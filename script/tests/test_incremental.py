@@ -0,0 +1,66 @@
+import json
+
+from bookmark_converter.dedup import SiteIndex
+from bookmark_converter.engine import build_result, default_configs
+from bookmark_converter.incremental import sync_file
+from bookmark_converter.writer import write_export
+
+BOOKMARKS = """<!DOCTYPE NETSCAPE-Bookmark-file-1>
+<DL><p>
+    <DT><H3>A</H3>
+    <DL><p>
+        <DT><A HREF="https://example.com/page">page</A>
+        <DT><H3>B</H3>
+        <DL><p>
+            <DT><A HREF="https://example.com/page/?utm_source=x">page again</A>
+            <DT><A HREF="https://example.com/other">other</A>
+        </DL><p>
+    </DL><p>
+    <DT><H3>C</H3>
+    <DL><p>
+        <DT><A HREF="https://example.com/page">page in C</A>
+        <DT><A HREF="https://example.com/c">c</A>
+    </DL><p>
+</DL><p>
+"""
+
+
+def _urls(result):
+    return [(g["name"], site["url"]) for g in result["groups"] for site in g["sites"]]
+
+
+def _export_writer(result, path):
+    write_export(result, path)
+
+
+def test_incremental_matches_default_dedup(tmp_path):
+    source = tmp_path / "bookmarks.html"
+    source.write_text(BOOKMARKS, encoding="utf-8")
+    expected = build_result(str(source), site_index=SiteIndex('skip'))
+
+    output = tmp_path / "result.json"
+    sync_file(str(source), str(output), default_configs(), site_index=SiteIndex('skip'))
+    actual = json.loads(output.read_text(encoding="utf-8"))
+
+    assert _urls(actual) == _urls(expected)
+    # 同一页面的三个地址只保留文档中最先出现的 A 中的一个
+    assert [(name, url) for name, url in _urls(actual) if "/page" in url] == [("A", "https://example.com/page")]
+    assert [g["name"] for g in actual["groups"]] == ["A", "B", "C"]
+    assert [g["order_num"] for g in actual["groups"]] == [0, 1, 2]
+
+
+def test_export_delta_keeps_removed(tmp_path):
+    source = tmp_path / "bookmarks.html"
+    source.write_text(BOOKMARKS, encoding="utf-8")
+    output, delta = tmp_path / "result.json", tmp_path / "delta.json"
+    sync_file(str(source), str(output), default_configs(), writer=_export_writer, site_index=SiteIndex('skip'))
+
+    source.write_text(BOOKMARKS.replace('        <DT><A HREF="https://example.com/c">c</A>\n', ''),
+                      encoding="utf-8")
+    stats = sync_file(str(source), str(output), default_configs(), delta_path=str(delta),
+                      writer=_export_writer, site_index=SiteIndex('skip'))
+
+    assert stats["removed"] == 1
+    data = json.loads(delta.read_text(encoding="utf-8"))
+    assert data["sites"] == []
+    assert [entry["url_key"] for entry in data["removed"]] == ["example.com/c"]
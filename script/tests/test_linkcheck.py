@@ -0,0 +1,117 @@
+import asyncio
+import socket
+
+import pytest
+
+from bookmark_converter import linkcheck
+from bookmark_converter.linkcheck import LinkCache, LinkChecker
+from mock_sites import MockSites
+
+
+@pytest.fixture(scope="module")
+def sites():
+    sites = MockSites(slow=2.0)
+    address = sites.start()
+    yield address
+    sites.stop()
+
+
+def _result(urls):
+    return {"groups": [{
+        "id": 1, "name": "书签", "order_num": 0,
+        "sites": [{"id": i + 1, "group_id": 1, "name": url, "url": url, "order_num": i, "notes": ""}
+                  for i, url in enumerate(urls)],
+    }]}
+
+
+def _checker(cache=None, **kwargs):
+    kwargs.setdefault("timeout", 0.5)
+    return LinkChecker(cache if cache is not None else LinkCache(), delay=0, **kwargs)
+
+
+def test_mock_sites(sites):
+    checker = _checker(connect_to=sites)
+    entries = checker.check([
+        "http://slow-a.test/",
+        "http://redirect-a.test/",
+        "http://link-a.test/missing/page",
+        "http://gone-a.test/",
+        "http://nohead-a.test/",
+        "http://error-a.test/",
+    ])
+    assert entries["http://slow-a.test/"] == ['error', None, None, False, "超时"]
+    assert entries["http://redirect-a.test/"] == ['ok', 200, "http://link-a.test/", True, None]
+    assert entries["http://link-a.test/missing/page"][:2] == ['dead', 404]
+    assert entries["http://gone-a.test/"][:2] == ['dead', 410]
+    assert entries["http://nohead-a.test/"][:2] == ['ok', 200]
+    assert entries["http://error-a.test/"][:2] == ['error', 500]
+
+
+def test_drop_and_rewrite_redirects(sites):
+    result = _result(["http://redirect-b.test/", "http://link-b.test/missing", "http://slow-b.test/"])
+    checker = _checker(connect_to=sites, action='drop', redirects='permanent')
+    assert checker.apply(result) == 2
+    assert [site["url"] for site in result["groups"][0]["sites"]] == ["http://link-b.test/", "http://slow-b.test/"]
+
+
+@pytest.fixture
+def resolver(sites, monkeypatch):
+    """nx-* 域名不存在，again-* 的 DNS 暂时不可用，其他主机连接到模拟网站"""
+    open_connection = asyncio.open_connection
+
+    async def fake_open_connection(host, port, **kwargs):
+        if host.startswith("nx-"):
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        if host.startswith("again-"):
+            raise socket.gaierror(socket.EAI_AGAIN, "Temporary failure in name resolution")
+        return await open_connection(sites[0], sites[1], **kwargs)
+
+    monkeypatch.setattr(asyncio, "open_connection", fake_open_connection)
+
+
+def test_only_nxdomain_is_dead(resolver):
+    cache = LinkCache()
+    entries = _checker(cache).check(["http://nx-a.test/", "http://again-a.test/", "http://link-c.test/"])
+    assert entries["http://nx-a.test/"][0] == 'dead'
+    assert entries["http://again-a.test/"][0] == 'error'
+    assert entries["http://link-c.test/"][0] == 'ok'
+    assert cache.get("http://again-a.test/")[0] == 'error'
+
+
+def test_refuse_drop_when_no_host_resolves(resolver):
+    urls = ["http://nx-b.test/", "http://nx-c.test/", "http://again-b.test/"]
+    cache = LinkCache()
+    logged = []
+    checker = _checker(cache, action='drop', log=logged.append)
+    result = _result(urls)
+    checker.apply(result)
+
+    assert checker.resolver_failed
+    assert [site["url"] for site in result["groups"][0]["sites"]] == urls
+    assert all(cache.get(url)[0] == 'error' for url in urls)
+    assert checker.stats["dead"] == 0 and checker.stats["error"] == 3
+    assert "无法解析任何域名，本次不移动或删除站点" in logged
+
+
+def test_nxdomain_not_saved_before_resolver_check(resolver, tmp_path, monkeypatch):
+    def interrupted(self, urls, results):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(linkcheck, "SAVE_INTERVAL", 1)
+    monkeypatch.setattr(LinkChecker, "_check_resolver", interrupted)
+    path = str(tmp_path / "links.json")
+    with pytest.raises(KeyboardInterrupt):
+        _checker(LinkCache(path)).check(["http://nx-d.test/", "http://nx-e.test/", "http://again-d.test/"])
+
+    # 中断时还不能确定 DNS 是否正常，域名不存在的结果不能留在缓存中
+    cache = LinkCache(path)
+    assert cache.get("http://nx-d.test/") is None and cache.get("http://nx-e.test/") is None
+    assert cache.get("http://again-d.test/")[0] == 'error'
+
+
+def test_resolver_failed_is_reset(resolver):
+    checker = _checker()
+    checker.check(["http://nx-f.test/", "http://nx-g.test/"])
+    assert checker.resolver_failed
+    assert checker.check(["http://nx-h.test/", "http://link-h.test/"])["http://nx-h.test/"][0] == 'dead'
+    assert not checker.resolver_failed
@@ -0,0 +1,86 @@
+import json
+import time
+
+from bookmark_converter.cli import main
+from bookmark_converter.corpus import write_corpus
+from bookmark_converter.engine import convert_file
+from bookmark_converter.metrics import Metrics
+
+
+def _spans(metrics):
+    return {span["name"]: span for span in metrics.to_dict()["spans"]}
+
+
+def test_nested_spans_and_iter():
+    metrics = Metrics()
+
+    def slow_items():
+        for i in range(3):
+            time.sleep(0.02)
+            yield i
+
+    with metrics.span('outer', items=5):
+        for _ in metrics.iter('inner', slow_items()):
+            time.sleep(0.01)
+    with metrics.span('outer'):
+        pass
+
+    spans = _spans(metrics)
+    assert spans['outer']['calls'] == 2 and spans['outer']['items'] == 5
+    # 迭代器的每次 next(包括结束时的一次)各算一次调用，只计入迭代器内部的时间
+    assert spans['inner']['calls'] == 4 and spans['inner']['items'] == 3
+    assert spans['inner']['seconds'] >= 0.06
+    assert spans['outer']['seconds'] >= spans['inner']['seconds'] + 0.03
+    assert abs(spans['outer']['self_seconds'] - (spans['outer']['seconds'] - spans['inner']['seconds'])) < 1e-3
+
+
+def test_memory_and_profile():
+    metrics = Metrics(trace_memory=True, profile=['build'])
+    try:
+        with metrics.span('build'):
+            data = [str(i) * 10 for i in range(20000)]
+            with metrics.span('temporary'):
+                temporary = bytearray(4 * 1024 * 1024)
+                del temporary
+        del data
+    finally:
+        metrics.close()
+
+    spans = _spans(metrics)
+    # 外层的峰值包括内层的临时分配；内层结束时没有净增长
+    assert spans['temporary']['peak_bytes'] >= 4 * 1024 * 1024
+    assert spans['build']['peak_bytes'] >= spans['temporary']['peak_bytes']
+    assert abs(spans['temporary']['delta_bytes']) < 64 * 1024
+    assert spans['build']['delta_bytes'] > 20000 * 10
+    # 只有 profile 中列出的阶段才采样
+    assert spans['build']['profile'] and 'profile' not in spans['temporary']
+    assert "内存峰值" in metrics.summary()
+
+
+def test_convert_file_stages_and_progress(tmp_path):
+    source = tmp_path / "bookmarks.html"
+    write_corpus(str(source), 2000, depth=2, fanout=3)
+    metrics = Metrics()
+    progress = []
+    convert_file(str(source), str(tmp_path / "result.json"), metrics=metrics, progress=progress.append)
+
+    spans = _spans(metrics)
+    assert {'log', 'parse', 'convert', 'write'} <= set(spans)
+    assert spans['parse']['items'] == 2000 and spans['parse']['bytes'] == source.stat().st_size
+    assert spans['write']['items'] == spans['convert']['items'] > 0
+    # 进度按实际读取的字节和写出的站点推进，单调增加到 100
+    assert len(progress) > 5 and progress == sorted(progress) and progress[-1] == 100
+
+
+def test_cli_writes_metrics(tmp_path, capsys):
+    source = tmp_path / "bookmarks.html"
+    write_corpus(str(source), 500, depth=1, fanout=3)
+    metrics_path = tmp_path / "metrics.json"
+    assert main(["convert", str(source), "-o", str(tmp_path / "result.json"), "--metrics", str(metrics_path),
+                 "--profile", "convert"]) == 0
+
+    with open(metrics_path, encoding="utf-8") as f:
+        data = json.load(f)
+    spans = {span["name"]: span for span in data["spans"]}
+    assert spans["parse"]["items"] == 500 and "profile" in spans["convert"]
+    assert "各阶段统计" in capsys.readouterr().err
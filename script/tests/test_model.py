@@ -0,0 +1,52 @@
+import json
+
+from bookmark_converter.engine import build_result, convert_file, write_result
+from bookmark_converter.model import GroupSites
+
+BOOKMARKS = """<!DOCTYPE NETSCAPE-Bookmark-file-1>
+<DL><p>
+    <DT><H3>A</H3>
+    <DL><p>
+        <DT><A HREF="https://a.example/" ADD_DATE="1600000000">a</A>
+        <DT><A HREF="https://b.example/">b</A>
+    </DL><p>
+    <DT><H3>B</H3>
+    <DL><p>
+        <DT><A HREF="https://c.example/">c</A>
+    </DL><p>
+</DL><p>
+"""
+
+
+def _source(tmp_path):
+    path = tmp_path / "bookmarks.html"
+    path.write_text(BOOKMARKS, encoding="utf-8")
+    return str(path)
+
+
+def test_results_are_plain_json(tmp_path):
+    source = _source(tmp_path)
+    result = build_result(source)
+    assert all(type(group["sites"]) is list for group in result["groups"])
+    assert json.loads(json.dumps(result)) == result
+
+    returned = convert_file(source, str(tmp_path / "result.json"))
+    assert all(type(group["sites"]) is list for group in returned["groups"])
+    json.dumps(returned)
+
+
+def test_columnar_writes_same_json(tmp_path):
+    source = _source(tmp_path)
+    columnar = build_result(source, keep_metadata=True, columnar=True)
+    assert all(isinstance(group["sites"], GroupSites) for group in columnar["groups"])
+    plain = build_result(source, keep_metadata=True)
+    for group in plain["groups"]:
+        for site in group["sites"]:
+            site["created_at"] = site["updated_at"] = "2020-01-01 00:00:00"
+    for group in columnar["groups"]:
+        for site in group["sites"]:
+            site["created_at"] = site["updated_at"] = "2020-01-01 00:00:00"
+
+    write_result(columnar, str(tmp_path / "columnar.json"))
+    with open(tmp_path / "columnar.json", encoding="utf-8") as f:
+        assert json.load(f) == plain
@@ -0,0 +1,101 @@
+import json
+import time
+
+import pytest
+
+from bookmark_converter.corpus import write_corpus
+from bookmark_converter.engine import build_result
+from bookmark_converter.neardup import MAX_BUCKET_COMPARISONS, NearDuplicateFinder, title_features, url_features
+
+ICON = "data:image/png;base64,iVBORw0KGgo="
+
+# 镜像域名、移动版主机和同义的标题；另有一个只有主机相同的无关页面
+BOOKMARKS = """<!DOCTYPE NETSCAPE-Bookmark-file-1>
+<DL><p>
+    <DT><H3>开发</H3>
+    <DL><p>
+        <DT><A HREF="https://www.foo.com/docs/guide/index.html">Docs – Foo Guide</A>
+        <DT><A HREF="https://bar.example.com/blog/2020/post">Bar Blog Post</A>
+    </DL><p>
+    <DT><H3>手机</H3>
+    <DL><p>
+        <DT><A HREF="https://m.foo.org/documentation/guide/" ICON="{icon}">Foo Guide Documentation</A>
+        <DT><A HREF="https://www.foo.com/pricing">Foo Pricing</A>
+    </DL><p>
+    <DT><H3>镜像</H3>
+    <DL><p>
+        <DT><A HREF="https://bar.example.net/blogs/2020/post?utm_source=rss">Bar Blog Post</A>
+    </DL><p>
+</DL><p>
+"""
+
+
+@pytest.fixture
+def result(tmp_path):
+    path = tmp_path / "bookmarks.html"
+    path.write_text(BOOKMARKS.format(icon=ICON), encoding="utf-8")
+    return build_result(str(path))
+
+
+def _names(result):
+    return [(g["name"], [s["name"] for s in g["sites"]]) for g in result["groups"]]
+
+
+def test_mirror_hosts_and_aliases_share_features():
+    assert set(url_features("https://www.foo.com/docs/guide/index.html")) == \
+        set(url_features("https://m.foo.org/documentation/guide/"))
+    assert set(title_features("Docs – Foo Guide")) == set(title_features("Foo Guide Documentation"))
+    assert url_features("https://bar.example.co.uk/a?utm_source=x&id=1") == ["h:bar.example", "p:a", "q:id=1"]
+
+
+def test_report_lists_clusters_without_changing_result(result, tmp_path):
+    before = _names(result)
+    finder = NearDuplicateFinder()
+    assert finder.apply(result) == 0
+    assert _names(result) == before
+
+    clusters = sorted([site["url"] for site in cluster["sites"]] for cluster in finder.clusters)
+    assert clusters == [
+        ["https://bar.example.com/blog/2020/post", "https://bar.example.net/blogs/2020/post?utm_source=rss"],
+        ["https://www.foo.com/docs/guide/index.html", "https://m.foo.org/documentation/guide/"],
+    ]
+    path = tmp_path / "neardup.json"
+    finder.write_report(str(path))
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    assert report["stats"]["clusters"] == 2 and len(report["clusters"]) == 2
+
+
+def test_merge_keeps_first_and_takes_icon(result):
+    finder = NearDuplicateFinder(action='merge')
+    assert finder.apply(result) == 2
+    # 合并后为空的分组被删除
+    assert _names(result) == [("开发", ["Docs – Foo Guide", "Bar Blog Post"]), ("手机", ["Foo Pricing"])]
+    assert result["groups"][0]["sites"][0]["icon"] == ICON
+
+
+def _best_find_seconds(result, rounds=3):
+    best = None
+    for _ in range(rounds):
+        finder = NearDuplicateFinder()
+        started = time.perf_counter()
+        finder.apply(result)
+        seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    return finder, best
+
+
+def test_find_scales_linearly(tmp_path):
+    seconds = []
+    for links in (2000, 8000):
+        path = tmp_path / f"corpus-{links}.html"
+        write_corpus(str(path), links, depth=2, fanout=4, icon_share=0, duplicate_rate=0,
+                     near_duplicate_rate=0.05)
+        finder, best = _best_find_seconds(build_result(str(path)))
+        assert finder.stats["clusters"] > 0
+        # 每个桶中每个站点最多比较 MAX_BUCKET_COMPARISONS 次，比较次数不会超过线性的上限
+        assert finder.stats["comparisons"] <= MAX_BUCKET_COMPARISONS * finder.bands * links
+        seconds.append(best)
+    # 4 倍的链接，两两比较约为 16 倍耗时；留出计时波动的余量
+    ratio = seconds[1] / seconds[0]
+    assert ratio < 8, f"4 倍输入耗时增长了 {ratio:.1f} 倍"
@@ -0,0 +1,99 @@
+import gc
+import os
+import time
+import tracemalloc
+
+from bookmark_converter.corpus import write_corpus
+from bookmark_converter.engine import build_result, iter_bookmark_folders, parse_bookmarks
+
+NESTED = """<!DOCTYPE NETSCAPE-Bookmark-file-1>
+<DL><p>
+    <DT><H3>A</H3>
+    <DL><p>
+        <DT><A HREF="https://a.example/1">a1</A>
+        <DT><H3>B</H3>
+        <DL><p>
+            <DT><H3>C</H3>
+            <DL><p>
+                <DT><A HREF="https://c.example/1">c1</A>
+            </DL><p>
+            <DT><A HREF="https://b.example/1">b1</A>
+        </DL><p>
+        <DT><A HREF="https://a.example/2">a2</A>
+    </DL><p>
+    <DT><A HREF="https://loose.example/">loose</A>
+    <DT><H3>D</H3>
+    <DL><p>
+        <DT><A HREF="https://d.example/1">d1</A>
+    </DL><p>
+</DL><p>
+"""
+
+
+def test_links_go_to_nearest_folder():
+    folders = parse_bookmarks(NESTED, full_path=True)
+    links = {folder["path"]: [link.url for link in folder["links"]] for folder in folders}
+    assert links == {
+        "A": ["https://a.example/1", "https://a.example/2"],
+        "A/B": ["https://b.example/1"],
+        "A/B/C": ["https://c.example/1"],
+        "D": ["https://d.example/1"],
+        "": ["https://loose.example/"],
+    }
+
+
+def test_groups_follow_document_order(tmp_path):
+    path = tmp_path / "nested.html"
+    path.write_text(NESTED, encoding="utf-8")
+    result = build_result(str(path))
+    groups = result["groups"]
+    assert [g["name"] for g in groups] == ["A", "B", "C", "D", "未分类"]
+    assert [g["id"] for g in groups] == [1, 2, 3, 4, 5]
+    assert [g["order_num"] for g in groups] == [0, 1, 2, 3, 4]
+    sites = [site for g in groups for site in g["sites"]]
+    assert [site["id"] for site in sites] == list(range(1, len(sites) + 1))
+    assert all(site["group_id"] == g["id"] for g in groups for site in g["sites"])
+
+
+def _best_parse_seconds(path, rounds=3):
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = build_result(str(path))
+        seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    assert result["groups"]
+    return best
+
+
+def test_parse_time_scales_linearly(tmp_path):
+    small, large = tmp_path / "small.html", tmp_path / "large.html"
+    # 深层嵌套：按祖先逐层重复查找的实现会随深度和文件大小超线性增长
+    write_corpus(str(small), 2000, depth=4, fanout=4, icon_share=0)
+    write_corpus(str(large), 16000, depth=4, fanout=4, icon_share=0)
+    ratio = _best_parse_seconds(large) / _best_parse_seconds(small)
+    # 8 倍的输入，线性实现约为 8 倍耗时；留出计时波动的余量
+    assert ratio < 16, f"8 倍输入耗时增长了 {ratio:.1f} 倍"
+
+
+def _stream_peak(path):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        links = sum(len(folder["links"]) for folder in iter_bookmark_folders(str(path)))
+        return links, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_stream_memory_is_bounded(tmp_path):
+    small, large = tmp_path / "small.html", tmp_path / "large.html"
+    # 每个链接都带不同的 4KB 图标，文件大小主要是图标；每个文件夹的链接数不变，只增加文件夹
+    write_corpus(str(small), 1000, depth=3, fanout=4, icon_share=1.0, icon_size=4096, icon_variety=1000)
+    write_corpus(str(large), 4000, depth=4, fanout=4, icon_share=1.0, icon_size=4096, icon_variety=4000)
+    small_links, small_peak = _stream_peak(small)
+    large_links, large_peak = _stream_peak(large)
+    assert (small_links, large_links) == (1000, 4000)
+    # 内存峰值与最大的文件夹和读取块的大小有关，而与整个文件的大小无关
+    assert large_peak < os.path.getsize(large) / 3
+    assert large_peak < small_peak * 1.5, f"4 倍输入内存峰值 {small_peak} -> {large_peak}"
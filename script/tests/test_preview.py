@@ -0,0 +1,150 @@
+import json
+
+import pytest
+
+pytest.importorskip("tkinter")
+
+import chromeToJSON  # noqa: E402
+from bookmark_converter.engine import build_result  # noqa: E402
+from bookmark_converter.icons import IconStore  # noqa: E402
+
+ICON = "data:image/png;base64," + "A" * 400
+
+
+class FakeTree:
+    """只记录节点的 Treeview 替身：iid -> (父节点, 文本, 值)"""
+
+    def __init__(self):
+        self.nodes = {}
+        self.selected = ()
+        self.focused = ""
+
+    def insert(self, parent, index, iid, text="", values=()):
+        assert iid not in self.nodes
+        self.nodes[iid] = (parent, text, values)
+
+    def delete(self, *iids):
+        for iid in iids:
+            for child in self.get_children(iid):
+                self.delete(child)
+            del self.nodes[iid]
+
+    def get_children(self, parent=""):
+        return [iid for iid, node in self.nodes.items() if node[0] == parent]
+
+    def exists(self, iid):
+        return iid in self.nodes
+
+    def focus(self):
+        return self.focused
+
+    def selection(self):
+        return self.selected
+
+
+class FakeText:
+    def __init__(self):
+        self.text = ""
+
+    def delete(self, start, end):
+        self.text = ""
+
+    def insert(self, index, text):
+        self.text += text
+
+
+class FakeRoot:
+    children = {"!notebook": "!notebook"}
+
+    def __init__(self):
+        self.selected_tab = None
+
+    def nametowidget(self, name):
+        return self
+
+    def select(self, index):
+        self.selected_tab = index
+
+
+class FakeVar:
+    def __init__(self):
+        self.value = None
+
+    def set(self, value):
+        self.value = value
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(chromeToJSON, "PREVIEW_PAGE_SIZE", 3)
+    monkeypatch.setattr(chromeToJSON, "RAW_PAGE_CHARS", 200)
+    app = chromeToJSON.BookmarkConverterApp.__new__(chromeToJSON.BookmarkConverterApp)
+    app.preview_tree = FakeTree()
+    app.preview_text = FakeText()
+    app.raw_page_var = FakeVar()
+    app.status_var = FakeVar()
+    app.root = FakeRoot()
+    app.logged = []
+    app.log = app.logged.append
+    return app
+
+
+@pytest.fixture
+def result(tmp_path):
+    folders = "".join(
+        f'<DT><H3>分组{g}</H3>\n<DL><p>\n'
+        + "".join(f'<DT><A HREF="https://g{g}.example/{i}" ICON="{ICON}">站点{i}</A>\n' for i in range(g + 1))
+        + "</DL><p>\n"
+        for g in range(7))
+    path = tmp_path / "bookmarks.html"
+    path.write_text(f"<!DOCTYPE NETSCAPE-Bookmark-file-1>\n<DL><p>\n{folders}</DL><p>\n", encoding="utf-8")
+    return build_result(str(path), icon_store=IconStore())
+
+
+def _select(app, iid):
+    app.preview_tree.selected = (iid,)
+    app.on_preview_select(None)
+
+
+def _open(app, iid):
+    app.preview_tree.focused = iid
+    app.on_preview_open(None)
+
+
+def test_groups_are_paged_and_sites_load_on_expand(app, result):
+    app.show_preview(result)
+    tree = app.preview_tree
+    assert tree.get_children() == ["configs", "g0", "g1", "g2", "more:g:3"]
+    # 分组一开始就显示站点数，站点只有占位节点
+    assert tree.nodes["g2"][2][0] == 3
+    assert tree.get_children("g2") == ["g2:loading"]
+    assert "预览: 7 个分组，28 个站点" in app.logged
+    assert app.root.selected_tab == 2
+
+    _select(app, "more:g:3")
+    _select(app, "more:g:6")
+    assert tree.get_children()[1:] == [f"g{i}" for i in range(7)]
+
+    _open(app, "g5")
+    assert tree.get_children("g5") == ["s5:0", "s5:1", "s5:2", "more:s:5:3"]
+    _select(app, "more:s:5:3")
+    assert tree.get_children("g5") == [f"s5:{i}" for i in range(6)]
+    # 图标只显示类型、大小和哈希
+    detail = tree.nodes["s5:0"][2][1]
+    assert detail.startswith("https://g5.example/0  [image/png 422 字节 #") and ICON not in detail
+
+
+def test_raw_json_is_paged(app, result):
+    app.show_preview(result)
+    _select(app, "g6")
+    pages = [app.preview_text.text]
+    assert app.raw_page_var.value == "第 1 页"
+    # 翻到最后一页之后页码不再变化
+    while True:
+        app.show_raw_page(app.raw_page + 1)
+        if app.raw_page < len(pages):
+            break
+        pages.append(app.preview_text.text)
+    assert len(pages) > 1 and all(len(page) <= 200 for page in pages)
+    assert app.raw_page_var.value == f"第 {len(pages)} / {len(pages)} 页"
+    assert json.loads("".join(pages)) == json.loads(json.dumps(result["groups"][6], default=chromeToJSON.to_plain))
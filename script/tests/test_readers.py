@@ -0,0 +1,155 @@
+import base64
+import json
+import plistlib
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+
+from bookmark_converter.engine import build_result
+from bookmark_converter.readers import detect_format
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(32))
+ICON = "data:image/png;base64," + base64.b64encode(PNG).decode("ascii")
+
+# 各个浏览器的书签与下面的HTML内容相同(与浏览器自己导出的HTML结构一致)
+EXPECTED_HTML = """<!DOCTYPE NETSCAPE-Bookmark-file-1>
+<DL><p>
+    <DT><H3>{bar}</H3>
+    <DL><p>
+        <DT><A HREF="https://news.example/" ADD_DATE="1600000000" ICON="{icon}">新闻</A>
+        <DT><H3>开发</H3>
+        <DL><p>
+            <DT><A HREF="https://docs.python.org/3/" ADD_DATE="1600000100">Python</A>
+        </DL><p>
+    </DL><p>
+    <DT><H3>阅读</H3>
+    <DL><p>
+        <DT><A HREF="https://read.example/a" ADD_DATE="1600000200">文章</A>
+    </DL><p>
+    <DT><A HREF="https://loose.example/" ADD_DATE="1600000300">散落的书签</A>
+</DL><p>
+"""
+
+
+def _content(result):
+    return [(group["name"], [(site["name"], site["url"], site["icon"], site["created_at"])
+                             for site in group["sites"]])
+            for group in result["groups"]]
+
+
+def _assert_same_as_html(tmp_path, path, bar, icons=True):
+    html_path = tmp_path / "expected.html"
+    html_path.write_text(EXPECTED_HTML.format(bar=bar, icon=ICON if icons else ""), encoding="utf-8")
+    expected = _content(build_result(str(html_path), keep_metadata=True))
+    assert [name for name, _ in expected] == [bar, "开发", "阅读", "未分类"]
+    assert expected[0][1][0] == ("新闻", "https://news.example/", ICON if icons else "", "2020-09-13 12:26:40")
+
+    assert _content(build_result(str(path), keep_metadata=True)) == expected
+
+
+def _sqlite(path, script, rows):
+    conn = sqlite3.connect(path)
+    conn.executescript(script)
+    for sql, values in rows:
+        conn.executemany(sql, values)
+    conn.commit()
+    conn.close()
+
+
+def _webkit(seconds):
+    return str((seconds + 11644473600) * 1000000)
+
+
+def test_chrome(tmp_path):
+    def url(name, address, seconds):
+        return {"type": "url", "name": name, "url": address, "date_added": _webkit(seconds)}
+
+    def folder(name, children):
+        return {"type": "folder", "name": name, "children": children}
+
+    bookmarks = {"version": 1, "roots": {
+        "bookmark_bar": folder("书签栏", [
+            url("新闻", "https://news.example/", 1600000000),
+            folder("开发", [url("Python", "https://docs.python.org/3/", 1600000100)]),
+        ]),
+        "other": folder("其他书签", [
+            folder("阅读", [url("文章", "https://read.example/a", 1600000200)]),
+            url("散落的书签", "https://loose.example/", 1600000300),
+        ]),
+        "synced": folder("移动设备书签", []),
+    }}
+    path = tmp_path / "Bookmarks"
+    path.write_text(json.dumps(bookmarks, ensure_ascii=False), encoding="utf-8")
+    _sqlite(str(tmp_path / "Favicons"),
+            "CREATE TABLE icon_mapping (id INTEGER PRIMARY KEY, page_url TEXT, icon_id INTEGER);"
+            "CREATE TABLE favicon_bitmaps (id INTEGER PRIMARY KEY, icon_id INTEGER, image_data BLOB, width INTEGER);",
+            [("INSERT INTO icon_mapping (page_url, icon_id) VALUES (?, ?)", [("https://news.example/", 1)]),
+             ("INSERT INTO favicon_bitmaps (icon_id, image_data, width) VALUES (?, ?, ?)", [(1, PNG, 16)])])
+
+    assert detect_format(str(path)) == 'chrome'
+    _assert_same_as_html(tmp_path, path, "书签栏")
+
+
+def test_firefox(tmp_path):
+    path = str(tmp_path / "places.sqlite")
+    places = [(1, "https://news.example/"), (2, "https://docs.python.org/3/"), (3, "https://read.example/a"),
+              (4, "https://loose.example/"), (5, "place:sort=8")]
+    # (id, type, fk, parent, position, title, dateAdded(微秒), guid)
+    bookmarks = [
+        (1, 2, None, 0, 0, "", 0, "root________"),
+        (2, 2, None, 1, 0, "menu", 0, "menu________"),
+        (3, 2, None, 1, 1, "toolbar", 0, "toolbar_____"),
+        (4, 2, None, 1, 3, "unfiled", 0, "unfiled_____"),
+        (5, 2, None, 1, 4, "mobile", 0, "mobile______"),
+        (10, 1, 1, 3, 0, "新闻", 1600000000 * 10 ** 6, "a"),
+        (11, 2, None, 3, 1, "开发", 0, "b"),
+        (12, 1, 2, 11, 0, "Python", 1600000100 * 10 ** 6, "c"),
+        (13, 1, 5, 3, 2, "最近的标签", 0, "d"),
+        (14, 2, None, 4, 0, "阅读", 0, "e"),
+        (15, 1, 3, 14, 0, "文章", 1600000200 * 10 ** 6, "f"),
+        (16, 1, 4, 2, 0, "散落的书签", 1600000300 * 10 ** 6, "g"),
+    ]
+    _sqlite(path,
+            "CREATE TABLE moz_places (id INTEGER PRIMARY KEY, url TEXT);"
+            "CREATE TABLE moz_bookmarks (id INTEGER PRIMARY KEY, type INTEGER, fk INTEGER, parent INTEGER,"
+            " position INTEGER, title TEXT, dateAdded INTEGER, guid TEXT);",
+            [("INSERT INTO moz_places VALUES (?, ?)", places),
+             ("INSERT INTO moz_bookmarks VALUES (?, ?, ?, ?, ?, ?, ?, ?)", bookmarks)])
+    _sqlite(str(tmp_path / "favicons.sqlite"),
+            "CREATE TABLE moz_pages_w_icons (id INTEGER PRIMARY KEY, page_url TEXT);"
+            "CREATE TABLE moz_icons_to_pages (page_id INTEGER, icon_id INTEGER);"
+            "CREATE TABLE moz_icons (id INTEGER PRIMARY KEY, data BLOB, width INTEGER);",
+            [("INSERT INTO moz_pages_w_icons VALUES (?, ?)", [(1, "https://news.example/")]),
+             ("INSERT INTO moz_icons_to_pages VALUES (?, ?)", [(1, 1)]),
+             ("INSERT INTO moz_icons VALUES (?, ?, ?)", [(1, PNG, 16)])])
+
+    assert detect_format(path) == 'firefox'
+    # 菜单中的书签位于顶层；"其他书签"中没有直接的书签，只有子文件夹"阅读"，不产生分组；place: 查询被跳过
+    _assert_same_as_html(tmp_path, path, "Bookmarks Toolbar")
+
+
+@pytest.mark.parametrize("fmt", [plistlib.FMT_BINARY, plistlib.FMT_XML])
+def test_safari(tmp_path, fmt):
+    def leaf(title, address, seconds):
+        added = datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None)
+        return {"WebBookmarkType": "WebBookmarkTypeLeaf", "URLString": address,
+                "URIDictionary": {"title": title}, "ReadingList": {"DateAdded": added}}
+
+    def folder(title, children):
+        return {"WebBookmarkType": "WebBookmarkTypeList", "Title": title, "Children": children}
+
+    root = folder("", [
+        {"WebBookmarkType": "WebBookmarkTypeProxy", "Title": "History"},
+        folder("BookmarksBar", [
+            leaf("新闻", "https://news.example/", 1600000000),
+            folder("开发", [leaf("Python", "https://docs.python.org/3/", 1600000100)]),
+        ]),
+        folder("阅读", [leaf("文章", "https://read.example/a", 1600000200)]),
+        leaf("散落的书签", "https://loose.example/", 1600000300),
+    ])
+    path = tmp_path / "Bookmarks.plist"
+    path.write_bytes(plistlib.dumps(root, fmt=fmt))
+
+    assert detect_format(str(path)) == 'safari'
+    _assert_same_as_html(tmp_path, path, "Favorites", icons=False)
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from bookmark_converter import searchindex
+from bookmark_converter.corpus import write_corpus
+from bookmark_converter.engine import build_result
+from bookmark_converter.searchindex import (
+    SearchIndex,
+    build_search_index,
+    main,
+    sample_queries,
+    substring_search,
+    write_search_index,
+)
+from bookmark_converter.writer import write_export
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("search")
+    path = directory / "bookmarks.html"
+    write_corpus(str(path), 1500, depth=2, fanout=4, icon_share=0, non_ascii_share=0.4)
+    return directory, build_result(str(path))
+
+
+def _round_trip(index):
+    return SearchIndex(json.loads(json.dumps(index, ensure_ascii=False)))
+
+
+def test_same_results_as_substring_search(corpus):
+    _, result = corpus
+    data = build_search_index(result, pinyin=False)
+    # "htt" 这样出现在大多数文档中的片段保存为不含它的文档
+    assert "htt" in data["common"] and "htt" not in data["grams"]
+    index = _round_trip(data).bind(result)
+    queries = sample_queries(result, 300, seed=1) + ["h", "ht", "https://", " NEWS ", "\0", "", "zqzqzq"]
+    for query in queries:
+        assert index.search(query) == substring_search(query, result), query
+
+
+def test_export_data_index(corpus):
+    directory, result = corpus
+    export = str(directory / "export.json")
+    write_export(result, export)
+    with open(export, encoding="utf-8") as f:
+        data = json.load(f)
+    index_path = str(directory / "export.search.json")
+    write_search_index(data, index_path, pinyin=False)
+    index = SearchIndex.load(index_path).bind(data)
+    for query in sample_queries(data, 100, seed=2):
+        assert index.search(query) == substring_search(query, data), query
+
+
+class FakePinyin:
+    """只认识测试中用到的几个字的 pypinyin 替身"""
+
+    SYLLABLES = {"百": "bai", "度": "du", "地": "di", "图": "tu"}
+
+    def lazy_pinyin(self, text, errors='default'):
+        return [self.SYLLABLES.get(char, char) for char in text]
+
+
+def test_term_prefixes(monkeypatch):
+    monkeypatch.setattr(searchindex, "_pinyin_module", FakePinyin())
+    result = {"groups": [{"id": 1, "name": "常用", "sites": [
+        {"name": "百度地图", "url": "https://map.baidu.com/", "description": "", "notes": ""},
+        {"name": "Docs", "url": "https://www.python-docs.example.org/3/", "description": "Lib Reference",
+         "notes": ""},
+    ]}]}
+    index = _round_trip(build_search_index(result)).bind(result)
+
+    assert index.search("bddt") == []
+    assert index.search("bddt", terms=True) == [("site", "常用", "https://map.baidu.com/", ["terms"])]
+    assert index.search("baidudi", terms=True) == [("site", "常用", "https://map.baidu.com/", ["terms"])]
+    # 子串匹配的结果在前，词项匹配只追加其他文档
+    assert index.search("python", terms=True) == [
+        ("site", "常用", "https://www.python-docs.example.org/3/", ["url"])]
+    assert index.search("refer", terms=True) == [
+        ("site", "常用", "https://www.python-docs.example.org/3/", ["description"])]
+    assert "www" not in build_search_index(result)["terms"]
+
+
+def test_rejects_other_version_and_unbound_search(corpus):
+    _, result = corpus
+    data = build_search_index(result, pinyin=False)
+    with pytest.raises(ValueError):
+        SearchIndex(dict(data, version=data["version"] + 1))
+    with pytest.raises(ValueError):
+        SearchIndex(data).search("news")
+
+
+def test_benchmark_command(corpus, capsys):
+    directory, result = corpus
+    source = directory / "result.json"
+    source.write_text(json.dumps(result, ensure_ascii=False), encoding="utf-8")
+    assert main([str(source), "-o", str(directory / "result.search.json"), "--queries", "200", "--no-pinyin"]) == 0
+    assert "所有查询的结果与线性搜索一致" in capsys.readouterr().out
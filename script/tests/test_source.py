@@ -0,0 +1,72 @@
+import gzip
+import io
+import zipfile
+
+import pytest
+
+from bookmark_converter.cache import ParseCache
+from bookmark_converter.readers import iter_input_folders
+from bookmark_converter.source import InputFile, read_text
+
+LINK = '<DT><A HREF="https://example.com/{0}">{1}</A>\n'
+
+
+def _write(tmp_path, data):
+    path = tmp_path / "bookmarks.html"
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_undeclared_gbk_whose_head_is_valid_utf8(tmp_path):
+    # "é" 的 UTF-8 编码在 GBK 中是合法的 "茅"，文件开头按 UTF-8 也能解码
+    text = "<DL><p>\n" + LINK.format(0, "茅") + "".join(LINK.format(i, "ascii") for i in range(200)) \
+        + LINK.format(1, "中文书签") + "</DL><p>\n"
+    data = text.encode("gbk")
+    assert data[:4096].decode("utf-8")
+
+    logged = []
+    assert read_text(_write(tmp_path, data), logged.append) == text
+    assert logged == ["UTF-8编码读取失败，改用 GB18030 编码继续读取"]
+
+
+def test_undeclared_utf8(tmp_path):
+    text = "<DL><p>\n" + "".join(LINK.format(i, "中文书签") for i in range(5000)) + "</DL><p>\n"
+    logged = []
+    assert read_text(_write(tmp_path, text.encode("utf-8")), logged.append) == text
+    assert logged == []
+
+
+def test_mixed_encodings_after_utf8_is_decided(tmp_path):
+    text = "".join(LINK.format(i, "中文书签") for i in range(100))
+    data = text.encode("utf-8") + LINK.format(0, "中文书签").encode("gbk")
+    with pytest.raises(UnicodeDecodeError):
+        read_text(_write(tmp_path, data), lambda message: None)
+
+
+@pytest.mark.parametrize("compress", [None, "gzip", "zip"])
+def test_input_file_opened_once(tmp_path, monkeypatch, compress):
+    text = "<DL><p>\n" + "".join(LINK.format(i, "中文书签") for i in range(3000)) + "</DL><p>\n"
+    data = text.encode("utf-8")
+    if compress == "gzip":
+        data = gzip.compress(data)
+    elif compress == "zip":
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            archive.writestr("bookmarks.html", data)
+        data = buffer.getvalue()
+    path = _write(tmp_path, data)
+
+    opened = []
+    init = InputFile.__init__
+
+    def counting_init(self, path):
+        opened.append(path)
+        init(self, path)
+
+    monkeypatch.setattr(InputFile, "__init__", counting_init)
+    # 判断格式、计算缓存指纹和解析都使用同一个打开的文件
+    folders = list(ParseCache().folders(path))
+    assert len(opened) == 1
+    assert sum(len(folder["links"]) for folder in folders) == 3000
+    assert list(iter_input_folders(path)) == folders
+    assert len(opened) == 2
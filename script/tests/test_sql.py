@@ -0,0 +1,92 @@
+import os
+import sqlite3
+
+import pytest
+
+from bookmark_converter.corpus import write_corpus
+from bookmark_converter.engine import build_result
+from bookmark_converter.sql import write_sql
+
+SCHEMA = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                      "init_table.sql")
+
+
+@pytest.fixture
+def database(tmp_path):
+    connection = sqlite3.connect(str(tmp_path / "d1.sqlite"))
+    connection.execute("PRAGMA foreign_keys = ON")  # 与 D1 一致
+    with open(SCHEMA, encoding="utf-8") as f:
+        connection.executescript(f.read())
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def result(tmp_path):
+    path = tmp_path / "bookmarks.html"
+    write_corpus(str(path), 3000, icon_share=0.2, icon_size=2048)
+    return build_result(str(path))
+
+
+def _load(connection, path):
+    with open(path, encoding="utf-8") as f:
+        connection.executescript(f.read())
+
+
+def _count(connection, table):
+    return connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_sql_loads_into_schema(database, result, tmp_path):
+    output = tmp_path / "result.sql"
+    statements = write_sql(result, str(output), max_bytes=20000)
+    assert statements > 2  # 按语句长度拆分
+
+    _load(database, output)
+    assert _count(database, "groups") == len(result["groups"])
+    assert _count(database, "sites") == sum(len(g["sites"]) for g in result["groups"])
+    assert database.execute("PRAGMA foreign_key_check").fetchall() == []
+    # DB_INITIALIZED 已由 init_table.sql 写入，配置被覆盖而不是重复插入
+    assert _count(database, "configs") == len(result["configs"])
+    site = result["groups"][0]["sites"][0]
+    assert database.execute("SELECT name, url FROM sites WHERE id = ?", (site["id"],)).fetchone() == \
+        (site["name"], site["url"])
+
+
+def test_sql_replace_keeps_other_sites(database, result, tmp_path):
+    _load(database, _write(result, tmp_path / "full.sql"))
+    sites = _count(database, "sites")
+    # 只包含第一个分组前两个站点的文件，站点改了名称
+    group = dict(result["groups"][0])
+    group["name"] = "renamed"
+    group["sites"] = [dict(site, name="changed") for site in group["sites"][:2]]
+    partial = {"groups": [group], "configs": result["configs"]}
+
+    output = tmp_path / "partial.sql"
+    write_sql(partial, str(output), replace=True)
+    _load(database, output)
+
+    assert _count(database, "sites") == sites
+    assert database.execute("SELECT name FROM groups WHERE id = ?", (group["id"],)).fetchone() == ("renamed",)
+    assert database.execute("SELECT COUNT(*) FROM sites WHERE name = 'changed'").fetchone() == (2,)
+    assert database.execute("PRAGMA foreign_key_check").fetchall() == []
+
+
+def test_oversized_icon_is_dropped(database, result, tmp_path):
+    site = result["groups"][0]["sites"][0]
+    site["icon"] = "data:image/png;base64," + "A" * 30000
+    logged = []
+    output = tmp_path / "result.sql"
+    write_sql(result, str(output), max_bytes=20000, log=logged.append)
+
+    with open(output, encoding="utf-8") as f:
+        statements = f.read().split(";\n")
+    assert max(len(statement.encode("utf-8")) for statement in statements) <= 20000
+    assert f"站点 {site['name']} 的图标过大，已在 SQL 中去掉图标" in logged
+    _load(database, output)
+    assert database.execute("SELECT icon FROM sites WHERE id = ?", (site["id"],)).fetchone() == ("",)
+
+
+def _write(result, path):
+    write_sql(result, str(path))
+    return str(path)
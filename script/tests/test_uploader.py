@@ -0,0 +1,80 @@
+import pytest
+
+from bookmark_converter.engine import default_configs
+from bookmark_converter.uploader import Bundle, Uploader
+from bookmark_converter.writer import write_export
+from mock_worker import MockWorker
+
+
+def _sites(group_id, count):
+    return [{"id": group_id * 1000 + i, "group_id": group_id, "name": f"站点{i}",
+             "url": f"https://g{group_id}.example/{i}", "icon": "", "description": "", "notes": "",
+             "order_num": i, "created_at": "2020-01-01 00:00:00", "updated_at": "2020-01-01 00:00:00"}
+            for i in range(count)]
+
+
+@pytest.fixture
+def bundles(tmp_path):
+    """两个大分组拆成 8 个导入包，相邻的导入包引用相同的分组"""
+    result = {"groups": [{"id": g, "name": f"分组{g}", "order_num": g, "sites": _sites(g, 300)} for g in (1, 2)],
+              "configs": default_configs()}
+    shards = write_export(result, str(tmp_path / "export.json"), 16 * 1024)
+    assert len(shards) > 4
+    return [Bundle.from_file(path) for path in shards]
+
+
+@pytest.fixture
+def worker():
+    worker = MockWorker(seed=1)
+    worker.url = worker.start()
+    yield worker
+    worker.stop()
+
+
+def _uploader(worker, **kwargs):
+    kwargs.setdefault("retries", 10)
+    return Uploader(worker.url, "admin", "admin", backoff=0.01, **kwargs)
+
+
+def test_retries_injected_failures(worker, bundles):
+    worker.fail_rate = 0.3
+    report = _uploader(worker).upload(bundles)
+
+    assert report["failed"] == []
+    assert worker.injected_failures > 0
+    assert report["sites"] == len(worker.sites) == 600
+    assert sorted(g["name"] for g in worker.groups) == ["分组1", "分组2"]
+
+
+def test_resume_from_checkpoint(worker, bundles, tmp_path):
+    checkpoint = str(tmp_path / "export.upload.json")
+    worker.fail_rate = 0.5
+    first = _uploader(worker, retries=0, concurrency=1, checkpoint_path=checkpoint).upload(bundles)
+    assert 0 < len(first["failed"]) < len(bundles)
+
+    worker.fail_rate = 0.0
+    requests = worker.requests
+    second = _uploader(worker, checkpoint_path=checkpoint).upload(bundles)
+    assert second["skipped"] == len(bundles) - len(first["failed"])
+    assert second["bundles"] == len(first["failed"]) and second["failed"] == []
+    # 登录一次，每个未完成的导入包上传一次
+    assert worker.requests - requests == 1 + len(first["failed"])
+    assert len(worker.sites) == 600
+
+
+def test_no_duplicate_groups_under_concurrency(worker, bundles, monkeypatch):
+    worker.latency = 0.05
+    report = _uploader(worker, concurrency=4).upload(bundles)
+    assert report["failed"] == []
+    assert worker.duplicate_groups == 0
+    assert len(worker.groups) == 2
+
+    # 不按分组名称加锁时，模拟的 worker 确实会产生重复分组
+    other = MockWorker(latency=0.05)
+    other.url = other.start()
+    try:
+        monkeypatch.setattr(Uploader, "_group_lock_list", lambda self, bundle: [])
+        _uploader(other, concurrency=4).upload(bundles)
+        assert other.duplicate_groups > 0
+    finally:
+        other.stop()
@@ -0,0 +1,63 @@
+import json
+import os
+
+import pytest
+
+from bookmark_converter.corpus import write_corpus
+from bookmark_converter.engine import build_result, default_configs
+from bookmark_converter.writer import validate_export_data, write_export
+
+
+def _load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="module")
+def result(tmp_path_factory):
+    path = tmp_path_factory.mktemp("corpus") / "bookmarks.html"
+    write_corpus(str(path), 3000, depth=2, fanout=4, icon_share=0.5, icon_size=2048)
+    return build_result(str(path), configs=default_configs())
+
+
+@pytest.mark.parametrize("compact", [True, False])
+def test_shards_fit_budget_and_validate(result, tmp_path, compact):
+    budget = 64 * 1024
+    single = _load(write_export(result, str(tmp_path / "single.json"), compact=compact)[0])
+    shards = write_export(result, str(tmp_path / "export.json"), max_bytes=budget, compact=compact)
+    assert len(shards) > 4
+
+    sites = []
+    for index, path in enumerate(shards):
+        assert os.path.getsize(path) <= budget
+        data = _load(path)
+        assert validate_export_data(data) == []
+        # 每个站点的分组都在同一个分片中
+        group_ids = {g["id"] for g in data["groups"]}
+        assert {s["group_id"] for s in data["sites"]} <= group_ids
+        assert (data["configs"] == single["configs"]) if index == 0 else (data["configs"] == {})
+        sites.extend(data["sites"])
+
+    assert validate_export_data(single) == []
+    assert sites == single["sites"]
+    assert len(sites) == sum(len(g["sites"]) for g in result["groups"])
+
+
+def test_oversized_icon_and_invalid_url(tmp_path):
+    icon = "data:image/png;base64," + "A" * 8000
+    sites = [
+        {"id": 1, "group_id": 1, "name": "大图标", "url": "https://a.example/", "icon": icon, "order_num": 0},
+        {"id": 2, "group_id": 1, "name": "", "url": "b.example/page", "icon": "", "order_num": 1},
+        {"id": 3, "group_id": 1, "name": "无效", "url": "", "icon": "", "order_num": 2},
+    ]
+    result = {"groups": [{"id": 1, "name": "分组", "order_num": 0, "sites": sites}], "configs": {}}
+    logged = []
+    shards = write_export(result, str(tmp_path / "export.json"), max_bytes=4096, log=logged.append)
+
+    data = [site for path in shards for site in _load(path)["sites"]]
+    assert [(s["name"], s["url"], s["icon"]) for s in data] == [
+        ("大图标", "https://a.example/", ""),
+        ("https://b.example/page", "https://b.example/page", ""),
+    ]
+    assert "站点 大图标 的图标过大，已在导入包中去掉图标" in logged
+    assert "跳过了 1 个URL无效的站点" in logged